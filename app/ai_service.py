@@ -5,6 +5,7 @@ Integração com Claude + Sistema de Memória + Aprendizado Contínuo
 
 import json
 import time
+import logging
 from typing import Optional, List, Dict
 from datetime import datetime
 
@@ -16,6 +17,7 @@ from app.config import (
     AI_MODEL_FALLBACK,
     MAX_TOKENS_RESPONSE,
     MONTHLY_MESSAGE_LIMIT,
+    FREE_MESSAGE_LIMIT,
     WEB_SEARCH_ENABLED
 )
 from app.prompts import (
@@ -29,6 +31,8 @@ from app.prompts import (
 )
 from app.prompts_i18n import get_persona_by_language, get_language_instruction
 from app.database import Database
+from app.context_builder import ContextAssembler, ContextProfile
+from app.telemetry import span, traced_llm_call
 from app.learning.continuous_learning import (
     LearningEngine,
     ImplicitFeedbackDetector,
@@ -39,6 +43,17 @@ from app.learning.continuous_learning import (
 from app.web_search_service import web_search_service
 from app.policy.router import get_policy_router
 from app.policy.types import PolicyAction
+from app.logging_config import get_logger
+
+
+logger = get_logger("chat")
+
+
+class MessageLimitReached(Exception):
+    """Cota free esgotada no momento de gravar o turno (requests concorrentes)"""
+
+    def __init__(self, message: str = "Você atingiu o limite gratuito. Assine para continuar conversando!"):
+        super().__init__(message)
 
 
 class AIService:
@@ -61,6 +76,8 @@ class AIService:
         image_data: Optional[str] = None,  # Base64 encoded image (single)
         image_media_type: Optional[str] = None,  # image/jpeg, image/png, etc.
         images: Optional[List[tuple]] = None,  # Lista de (base64, media_type) para PDFs
+        pdf_text: Optional[str] = None,  # Texto extraído de PDF com camada de texto
+        pdf_pages: int = 0,  # Páginas do PDF (para o registro da mensagem)
         detected_location: Optional[str] = None  # Localizacao detectada pelo IP/headers
     ) -> Dict:
         """
@@ -68,11 +85,12 @@ class AIService:
         """
         # 0. POLICY ENGINE: Input Guard (Playbook Secao 3.1)
         # Analisa mensagem ANTES de processar
-        policy_router = get_policy_router()
-        input_policy, safe_response = policy_router.guard_input(
-            message=message,
-            user_id=user_id
-        )
+        with span("chat.policy_guard"):
+            policy_router = get_policy_router()
+            input_policy, safe_response = policy_router.guard_input(
+                message=message,
+                user_id=user_id
+            )
 
         # Se bloqueado, retornar resposta segura sem chamar LLM
         if safe_response is not None:
@@ -83,224 +101,204 @@ class AIService:
                 conversation = await self.db.create_conversation(user_id)
                 conversation_id = conversation["id"]
 
-            # Salvar mensagem do usuario e resposta segura
-            await self.db.save_message(
-                conversation_id=conversation_id,
-                user_id=user_id,
-                role="user",
-                content=message
-            )
-            await self.db.save_message(
+            # Salvar mensagem do usuario e resposta segura (atômico). Sem limite
+            # de cota: resposta de crise/segurança nunca vira 402
+            quota = await self.db.save_chat_turn(
                 conversation_id=conversation_id,
                 user_id=user_id,
-                role="assistant",
-                content=safe_response,
+                user_content=message,
+                assistant_content=safe_response,
                 tokens_used=0,
-                model_used="policy_engine"
+                model_used="policy_engine",
+                message_limit=None
             )
-            await self.db.increment_message_count(user_id)
 
             return {
                 "response": safe_response,
                 "conversation_id": str(conversation_id),
                 "model_used": "policy_engine",
                 "tokens_used": 0,
+                "messages_used": quota["trial_messages_used"] if quota else 0,
                 "policy_action": input_policy.action.value
             }
 
         # Guardar guardrail para injetar no prompt (se necessario)
         policy_guardrail = policy_router.get_guardrail_for_prompt(input_policy)
 
-        # 1. Buscar ou criar conversa
-        if conversation_id:
-            conversation = await self.db.get_conversation(conversation_id)
-        else:
-            conversation = await self.db.create_conversation(user_id)
-            conversation_id = conversation["id"]
-
-        # 2. Buscar contexto do usuário
-        profile = await self.db.get_user_profile(user_id)
-        user = await self.db.get_user_by_id(user_id)
-
-        # 3. Buscar histórico de conversas e pedidos de oração
-        recent_conversations = await self.db.get_recent_conversations(user_id, limit=5)
-        prayer_requests = await self.db.get_active_prayer_requests(user_id)
-
-        # 4. Buscar mensagens da conversa atual
-        messages = await self.db.get_conversation_messages(conversation_id, user_id)
-
-        # 4.5 MEMÓRIA ETERNA: Buscar memórias RELEVANTES (Top-K, não todas!)
-        # Passa a mensagem atual para priorizar memórias relacionadas
-        permanent_memory = await self.db.get_all_memories_formatted(
-            user_id,
-            current_message=message,
-            top_k=20  # Máximo de memórias a incluir
-        )
+        with span("chat.context_load"):
+            # Perfil do turno: quais leituras/descriptografias foram feitas e usadas
+            turn_profile = ContextProfile()
 
-        # 4.6 PERFIL PSICOLÓGICO: Buscar contexto psicológico
-        psychological_context = await self.db.get_psychological_context(user_id)
-
-        # 4.65 APRENDIZADO: Detectar feedback implícito da mensagem anterior
-        recent_feedbacks = []
-        if user_id in self._last_responses:
-            last = self._last_responses[user_id]
-            time_to_respond = time.time() - last.get("timestamp", time.time())
-            feedbacks = ImplicitFeedbackDetector.detect_feedback(
-                last.get("user_message", ""),
-                last.get("ai_response", ""),
-                message,
-                time_to_respond
+            # 1. Buscar ou criar conversa
+            if conversation_id:
+                conversation = await turn_profile.track("conversation", self.db.get_conversation(conversation_id))
+            else:
+                conversation = await self.db.create_conversation(user_id)
+                conversation_id = conversation["id"]
+
+            # 2. Buscar contexto do usuário
+            profile = await turn_profile.track("profile", self.db.get_user_profile(user_id))
+            user = await turn_profile.track("user", self.db.get_user_by_id(user_id))
+
+            # 3. Buscar histórico de conversas (resumos e datas já vêm nesta leitura)
+            recent_conversations = await turn_profile.track(
+                "recent_conversations", self.db.get_recent_conversations(user_id, limit=5)
             )
-            recent_feedbacks = feedbacks
 
-            # Salvar feedbacks detectados
-            for fb in feedbacks:
-                await self.learning_engine.process_user_response(
-                    user_id=user_id,
-                    original_ai_response=last.get("ai_response", ""),
-                    user_response=message,
-                    time_to_respond=time_to_respond,
-                    original_user_message=last.get("user_message", "")
-                )
-                # Ajustar perfil baseado nos feedbacks
-                await self.learning_engine.adjust_profile(user_id, feedbacks)
-
-        # 4.66 APRENDIZADO: Determinar melhor estratégia para este usuário
-        current_context = {
-            "emotional_state": profile.get("estado_emocional", "neutro") if profile else "neutro",
-            "communication_style": profile.get("tom_preferido", "acolhedor") if profile else "acolhedor",
-            "urgency": 0.3  # Pode ser ajustado baseado na mensagem
-        }
-        optimal_strategy = await self.learning_engine.get_optimal_strategy(user_id, current_context)
-
-        # 4.67 APRENDIZADO: Construir contexto de aprendizado para o prompt
-        patterns = await self.learning_engine.detect_patterns(user_id)
-        learning_context = LearningContextBuilder.build_learning_context(
-            optimal_strategy=optimal_strategy,
-            patterns=patterns,
-            insights=[],
-            recent_feedbacks=recent_feedbacks
-        )
+            # 4. Buscar mensagens da conversa atual
+            messages = await turn_profile.track(
+                "messages", self.db.get_conversation_messages(conversation_id, user_id)
+            )
 
-        # 4.7 Buscar últimas mensagens de conversas anteriores (contexto recente)
-        previous_conversations_detail = []
-        for conv in recent_conversations[:3]:  # Últimas 3 conversas
-            if str(conv["id"]) != str(conversation_id):  # Excluir conversa atual
-                conv_messages = await self.db.get_conversation_messages(
-                    str(conv["id"]), user_id, limit=6  # Últimas 3 trocas
+            # Usados fora do contexto (modelo, estratégia, onboarding, histórico da API)
+            turn_profile.mark_used("conversation", "profile", "user", "recent_conversations", "messages")
+
+            # 4.65 APRENDIZADO: Detectar feedback implícito da mensagem anterior
+            recent_feedbacks = []
+            if user_id in self._last_responses:
+                last = self._last_responses[user_id]
+                time_to_respond = time.time() - last.get("timestamp", time.time())
+                feedbacks = ImplicitFeedbackDetector.detect_feedback(
+                    last.get("user_message", ""),
+                    last.get("ai_response", ""),
+                    message,
+                    time_to_respond
                 )
-                if conv_messages:
-                    previous_conversations_detail.append({
-                        "data": conv["last_message_at"].strftime("%d/%m"),
-                        "resumo": conv.get("resumo", ""),
-                        "mensagens": conv_messages
-                    })
+                recent_feedbacks = feedbacks
 
-        # 5. Decidir modelo (throttling)
-        model = self._select_model(user)
+                # Salvar feedbacks detectados
+                for fb in feedbacks:
+                    await self.learning_engine.process_user_response(
+                        user_id=user_id,
+                        original_ai_response=last.get("ai_response", ""),
+                        user_response=message,
+                        time_to_respond=time_to_respond,
+                        original_user_message=last.get("user_message", "")
+                    )
+                    # Ajustar perfil baseado nos feedbacks
+                    await self.learning_engine.adjust_profile(user_id, feedbacks)
+
+            # 4.66 APRENDIZADO: Determinar melhor estratégia para este usuário
+            current_context = {
+                "emotional_state": profile.get("estado_emocional", "neutro") if profile else "neutro",
+                "communication_style": profile.get("tom_preferido", "acolhedor") if profile else "acolhedor",
+                "urgency": 0.3  # Pode ser ajustado baseado na mensagem
+            }
+            optimal_strategy = await self.learning_engine.get_optimal_strategy(user_id, current_context)
+
+            # 4.67 APRENDIZADO: Construir contexto de aprendizado para o prompt
+            patterns = await self.learning_engine.detect_patterns(user_id)
+            learning_context = LearningContextBuilder.build_learning_context(
+                optimal_strategy=optimal_strategy,
+                patterns=patterns,
+                insights=[],
+                recent_feedbacks=recent_feedbacks
+            )
 
-        # 6. Construir prompts SEPARADOS (melhor para caching)
-        is_first = len(recent_conversations) <= 1 and len(messages) == 0
+            # 5. Decidir modelo (throttling)
+            model = self._select_model(user)
 
-        # Detectar idioma automaticamente pela mensagem (como GPT faz)
-        user_language = self._detect_language(message)
+            # 6. Construir prompts SEPARADOS (melhor para caching)
+            is_first = len(recent_conversations) <= 1 and len(messages) == 0
 
-        # SYSTEM: so persona/regras (estavel, cacheable) - no idioma do usuario
-        system_prompt = self._build_system_prompt(is_first_conversation=is_first, language=user_language)
+            # Detectar idioma automaticamente pela mensagem (como GPT faz)
+            user_language = self._detect_language(message)
 
-        # POLICY ENGINE: Injetar guardrail no system prompt (se necessario)
-        if policy_guardrail:
-            system_prompt = system_prompt + "\n\n" + policy_guardrail
+            # SYSTEM: so persona/regras (estavel, cacheable) - no idioma do usuario
+            system_prompt = self._build_system_prompt(is_first_conversation=is_first, language=user_language)
 
-        # CONTEXTO: memórias + perfil + psicológico + aprendizado (dinâmico)
-        context_message = self._build_context_message(
-            profile=profile,
-            history=recent_conversations,
-            previous_conversations=previous_conversations_detail,
-            prayer_requests=prayer_requests,
-            permanent_memory=permanent_memory,
-            psychological_context=psychological_context,
-            learning_context=learning_context
-        )
+            # POLICY ENGINE: Injetar guardrail no system prompt (se necessario)
+            if policy_guardrail:
+                system_prompt = system_prompt + "\n\n" + policy_guardrail
+
+            # CONTEXTO: memórias + perfil + psicológico + aprendizado (dinâmico)
+            # Cada seção declara o que renderiza; só o que ela usa é buscado
+            context_message = await self._build_context_message(
+                user_id=user_id,
+                message=message,
+                conversation_id=conversation_id,
+                profile=profile,
+                recent_conversations=recent_conversations,
+                learning_context=learning_context,
+                turn_profile=turn_profile
+            )
 
         # 6.5 PESQUISA WEB INTELIGENTE: Claude decide se precisa pesquisar
         # Não pesquisar se tiver imagens/PDFs (foco no arquivo)
-        has_attachments = image_data or images
+        has_attachments = image_data or images or pdf_text
         web_search_context = None
         web_search_indicator = None  # Para mostrar ao usuário o que está buscando
         web_search_sources = None  # Fontes para mostrar ao usuário
-        if WEB_SEARCH_ENABLED and not has_attachments:
-            try:
-                # Detectar localização: MEMÓRIAS (busca específica) > perfil > IP
-                # (memórias são mais confiáveis - usuário disse explicitamente onde mora)
-                # (IP pode ser enganado por VPN)
-                user_location = None
-                print(f"[WEB_SEARCH] Localização via IP (ignorada se houver memória): {detected_location}")
-
-                # 1. PRIMEIRO: Buscar memórias de IDENTIDADE e CONTEXTO diretamente no banco
-                # (não depende de relevância à mensagem atual)
+        with span("chat.web_search"):
+            if WEB_SEARCH_ENABLED and not has_attachments:
                 try:
-                    # Buscar memórias de identidade (onde mora, quem é, etc)
-                    identity_memories = await self.db.get_user_memories(user_id, categoria="IDENTIDADE", limit=20)
-                    context_memories = await self.db.get_user_memories(user_id, categoria="CONTEXTO", limit=10)
-                    all_location_memories = identity_memories + context_memories
-
-                    print(f"[WEB_SEARCH] Buscando em {len(identity_memories)} IDENTIDADE + {len(context_memories)} CONTEXTO")
-
-                    for mem in all_location_memories:
-                        fato = mem.get("fato", "").lower()
-                        # Log todas as memórias para debug
-                        print(f"[WEB_SEARCH] Memória: {fato[:100]}")
-
-                        if any(loc in fato for loc in ["florida", "flórida", "orlando", "miami"]):
-                            user_location = "Estados Unidos"
-                            print(f"[WEB_SEARCH] Localização via memória DB: Florida -> Estados Unidos")
-                            break
-                        elif any(loc in fato for loc in ["eua", "estados unidos", "usa", "texas", "california", "new york", "los angeles"]):
-                            user_location = "Estados Unidos"
-                            print(f"[WEB_SEARCH] Localização via memória DB: EUA")
-                            break
-                        elif any(loc in fato for loc in ["brasil", "são paulo", "rio de janeiro", "belo horizonte", "brasília"]):
-                            user_location = "Brasil"
-                            print(f"[WEB_SEARCH] Localização via memória DB: Brasil")
-                            break
-                except Exception as e:
-                    print(f"[WEB_SEARCH] Erro ao buscar memórias de localização: {e}")
-
-                # 2. Se não encontrou na memória, tentar perfil
-                if not user_location and profile:
-                    user_location = profile.get("localizacao") or profile.get("cidade") or profile.get("pais")
-                    if user_location:
-                        print(f"[WEB_SEARCH] Localização via perfil: {user_location}")
-
-                # 3. Por último, usar IP (pode ser VPN - menos confiável)
-                if not user_location and detected_location:
-                    user_location = detected_location
-                    print(f"[WEB_SEARCH] Localização via IP (fallback): {user_location}")
-
-                if user_location:
-                    print(f"[WEB_SEARCH] Localização FINAL: {user_location}")
-                else:
-                    print(f"[WEB_SEARCH] Localização NÃO detectada")
-
-                # Pesquisa inteligente: Claude decide se precisa e gera queries otimizadas
-                search_result = await web_search_service.smart_search(
-                    message=message,
-                    user_context=f"Usuário: {profile.get('nome', 'Desconhecido')}" if profile else "",
-                    user_location=user_location
-                )
+                    # Detectar localização: MEMÓRIAS (busca específica) > perfil > IP
+                    # (memórias são mais confiáveis - usuário disse explicitamente onde mora)
+                    # (IP pode ser enganado por VPN)
+                    user_location = None
+                    location_source = None
+
+                    # 1. PRIMEIRO: Buscar memórias de IDENTIDADE e CONTEXTO diretamente no banco
+                    # (não depende de relevância à mensagem atual)
+                    try:
+                        # Buscar memórias de identidade (onde mora, quem é, etc)
+                        identity_memories = await self.db.get_user_memories(user_id, categoria="IDENTIDADE", limit=20)
+                        context_memories = await self.db.get_user_memories(user_id, categoria="CONTEXTO", limit=10)
+                        all_location_memories = identity_memories + context_memories
+
+                        for mem in all_location_memories:
+                            fato = mem.get("fato", "").lower()
+
+                            if any(loc in fato for loc in ["florida", "flórida", "orlando", "miami"]):
+                                user_location = "Estados Unidos"
+                                location_source = "memoria"
+                                break
+                            elif any(loc in fato for loc in ["eua", "estados unidos", "usa", "texas", "california", "new york", "los angeles"]):
+                                user_location = "Estados Unidos"
+                                location_source = "memoria"
+                                break
+                            elif any(loc in fato for loc in ["brasil", "são paulo", "rio de janeiro", "belo horizonte", "brasília"]):
+                                user_location = "Brasil"
+                                location_source = "memoria"
+                                break
+                    except Exception as e:
+                        logger.warning("web_search.location_memory_failed", extra={"error": str(e)})
+
+                    # 2. Se não encontrou na memória, tentar perfil
+                    if not user_location and profile:
+                        user_location = profile.get("localizacao") or profile.get("cidade") or profile.get("pais")
+                        if user_location:
+                            location_source = "perfil"
+
+                    # 3. Por último, usar IP (pode ser VPN - menos confiável)
+                    if not user_location and detected_location:
+                        user_location = detected_location
+                        location_source = "ip"
+
+                    if logger.isEnabledFor(logging.DEBUG):
+                        logger.debug("web_search.location", extra={"location": user_location, "source": location_source})
+
+                    # Pesquisa inteligente: Claude decide se precisa e gera queries otimizadas
+                    search_result = await web_search_service.smart_search(
+                        message=message,
+                        user_context=f"Usuário: {profile.get('nome', 'Desconhecido')}" if profile else "",
+                        user_location=user_location
+                    )
 
-                if search_result:
-                    # Formatar contexto para incluir no prompt
-                    web_search_context = web_search_service.format_for_context(search_result)
-                    # Indicador para UI (ex: "Buscando: preços de iPhone...")
-                    web_search_indicator = web_search_service.format_search_indicator(search_result)
-                    # Fontes para mostrar ao usuário
-                    web_search_sources = search_result.get("sources", [])
-                    print(f"[WEB_SEARCH] {web_search_indicator} - tokens: {search_result.get('tokens_used', 0)} - fontes: {len(web_search_sources)}")
-            except Exception as e:
-                print(f"[WEB_SEARCH] Erro ao pesquisar: {e}")
-                web_search_context = None
+                    if search_result:
+                        # Formatar contexto para incluir no prompt
+                        web_search_context = web_search_service.format_for_context(search_result)
+                        # Indicador para UI (ex: "Buscando: preços de iPhone...")
+                        web_search_indicator = web_search_service.format_search_indicator(search_result)
+                        # Fontes para mostrar ao usuário
+                        web_search_sources = search_result.get("sources", [])
+                        logger.info("web_search.done", extra={
+                            "tokens": search_result.get("tokens_used", 0),
+                            "sources": len(web_search_sources)
+                        })
+                except Exception as e:
+                    logger.warning("web_search.failed", extra={"error": str(e)})
+                    web_search_context = None
 
         # 7. Preparar mensagens para a API
         api_messages = []
@@ -365,13 +363,20 @@ class AIService:
             })
 
             api_messages.append({"role": "user", "content": user_content})
+        elif pdf_text:
+            # PDF com camada de texto: vai como texto (sem rasterizar)
+            api_messages.append({
+                "role": "user",
+                "content": f"[CONTEÚDO DO PDF]\n{pdf_text}\n[FIM DO PDF]\n\n{message}"
+            })
         else:
             # Mensagem apenas texto
             api_messages.append({"role": "user", "content": message})
 
         # 8. Chamar Claude (tokens maiores para imagens/PDFs)
-        max_tokens = MAX_TOKENS_RESPONSE * 2 if has_images else MAX_TOKENS_RESPONSE
-        response = self.client.messages.create(
+        max_tokens = MAX_TOKENS_RESPONSE * 2 if has_attachments else MAX_TOKENS_RESPONSE
+        response = traced_llm_call(
+            "chat", self.client,
             model=model,
             max_tokens=max_tokens,
             system=system_prompt,
@@ -382,94 +387,103 @@ class AIService:
         tokens_used = response.usage.input_tokens + response.usage.output_tokens
 
         # 8.5 POLICY ENGINE: Output Guard - sanitizar resposta
-        output_policy, reply = policy_router.guard_output(
-            response=reply,
-            input_result=input_policy,
-            user_id=user_id
-        )
-
-        # 9. Salvar mensagens no banco (indicar se tinha imagem/PDF)
-        if images:
-            saved_content = f"[📄 PDF enviado - {len(images)} páginas]\n{message}"
-        elif image_data:
-            saved_content = f"[📷 Imagem enviada]\n{message}"
-        else:
-            saved_content = message
-        await self.db.save_message(
-            conversation_id=conversation_id,
-            user_id=user_id,
-            role="user",
-            content=saved_content
-        )
-
-        await self.db.save_message(
-            conversation_id=conversation_id,
-            user_id=user_id,
-            role="assistant",
-            content=reply,
-            tokens_used=tokens_used,
-            model_used=model
-        )
-
-        # 10. Incrementar contador de mensagens
-        await self.db.increment_message_count(user_id)
-
-        # 11. MEMÓRIA ETERNA: Extrair fatos da mensagem do usuário (SEMPRE)
-        # Isso é crítico - extraímos memórias de TODA mensagem do usuário
-        await self._extract_memories(user_id, message, conversation_id)
-
-        # 12. Atualizar resumo periodicamente (a cada 5 mensagens para ter resumo logo)
-        message_count = len(messages) + 2  # +2 pelas novas mensagens
-        if message_count % 5 == 0:
-            await self._update_conversation_summary(conversation_id, user_id)
-
-        # 13. Extrair insights periodicamente (a cada 20 mensagens)
-        if message_count % 20 == 0:
-            await self._extract_insights(conversation_id, user_id)
-
-        # 14. Atualizar perfil psicológico periodicamente (a cada 30 mensagens)
-        total_messages = user.get("total_messages", 0) if user else 0
-        if total_messages > 0 and total_messages % 30 == 0:
-            await self._analyze_psychological_profile(user_id)
+        with span("chat.output_guard"):
+            output_policy, reply = policy_router.guard_output(
+                response=reply,
+                input_result=input_policy,
+                user_id=user_id
+            )
 
-        # 15. APRENDIZADO: Registrar interação e guardar resposta para feedback futuro
-        try:
-            await self.learning_engine.record_interaction(
+        with span("chat.persistence"):
+            # 9. Salvar mensagens no banco (indicar se tinha imagem/PDF)
+            if images or pdf_text:
+                saved_content = f"[📄 PDF enviado - {pdf_pages or len(images)} páginas]\n{message}"
+            elif image_data:
+                saved_content = f"[📷 Imagem enviada]\n{message}"
+            else:
+                saved_content = message
+            # 10. Mensagens + contador da conversa + cota do usuário num único comando.
+            # A cota é conferida na gravação, não reservada antes do LLM: requests
+            # concorrentes que passaram pela checagem da rota gastam uma chamada
+            # cada, mas só os que cabem no limite são gravados (o resto vira 402)
+            quota = await self.db.save_chat_turn(
+                conversation_id=conversation_id,
                 user_id=user_id,
-                conversation_id=str(conversation_id),
-                user_message=message,
-                ai_response=reply,
-                strategy_used=optimal_strategy,
-                emotion_before=current_context.get("emotional_state", "neutro"),
-                emotion_after="neutro",  # Será atualizado na próxima mensagem
-                response_time=0
+                user_content=saved_content,
+                assistant_content=reply,
+                tokens_used=tokens_used,
+                model_used=model,
+                message_limit=FREE_MESSAGE_LIMIT
             )
-        except Exception as e:
-            print(f"[LEARNING] Error recording interaction: {e}")
+            if quota is None:
+                raise MessageLimitReached()
+
+        with span("chat.enrichment"):
+            # 11. MEMÓRIA ETERNA: Extrair fatos da mensagem do usuário (SEMPRE)
+            # Isso é crítico - extraímos memórias de TODA mensagem do usuário
+            await self._extract_memories(user_id, message, conversation_id)
+
+            # 12. Atualizar resumo periodicamente (a cada 5 mensagens para ter resumo logo)
+            message_count = len(messages) + 2  # +2 pelas novas mensagens
+            if message_count % 5 == 0:
+                await self._update_conversation_summary(conversation_id, user_id)
+
+            # 13. Extrair insights periodicamente (a cada 20 mensagens)
+            if message_count % 20 == 0:
+                await self._extract_insights(conversation_id, user_id)
+
+            # 14. Atualizar perfil psicológico periodicamente (a cada 30 mensagens)
+            total_messages = quota["total_messages"]
+            if total_messages > 0 and total_messages % 30 == 0:
+                await self._analyze_psychological_profile(user_id)
+
+            # 15. LAYER 2: Detectar estado emocional (alimenta timeline e temas do aprendizado)
+            detected_emotion = None
+            try:
+                detected_emotion = await self._detect_emotion_for_timeline(message, reply)
+            except Exception as e:
+                logger.warning("emotion.detect_failed", extra={"error": str(e)})
 
-        # 16. LAYER 2: Registrar estado emocional na timeline (interno)
-        try:
-            detected_emotion = await self._detect_emotion_for_timeline(message, reply)
-            if detected_emotion:
-                await self.db.record_emotional_state(
+            # 15.1 APRENDIZADO: Registrar interação e guardar resposta para feedback futuro
+            try:
+                await self.learning_engine.record_interaction(
                     user_id=user_id,
-                    emotion=detected_emotion["emotion"],
-                    intensity=detected_emotion.get("intensity", 0.5),
-                    confidence=detected_emotion.get("confidence", 0.7),
-                    trigger=detected_emotion.get("trigger"),
-                    themes=detected_emotion.get("themes", []),
-                    conversation_id=str(conversation_id)
+                    conversation_id=str(conversation_id),
+                    user_message=message,
+                    ai_response=reply,
+                    strategy_used=optimal_strategy,
+                    emotion_before=current_context.get("emotional_state", "neutro"),
+                    emotion_after="neutro",  # Será atualizado na próxima mensagem
+                    response_time=0,
+                    themes=detected_emotion.get("themes", []) if detected_emotion else None
                 )
-        except Exception as e:
-            print(f"[EMOTIONAL_TIMELINE] Error recording emotion: {e}")
+            except Exception as e:
+                logger.warning("learning.record_failed", extra={"error": str(e)})
 
-        # 17. LAYER 2: Atualizar Health Score periodicamente (a cada 10 mensagens)
-        if total_messages > 0 and total_messages % 10 == 0:
+            # 16. LAYER 2: Registrar estado emocional na timeline (interno)
             try:
-                health_score = await self.db.calculate_memory_health_score(user_id)
-                await self.db.save_memory_health_score(user_id, health_score)
+                if detected_emotion:
+                    await self.db.record_emotional_state(
+                        user_id=user_id,
+                        emotion=detected_emotion["emotion"],
+                        intensity=detected_emotion.get("intensity", 0.5),
+                        confidence=detected_emotion.get("confidence", 0.7),
+                        trigger=detected_emotion.get("trigger"),
+                        themes=detected_emotion.get("themes", []),
+                        conversation_id=str(conversation_id)
+                    )
             except Exception as e:
-                print(f"[HEALTH_SCORE] Error calculating: {e}")
+                logger.warning("emotion.record_failed", extra={"error": str(e)})
+
+            # 17. LAYER 2: Atualizar Health Score periodicamente (a cada 10 mensagens)
+            if total_messages > 0 and total_messages % 10 == 0:
+                try:
+                    health_score = await self.db.calculate_memory_health_score(user_id)
+                    await self.db.save_memory_health_score(user_id, health_score)
+                except Exception as e:
+                    logger.warning("health_score.failed", extra={"error": str(e)})
+
+        turn_profile.log(str(user_id))
 
         # Guardar resposta para detecção de feedback na próxima mensagem
         self._last_responses[user_id] = {
@@ -483,7 +497,8 @@ class AIService:
             "response": reply,
             "conversation_id": str(conversation_id),
             "model_used": model,
-            "tokens_used": tokens_used
+            "tokens_used": tokens_used,
+            "messages_used": quota["trial_messages_used"]
         }
 
         # Incluir info de pesquisa se houve
@@ -622,57 +637,44 @@ class AIService:
 
         return prompt
 
-    def _build_context_message(
+    async def _build_context_message(
         self,
-        profile: dict,
-        history: List[dict],
-        previous_conversations: List[dict],
-        prayer_requests: List[dict],
-        permanent_memory: str,
-        psychological_context: str = "",
-        learning_context: str = ""
+        user_id: str,
+        message: str,
+        conversation_id: str,
+        profile: Optional[dict],
+        recent_conversations: List[dict],
+        learning_context: str = "",
+        turn_profile: Optional[ContextProfile] = None
     ) -> str:
         """
         Constrói mensagem de CONTEXTO separada (memórias + perfil + psicológico + aprendizado).
         Isso permite melhor prompt caching do SYSTEM.
-        """
-        context_parts = []
-
-        # MEMÓRIA PERMANENTE (mais importante)
-        if permanent_memory:
-            context_parts.append(permanent_memory)
-
-        # Contexto do perfil
-        if profile:
-            user_context = build_user_context(
-                profile=profile,
-                history=[
-                    {"data": c["last_message_at"].strftime("%d/%m"), "resumo": c.get("resumo", "")}
-                    for c in history if c.get("resumo")
-                ],
-                prayer_requests=prayer_requests,
-                learning_context=learning_context
-            )
-            context_parts.append(user_context)
 
-        # Contexto das conversas recentes
-        if previous_conversations:
-            conv_context = "=== CONVERSAS RECENTES ===\n"
-            for conv in previous_conversations:
-                conv_context += f"--- {conv['data']} ---\n"
-                if conv.get('resumo'):
-                    conv_context += f"{conv['resumo']}\n"
-            context_parts.append(conv_context)
-
-        # PERFIL PSICOLÓGICO (guia como abordar)
-        if psychological_context:
-            context_parts.append(psychological_context)
-
-        # CONTEXTO DE APRENDIZADO (estratégia e ajustes)
-        if learning_context:
-            context_parts.append(f"=== APRENDIZADO ===\n{learning_context}")
-
-        return "\n\n".join(context_parts) if context_parts else ""
+        As seções estão em app.context_builder.CONTEXT_SECTIONS: as conversas
+        anteriores entram só com data + resumo (sem ler/descriptografar mensagens)
+        e os pedidos de oração só são buscados se o perfil for renderizado.
+        """
+        turn_profile = turn_profile or ContextProfile()
+        return await ContextAssembler().build(
+            preloaded={
+                "profile": profile,
+                "recent_conversations": recent_conversations,
+                "conversation_id": conversation_id,
+                "learning_context": learning_context
+            },
+            loaders={
+                # MEMÓRIA ETERNA: memórias RELEVANTES (Top-K, não todas!)
+                "permanent_memory": lambda: self.db.get_all_memories_formatted(
+                    user_id, current_message=message, top_k=20
+                ),
+                "prayer_requests": lambda: self.db.get_active_prayer_requests(
+                    user_id, include_descricao=False  # Prompt só usa título/categoria
+                ),
+                "psychological_context": lambda: self.db.get_psychological_context(user_id)
+            },
+            profile=turn_profile
+        )
 
     async def _update_conversation_summary(self, conversation_id: str, user_id: str):
         """
@@ -691,7 +693,8 @@ class AIService:
 
         prompt = SUMMARY_PROMPT.format(conversation=conversation_text)
 
-        response = self.client.messages.create(
+        response = traced_llm_call(
+            "conversation_summary", self.client,
             model=AI_MODEL_FALLBACK,  # Usa modelo econômico para resumos
             max_tokens=500,
             messages=[{"role": "user", "content": prompt}]
@@ -721,7 +724,8 @@ class AIService:
 
         prompt = INSIGHT_EXTRACTION_PROMPT.format(conversation=conversation_text)
 
-        response = self.client.messages.create(
+        response = traced_llm_call(
+            "insights", self.client,
             model=AI_MODEL_FALLBACK,
             max_tokens=500,
             messages=[{"role": "user", "content": prompt}]
@@ -776,7 +780,8 @@ class AIService:
                     memories_context += f"- [{mem['categoria']}] {mem['fato']}\n"
 
             # Usar modelo econômico para extração (roda frequentemente)
-            response = self.client.messages.create(
+            response = traced_llm_call(
+                "memory_extraction", self.client,
                 model=AI_MODEL_FALLBACK,
                 max_tokens=500,
                 messages=[{
@@ -810,8 +815,7 @@ class AIService:
                         try:
                             result = json.loads(cleaned)
                         except json.JSONDecodeError as e2:
-                            print(f"[MEMORY] JSON parse failed after cleanup: {e2}")
-                            print(f"[MEMORY] Raw response: {result_text[:500]}")
+                            logger.warning("memory.parse_failed", extra={"error": str(e2), "response_chars": len(result_text)})
                             return
 
             if not result:
@@ -836,7 +840,7 @@ class AIService:
 
         except Exception as e:
             # Não deixar erros de extração quebrarem o chat
-            print(f"Erro ao extrair memórias: {e}")
+            logger.warning("memory.extract_failed", extra={"error": str(e)})
             pass
 
     async def _analyze_psychological_profile(self, user_id: str):
@@ -862,7 +866,7 @@ class AIService:
                         all_messages.append(msg["content"])
 
             if len(all_messages) < 30:  # Mínimo de 30 mensagens para análise inicial confiável
-                print(f"[PSYCH] Insufficient messages ({len(all_messages)}/30) for user {user_id[:8]}")
+                logger.debug("psych.insufficient_messages", extra={"messages": len(all_messages)})
                 return
 
             # Formatar para análise
@@ -871,7 +875,8 @@ class AIService:
             ])
 
             # Chamar IA para análise
-            response = self.client.messages.create(
+            response = traced_llm_call(
+                "psychological_profile", self.client,
                 model=AI_MODEL_FALLBACK,
                 max_tokens=1000,
                 messages=[{
@@ -897,10 +902,10 @@ class AIService:
 
             # Salvar perfil
             await self.db.save_psychological_profile(user_id, result)
-            print(f"[PSYCH] Profile updated for user {user_id[:8]}...")
+            logger.info("psych.profile_updated")
 
         except Exception as e:
-            print(f"Erro ao analisar perfil psicológico: {e}")
+            logger.warning("psych.failed", extra={"error": str(e)})
 
     async def _detect_emotion_for_timeline(
         self,
@@ -1017,7 +1022,7 @@ class AIService:
                 "needs_attention": trend == "worsening" or patterns.get("avg_intensity", 0.5) > 0.7
             }
         except Exception as e:
-            print(f"[EMOTIONAL_SUMMARY] Error: {e}")
+            logger.warning("emotion.summary_failed", extra={"error": str(e)})
             return {
                 "dominant_emotion": "neutro",
                 "avg_intensity": 0.5,
@@ -1065,7 +1070,8 @@ Convide-o a criar uma conta para uma experiência mais personalizada."""
         api_messages.append({"role": "user", "content": message})
 
         # Usar modelo econômico
-        response = self.client.messages.create(
+        response = traced_llm_call(
+            "trial", self.client,
             model=AI_MODEL_FALLBACK,
             max_tokens=512,  # Respostas mais curtas para trial
             system=system_prompt,
@@ -1076,7 +1082,9 @@ Convide-o a criar uma conta para uma experiência mais personalizada."""
 
     async def generate_devotional(self, tema: Optional[str] = None) -> Dict:
         """
-        Gera devocional do dia
+        Gera devocional do dia.
+        Resposta do LLM fora do formato devolve o devocional padrão marcado
+        com "fallback": True (não deve ser cacheado).
         """
         from app.prompts import DEVOTIONAL_GENERATION_PROMPT
 
@@ -1084,7 +1092,8 @@ Convide-o a criar uma conta para uma experiência mais personalizada."""
             tema=tema or "esperança e fé no dia a dia"
         )
 
-        response = self.client.messages.create(
+        response = traced_llm_call(
+            "devotional", self.client,
             model=AI_MODEL_PRIMARY,
             max_tokens=1000,
             messages=[{"role": "user", "content": prompt}]
@@ -1097,5 +1106,6 @@ Convide-o a criar uma conta para uma experiência mais personalizada."""
                 "versiculo": "O Senhor é o meu pastor; nada me faltará.",
                 "referencia": "Salmo 23:1",
                 "meditacao": "Deus cuida de cada detalhe da sua vida.",
-                "oracao": "Senhor, ajuda-me a confiar em Ti. Amém."
+                "oracao": "Senhor, ajuda-me a confiar em Ti. Amém.",
+                "fallback": True
             }
@@ -0,0 +1,160 @@
+"""
+AiSyster - Auditoria
+Gravação do audit_log em lote: as rotas só enfileiram o evento em memória e
+um flusher em background grava com COPY por tamanho do lote ou por tempo
+"""
+
+import asyncio
+from typing import List, Optional, Tuple
+
+from app.config import AUDIT_BATCH_SIZE, AUDIT_FLUSH_INTERVAL, AUDIT_MAX_PENDING
+from app.telemetry import registry
+from app.logging_config import get_logger
+
+
+logger = get_logger("audit")
+
+AUDIT_EVENTS = registry.counter(
+    "aisyster_audit_events_total", "Eventos de auditoria por resultado (written, dropped, failed)", ("result",)
+)
+
+# Ordem dos campos de cada registro enfileirado
+AUDIT_COLUMNS = ("user_id", "action", "details", "ip_address", "created_at")
+
+AuditRecord = Tuple  # (user_uuid, action, details_json, ip, created_at)
+
+
+class AuditWriter:
+    """
+    Buffer de eventos com flush em lote.
+
+    - Flush quando o buffer chega a batch_size ou a cada flush_interval segundos
+    - Backpressure: com max_pending eventos pendentes, quem loga espera um
+      flush (até flush_interval); se o banco não drenar, o evento é descartado e contado
+    - stop() grava o que restou (shutdown do app)
+    """
+
+    def __init__(
+        self,
+        batch_size: int = AUDIT_BATCH_SIZE,
+        flush_interval: float = AUDIT_FLUSH_INTERVAL,
+        max_pending: int = AUDIT_MAX_PENDING
+    ):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.pool = None
+        self._pending: List[AuditRecord] = []
+        self._wakeup = asyncio.Event()
+        self._drained = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        self._stopping = False
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    def start(self, pool):
+        """Inicia o flusher (chamado no init_db, com o pool já criado)"""
+        if self.running:
+            return
+        self.pool = pool
+        self._stopping = False
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self, timeout: float = 10.0):
+        """Para o flusher e grava os eventos pendentes (espera no máximo timeout)"""
+        if self._task:
+            # Sinaliza em vez de cancel(): no 3.11 o cancel pode se perder dentro do wait_for
+            self._stopping = True
+            self._wakeup.set()
+            try:
+                await asyncio.wait_for(asyncio.shield(self._task), timeout=timeout)
+            except asyncio.TimeoutError:
+                logger.warning("audit.stop_timeout", extra={"pending": len(self._pending)})
+                self._task.cancel()
+            self._task = None
+        if self.pool is not None:
+            await self.flush()
+
+    async def submit(self, record: AuditRecord):
+        """Enfileira um evento (sem ir ao banco no caminho do request)"""
+        if len(self._pending) >= self.max_pending:
+            self._drained.clear()
+            self._wakeup.set()
+            try:
+                await asyncio.wait_for(self._drained.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            if len(self._pending) >= self.max_pending:
+                AUDIT_EVENTS.inc(("dropped",))
+                return
+
+        self._pending.append(record)
+        if len(self._pending) >= self.batch_size:
+            self._wakeup.set()
+
+    async def _run(self):
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            if self._stopping:
+                break  # O flush final fica com stop()
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error("audit.flush_failed", extra={"error": str(e)})
+
+    async def flush(self) -> int:
+        """Grava tudo que está pendente em lotes de batch_size. Retorna linhas gravadas"""
+        written = 0
+        async with self._flush_lock:
+            while self._pending:
+                batch = self._pending[:self.batch_size]
+                del self._pending[:self.batch_size]
+                try:
+                    written += await self._write(batch)
+                except Exception as e:
+                    # Banco indisponível: devolve o lote à frente da fila e tenta no próximo ciclo
+                    self._pending[:0] = batch[:max(0, self.max_pending - len(self._pending))]
+                    logger.warning("audit.write_failed", extra={"error": str(e), "rows": len(batch)})
+                    break
+            self._drained.set()
+        return written
+
+    async def _write(self, batch: List[AuditRecord]) -> int:
+        async with self.pool.acquire() as conn:
+            try:
+                await conn.copy_records_to_table("audit_log", records=batch, columns=AUDIT_COLUMNS)
+                AUDIT_EVENTS.inc(("written",), len(batch))
+                return len(batch)
+            except Exception as e:
+                logger.warning("audit.copy_failed", extra={"error": str(e), "rows": len(batch)})
+
+            # Linha a linha: isola o registro inválido (ex: usuário apagado antes do flush)
+            written = 0
+            for record in batch:
+                try:
+                    await conn.execute(
+                        """
+                        INSERT INTO audit_log (user_id, action, details, ip_address, created_at)
+                        VALUES ($1, $2, $3, $4, $5)
+                        """,
+                        *record
+                    )
+                    written += 1
+                except Exception:
+                    AUDIT_EVENTS.inc(("failed",))
+            AUDIT_EVENTS.inc(("written",), written)
+            return written
+
+
+# Instância global (iniciada/parada junto com o pool em init_db/close_db)
+audit_writer = AuditWriter()
@@ -16,9 +16,11 @@ from pydantic import BaseModel, EmailStr
 from app.security import (
     hash_password,
     verify_password,
-    create_access_token,
-    create_refresh_token,
+    create_token_pair,
     verify_token,
+    verify_token_cached,
+    revoke_token,
+    revocation_keys,
     generate_secure_token
 )
 from app.database import get_db, Database
@@ -94,13 +96,14 @@ async def get_current_user(
     authorization: str = Header(..., description="Bearer token")
 ) -> dict:
     """
-    Dependência que extrai e valida o usuário do token JWT
+    Dependência que extrai e valida o usuário do token JWT.
+    Tokens já verificados vêm do cache (sem re-decodificar o JWT).
     """
     if not authorization.startswith("Bearer "):
         raise HTTPException(status_code=401, detail="Token inválido")
 
-    token = authorization.replace("Bearer ", "")
-    payload = verify_token(token)
+    token = authorization[7:]
+    payload = verify_token_cached(token)
 
     if not payload:
         raise HTTPException(status_code=401, detail="Token expirado ou inválido")
@@ -152,8 +155,7 @@ async def register(request: RegisterRequest, db: Database = Depends(get_db)):
     await db.create_user_profile(user_id=user["id"], nome=request.nome)
 
     # Gera tokens
-    access_token = create_access_token(user["id"], user["email"])
-    refresh_token = create_refresh_token(user["id"])
+    access_token, refresh_token = create_token_pair(user["id"], user["email"])
 
     # Log de auditoria
     await db.log_audit(
@@ -198,8 +200,7 @@ async def login(request: LoginRequest, db: Database = Depends(get_db)):
     await db.update_last_login(user["id"])
 
     # Gera tokens
-    access_token = create_access_token(user["id"], user["email"])
-    refresh_token = create_refresh_token(user["id"])
+    access_token, refresh_token = create_token_pair(user["id"], user["email"])
 
     # Log de auditoria
     await db.log_audit(
@@ -219,7 +220,8 @@ async def refresh_token(request: RefreshRequest, db: Database = Depends(get_db))
     """
     Renova tokens usando refresh token
     """
-    payload = verify_token(request.refresh_token)
+    # Revogado neste worker (logout) ou em qualquer outro (revoked_tokens no banco)
+    payload = verify_token_cached(request.refresh_token)
 
     if not payload:
         raise HTTPException(status_code=401, detail="Refresh token inválido ou expirado")
@@ -227,14 +229,17 @@ async def refresh_token(request: RefreshRequest, db: Database = Depends(get_db))
     if payload.get("type") != "refresh":
         raise HTTPException(status_code=401, detail="Tipo de token inválido")
 
+    keys = [key for key, _ in revocation_keys(request.refresh_token, payload)]
+    if await db.any_token_revoked(keys):
+        raise HTTPException(status_code=401, detail="Refresh token inválido ou expirado")
+
     # Busca usuário
     user = await db.get_user_by_id(payload["sub"])
     if not user:
         raise HTTPException(status_code=401, detail="Usuário não encontrado")
 
-    # Gera novos tokens
-    access_token = create_access_token(user["id"], user["email"])
-    new_refresh_token = create_refresh_token(user["id"])
+    # Gera novos tokens na mesma sessão (o logout continua revogando os renovados)
+    access_token, new_refresh_token = create_token_pair(user["id"], user["email"], payload.get("sid"))
 
     return TokenResponse(
         access_token=access_token,
@@ -331,10 +336,21 @@ async def confirm_password_reset(request: PasswordResetConfirm, db: Database = D
 
 
 @router.post("/logout")
-async def logout(current_user: dict = Depends(get_current_user), db: Database = Depends(get_db)):
+async def logout(
+    authorization: str = Header(..., description="Bearer token"),
+    current_user: dict = Depends(get_current_user),
+    db: Database = Depends(get_db)
+):
     """
-    Logout (invalida sessão no log)
+    Logout: revoga o access token e a sessão dele (o refresh token do mesmo
+    login também para de valer) e registra no log
     """
+    token = authorization[7:]
+    payload = verify_token(token)
+    if revoke_token(token):
+        # No banco: os outros workers recusam o refresh da sessão
+        await db.revoke_tokens(revocation_keys(token, payload))
+
     await db.log_audit(
         user_id=current_user["user_id"],
         action="logout",
@@ -463,8 +479,7 @@ async def google_callback(
             await db.create_user_profile(user_id=user["id"], nome=nome)
 
         # Gerar tokens JWT
-        jwt_access = create_access_token(user["id"], email)
-        jwt_refresh = create_refresh_token(user["id"])
+        jwt_access, jwt_refresh = create_token_pair(user["id"], email)
 
         # Log de auditoria
         await db.log_audit(
@@ -586,8 +601,7 @@ async def apple_callback(
             await db.create_user_profile(user_id=user_record["id"], nome=nome)
 
         # Gerar tokens JWT
-        jwt_access = create_access_token(user_record["id"], email)
-        jwt_refresh = create_refresh_token(user_record["id"])
+        jwt_access, jwt_refresh = create_token_pair(user_record["id"], email)
 
         # Log de auditoria
         await db.log_audit(
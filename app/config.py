@@ -41,6 +41,7 @@ if not ENCRYPTION_KEY:
 JWT_ALGORITHM = "HS256"
 JWT_ACCESS_TOKEN_HOURS = 1  # Access token: 1 hora (segurança)
 JWT_REFRESH_TOKEN_DAYS = 30  # Refresh token: 30 dias (conveniência)
+JWT_CACHE_MAX_SIZE = int(os.getenv("JWT_CACHE_MAX_SIZE", "10000"))  # Tokens verificados mantidos em memória
 
 # ============================================
 # APP SETTINGS
@@ -59,6 +60,8 @@ AI_MODEL_PRIMARY = "claude-sonnet-4-20250514"  # Assinantes - máxima qualidade
 AI_MODEL_FALLBACK = "claude-3-5-haiku-20241022"  # Trial/Free - economia, boa qualidade
 MAX_TOKENS_RESPONSE = 2000  # Teto para estudos bíblicos completos - prompt controla tamanho por tipo
 MAX_CONTEXT_TOKENS = 4000
+# Relatório por turno: leituras de banco e descriptografias feitas x usadas no prompt
+CONTEXT_PROFILE_LOG = os.getenv("CONTEXT_PROFILE_LOG", "False").lower() == "true"
 
 # Web Search - Pesquisa na internet quando necessário
 WEB_SEARCH_ENABLED = os.getenv("WEB_SEARCH_ENABLED", "True").lower() == "true"
@@ -73,6 +76,25 @@ STT_MAX_FILE_SIZE = 25 * 1024 * 1024  # 25MB (limite do Whisper)
 TTS_MODEL = "tts-1"  # tts-1 (rápido) ou tts-1-hd (qualidade)
 TTS_VOICE = "nova"  # alloy, echo, fable, onyx, nova, shimmer (nova = feminina suave)
 TTS_SPEED = 1.0  # 0.25 a 4.0
+TTS_STREAM_CHUNK_SIZE = 4096  # Bytes por chunk no áudio em streaming
+# Cliente OpenAI (voz) - instância única assíncrona, conexões reaproveitadas
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL") or None  # Ex: servidor stub local nos benchmarks
+VOICE_REQUEST_TIMEOUT = float(os.getenv("VOICE_REQUEST_TIMEOUT", "60"))  # segundos
+# Cache de áudio TTS (frases idênticas nunca são sintetizadas de novo)
+TTS_CACHE_ENABLED = os.getenv("TTS_CACHE_ENABLED", "True").lower() == "true"
+TTS_CACHE_DIR = os.getenv("TTS_CACHE_DIR", "/tmp/aisyster_tts_cache")
+TTS_CACHE_MAX_BYTES = int(os.getenv("TTS_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))  # 256MB no diretório (somando todos os workers)
+TTS_CACHE_RESCAN_SECONDS = float(os.getenv("TTS_CACHE_RESCAN_SECONDS", "30"))  # Relê o diretório para ver o que os outros workers gravaram
+TTS_CACHE_PREWARM = os.getenv("TTS_CACHE_PREWARM", "True").lower() == "true"  # Templates/devocionais no startup
+
+# PDF - Rasterização fora do event loop (pool de processos) + cache por conteúdo
+PDF_WORKERS = int(os.getenv("PDF_WORKERS", str(min(4, os.cpu_count() or 1))))
+PDF_IMAGE_TOKEN_BUDGET = int(os.getenv("PDF_IMAGE_TOKEN_BUDGET", "8000"))  # Tokens de imagem por PDF (todas as páginas)
+PDF_CACHE_MAX_BYTES = int(os.getenv("PDF_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))  # 64MB de resultados em memória
+
+# Imagens - Redimensionadas ao limite útil do modelo, sem metadados, cache por conteúdo
+IMAGE_JPEG_QUALITY = int(os.getenv("IMAGE_JPEG_QUALITY", "85"))
+IMAGE_CACHE_MAX_BYTES = int(os.getenv("IMAGE_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))  # 32MB em memória
 
 # ============================================
 # LIMITS
@@ -81,9 +103,21 @@ FREE_MESSAGE_LIMIT = 30  # Limite total para usuários free
 FREE_WARNING_AT = 20  # Aviso sutil "10 restantes"
 FREE_URGENT_AT = 25  # Aviso urgente "5 restantes"
 TRIAL_MESSAGES_LIMIT_ANONYMOUS = 5  # Limite para visitantes sem conta
+# Sessões de visitantes: memory (por worker), postgres ou redis (compartilhadas entre workers)
+TRIAL_SESSION_BACKEND = os.getenv("TRIAL_SESSION_BACKEND", "memory").lower()
+TRIAL_SESSION_TTL_SECONDS = int(os.getenv("TRIAL_SESSION_TTL_SECONDS", str(24 * 3600)))  # Inatividade até expirar
+TRIAL_SESSION_MAX = int(os.getenv("TRIAL_SESSION_MAX", "10000"))  # Máximo em memória (LRU)
+TRIAL_SESSION_TURNS = 6  # Últimas 3 trocas usadas como histórico
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
 MONTHLY_MESSAGE_LIMIT = 500  # Premium - antes de throttling
 THROTTLE_DELAY_SECONDS = 3
 
+# ============================================
+# DATA RETENTION
+# ============================================
+# Linhas brutas da timeline emocional; o historico agregado fica em emotional_daily_rollups
+EMOTIONAL_TIMELINE_RETENTION_DAYS = int(os.getenv("EMOTIONAL_TIMELINE_RETENTION_DAYS", "180"))
+
 # ============================================
 # PRICING
 # ============================================
@@ -97,6 +131,15 @@ STRIPE_SECRET_KEY = os.getenv("STRIPE_SECRET_KEY", "")
 STRIPE_PUBLISHABLE_KEY = os.getenv("STRIPE_PUBLISHABLE_KEY", "")
 STRIPE_WEBHOOK_SECRET = os.getenv("STRIPE_WEBHOOK_SECRET", "")
 STRIPE_PRICE_ID = os.getenv("STRIPE_PRICE_ID", "")  # ID do preço no Stripe
+STRIPE_HTTP_WORKERS = int(os.getenv("STRIPE_HTTP_WORKERS", "4"))  # Threads para chamadas à API (cada uma com sua conexão keep-alive)
+STRIPE_TIMEOUT = float(os.getenv("STRIPE_TIMEOUT", "30"))  # Segundos por chamada à API
+
+# Webhook: eventos gravados em stripe_events e processados pelo worker
+STRIPE_WORKER_ENABLED = os.getenv("STRIPE_WORKER_ENABLED", "true").lower() == "true"
+STRIPE_EVENT_BATCH_SIZE = int(os.getenv("STRIPE_EVENT_BATCH_SIZE", "50"))  # Eventos reivindicados por vez
+STRIPE_EVENT_POLL_INTERVAL = float(os.getenv("STRIPE_EVENT_POLL_INTERVAL", "10.0"))  # Segundos entre buscas sem trabalho
+STRIPE_EVENT_LEASE_SECONDS = int(os.getenv("STRIPE_EVENT_LEASE_SECONDS", "300"))  # 'processing' mais antigo volta para a fila
+STRIPE_EVENT_MAX_ATTEMPTS = int(os.getenv("STRIPE_EVENT_MAX_ATTEMPTS", "5"))  # Depois disso o evento fica 'failed'
 
 # ============================================
 # OAUTH SETTINGS
@@ -137,6 +180,10 @@ RESEND_API_KEY = os.getenv("RESEND_API_KEY", "")
 EMAIL_FROM = "AiSyster <noreply@aisyster.com>"
 EMAIL_REPLY_TO = "contato@aisyster.com"
 APP_URL = os.getenv("APP_URL", "https://www.aisyster.com")
+EMAIL_MAX_CONCURRENCY = int(os.getenv("EMAIL_MAX_CONCURRENCY", "5"))  # Requests simultâneos ao Resend (por processo)
+EMAIL_MAX_RETRIES = int(os.getenv("EMAIL_MAX_RETRIES", "4"))  # Retentativas em 429/5xx/erro de rede
+EMAIL_RATE_LIMIT = float(os.getenv("EMAIL_RATE_LIMIT", "2"))  # Requests/s por processo (limite padrão do Resend; 0 = sem limite)
+EMAIL_BATCH_SIZE = min(100, int(os.getenv("EMAIL_BATCH_SIZE", "100")))  # /emails/batch aceita até 100
 
 # ============================================
 # ADMIN SETTINGS
@@ -144,6 +191,49 @@ APP_URL = os.getenv("APP_URL", "https://www.aisyster.com")
 # Emails que têm acesso ao painel admin
 ADMIN_EMAILS = os.getenv("ADMIN_EMAILS", "luizjuniorbjj@gmail.com").split(",")
 
+# ============================================
+# TELEMETRIA (spans, /metrics)
+# ============================================
+TELEMETRY_ENABLED = os.getenv("TELEMETRY_ENABLED", "True").lower() == "true"
+TELEMETRY_TRACE_FILE = os.getenv("TELEMETRY_TRACE_FILE", "")  # Ex: /tmp/aisyster_traces.jsonl (OTLP/JSON)
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")  # /metrics exige "Authorization: Bearer <token>"; vazio = desligado (aberto só em DEBUG)
+
+# ============================================
+# LOGGING (JSON via fila, sem bloquear o event loop)
+# ============================================
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")  # DEBUG liga os eventos detalhados do chat/pesquisa
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json")  # json ou text
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))  # Fila cheia = descarta (nunca bloqueia)
+LOG_SAMPLE_RATE = float(os.getenv("LOG_SAMPLE_RATE", "0.1"))  # Fração mantida dos eventos de alto volume
+
+# ============================================
+# DEVOCIONAIS
+# ============================================
+DEVOTIONAL_CACHE_MAX_ENTRIES = int(os.getenv("DEVOTIONAL_CACHE_MAX_ENTRIES", "200"))  # Devocionais gerados (dia/tema/idioma)
+
+# ============================================
+# AUDITORIA (audit_log gravado em lote)
+# ============================================
+AUDIT_BATCH_SIZE = int(os.getenv("AUDIT_BATCH_SIZE", "500"))  # Eventos por COPY
+AUDIT_FLUSH_INTERVAL = float(os.getenv("AUDIT_FLUSH_INTERVAL", "2.0"))  # Segundos entre flushes
+AUDIT_MAX_PENDING = int(os.getenv("AUDIT_MAX_PENDING", "20000"))  # Acima disso: backpressure/descarte
+
+# ============================================
+# CAMPANHAS DE NOTIFICAÇÃO (worker de entregas)
+# ============================================
+NOTIFICATION_WORKER_ENABLED = os.getenv("NOTIFICATION_WORKER_ENABLED", "true").lower() == "true"
+NOTIFICATION_BATCH_SIZE = int(os.getenv("NOTIFICATION_BATCH_SIZE", "200"))  # Entregas reivindicadas por vez
+NOTIFICATION_SEND_CONCURRENCY = int(os.getenv("NOTIFICATION_SEND_CONCURRENCY", "10"))  # Envios simultâneos por worker
+NOTIFICATION_POLL_INTERVAL = float(os.getenv("NOTIFICATION_POLL_INTERVAL", "5.0"))  # Segundos entre buscas sem trabalho
+NOTIFICATION_LEASE_SECONDS = int(os.getenv("NOTIFICATION_LEASE_SECONDS", "300"))  # 'sending' mais antigo volta para a fila
+
+# ============================================
+# SCHEDULER DE NOTIFICAÇÕES (lembretes/engajamento em vários nós)
+# ============================================
+SCHEDULER_SHARDS = int(os.getenv("SCHEDULER_SHARDS", "8"))  # Fatias de usuários por execução (divididas entre os nós)
+SCHEDULER_LEASE_SECONDS = int(os.getenv("SCHEDULER_LEASE_SECONDS", "600"))  # Fatia de nó que caiu volta a ser reivindicável
+SCHEDULER_RETRY_BATCH = int(os.getenv("SCHEDULER_RETRY_BATCH", "100"))  # Retries reivindicados por vez
+
 # ============================================
 # POLICY ENGINE (Governanca Cognitiva)
 # ============================================
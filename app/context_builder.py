@@ -0,0 +1,247 @@
+"""
+AiSyster - Montagem de Contexto
+Seções do contexto do chat declaradas com os dados que cada uma renderiza:
+só buscamos (e descriptografamos) o que realmente entra no prompt
+"""
+
+import time
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from app.config import CONTEXT_PROFILE_LOG
+from app.prompts import build_user_context
+from app.security import decrypt_counter
+
+
+# ============================================
+# PERFIL DO TURNO (leituras x uso)
+# ============================================
+
+@dataclass
+class SourceRead:
+    """Uma fonte de dados do turno: de onde veio, quanto custou e se foi usada"""
+    source: str
+    origin: str  # "db" (buscada aqui) ou "preloaded" (já carregada pelo chat)
+    rows: int = 0
+    decrypts: int = 0
+    elapsed_ms: float = 0.0
+    used: bool = False
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "source": self.source,
+            "origin": self.origin,
+            "rows": self.rows,
+            "decrypts": self.decrypts,
+            "elapsed_ms": round(self.elapsed_ms, 2),
+            "used": self.used
+        }
+
+
+def _count_rows(value: Any) -> int:
+    if isinstance(value, (list, tuple)):
+        return len(value)
+    return 1 if value else 0
+
+
+class ContextProfile:
+    """
+    Registra as leituras de banco e descriptografias de um turno de chat
+    e quais delas acabaram no prompt (ou em outra decisão do turno).
+    """
+
+    def __init__(self):
+        self.reads: Dict[str, SourceRead] = {}
+        self.skipped: List[str] = []
+
+    async def track(self, source: str, awaitable: Awaitable) -> Any:
+        """Executa uma leitura medindo tempo, linhas e descriptografias"""
+        counter = [0]
+        token = decrypt_counter.set(counter)
+        start = time.perf_counter()
+        try:
+            value = await awaitable
+        finally:
+            decrypt_counter.reset(token)
+        self.reads[source] = SourceRead(
+            source=source,
+            origin="db",
+            rows=_count_rows(value),
+            decrypts=counter[0],
+            elapsed_ms=(time.perf_counter() - start) * 1000
+        )
+        return value
+
+    def preloaded(self, source: str, value: Any):
+        """Registra um dado que já estava carregado (sem custo de leitura aqui)"""
+        if source not in self.reads:
+            self.reads[source] = SourceRead(source=source, origin="preloaded", rows=_count_rows(value))
+
+    def skip(self, source: str):
+        """Leitura evitada porque a seção que a usaria não vai renderizar"""
+        self.skipped.append(source)
+
+    def mark_used(self, *sources: str):
+        for source in sources:
+            if source in self.reads:
+                self.reads[source].used = True
+
+    def report(self) -> Dict[str, Any]:
+        """Resumo do turno: o que foi lido, descriptografado e aproveitado"""
+        db_reads = [r for r in self.reads.values() if r.origin == "db"]
+        wasted = [r for r in db_reads if not r.used]
+        return {
+            "db_reads": len(db_reads),
+            "decrypts": sum(r.decrypts for r in db_reads),
+            "unused_reads": [r.source for r in wasted],
+            "unused_decrypts": sum(r.decrypts for r in wasted),
+            "skipped": list(self.skipped),
+            "sources": [r.to_dict() for r in self.reads.values()]
+        }
+
+    def log(self, user_id: str = ""):
+        """Imprime o relatório (ativado por CONTEXT_PROFILE_LOG)"""
+        if not CONTEXT_PROFILE_LOG:
+            return
+        report = self.report()
+        details = ", ".join(
+            f"{r['source']}({r['origin']}, {r['rows']} linhas, {r['decrypts']} decrypts, "
+            f"{r['elapsed_ms']}ms, {'usado' if r['used'] else 'NAO USADO'})"
+            for r in report["sources"]
+        )
+        print(
+            f"[CONTEXT_PROFILE] user={user_id[:8]} leituras={report['db_reads']} "
+            f"decrypts={report['decrypts']} desperdicio={report['unused_reads']} "
+            f"evitadas={report['skipped']} | {details}"
+        )
+
+
+# ============================================
+# SEÇÕES DO CONTEXTO
+# ============================================
+
+def previous_conversation_summaries(
+    recent_conversations: List[dict],
+    current_conversation_id: Any,
+    limit: int = 3
+) -> List[dict]:
+    """Data + resumo das últimas conversas (exceto a atual) - sem ler mensagens"""
+    summaries = []
+    for conv in recent_conversations[:limit]:
+        if str(conv["id"]) == str(current_conversation_id):
+            continue
+        if not conv.get("message_count", 1):
+            continue
+        summaries.append({
+            "data": conv["last_message_at"].strftime("%d/%m"),
+            "resumo": conv.get("resumo") or ""
+        })
+    return summaries
+
+
+def _render_memory(data: Dict[str, Any]) -> str:
+    return data["permanent_memory"] or ""
+
+
+def _render_profile(data: Dict[str, Any]) -> str:
+    return build_user_context(
+        profile=data["profile"],
+        history=[
+            {"data": c["last_message_at"].strftime("%d/%m"), "resumo": c.get("resumo", "")}
+            for c in data["recent_conversations"] if c.get("resumo")
+        ],
+        prayer_requests=data["prayer_requests"] or [],
+        learning_context=data["learning_context"] or ""
+    )
+
+
+def _render_recent_conversations(data: Dict[str, Any]) -> str:
+    summaries = previous_conversation_summaries(data["recent_conversations"] or [], data["conversation_id"])
+    if not summaries:
+        return ""
+    conv_context = "=== CONVERSAS RECENTES ===\n"
+    for conv in summaries:
+        conv_context += f"--- {conv['data']} ---\n"
+        if conv["resumo"]:
+            conv_context += f"{conv['resumo']}\n"
+    return conv_context
+
+
+def _render_psychological(data: Dict[str, Any]) -> str:
+    return data["psychological_context"] or ""
+
+
+def _render_learning(data: Dict[str, Any]) -> str:
+    if not data["learning_context"]:
+        return ""
+    return f"=== APRENDIZADO ===\n{data['learning_context']}"
+
+
+@dataclass(frozen=True)
+class ContextSection:
+    """Seção do contexto: as fontes que renderiza e como renderiza"""
+    name: str
+    sources: Tuple[str, ...]
+    render: Callable[[Dict[str, Any]], str]
+    requires: Optional[str] = None  # Fonte que, vazia, anula a seção (nada mais é buscado)
+
+
+# Ordem = ordem no prompt
+CONTEXT_SECTIONS: Tuple[ContextSection, ...] = (
+    ContextSection("memoria", ("permanent_memory",), _render_memory),
+    ContextSection(
+        "perfil",
+        ("profile", "recent_conversations", "prayer_requests", "learning_context"),
+        _render_profile,
+        requires="profile"
+    ),
+    ContextSection("conversas_recentes", ("recent_conversations", "conversation_id"), _render_recent_conversations),
+    ContextSection("psicologico", ("psychological_context",), _render_psychological),
+    ContextSection("aprendizado", ("learning_context",), _render_learning),
+)
+
+
+class ContextAssembler:
+    """
+    Monta a mensagem de contexto a partir de CONTEXT_SECTIONS.
+
+    - preloaded: dados que o chat já carregou para outras decisões
+    - loaders: leituras só do contexto, executadas sob demanda (uma vez cada)
+    """
+
+    def __init__(self, sections: Tuple[ContextSection, ...] = CONTEXT_SECTIONS):
+        self.sections = sections
+
+    async def build(
+        self,
+        preloaded: Dict[str, Any],
+        loaders: Dict[str, Callable[[], Awaitable]],
+        profile: Optional[ContextProfile] = None
+    ) -> str:
+        profile = profile or ContextProfile()
+        data: Dict[str, Any] = {}
+        for source, value in preloaded.items():
+            profile.preloaded(source, value)
+            data[source] = value
+
+        async def load(source: str) -> Any:
+            if source not in data:
+                loader = loaders.get(source)
+                data[source] = await profile.track(source, loader()) if loader else None
+            return data[source]
+
+        parts = []
+        for section in self.sections:
+            if section.requires and not await load(section.requires):
+                for source in section.sources:
+                    if source not in data and source in loaders:
+                        profile.skip(source)
+                continue
+
+            values = {source: await load(source) for source in section.sources}
+            rendered = section.render(values)
+            if rendered:
+                parts.append(rendered)
+                profile.mark_used(*section.sources)
+
+        return "\n\n".join(parts)
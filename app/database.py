@@ -4,14 +4,23 @@ Abstração para PostgreSQL/Supabase
 """
 
 import json
-from datetime import datetime, date
-from typing import Optional, List, Dict, Any
+import math
+from datetime import datetime, date, time, timedelta, timezone
+from functools import lru_cache
+from zoneinfo import available_timezones
+from typing import Optional, List, Dict, Any, Tuple
 from contextlib import asynccontextmanager
 from uuid import UUID
 
 import asyncpg
-from app.config import DATABASE_URL
+from app.config import DATABASE_URL, EMOTIONAL_TIMELINE_RETENTION_DAYS
 from app.security import encrypt_data, decrypt_data
+from app.telemetry import instrument_connection
+from app.logging_config import get_logger
+from app.audit import audit_writer
+
+
+logger = get_logger("database")
 
 
 class UUIDEncoder(json.JSONEncoder):
@@ -22,6 +31,136 @@ class UUIDEncoder(json.JSONEncoder):
         return super().default(obj)
 
 
+# ============================================
+# LEMBRETES: TIMEZONE IANA E PRÓXIMO DISPARO
+# ============================================
+
+DEFAULT_TIMEZONE = "America/Sao_Paulo"
+
+
+@lru_cache(maxsize=1)
+def _iana_timezones() -> frozenset:
+    return frozenset(available_timezones())
+
+
+def normalize_timezone(name: Optional[str]) -> str:
+    """Nome IANA válido (ex: Europe/Lisbon); vazio ou desconhecido vira o padrão"""
+    if name and name in _iana_timezones():
+        return name
+    return DEFAULT_TIMEZONE
+
+
+# Próximo reminder_time local (nos reminder_days) depois de agora, em UTC.
+# As regras de cada fuso (inclusive horário de verão) vêm da base IANA do
+# Postgres via AT TIME ZONE; sem dias ou horário o resultado é NULL (nunca dispara).
+NEXT_FIRE_AT_SQL = """(
+    SELECT MIN(((NOW() AT TIME ZONE unp.timezone)::date + d + unp.reminder_time) AT TIME ZONE unp.timezone)
+    FROM generate_series(0, 7) AS d
+    WHERE unp.reminder_days ? to_char((NOW() AT TIME ZONE unp.timezone)::date + d, 'dy')
+    AND (((NOW() AT TIME ZONE unp.timezone)::date + d + unp.reminder_time) AT TIME ZONE unp.timezone) > NOW()
+)"""
+
+# Linhas antigas: NULLs gravados no lugar dos padrões e fusos que o Postgres
+# não conhece viram o padrão; depois calcula o next_fire_at que falta
+BACKFILL_NEXT_FIRE_AT_SQL = f"""
+    UPDATE user_notification_preferences
+    SET reminder_time = COALESCE(reminder_time, '09:00:00'),
+        reminder_days = COALESCE(reminder_days, '["mon","tue","wed","thu","fri","sat","sun"]'),
+        timezone = CASE
+            WHEN timezone IN (SELECT name FROM pg_timezone_names) THEN timezone
+            ELSE 'America/Sao_Paulo'
+        END
+    WHERE next_fire_at IS NULL;
+
+    UPDATE user_notification_preferences unp
+    SET next_fire_at = {NEXT_FIRE_AT_SQL}
+    WHERE unp.next_fire_at IS NULL;
+"""
+
+# Reivindica os lembretes vencidos (range scan no índice parcial de next_fire_at),
+# já avança cada um para o próximo disparo e devolve as subscriptions ativas
+# (usuário sem subscription vem com endpoint NULL: foi avançado, nada a enviar).
+# SKIP LOCKED: vários nós podem rodar ao mesmo tempo sem enviar duas vezes.
+CLAIM_DUE_REMINDERS_QUERY = f"""
+    WITH due AS (
+        SELECT user_id, next_fire_at
+        FROM user_notification_preferences
+        WHERE next_fire_at <= NOW()
+        AND reminder_enabled = TRUE
+        AND push_enabled = TRUE
+        ORDER BY next_fire_at
+        LIMIT $1
+        FOR UPDATE SKIP LOCKED
+    ),
+    advanced AS (
+        UPDATE user_notification_preferences unp
+        SET next_fire_at = {NEXT_FIRE_AT_SQL}
+        FROM due
+        WHERE unp.user_id = due.user_id
+        RETURNING unp.user_id, unp.timezone, due.next_fire_at AS fire_at
+    )
+    SELECT a.user_id, a.timezone, a.fire_at, ps.endpoint, ps.p256dh, ps.auth
+    FROM advanced a
+    LEFT JOIN push_subscriptions ps ON ps.user_id = a.user_id AND ps.is_active = TRUE
+"""
+
+
+# ============================================
+# ENGAJAMENTO: PAGINAÇÃO POR KEYSET
+# ============================================
+
+# Cursor da primeira página (antes de qualquer last_login)
+ENGAGEMENT_FIRST_PAGE = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+# A página é de usuários (não de subscriptions): o cursor nunca corta no meio
+# das subscriptions de um usuário. Percorre idx_users_last_login_id a partir do
+# cursor; o NOT EXISTS e o EXISTS são buscas pontuais nos índices abaixo.
+ENGAGEMENT_PAGE_QUERY = """
+    WITH page AS (
+        SELECT
+            u.id AS user_id,
+            u.email,
+            u.last_login,
+            unp.engagement_after_days,
+            unp.timezone
+        FROM users u
+        JOIN user_notification_preferences unp ON unp.user_id = u.id
+        WHERE (u.last_login, u.id) > ($3, $4)
+        AND unp.engagement_enabled = TRUE
+        AND unp.push_enabled = TRUE
+        AND u.last_login < NOW() - (COALESCE(unp.engagement_after_days, $1) || ' days')::INTERVAL
+        AND EXISTS (
+            SELECT 1 FROM push_subscriptions ps
+            WHERE ps.user_id = u.id AND ps.is_active = TRUE
+        )
+        AND NOT EXISTS (
+            SELECT 1 FROM notification_logs nl
+            WHERE nl.user_id = u.id
+            AND nl.notification_type = 'engagement'
+            AND nl.sent_at > NOW() - INTERVAL '7 days'
+        )
+        AND (hashtext(u.id::text) & 2147483647) % $6 = $5
+        ORDER BY u.last_login, u.id
+        LIMIT $2
+    )
+    SELECT page.*, ps.endpoint, ps.p256dh, ps.auth
+    FROM page
+    JOIN push_subscriptions ps ON ps.user_id = page.user_id AND ps.is_active = TRUE
+    ORDER BY page.last_login, page.user_id
+"""
+
+ENGAGEMENT_INDEXES = [
+    # Keyset da varredura de inativos
+    "CREATE INDEX IF NOT EXISTS idx_users_last_login_id ON users(last_login, id)",
+    # NOT EXISTS "já recebeu engajamento nos últimos 7 dias"
+    """CREATE INDEX IF NOT EXISTS idx_notification_logs_user_type_sent
+       ON notification_logs(user_id, notification_type, sent_at DESC)""",
+    # Subscriptions ativas do usuário
+    """CREATE INDEX IF NOT EXISTS idx_push_subscriptions_active_user
+       ON push_subscriptions(user_id) WHERE is_active = TRUE""",
+]
+
+
 class Database:
     """
     Classe de abstração do banco de dados
@@ -296,6 +435,68 @@ class Database:
 
             return dict(row)
 
+    async def save_chat_turn(
+        self,
+        conversation_id: str,
+        user_id: str,
+        user_content: str,
+        assistant_content: str,
+        tokens_used: int = 0,
+        model_used: str = None,
+        message_limit: Optional[int] = None
+    ) -> Optional[dict]:
+        """
+        Persiste um turno do chat num único comando (1 ida ao banco):
+        as duas mensagens, o contador da conversa (+2) e a cota do usuário.
+
+        A cota é verificada e incrementada na mesma linha (UPDATE ... WHERE
+        trial_messages_used < limite), então requests concorrentes não passam
+        do limite free. Sem cota, nada é gravado e retorna None.
+
+        Returns:
+            {"total_messages", "trial_messages_used", "is_premium", "conversation_message_count"}
+        """
+        conv_uuid = UUID(conversation_id) if isinstance(conversation_id, str) else conversation_id
+        user_uuid = UUID(user_id) if isinstance(user_id, str) else user_id
+        user_encrypted = encrypt_data(user_content, user_id)
+        assistant_encrypted = encrypt_data(assistant_content, user_id)
+
+        async with self.pool.acquire() as conn:
+            row = await conn.fetchrow(
+                """
+                WITH quota AS (
+                    UPDATE users
+                    SET total_messages = COALESCE(total_messages, 0) + 1,
+                        trial_messages_used = COALESCE(trial_messages_used, 0) + 1
+                    WHERE id = $2
+                      AND ($7::int IS NULL OR is_premium OR COALESCE(trial_messages_used, 0) < $7::int)
+                    RETURNING total_messages, trial_messages_used, COALESCE(is_premium, FALSE) AS is_premium
+                ),
+                conv AS (
+                    UPDATE conversations
+                    SET message_count = message_count + 2,
+                        last_message_at = NOW()
+                    WHERE id = $1 AND EXISTS (SELECT 1 FROM quota)
+                    RETURNING message_count
+                ),
+                saved AS (
+                    -- Resposta 1µs depois da pergunta: mantém a ordem por created_at
+                    INSERT INTO messages (conversation_id, user_id, role, content_encrypted, tokens_used, model_used, created_at)
+                    SELECT $1, $2, m.role, m.content, m.tokens, m.model, NOW() + m.seq * INTERVAL '1 microsecond'
+                    FROM quota, (VALUES
+                        ('user', $3::bytea, 0, NULL::varchar, 0),
+                        ('assistant', $4::bytea, $5::int, $6::varchar, 1)
+                    ) AS m(role, content, tokens, model, seq)
+                )
+                SELECT q.total_messages, q.trial_messages_used, q.is_premium,
+                       (SELECT message_count FROM conv) AS conversation_message_count
+                FROM quota q
+                """,
+                conv_uuid, user_uuid, user_encrypted, assistant_encrypted,
+                tokens_used, model_used, message_limit
+            )
+            return dict(row) if row else None
+
     async def get_conversation_messages(
         self,
         conversation_id: str,
@@ -352,8 +553,11 @@ class Database:
             )
             return dict(row)
 
-    async def get_active_prayer_requests(self, user_id: str) -> List[dict]:
-        """Busca pedidos de oração ativos"""
+    async def get_active_prayer_requests(self, user_id: str, include_descricao: bool = True) -> List[dict]:
+        """
+        Busca pedidos de oração ativos.
+        include_descricao=False evita descriptografar a descrição (o prompt só usa título/categoria)
+        """
         user_uuid = UUID(user_id) if isinstance(user_id, str) else user_id
         async with self.pool.acquire() as conn:
             rows = await conn.fetch(
@@ -368,7 +572,7 @@ class Database:
             requests = []
             for row in rows:
                 req = dict(row)
-                if req.get("descricao_encrypted"):
+                if include_descricao and req.get("descricao_encrypted"):
                     req["descricao"] = decrypt_data(req["descricao_encrypted"], user_id)
                 requests.append(req)
 
@@ -582,7 +786,7 @@ class Database:
                             conf["id"]
                         )
                         superseded_ids.append(str(conf["id"]))
-                        print(f"[MEMORY] Superseded conflicting fact: '{conf['fato']}' -> '{fato}'")
+                        logger.info("memory.superseded", extra={"categoria": categoria})
 
             # Buscar memória similar usando fato_normalizado (melhor dedupe)
             existing = await conn.fetchrow(
@@ -986,6 +1190,11 @@ class Database:
     # LEARNING - APRENDIZADO CONTÍNUO
     # ============================================
 
+    # Classificação de feedbacks para o score de estratégias
+    POSITIVE_FEEDBACKS = ("positive_explicit", "engagement_high", "emotional_improvement", "returned_soon")
+    NEGATIVE_FEEDBACKS = ("negative_explicit", "engagement_low", "emotional_decline", "long_absence")
+    STRATEGY_EMA_ALPHA = 0.2  # Peso do feedback mais recente no score
+
     async def save_learning_interaction(
         self,
         user_id: str,
@@ -995,41 +1204,76 @@ class Database:
         emotion_after: str = None,
         response_time: float = None,
         user_message_length: int = None,
-        ai_response_length: int = None
+        ai_response_length: int = None,
+        themes: List[str] = None
     ):
-        """Salva uma interação para aprendizado"""
+        """
+        Salva uma interação para aprendizado e atualiza os agregados
+        do usuário (histogramas de hora/dia, emoções por dia, temas)
+        na mesma transação.
+        """
         # Converter strings para UUID
         user_uuid = UUID(user_id) if isinstance(user_id, str) else user_id
         conv_uuid = UUID(conversation_id) if conversation_id and isinstance(conversation_id, str) else conversation_id
 
-        async with self.pool.acquire() as conn:
-            # Criar tabela se não existir
-            await conn.execute("""
-                CREATE TABLE IF NOT EXISTS learning_interactions (
-                    id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
-                    user_id UUID NOT NULL REFERENCES users(id),
-                    conversation_id UUID,
-                    strategy_used VARCHAR(50),
-                    emotion_before VARCHAR(30),
-                    emotion_after VARCHAR(30),
-                    response_time FLOAT,
-                    user_message_length INT,
-                    ai_response_length INT,
-                    feedback_type VARCHAR(30),
-                    created_at TIMESTAMP DEFAULT NOW()
-                )
-            """)
+        now = datetime.utcnow()
+        day_name = now.strftime("%A")
+        emotion = emotion_before or "neutro"
+        hour_counts = [0] * 24
+        hour_counts[now.hour] = 1
+        day_counts = [0] * 7
+        day_counts[now.weekday()] = 1
+        theme_counts = {}
+        for theme in themes or []:
+            theme_counts[theme] = theme_counts.get(theme, 0) + 1
 
-            await conn.execute("""
-                INSERT INTO learning_interactions (
-                    user_id, conversation_id, strategy_used,
+        async with self.pool.acquire() as conn:
+            async with conn.transaction():
+                await conn.execute("""
+                    INSERT INTO learning_interactions (
+                        user_id, conversation_id, strategy_used,
+                        emotion_before, emotion_after, response_time,
+                        user_message_length, ai_response_length
+                    ) VALUES ($1, $2, $3, $4, $5, $6, $7, $8)
+                """, user_uuid, conv_uuid, strategy_used,
                     emotion_before, emotion_after, response_time,
                     user_message_length, ai_response_length
-                ) VALUES ($1, $2, $3, $4, $5, $6, $7, $8)
-            """, user_uuid, conv_uuid, strategy_used,
-                emotion_before, emotion_after, response_time,
-                user_message_length, ai_response_length
-            )
+                )
+
+                await conn.execute("""
+                    INSERT INTO learning_user_stats AS s (
+                        user_id, interaction_count, hour_counts, day_counts,
+                        emotion_by_day, theme_counts, last_strategy, last_interaction_at
+                    ) VALUES (
+                        $1, 1, $2::int[], $3::int[],
+                        jsonb_build_object($4::text, jsonb_build_object($5::text, 1)),
+                        $6::jsonb, $7::text, NOW()
+                    )
+                    ON CONFLICT (user_id) DO UPDATE SET
+                        interaction_count = s.interaction_count + 1,
+                        hour_counts = ARRAY(
+                            SELECT s.hour_counts[i] + EXCLUDED.hour_counts[i]
+                            FROM generate_series(1, 24) i ORDER BY i
+                        ),
+                        day_counts = ARRAY(
+                            SELECT s.day_counts[i] + EXCLUDED.day_counts[i]
+                            FROM generate_series(1, 7) i ORDER BY i
+                        ),
+                        emotion_by_day = jsonb_set(
+                            s.emotion_by_day, ARRAY[$4::text],
+                            COALESCE(s.emotion_by_day -> $4::text, '{}'::jsonb) || jsonb_build_object(
+                                $5::text, COALESCE((s.emotion_by_day -> $4::text ->> $5::text)::int, 0) + 1
+                            )
+                        ),
+                        theme_counts = s.theme_counts || COALESCE((
+                            SELECT jsonb_object_agg(e.key, COALESCE((s.theme_counts ->> e.key)::int, 0) + e.value::int)
+                            FROM jsonb_each_text(EXCLUDED.theme_counts) e
+                        ), '{}'::jsonb),
+                        last_strategy = COALESCE(EXCLUDED.last_strategy, s.last_strategy),
+                        last_interaction_at = NOW()
+                """, user_uuid, hour_counts, day_counts, day_name, emotion,
+                    json.dumps(theme_counts), strategy_used
+                )
 
     async def save_learning_feedback(
         self,
@@ -1038,90 +1282,82 @@ class Database:
         strategy_used: str = None,
         context: str = None
     ):
-        """Salva feedback implícito ou explícito para aprendizado"""
+        """
+        Salva feedback implícito ou explícito para aprendizado.
+        Atualiza contadores e EMA de sucesso da estratégia na mesma transação.
+        """
         # Converter string para UUID
         user_uuid = UUID(user_id) if isinstance(user_id, str) else user_id
 
+        if feedback_type in self.POSITIVE_FEEDBACKS:
+            outcome, positive, negative = 1.0, 1, 0
+        elif feedback_type in self.NEGATIVE_FEEDBACKS:
+            outcome, positive, negative = 0.0, 0, 1
+        else:
+            outcome, positive, negative = 0.5, 0, 0
+
         async with self.pool.acquire() as conn:
-            # Criar tabela se não existir
-            await conn.execute("""
-                CREATE TABLE IF NOT EXISTS learning_feedbacks (
-                    id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
-                    user_id UUID NOT NULL REFERENCES users(id),
-                    feedback_type VARCHAR(50) NOT NULL,
-                    strategy_used VARCHAR(50),
-                    context TEXT,
-                    created_at TIMESTAMP DEFAULT NOW()
+            async with conn.transaction():
+                await conn.execute("""
+                    INSERT INTO learning_feedbacks (user_id, feedback_type, strategy_used, context)
+                    VALUES ($1, $2, $3, $4)
+                """, user_uuid, feedback_type, strategy_used, context[:500] if context else None)
+
+                if not strategy_used:
+                    return
+
+                await conn.execute("""
+                    INSERT INTO learning_strategy_stats AS st (
+                        user_id, strategy, positive_count, negative_count, total_count, success_ema
+                    ) VALUES ($1, $2, $3, $4, 1, 0.5 + $5::float8 * ($6::float8 - 0.5))
+                    ON CONFLICT (user_id, strategy) DO UPDATE SET
+                        positive_count = st.positive_count + EXCLUDED.positive_count,
+                        negative_count = st.negative_count + EXCLUDED.negative_count,
+                        total_count = st.total_count + 1,
+                        success_ema = st.success_ema + $5::float8 * ($6::float8 - st.success_ema),
+                        updated_at = NOW()
+                """, user_uuid, strategy_used, positive, negative,
+                    self.STRATEGY_EMA_ALPHA, outcome
                 )
-            """)
-
-            await conn.execute("""
-                INSERT INTO learning_feedbacks (user_id, feedback_type, strategy_used, context)
-                VALUES ($1, $2, $3, $4)
-            """, user_uuid, feedback_type, strategy_used, context[:500] if context else None)
 
     async def get_strategy_scores(self, user_id: str) -> dict:
         """
-        Calcula scores de efetividade para cada estratégia baseado no histórico.
+        Retorna scores de efetividade (0.0 a 1.0) para cada estratégia.
         Score alto = estratégia funciona bem para este usuário.
+        Lido de learning_strategy_stats (EMA mantida a cada feedback).
         """
         # Converter string para UUID
         user_uuid = UUID(user_id) if isinstance(user_id, str) else user_id
 
         async with self.pool.acquire() as conn:
-            # Verificar se tabela existe
-            table_exists = await conn.fetchval("""
-                SELECT EXISTS (
-                    SELECT FROM information_schema.tables
-                    WHERE table_name = 'learning_feedbacks'
-                )
-            """)
-
-            if not table_exists:
-                return {}
-
-            # Buscar feedbacks por estratégia
             rows = await conn.fetch("""
-                SELECT
-                    strategy_used,
-                    feedback_type,
-                    COUNT(*) as count
-                FROM learning_feedbacks
-                WHERE user_id = $1 AND strategy_used IS NOT NULL
-                GROUP BY strategy_used, feedback_type
+                SELECT strategy, success_ema
+                FROM learning_strategy_stats
+                WHERE user_id = $1
             """, user_uuid)
 
-            if not rows:
-                return {}
-
-            # Calcular scores
-            strategy_data = {}
-            for row in rows:
-                strategy = row["strategy_used"]
-                if strategy not in strategy_data:
-                    strategy_data[strategy] = {"positive": 0, "negative": 0, "total": 0}
+            return {row["strategy"]: max(0.0, min(1.0, float(row["success_ema"]))) for row in rows}
 
-                count = row["count"]
-                feedback = row["feedback_type"]
-
-                strategy_data[strategy]["total"] += count
+    async def get_learning_aggregates(self, user_id: str) -> Optional[dict]:
+        """Retorna os agregados de aprendizado do usuário (uma linha, por PK)"""
+        user_uuid = UUID(user_id) if isinstance(user_id, str) else user_id
 
-                # Feedbacks positivos
-                if feedback in ["positive_explicit", "engagement_high", "emotional_improvement", "returned_soon"]:
-                    strategy_data[strategy]["positive"] += count
-                # Feedbacks negativos
-                elif feedback in ["negative_explicit", "engagement_low", "emotional_decline", "long_absence"]:
-                    strategy_data[strategy]["negative"] += count
+        async with self.pool.acquire() as conn:
+            row = await conn.fetchrow("""
+                SELECT interaction_count, hour_counts, day_counts, emotion_by_day,
+                       theme_counts, last_strategy, last_interaction_at
+                FROM learning_user_stats
+                WHERE user_id = $1
+            """, user_uuid)
 
-            # Converter para scores (0.0 a 1.0)
-            scores = {}
-            for strategy, data in strategy_data.items():
-                if data["total"] > 0:
-                    # Score = (positivos - negativos/2) / total, normalizado para 0-1
-                    raw_score = (data["positive"] - data["negative"] * 0.5) / data["total"]
-                    scores[strategy] = max(0.0, min(1.0, (raw_score + 1) / 2))  # Normaliza de -1,1 para 0,1
+            if not row:
+                return None
 
-            return scores
+            result = dict(row)
+            for field in ("emotion_by_day", "theme_counts"):
+                if isinstance(result.get(field), str):
+                    result[field] = json.loads(result[field])
+            return result
 
     async def get_user_learning_stats(self, user_id: str) -> dict:
         """Retorna estatísticas de aprendizado do usuário"""
@@ -1208,16 +1444,53 @@ class Database:
     # ============================================
 
     async def log_audit(self, user_id: str, action: str, details: dict = None, ip: str = None):
-        """Registra ação no log de auditoria"""
+        """Registra ação no log de auditoria (enfileirada; gravada em lote pelo audit_writer)"""
         user_uuid = UUID(user_id) if isinstance(user_id, str) else user_id
+        record = (user_uuid, action, json.dumps(details or {}, cls=UUIDEncoder), ip, datetime.now(timezone.utc))
+        if audit_writer.running:
+            await audit_writer.submit(record)
+            return
+
+        # Sem o writer (scripts, testes): grava direto
         async with self.pool.acquire() as conn:
             await conn.execute(
                 """
-                INSERT INTO audit_log (user_id, action, details, ip_address)
-                VALUES ($1, $2, $3, $4)
+                INSERT INTO audit_log (user_id, action, details, ip_address, created_at)
+                VALUES ($1, $2, $3, $4, $5)
                 """,
-                user_uuid, action, json.dumps(details or {}, cls=UUIDEncoder), ip
+                *record
+            )
+
+    async def ensure_audit_partitions(self, months_ahead: int = 2) -> int:
+        """
+        Cria as partições mensais do audit_log (mês atual + months_ahead).
+        Retorna quantas foram criadas; não faz nada se a tabela ainda não for
+        particionada (rodar database/migrations/008_audit_log_partitioned.sql).
+        """
+        async with self.pool.acquire() as conn:
+            kind = await conn.fetchval(
+                "SELECT relkind FROM pg_class WHERE oid = to_regclass('audit_log')"
             )
+            if kind != "p":
+                return 0
+
+            # Rede de segurança: evento fora das partições não falha (deve ficar vazia)
+            await conn.execute("CREATE TABLE IF NOT EXISTS audit_log_default PARTITION OF audit_log DEFAULT")
+
+            created = 0
+            month = datetime.now(timezone.utc).replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+            for _ in range(months_ahead + 1):
+                next_month = (month + timedelta(days=32)).replace(day=1)
+                name = f"audit_log_y{month:%Y}m{month:%m}"
+                exists = await conn.fetchval("SELECT to_regclass($1) IS NOT NULL", name)
+                if not exists:
+                    await conn.execute(
+                        f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF audit_log "
+                        f"FOR VALUES FROM ('{month.isoformat()}') TO ('{next_month.isoformat()}')"
+                    )
+                    created += 1
+                month = next_month
+            return created
 
     # ============================================
     # PASSWORD RESET
@@ -1351,6 +1624,9 @@ class Database:
     # Tracking interno de estados emocionais
     # ============================================
 
+    # Emoções negativas usadas em tendências e alertas
+    NEGATIVE_EMOTIONS = ('ansioso', 'triste', 'angustiado', 'estressado', 'deprimido', 'frustrado')
+
     async def record_emotional_state(
         self,
         user_id: str,
@@ -1364,43 +1640,65 @@ class Database:
         """
         Registra um estado emocional detectado na timeline.
         Uso interno - não exposto ao usuário.
+
+        O rollup diário (emotional_daily_rollups) é atualizado no mesmo
+        statement, então padrões e tendências nunca varrem a timeline bruta.
+        Dia do rollup, day_of_week e hour_of_day saem do mesmo instante em UTC
+        (created_at), o mesmo relógio das consultas e da compactação.
         """
         user_uuid = UUID(user_id) if isinstance(user_id, str) else user_id
         conv_uuid = UUID(conversation_id) if conversation_id and isinstance(conversation_id, str) else conversation_id
-        now = datetime.now()
+        now = datetime.now(timezone.utc)
 
         async with self.pool.acquire() as conn:
-            # Criar tabela se não existir
-            await conn.execute("""
-                CREATE TABLE IF NOT EXISTS emotional_timeline (
-                    id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
-                    user_id UUID NOT NULL REFERENCES users(id) ON DELETE CASCADE,
-                    conversation_id UUID REFERENCES conversations(id) ON DELETE SET NULL,
-                    emotion VARCHAR(50) NOT NULL,
-                    intensity DECIMAL(3,2) DEFAULT 0.5,
-                    confidence DECIMAL(3,2) DEFAULT 0.7,
-                    trigger_detected VARCHAR(100),
-                    themes JSONB DEFAULT '[]',
-                    day_of_week INTEGER,
-                    hour_of_day INTEGER,
-                    created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
-                )
-            """)
-
             row = await conn.fetchrow(
                 """
-                INSERT INTO emotional_timeline (
-                    user_id, conversation_id, emotion, intensity, confidence,
-                    trigger_detected, themes, day_of_week, hour_of_day
+                WITH ins AS (
+                    INSERT INTO emotional_timeline (
+                        user_id, conversation_id, emotion, intensity, confidence,
+                        trigger_detected, themes, day_of_week, hour_of_day, created_at
+                    )
+                    VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9, $10)
+                    RETURNING id, user_id, emotion, intensity, trigger_detected, hour_of_day, created_at
+                ),
+                rollup AS (
+                    INSERT INTO emotional_daily_rollups AS r (
+                        user_id, day, emotion, entry_count, intensity_sum, intensity_sq_sum,
+                        hour_counts, trigger_counts
+                    )
+                    SELECT
+                        ins.user_id,
+                        (ins.created_at AT TIME ZONE 'UTC')::date,
+                        ins.emotion,
+                        1,
+                        ins.intensity,
+                        ins.intensity * ins.intensity,
+                        (SELECT array_agg(CASE WHEN h = ins.hour_of_day THEN 1 ELSE 0 END ORDER BY h)
+                         FROM generate_series(0, 23) h),
+                        CASE WHEN ins.trigger_detected IS NULL THEN '{}'::jsonb
+                             ELSE jsonb_build_object(ins.trigger_detected, 1) END
+                    FROM ins
+                    ON CONFLICT (user_id, day, emotion) DO UPDATE SET
+                        entry_count = r.entry_count + 1,
+                        intensity_sum = r.intensity_sum + EXCLUDED.intensity_sum,
+                        intensity_sq_sum = r.intensity_sq_sum + EXCLUDED.intensity_sq_sum,
+                        hour_counts = ARRAY(
+                            SELECT r.hour_counts[i] + EXCLUDED.hour_counts[i]
+                            FROM generate_series(1, 24) i ORDER BY i
+                        ),
+                        trigger_counts = r.trigger_counts || COALESCE((
+                            SELECT jsonb_object_agg(e.key, COALESCE((r.trigger_counts ->> e.key)::int, 0) + e.value::int)
+                            FROM jsonb_each_text(EXCLUDED.trigger_counts) e
+                        ), '{}'::jsonb),
+                        updated_at = NOW()
                 )
-                VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9)
-                RETURNING id, created_at
+                SELECT id, created_at FROM ins
                 """,
                 user_uuid, conv_uuid, emotion,
                 min(max(intensity, 0.0), 1.0),
                 min(max(confidence, 0.0), 1.0),
                 trigger, json.dumps(themes or []),
-                now.weekday(), now.hour
+                now.weekday(), now.hour, now
             )
             return {"id": str(row["id"]), "recorded_at": row["created_at"].isoformat()}
 
@@ -1438,95 +1736,148 @@ class Database:
         """
         Analisa padrões emocionais do usuário.
         Retorna tendências, picos e triggers comuns.
+
+        Lê apenas os rollups diários: O(dias x emoções) linhas,
+        independente de quantas mensagens o usuário mandou.
         """
         user_uuid = UUID(user_id) if isinstance(user_id, str) else user_id
         async with self.pool.acquire() as conn:
-            # Verificar se a função existe (pode não ter rodado a migration)
-            func_exists = await conn.fetchval("""
-                SELECT EXISTS (
-                    SELECT 1 FROM pg_proc WHERE proname = 'get_emotional_patterns'
-                )
-            """)
-
-            if func_exists:
-                row = await conn.fetchrow(
-                    "SELECT * FROM get_emotional_patterns($1, $2)",
-                    user_uuid, days
-                )
-                if row:
-                    return dict(row)
-
-            # Fallback se função não existe - análise simplificada
-            emotions = await conn.fetch(
+            rows = await conn.fetch(
                 """
-                SELECT emotion, COUNT(*) as count, AVG(intensity) as avg_intensity
-                FROM emotional_timeline
-                WHERE user_id = $1 AND created_at > NOW() - ($2 || ' days')::INTERVAL
-                GROUP BY emotion
-                ORDER BY count DESC
-                LIMIT 5
+                SELECT day, emotion, entry_count, intensity_sum, intensity_sq_sum,
+                       hour_counts, trigger_counts
+                FROM emotional_daily_rollups
+                WHERE user_id = $1
+                AND day > (NOW() AT TIME ZONE 'UTC')::date - $2::int
                 """,
-                user_uuid, str(days)
+                user_uuid, days
             )
+            today = await conn.fetchval("SELECT (NOW() AT TIME ZONE 'UTC')::date")
 
-            if not emotions:
-                return {
-                    "dominant_emotion": "neutro",
-                    "avg_intensity": 0.5,
-                    "emotion_variance": 0.0,
-                    "trend": "stable",
-                    "emotions_detected": []
-                }
+        return self._summarize_emotional_rollups([dict(r) for r in rows], today)
 
+    @staticmethod
+    def _summarize_emotional_rollups(rows: List[dict], today: date) -> dict:
+        """Consolida linhas de emotional_daily_rollups no formato de get_emotional_patterns"""
+        if not rows:
             return {
-                "dominant_emotion": emotions[0]["emotion"] if emotions else "neutro",
-                "avg_intensity": float(emotions[0]["avg_intensity"]) if emotions else 0.5,
+                "dominant_emotion": "neutro",
+                "avg_intensity": 0.5,
                 "emotion_variance": 0.0,
+                "peak_day": None,
+                "peak_hour": None,
+                "common_triggers": [],
                 "trend": "stable",
-                "emotions_detected": [
-                    {"emotion": e["emotion"], "count": e["count"], "avg_intensity": float(e["avg_intensity"])}
-                    for e in emotions
-                ]
+                "emotions_detected": []
             }
 
+        by_emotion: Dict[str, List[float]] = {}  # emotion -> [count, soma]
+        weekday_negative = [0] * 7
+        hours = [0] * 24
+        triggers: Dict[str, int] = {}
+        total_count = 0
+        total_sum = 0.0
+        total_sq_sum = 0.0
+        recent = [0, 0.0]
+        older = [0, 0.0]
+        week_start = date.fromordinal(today.toordinal() - 7)
+
+        for row in rows:
+            count = row["entry_count"]
+            intensity_sum = float(row["intensity_sum"])
+            emotion = row["emotion"]
+
+            acc = by_emotion.setdefault(emotion, [0, 0.0])
+            acc[0] += count
+            acc[1] += intensity_sum
+
+            total_count += count
+            total_sum += intensity_sum
+            total_sq_sum += float(row["intensity_sq_sum"])
+
+            if emotion in ('ansioso', 'triste', 'angustiado', 'estressado'):
+                weekday_negative[row["day"].weekday()] += count
+
+            # Tendência: última semana vs restante do período
+            if emotion in ('ansioso', 'triste', 'angustiado'):
+                bucket = recent if row["day"] > week_start else older
+                bucket[0] += count
+                bucket[1] += intensity_sum
+
+            for hour, hour_count in enumerate(row["hour_counts"] or []):
+                hours[hour] += hour_count
+
+            trigger_counts = row["trigger_counts"] or {}
+            if isinstance(trigger_counts, str):
+                trigger_counts = json.loads(trigger_counts)
+            for trigger, trigger_count in trigger_counts.items():
+                triggers[trigger] = triggers.get(trigger, 0) + int(trigger_count)
+
+        emotions = sorted(
+            by_emotion.items(),
+            key=lambda item: (item[1][0], item[1][1] / item[1][0]),
+            reverse=True
+        )
+        dominant, (dominant_count, dominant_sum) = emotions[0]
+
+        variance = 0.0
+        if total_count > 1:
+            spread = (total_sq_sum - total_sum ** 2 / total_count) / (total_count - 1)
+            variance = round(math.sqrt(max(spread, 0.0)), 2)
+
+        trend = "stable"
+        if recent[0] and older[0]:
+            recent_avg = recent[1] / recent[0]
+            older_avg = older[1] / older[0]
+            if recent_avg > older_avg * 1.2:
+                trend = "worsening"
+            elif recent_avg < older_avg * 0.8:
+                trend = "improving"
+
+        return {
+            "dominant_emotion": dominant,
+            "avg_intensity": round(dominant_sum / dominant_count, 2),
+            "emotion_variance": variance,
+            "peak_day": weekday_negative.index(max(weekday_negative)) if any(weekday_negative) else None,
+            "peak_hour": hours.index(max(hours)) if any(hours) else None,
+            "common_triggers": [t for t, _ in sorted(triggers.items(), key=lambda item: item[1], reverse=True)[:3]],
+            "trend": trend,
+            "emotions_detected": [
+                {"emotion": e, "count": c, "avg_intensity": round(s / c, 2)}
+                for e, (c, s) in emotions[:5]
+            ]
+        }
+
     async def get_emotional_trend(self, user_id: str) -> str:
         """
         Retorna tendência emocional recente: 'improving', 'worsening', 'stable'
         Compara última semana com semanas anteriores.
         """
         user_uuid = UUID(user_id) if isinstance(user_id, str) else user_id
-        negative_emotions = ('ansioso', 'triste', 'angustiado', 'estressado', 'deprimido', 'frustrado')
 
         async with self.pool.acquire() as conn:
-            # Média de intensidade de emoções negativas na última semana
-            recent = await conn.fetchval(
-                """
-                SELECT AVG(intensity)
-                FROM emotional_timeline
-                WHERE user_id = $1
-                AND emotion = ANY($2)
-                AND created_at > NOW() - INTERVAL '7 days'
-                """,
-                user_uuid, list(negative_emotions)
-            )
-
-            # Média das 3 semanas anteriores
-            older = await conn.fetchval(
+            # Média de intensidade de emoções negativas: última semana vs 3 semanas anteriores
+            row = await conn.fetchrow(
                 """
-                SELECT AVG(intensity)
-                FROM emotional_timeline
+                SELECT
+                    SUM(intensity_sum) FILTER (WHERE day > today - 7)
+                        / NULLIF(SUM(entry_count) FILTER (WHERE day > today - 7), 0) AS recent,
+                    SUM(intensity_sum) FILTER (WHERE day <= today - 7)
+                        / NULLIF(SUM(entry_count) FILTER (WHERE day <= today - 7), 0) AS older
+                FROM emotional_daily_rollups,
+                     (SELECT (NOW() AT TIME ZONE 'UTC')::date AS today) t
                 WHERE user_id = $1
                 AND emotion = ANY($2)
-                AND created_at BETWEEN NOW() - INTERVAL '28 days' AND NOW() - INTERVAL '7 days'
+                AND day > today - 28
                 """,
-                user_uuid, list(negative_emotions)
+                user_uuid, list(self.NEGATIVE_EMOTIONS)
             )
 
-            if recent is None or older is None:
+            if row is None or row["recent"] is None or row["older"] is None:
                 return "stable"
 
-            recent = float(recent)
-            older = float(older)
+            recent = float(row["recent"])
+            older = float(row["older"])
 
             if recent > older * 1.2:
                 return "worsening"
@@ -1534,6 +1885,38 @@ class Database:
                 return "improving"
             return "stable"
 
+    async def compact_emotional_timeline(
+        self,
+        retention_days: int = EMOTIONAL_TIMELINE_RETENTION_DAYS,
+        batch_size: int = 5000
+    ) -> int:
+        """
+        Remove linhas brutas da timeline mais antigas que a retenção.
+        O histórico continua nos rollups diários. O corte é no início de um
+        dia UTC (o mesmo dia dos rollups), então só sai da timeline bruta dia
+        inteiro. Apaga em lotes para não segurar locks longos. Retorna quantas
+        linhas foram removidas.
+        """
+        removed = 0
+        async with self.pool.acquire() as conn:
+            while True:
+                result = await conn.execute(
+                    """
+                    DELETE FROM emotional_timeline
+                    WHERE ctid IN (
+                        SELECT ctid FROM emotional_timeline
+                        WHERE created_at < ((NOW() AT TIME ZONE 'UTC')::date - $1::int) AT TIME ZONE 'UTC'
+                        LIMIT $2
+                    )
+                    """,
+                    retention_days, batch_size
+                )
+                deleted = int(result.split()[-1])
+                removed += deleted
+                if deleted < batch_size:
+                    break
+        return removed
+
     # ============================================
     # MEMORY HEALTH SCORE (Layer 2)
     # Avaliação da qualidade do contexto do usuário
@@ -1919,6 +2302,7 @@ class Database:
                     engagement_after_days INTEGER DEFAULT 3,
                     marketing_enabled BOOLEAN DEFAULT FALSE,
                     timezone VARCHAR(50) DEFAULT 'America/Sao_Paulo',
+                    next_fire_at TIMESTAMP WITH TIME ZONE,
                     created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
                     updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
                 )
@@ -1940,8 +2324,15 @@ class Database:
         user_id: str,
         preferences: dict
     ) -> dict:
-        """Salva ou atualiza preferências de notificação"""
+        """Salva ou atualiza preferências de notificação (e recalcula o próximo lembrete)"""
         user_uuid = UUID(user_id) if isinstance(user_id, str) else user_id
+        reminder_time = preferences.get("reminder_time")
+        if isinstance(reminder_time, str):
+            reminder_time = time.fromisoformat(reminder_time)  # "HH:MM" do frontend
+        tz_name = preferences.get("timezone")
+        if tz_name is not None:
+            tz_name = normalize_timezone(tz_name)
+
         async with self.pool.acquire() as conn:
             # Garantir que tabela existe
             await conn.execute("""
@@ -1956,6 +2347,7 @@ class Database:
                     engagement_after_days INTEGER DEFAULT 3,
                     marketing_enabled BOOLEAN DEFAULT FALSE,
                     timezone VARCHAR(50) DEFAULT 'America/Sao_Paulo',
+                    next_fire_at TIMESTAMP WITH TIME ZONE,
                     created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
                     updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
                 )
@@ -1968,7 +2360,12 @@ class Database:
                     reminder_days, engagement_enabled, engagement_after_days,
                     marketing_enabled, timezone
                 )
-                VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9)
+                -- Parâmetro ausente no primeiro INSERT usa o padrão da coluna (NULL explícito não usaria)
+                VALUES (
+                    $1, COALESCE($2, TRUE), COALESCE($3, TRUE), COALESCE($4, '09:00:00'::time),
+                    COALESCE($5, '["mon","tue","wed","thu","fri","sat","sun"]'::jsonb), COALESCE($6, TRUE),
+                    COALESCE($7, 3), COALESCE($8, FALSE), COALESCE($9, 'America/Sao_Paulo')
+                )
                 ON CONFLICT (user_id) DO UPDATE SET
                     push_enabled = COALESCE($2, user_notification_preferences.push_enabled),
                     reminder_enabled = COALESCE($3, user_notification_preferences.reminder_enabled),
@@ -1983,12 +2380,16 @@ class Database:
                 user_uuid,
                 preferences.get("push_enabled"),
                 preferences.get("reminder_enabled"),
-                preferences.get("reminder_time"),
+                reminder_time,
                 json.dumps(preferences.get("reminder_days")) if preferences.get("reminder_days") else None,
                 preferences.get("engagement_enabled"),
                 preferences.get("engagement_after_days"),
                 preferences.get("marketing_enabled"),
-                preferences.get("timezone")
+                tz_name
+            )
+            await conn.execute(
+                f"UPDATE user_notification_preferences unp SET next_fire_at = {NEXT_FIRE_AT_SQL} WHERE unp.user_id = $1",
+                user_uuid
             )
             return {"saved": True}
 
@@ -2020,126 +2421,40 @@ class Database:
             )
             return [dict(row) for row in rows]
 
-    async def get_users_for_reminder_with_timezone(self, utc_hour: int, day_of_week: str) -> List[dict]:
+    async def claim_due_reminders(self, limit: int = 500) -> List[dict]:
         """
-        Busca usuários que devem receber lembrete agora, considerando timezone.
-        utc_hour: hora atual em UTC (0-23)
-        day_of_week: dia da semana em inglês (mon, tue, etc.)
-
-        Calcula a hora local do usuário baseado no timezone configurado.
+        Lembretes vencidos (next_fire_at <= agora), até limit usuários por chamada.
+        Cada usuário reivindicado já tem o next_fire_at avançado para o próximo
+        disparo no seu fuso; retorna uma linha por subscription ativa (endpoint
+        NULL se não houver nenhuma), com fire_at (o horário que venceu).
         """
-        # Mapeamento de timezones para offsets
-        timezone_offsets = {
-            'America/Sao_Paulo': -3,
-            'America/Manaus': -4,
-            'America/Belem': -3,
-            'America/Fortaleza': -3,
-            'America/Recife': -3,
-            'America/Cuiaba': -4,
-            'America/Porto_Velho': -4,
-            'America/Rio_Branco': -5,
-            'America/Noronha': -2,
-            'UTC': 0,
-        }
-
         async with self.pool.acquire() as conn:
-            # Buscar usuários considerando conversão de timezone
-            rows = await conn.fetch(
-                """
-                WITH user_local_hours AS (
-                    SELECT
-                        unp.user_id,
-                        unp.timezone,
-                        unp.reminder_time,
-                        unp.reminder_days,
-                        EXTRACT(HOUR FROM unp.reminder_time) as reminder_hour,
-                        CASE
-                            WHEN unp.timezone = 'America/Sao_Paulo' THEN -3
-                            WHEN unp.timezone = 'America/Manaus' THEN -4
-                            WHEN unp.timezone = 'America/Belem' THEN -3
-                            WHEN unp.timezone = 'America/Fortaleza' THEN -3
-                            WHEN unp.timezone = 'America/Recife' THEN -3
-                            WHEN unp.timezone = 'America/Cuiaba' THEN -4
-                            WHEN unp.timezone = 'America/Porto_Velho' THEN -4
-                            WHEN unp.timezone = 'America/Rio_Branco' THEN -5
-                            WHEN unp.timezone = 'America/Noronha' THEN -2
-                            WHEN unp.timezone = 'UTC' THEN 0
-                            ELSE -3  -- Default: Brasilia
-                        END as tz_offset
-                    FROM user_notification_preferences unp
-                    WHERE unp.reminder_enabled = TRUE
-                    AND unp.push_enabled = TRUE
-                )
-                SELECT
-                    ulh.user_id,
-                    ulh.timezone,
-                    u.email,
-                    ps.endpoint,
-                    ps.p256dh,
-                    ps.auth
-                FROM user_local_hours ulh
-                JOIN users u ON u.id = ulh.user_id
-                JOIN push_subscriptions ps ON ps.user_id = ulh.user_id
-                WHERE ps.is_active = TRUE
-                AND ulh.reminder_days ? $2
-                -- Verifica se a hora UTC atual corresponde à hora local do lembrete
-                AND MOD(ulh.reminder_hour - ulh.tz_offset + 24, 24) = $1
-                -- Evita enviar mais de uma vez por dia
-                AND NOT EXISTS (
-                    SELECT 1 FROM notification_logs nl
-                    WHERE nl.user_id = ulh.user_id
-                    AND nl.notification_type = 'reminder'
-                    AND nl.sent_at > NOW() - INTERVAL '20 hours'
-                )
-                """,
-                utc_hour, day_of_week
-            )
+            rows = await conn.fetch(CLAIM_DUE_REMINDERS_QUERY, limit)
             return [dict(row) for row in rows]
 
     async def get_users_for_engagement(
         self,
         days_inactive: int = 3,
         limit: int = 100,
-        offset: int = 0
+        after: Optional[tuple] = None,
+        shard: int = 0,
+        shards: int = 1
     ) -> List[dict]:
         """
         Busca usuários inativos que devem receber notificação de engajamento.
-        Suporta paginação para processar em batches.
+        Paginação por keyset em (last_login, user_id): cada página continua do
+        índice de onde a anterior parou, sem refazer as linhas já vistas.
 
         Args:
             days_inactive: Dias minimos de inatividade (default 3)
             limit: Maximo de usuarios por pagina
-            offset: Offset para paginacao
+            after: (last_login, user_id) do último usuário da página anterior
+            shard/shards: Só os usuários desta fatia (hash do user_id)
         """
+        last_login, user_id = after or (ENGAGEMENT_FIRST_PAGE, UUID(int=0))
         async with self.pool.acquire() as conn:
             rows = await conn.fetch(
-                """
-                SELECT
-                    unp.user_id,
-                    u.email,
-                    u.last_login,
-                    ps.endpoint,
-                    ps.p256dh,
-                    ps.auth,
-                    unp.engagement_after_days,
-                    unp.timezone
-                FROM user_notification_preferences unp
-                JOIN users u ON u.id = unp.user_id
-                JOIN push_subscriptions ps ON ps.user_id = unp.user_id
-                WHERE unp.engagement_enabled = TRUE
-                AND unp.push_enabled = TRUE
-                AND ps.is_active = TRUE
-                AND u.last_login < NOW() - (COALESCE(unp.engagement_after_days, $1) || ' days')::INTERVAL
-                AND NOT EXISTS (
-                    SELECT 1 FROM notification_logs nl
-                    WHERE nl.user_id = unp.user_id
-                    AND nl.notification_type = 'engagement'
-                    AND nl.sent_at > NOW() - INTERVAL '7 days'
-                )
-                ORDER BY u.last_login ASC
-                LIMIT $2 OFFSET $3
-                """,
-                days_inactive, limit, offset
+                ENGAGEMENT_PAGE_QUERY, days_inactive, limit, last_login, user_id, shard, shards
             )
             return [dict(row) for row in rows]
 
@@ -2201,6 +2516,129 @@ class Database:
             )
             return dict(stats) if stats else {}
 
+    # ============================================
+    # TRIAL SESSIONS (visitantes sem conta)
+    # Compartilhadas entre workers; expiram por inatividade
+    # ============================================
+
+    async def get_trial_session(self, session_id: str) -> Optional[dict]:
+        """Sessão de visitante ainda válida (contador + últimas mensagens)"""
+        async with self.pool.acquire() as conn:
+            row = await conn.fetchrow(
+                """
+                SELECT messages_count, turns, ip
+                FROM trial_sessions
+                WHERE session_id = $1 AND expires_at > NOW()
+                """,
+                session_id
+            )
+            if not row:
+                return None
+            return {
+                "messages_count": row["messages_count"],
+                "turns": json.loads(row["turns"]) if row["turns"] else [],
+                "ip": row["ip"]
+            }
+
+    async def record_trial_turn(
+        self,
+        session_id: str,
+        ip: str,
+        turns: List[dict],
+        ttl_seconds: int,
+        max_turns: int,
+        limit: Optional[int] = None
+    ) -> Optional[int]:
+        """
+        Conta uma mensagem e acrescenta as trocas ao buffer circular
+        (mantém só as últimas max_turns) numa única instrução atômica.
+        Sessão expirada recomeça do zero. Retorna o novo contador, ou None
+        se a sessão já estava no limite (nada é gravado).
+        """
+        async with self.pool.acquire() as conn:
+            return await conn.fetchval(
+                """
+                INSERT INTO trial_sessions (session_id, ip, messages_count, turns, expires_at)
+                VALUES ($1, $2, 1, $3::jsonb, NOW() + make_interval(secs => $4))
+                ON CONFLICT (session_id) DO UPDATE SET
+                    ip = EXCLUDED.ip,
+                    messages_count = CASE
+                        WHEN trial_sessions.expires_at <= NOW() THEN 1
+                        ELSE trial_sessions.messages_count + 1
+                    END,
+                    turns = CASE
+                        WHEN trial_sessions.expires_at <= NOW() THEN EXCLUDED.turns
+                        ELSE (
+                            SELECT COALESCE(jsonb_agg(t.value ORDER BY t.idx), '[]'::jsonb)
+                            FROM jsonb_array_elements(trial_sessions.turns || EXCLUDED.turns)
+                                 WITH ORDINALITY AS t(value, idx)
+                            WHERE t.idx > jsonb_array_length(trial_sessions.turns || EXCLUDED.turns) - $5
+                        )
+                    END,
+                    expires_at = EXCLUDED.expires_at
+                WHERE $6::int IS NULL
+                   OR trial_sessions.expires_at <= NOW()
+                   OR trial_sessions.messages_count < $6
+                RETURNING messages_count
+                """,
+                session_id, ip, json.dumps(turns[-max_turns:]), float(ttl_seconds), max_turns, limit
+            )
+
+    async def purge_expired_trial_sessions(self) -> int:
+        """Remove sessões de visitantes expiradas (manutenção diária)"""
+        async with self.pool.acquire() as conn:
+            result = await conn.execute("DELETE FROM trial_sessions WHERE expires_at <= NOW()")
+            return int(result.split()[-1])
+
+    async def purge_notification_dedupe(self) -> int:
+        """Remove chaves de dedupe de campanhas com mais de 24h (manutenção diária)"""
+        async with self.pool.acquire() as conn:
+            result = await conn.execute(
+                "DELETE FROM notification_dedupe WHERE sent_at < NOW() - INTERVAL '24 hours'"
+            )
+            return int(result.split()[-1])
+
+    async def revoke_tokens(self, keys: List[Tuple[str, float]]):
+        """Grava revogações do logout (chave -> exp unix) para os outros workers"""
+        async with self.pool.acquire() as conn:
+            await conn.executemany(
+                """
+                INSERT INTO revoked_tokens (key, expires_at) VALUES ($1, $2)
+                ON CONFLICT (key) DO UPDATE SET expires_at = GREATEST(revoked_tokens.expires_at, EXCLUDED.expires_at)
+                """,
+                [(key, datetime.fromtimestamp(exp, tz=timezone.utc)) for key, exp in keys]
+            )
+
+    async def any_token_revoked(self, keys: List[str]) -> bool:
+        """Alguma das chaves (token ou sessão) foi revogada e ainda não expirou"""
+        async with self.pool.acquire() as conn:
+            return await conn.fetchval(
+                "SELECT EXISTS (SELECT 1 FROM revoked_tokens WHERE key = ANY($1::text[]) AND expires_at > NOW())",
+                keys
+            )
+
+    async def purge_revoked_tokens(self) -> int:
+        """Remove revogações de tokens que já expiraram (manutenção diária)"""
+        async with self.pool.acquire() as conn:
+            result = await conn.execute("DELETE FROM revoked_tokens WHERE expires_at <= NOW()")
+            return int(result.split()[-1])
+
+    async def purge_stripe_events(self) -> int:
+        """Remove eventos do Stripe processados há mais de 30 dias (o Stripe reentrega por até 3 dias)"""
+        async with self.pool.acquire() as conn:
+            result = await conn.execute(
+                "DELETE FROM stripe_events WHERE status = 'processed' AND processed_at < NOW() - INTERVAL '30 days'"
+            )
+            return int(result.split()[-1])
+
+    async def purge_scheduler_runs(self) -> int:
+        """Remove o registro de fatias do scheduler com mais de 7 dias (manutenção diária)"""
+        async with self.pool.acquire() as conn:
+            result = await conn.execute(
+                "DELETE FROM scheduler_runs WHERE created_at < NOW() - INTERVAL '7 days'"
+            )
+            return int(result.split()[-1])
+
 
 # ============================================
 # CONNECTION POOL
@@ -2209,10 +2647,13 @@ class Database:
 _pool: Optional[asyncpg.Pool] = None
 
 
-async def init_db():
-    """Inicializa pool de conexões e cria tabelas necessárias"""
+async def init_db(database_url: Optional[str] = None):
+    """Inicializa pool de conexões e cria tabelas necessárias (database_url: outro banco, ex. evals in-process)"""
     global _pool
-    _pool = await asyncpg.create_pool(DATABASE_URL, min_size=5, max_size=20)
+    _pool = await asyncpg.create_pool(
+        database_url or DATABASE_URL, min_size=5, max_size=20,
+        init=instrument_connection  # Tempo de cada query em /metrics
+    )
 
     # Criar tabelas de notificações se não existirem
     async with _pool.acquire() as conn:
@@ -2250,6 +2691,137 @@ async def init_db():
             )
         """)
 
+        # Timeline emocional (Layer 2) + rollups diários (ver migration 005)
+        try:
+            await conn.execute("""
+                CREATE TABLE IF NOT EXISTS emotional_timeline (
+                    id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+                    user_id UUID NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+                    conversation_id UUID REFERENCES conversations(id) ON DELETE SET NULL,
+                    emotion VARCHAR(50) NOT NULL,
+                    intensity DECIMAL(3,2) DEFAULT 0.5,
+                    confidence DECIMAL(3,2) DEFAULT 0.7,
+                    trigger_detected VARCHAR(100),
+                    themes JSONB DEFAULT '[]',
+                    day_of_week INTEGER,
+                    hour_of_day INTEGER,
+                    created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+                )
+            """)
+            await conn.execute("""
+                CREATE TABLE IF NOT EXISTS emotional_daily_rollups (
+                    user_id UUID NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+                    day DATE NOT NULL,
+                    emotion VARCHAR(50) NOT NULL,
+                    entry_count INTEGER NOT NULL DEFAULT 0,
+                    intensity_sum NUMERIC NOT NULL DEFAULT 0,
+                    intensity_sq_sum NUMERIC NOT NULL DEFAULT 0,
+                    hour_counts INTEGER[] NOT NULL DEFAULT array_fill(0, ARRAY[24]),
+                    trigger_counts JSONB NOT NULL DEFAULT '{}',
+                    updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+                    PRIMARY KEY (user_id, day, emotion)
+                )
+            """)
+            await conn.execute("CREATE INDEX IF NOT EXISTS idx_emotional_timeline_user_created ON emotional_timeline(user_id, created_at DESC)")
+            await conn.execute("CREATE INDEX IF NOT EXISTS idx_emotional_timeline_created_brin ON emotional_timeline USING BRIN (created_at)")
+            await conn.execute("CREATE INDEX IF NOT EXISTS idx_emotional_rollups_day ON emotional_daily_rollups(day DESC)")
+        except Exception as e:
+            print(f"[DB] Aviso ao criar timeline emocional: {e}")
+
+        # Aprendizado contínuo: eventos brutos + agregados por usuário (ver migration 006)
+        try:
+            await conn.execute("""
+                CREATE TABLE IF NOT EXISTS learning_interactions (
+                    id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+                    user_id UUID NOT NULL REFERENCES users(id),
+                    conversation_id UUID,
+                    strategy_used VARCHAR(50),
+                    emotion_before VARCHAR(30),
+                    emotion_after VARCHAR(30),
+                    response_time FLOAT,
+                    user_message_length INT,
+                    ai_response_length INT,
+                    feedback_type VARCHAR(30),
+                    created_at TIMESTAMP DEFAULT NOW()
+                )
+            """)
+            await conn.execute("""
+                CREATE TABLE IF NOT EXISTS learning_feedbacks (
+                    id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+                    user_id UUID NOT NULL REFERENCES users(id),
+                    feedback_type VARCHAR(50) NOT NULL,
+                    strategy_used VARCHAR(50),
+                    context TEXT,
+                    created_at TIMESTAMP DEFAULT NOW()
+                )
+            """)
+            await conn.execute("""
+                CREATE TABLE IF NOT EXISTS learning_user_stats (
+                    user_id UUID PRIMARY KEY REFERENCES users(id) ON DELETE CASCADE,
+                    interaction_count INTEGER NOT NULL DEFAULT 0,
+                    hour_counts INTEGER[] NOT NULL DEFAULT array_fill(0, ARRAY[24]),
+                    day_counts INTEGER[] NOT NULL DEFAULT array_fill(0, ARRAY[7]),
+                    emotion_by_day JSONB NOT NULL DEFAULT '{}',
+                    theme_counts JSONB NOT NULL DEFAULT '{}',
+                    last_strategy VARCHAR(50),
+                    last_interaction_at TIMESTAMP WITH TIME ZONE
+                )
+            """)
+            await conn.execute("""
+                CREATE TABLE IF NOT EXISTS learning_strategy_stats (
+                    user_id UUID NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+                    strategy VARCHAR(50) NOT NULL,
+                    positive_count INTEGER NOT NULL DEFAULT 0,
+                    negative_count INTEGER NOT NULL DEFAULT 0,
+                    total_count INTEGER NOT NULL DEFAULT 0,
+                    success_ema DOUBLE PRECISION NOT NULL DEFAULT 0.5,
+                    updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+                    PRIMARY KEY (user_id, strategy)
+                )
+            """)
+        except Exception as e:
+            print(f"[DB] Aviso ao criar tabelas de aprendizado: {e}")
+
+        # Sessões de visitantes (TRIAL_SESSION_BACKEND=postgres)
+        try:
+            await conn.execute("""
+                CREATE TABLE IF NOT EXISTS trial_sessions (
+                    session_id VARCHAR(128) PRIMARY KEY,
+                    ip VARCHAR(64),
+                    messages_count INTEGER NOT NULL DEFAULT 0,
+                    turns JSONB NOT NULL DEFAULT '[]',
+                    expires_at TIMESTAMP WITH TIME ZONE NOT NULL
+                )
+            """)
+            await conn.execute("""
+                CREATE INDEX IF NOT EXISTS idx_trial_sessions_expires
+                ON trial_sessions(expires_at)
+            """)
+        except Exception as e:
+            print(f"[DB] Aviso ao criar trial_sessions: {e}")
+
+        # Log de auditoria particionado por mês (instalações existentes: migration 008)
+        try:
+            await conn.execute("""
+                CREATE TABLE IF NOT EXISTS audit_log (
+                    id UUID NOT NULL DEFAULT gen_random_uuid(),
+                    user_id UUID REFERENCES users(id),
+                    action VARCHAR(100) NOT NULL,
+                    ip_address INET,
+                    user_agent TEXT,
+                    details JSONB,
+                    created_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW(),
+                    PRIMARY KEY (id, created_at)
+                ) PARTITION BY RANGE (created_at)
+            """)
+            await conn.execute("CREATE INDEX IF NOT EXISTS idx_audit_log_user ON audit_log(user_id)")
+            await conn.execute("CREATE INDEX IF NOT EXISTS idx_audit_log_created ON audit_log(created_at DESC)")
+            partitions = await Database(_pool).ensure_audit_partitions()
+            if partitions:
+                print(f"[DB] audit_log: {partitions} partições mensais criadas")
+        except Exception as e:
+            print(f"[DB] Aviso ao preparar audit_log: {e}")
+
         # Adicionar colunas de preferências no user_profiles se não existirem
         try:
             await conn.execute("""
@@ -2276,6 +2848,180 @@ async def init_db():
         except:
             pass
 
+        # Campanhas: destinatários como lista compacta + progresso por status (ver migration 009)
+        try:
+            await conn.execute("ALTER TABLE notifications ADD COLUMN IF NOT EXISTS recipient_ids UUID[]")
+            await conn.execute("""
+                CREATE INDEX IF NOT EXISTS idx_notification_deliveries_progress
+                ON notification_deliveries(notification_id, channel, status)
+            """)
+
+            # Worker de entregas: lease do lote, dedupe por chave e contadores por canal (ver migration 010)
+            await conn.execute("ALTER TABLE notification_deliveries ADD COLUMN IF NOT EXISTS claimed_at TIMESTAMP WITH TIME ZONE")
+            for column in ("push_sent", "push_failed", "email_sent", "email_failed"):
+                await conn.execute(f"ALTER TABLE notifications ADD COLUMN IF NOT EXISTS {column} INTEGER DEFAULT 0")
+            await conn.execute("""
+                CREATE INDEX IF NOT EXISTS idx_notification_deliveries_claim
+                ON notification_deliveries(created_at)
+                WHERE status IN ('pending', 'sending')
+            """)
+            await conn.execute("""
+                CREATE TABLE IF NOT EXISTS notification_dedupe (
+                    dedupe_key VARCHAR(100) PRIMARY KEY,
+                    sent_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW()
+                )
+            """)
+            await conn.execute("CREATE INDEX IF NOT EXISTS idx_notification_dedupe_sent ON notification_dedupe(sent_at)")
+            # Por último: falha se houver duplicatas antigas (a migration 010 remove antes)
+            await conn.execute("""
+                CREATE UNIQUE INDEX IF NOT EXISTS idx_notification_deliveries_unique
+                ON notification_deliveries(notification_id, user_id, channel)
+            """)
+        except Exception as e:
+            print(f"[DB] Aviso ao preparar campanhas: {e}")
+
+        # Lembretes: fuso IANA e próximo disparo em UTC pré-calculado (ver migration 012)
+        try:
+            await conn.execute("""
+                CREATE TABLE IF NOT EXISTS user_notification_preferences (
+                    id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+                    user_id UUID UNIQUE NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+                    push_enabled BOOLEAN DEFAULT TRUE,
+                    reminder_enabled BOOLEAN DEFAULT TRUE,
+                    reminder_time TIME DEFAULT '09:00:00',
+                    reminder_days JSONB DEFAULT '["mon","tue","wed","thu","fri","sat","sun"]',
+                    engagement_enabled BOOLEAN DEFAULT TRUE,
+                    engagement_after_days INTEGER DEFAULT 3,
+                    marketing_enabled BOOLEAN DEFAULT FALSE,
+                    timezone VARCHAR(50) DEFAULT 'America/Sao_Paulo',
+                    next_fire_at TIMESTAMP WITH TIME ZONE,
+                    created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+                    updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+                )
+            """)
+            await conn.execute(
+                "ALTER TABLE user_notification_preferences ADD COLUMN IF NOT EXISTS next_fire_at TIMESTAMP WITH TIME ZONE"
+            )
+            await conn.execute("""
+                CREATE INDEX IF NOT EXISTS idx_user_notification_preferences_next_fire
+                ON user_notification_preferences(next_fire_at)
+                WHERE reminder_enabled = TRUE AND push_enabled = TRUE
+            """)
+            await conn.execute(BACKFILL_NEXT_FIRE_AT_SQL)
+        except Exception as e:
+            print(f"[DB] Aviso ao preparar lembretes: {e}")
+
+        # Engajamento: tabelas antes criadas só no primeiro uso + índices do keyset (ver migration 013)
+        try:
+            await conn.execute("""
+                CREATE TABLE IF NOT EXISTS push_subscriptions (
+                    id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+                    user_id UUID NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+                    endpoint TEXT NOT NULL UNIQUE,
+                    p256dh TEXT NOT NULL,
+                    auth TEXT NOT NULL,
+                    user_agent TEXT,
+                    is_active BOOLEAN DEFAULT TRUE,
+                    created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+                    last_used_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+                )
+            """)
+            await conn.execute("""
+                CREATE TABLE IF NOT EXISTS notification_logs (
+                    id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+                    user_id UUID REFERENCES users(id) ON DELETE SET NULL,
+                    notification_type VARCHAR(50) NOT NULL,
+                    title VARCHAR(200),
+                    body TEXT,
+                    success BOOLEAN DEFAULT TRUE,
+                    error_message TEXT,
+                    sent_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+                )
+            """)
+            for ddl in ENGAGEMENT_INDEXES:
+                await conn.execute(ddl)
+        except Exception as e:
+            print(f"[DB] Aviso ao preparar engajamento: {e}")
+
+        # Scheduler em vários nós: fatias com lease e fila de retry persistente (ver migration 011)
+        try:
+            await conn.execute("""
+                CREATE TABLE IF NOT EXISTS scheduler_runs (
+                    job_name VARCHAR(50) NOT NULL,
+                    run_key VARCHAR(30) NOT NULL,
+                    shard INTEGER NOT NULL,
+                    owner VARCHAR(100) NOT NULL,
+                    lease_until TIMESTAMP WITH TIME ZONE NOT NULL,
+                    attempts INTEGER NOT NULL DEFAULT 1,
+                    processed INTEGER,
+                    finished_at TIMESTAMP WITH TIME ZONE,
+                    created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+                    PRIMARY KEY (job_name, run_key, shard)
+                )
+            """)
+            await conn.execute("CREATE INDEX IF NOT EXISTS idx_scheduler_runs_created ON scheduler_runs(created_at)")
+            await conn.execute("""
+                CREATE TABLE IF NOT EXISTS notification_retry_queue (
+                    id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+                    user_id UUID REFERENCES users(id) ON DELETE CASCADE,
+                    notification_type VARCHAR(50) NOT NULL,
+                    subscription_info JSONB NOT NULL,
+                    title VARCHAR(200),
+                    body TEXT,
+                    url VARCHAR(500),
+                    retry_count INTEGER NOT NULL DEFAULT 1,
+                    retry_at TIMESTAMP WITH TIME ZONE NOT NULL,
+                    created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+                )
+            """)
+            await conn.execute("""
+                CREATE INDEX IF NOT EXISTS idx_notification_retry_queue_retry_at
+                ON notification_retry_queue(retry_at)
+            """)
+        except Exception as e:
+            print(f"[DB] Aviso ao preparar scheduler: {e}")
+
+        # Logout: revogações de token/sessão visíveis para todos os workers (ver migration 015)
+        try:
+            await conn.execute("""
+                CREATE TABLE IF NOT EXISTS revoked_tokens (
+                    key VARCHAR(100) PRIMARY KEY,
+                    expires_at TIMESTAMP WITH TIME ZONE NOT NULL
+                )
+            """)
+            await conn.execute("CREATE INDEX IF NOT EXISTS idx_revoked_tokens_expires ON revoked_tokens(expires_at)")
+        except Exception as e:
+            print(f"[DB] Aviso ao preparar revogação de tokens: {e}")
+
+        # Webhook do Stripe: eventos idempotentes pelo id, processados pelo worker (ver migration 014)
+        try:
+            await conn.execute("""
+                CREATE TABLE IF NOT EXISTS stripe_events (
+                    id VARCHAR(255) PRIMARY KEY,
+                    type VARCHAR(100) NOT NULL,
+                    payload JSONB NOT NULL,
+                    status VARCHAR(20) NOT NULL DEFAULT 'pending',
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    last_error TEXT,
+                    stripe_created TIMESTAMP WITH TIME ZONE NOT NULL,
+                    received_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+                    claimed_at TIMESTAMP WITH TIME ZONE,
+                    processed_at TIMESTAMP WITH TIME ZONE
+                )
+            """)
+            await conn.execute("""
+                CREATE INDEX IF NOT EXISTS idx_stripe_events_claim
+                ON stripe_events(stripe_created)
+                WHERE status IN ('pending', 'processing')
+            """)
+            await conn.execute("""
+                CREATE INDEX IF NOT EXISTS idx_stripe_events_processed
+                ON stripe_events(processed_at)
+                WHERE status = 'processed'
+            """)
+        except Exception as e:
+            print(f"[DB] Aviso ao preparar eventos do Stripe: {e}")
+
         # Adicionar colunas de idioma/voz se não existirem
         try:
             await conn.execute("""
@@ -2313,6 +3059,9 @@ async def init_db():
             print(f"[DB] Aviso ao atualizar configs: {e}")
 
     print("[DB] Tabelas de notificações verificadas/criadas")
+
+    # Auditoria em lote (flush periódico e no close_db)
+    audit_writer.start(_pool)
     return _pool
 
 
@@ -2320,6 +3069,7 @@ async def close_db():
     """Fecha pool de conexões"""
     global _pool
     if _pool:
+        await audit_writer.stop()  # Grava eventos de auditoria pendentes antes de fechar
         await _pool.close()
 
 
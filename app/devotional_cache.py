@@ -0,0 +1,185 @@
+"""
+AiSyster - Cache de Devocionais
+Devocional do dia pré-renderizado (JSON + ETag) servido da memória e cache
+dos devocionais gerados pela IA por dia/tema/idioma, compartilhado entre usuários
+"""
+
+import re
+import json
+import asyncio
+import hashlib
+from collections import OrderedDict
+from datetime import date, datetime, timedelta
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+from app.config import DEVOTIONAL_CACHE_MAX_ENTRIES
+
+
+DEFAULT_TEMA = "esperança e fé no dia a dia"
+DEVOTIONAL_LANGUAGES = ("pt",)  # Conteúdo fixo só existe em português; outros idiomas caem no pt
+
+
+def seconds_until_midnight(now: Optional[datetime] = None) -> int:
+    """Validade do devocional do dia (troca à meia-noite do servidor)"""
+    now = now or datetime.now()
+    midnight = datetime.combine(now.date() + timedelta(days=1), datetime.min.time())
+    return max(60, int((midnight - now).total_seconds()))
+
+
+def make_etag(body: bytes) -> str:
+    return '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """If-None-Match pode ter vários ETags, prefixo W/ ou *"""
+    if not if_none_match:
+        return False
+    candidates = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+    return "*" in candidates or etag in candidates
+
+
+# ============================================
+# DEVOCIONAL DO DIA
+# ============================================
+
+class RenderedDevotional:
+    """Payload pronto para a resposta: corpo JSON, ETag e dia de referência"""
+
+    __slots__ = ("day", "devotional", "body", "etag")
+
+    def __init__(self, day: date, devotional: dict, body: bytes):
+        self.day = day
+        self.devotional = devotional
+        self.body = body
+        self.etag = make_etag(body)
+
+    def headers(self, now: Optional[datetime] = None) -> Dict[str, str]:
+        # private: a rota é autenticada (CDN/proxy compartilhado não guarda).
+        # Sem Accept-Language no Vary enquanto a rota só servir pt
+        return {
+            "ETag": self.etag,
+            "Cache-Control": f"private, max-age={seconds_until_midnight(now)}",
+            "Vary": "Authorization"
+        }
+
+
+class DevotionalStore:
+    """
+    Devocionais do dia renderizados uma vez por dia e idioma.
+
+    refresh() roda no startup; get() reconstrói sozinho na virada do dia
+    (custo de uma serialização por idioma), então nenhum request monta a resposta.
+    """
+
+    def __init__(self, devotionals: List[dict], clock: Callable[[], date] = date.today):
+        self.devotionals = devotionals
+        self.clock = clock
+        self._rendered: Dict[str, RenderedDevotional] = {}
+        self._day: Optional[date] = None
+
+    def pick(self, day: date) -> dict:
+        """Rotação pelo dia do ano (mesma regra de sempre)"""
+        return self.devotionals[day.timetuple().tm_yday % len(self.devotionals)]
+
+    def refresh(self, day: Optional[date] = None):
+        day = day or self.clock()
+        devotional = self.pick(day)
+        rendered = {}
+        for language in DEVOTIONAL_LANGUAGES:
+            body = json.dumps(
+                {"date": day.isoformat(), **{k: devotional[k] for k in ("versiculo", "referencia", "meditacao", "oracao")}},
+                ensure_ascii=False
+            ).encode("utf-8")
+            rendered[language] = RenderedDevotional(day, devotional, body)
+        self._rendered = rendered
+        self._day = day
+
+    def get(self, language: str = "pt") -> RenderedDevotional:
+        if self._day != self.clock():
+            self.refresh()
+        return self._rendered.get(language) or self._rendered[DEVOTIONAL_LANGUAGES[0]]
+
+
+# ============================================
+# DEVOCIONAIS GERADOS (premium)
+# ============================================
+
+def normalize_tema(tema: Optional[str]) -> str:
+    """Mesma chave para "Ansiedade", " ansiedade " e "ANSIEDADE" """
+    tema = re.sub(r"\s+", " ", (tema or "").strip().lower())[:100]
+    return tema or DEFAULT_TEMA
+
+
+class GeneratedDevotionalCache:
+    """
+    LRU de devocionais gerados, chave (dia, tema normalizado, idioma).
+
+    Requests concorrentes do mesmo tema esperam a mesma geração (uma chamada
+    ao LLM); entradas de dias anteriores saem na primeira escrita do dia.
+    O devocional padrão (marcado "fallback") não é guardado: o próximo
+    request tenta o LLM de novo.
+    """
+
+    def __init__(self, max_entries: int = DEVOTIONAL_CACHE_MAX_ENTRIES, clock: Callable[[], date] = date.today):
+        self.max_entries = max_entries
+        self.clock = clock
+        self._entries: "OrderedDict[Tuple[str, str, str], dict]" = OrderedDict()
+        self._inflight: Dict[Tuple[str, str, str], asyncio.Future] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def key(self, tema: Optional[str], language: str = "pt") -> Tuple[str, str, str]:
+        return (self.clock().isoformat(), normalize_tema(tema), language)
+
+    def _put(self, key: Tuple[str, str, str], devotional: dict):
+        today = key[0]
+        for old in [k for k in self._entries if k[0] != today]:
+            del self._entries[old]
+        self._entries[key] = devotional
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def get_or_create(
+        self,
+        tema: Optional[str],
+        generate: Callable[[str], Awaitable[dict]],
+        language: str = "pt"
+    ) -> dict:
+        key = self.key(tema, language)
+        cached = self._entries.get(key)
+        if cached is not None:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return cached
+
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            self.hits += 1
+            return await asyncio.shield(inflight)
+
+        self.misses += 1
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            devotional = await generate(key[1])
+            if not devotional.get("fallback"):
+                self._put(key, devotional)
+            future.set_result(devotional)
+            return devotional
+        except BaseException as e:
+            future.set_exception(e)
+            future.exception()  # Evita "exception was never retrieved" sem outros esperando
+            raise
+        finally:
+            del self._inflight[key]
+
+    def get_stats(self) -> dict:
+        return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+# Instância global
+generated_devotional_cache = GeneratedDevotionalCache()
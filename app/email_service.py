@@ -4,9 +4,25 @@ Usa Resend para envio de emails transacionais
 Com suporte a i18n (PT, EN, ES)
 """
 
+import random
+import asyncio
+import importlib.util
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+
 import httpx
-from typing import Optional
-from app.config import RESEND_API_KEY, EMAIL_FROM, EMAIL_REPLY_TO, APP_URL, APP_NAME
+from app.config import (
+    RESEND_API_KEY, EMAIL_FROM, EMAIL_REPLY_TO, APP_URL, APP_NAME,
+    EMAIL_MAX_CONCURRENCY, EMAIL_MAX_RETRIES, EMAIL_RATE_LIMIT, EMAIL_BATCH_SIZE
+)
+
+# HTTP/2 só com o pacote h2 instalado (httpx[http2]); sem ele, HTTP/1.1 com keep-alive
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+MAX_BACKOFF_SECONDS = 30.0
+MIN_INTERVAL_SECONDS = 0.05  # Primeiro 429 sem rate_limit configurado: no máximo 20 requests/s
+MAX_INTERVAL_SECONDS = 2.0
 
 
 # ============================================
@@ -176,14 +192,183 @@ def get_email_text(key: str, language: str = "pt", **kwargs) -> str:
     return text
 
 
+_CONTENT_SLOT = "\x00CONTENT\x00"
+
+
+@lru_cache(maxsize=None)
+def _base_template_parts(language: str) -> Tuple[str, str]:
+    """Moldura do email (header/footer traduzidos) montada uma vez por idioma"""
+    # Logo via URL publica para melhor compatibilidade com clientes de email
+    logo_url = f"{APP_URL}/static/icons/logo-email-v7.png"
+    tagline = get_email_text("tagline", language)
+    sent_by = get_email_text("sent_by", language)
+
+    html = f"""
+    <!DOCTYPE html>
+    <html>
+    <head>
+        <meta charset="utf-8">
+        <meta name="viewport" content="width=device-width, initial-scale=1.0">
+        <title>{APP_NAME}</title>
+    </head>
+    <body style="margin: 0; padding: 0; font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif; background-color: #f5f5f5;">
+        <table width="100%" cellpadding="0" cellspacing="0" style="background-color: #f5f5f5; padding: 40px 20px;">
+            <tr>
+                <td align="center">
+                    <table width="600" cellpadding="0" cellspacing="0" style="background-color: #ffffff; border-radius: 12px; overflow: hidden; box-shadow: 0 4px 6px rgba(0,0,0,0.1);">
+                        <!-- Header -->
+                        <tr>
+                            <td style="background-color: #1a1a3e; padding: 20px 30px; text-align: center;">
+                                <img src="{logo_url}" alt="AiSyster" style="max-width: 200px; height: auto; margin-bottom: 4px;">
+                                <p style="margin: 0; color: #d4af37; font-size: 14px; font-style: italic;">{tagline}</p>
+                            </td>
+                        </tr>
+                        <!-- Content -->
+                        <tr>
+                            <td style="padding: 40px 30px;">
+                                {_CONTENT_SLOT}
+                            </td>
+                        </tr>
+                        <!-- Footer -->
+                        <tr>
+                            <td style="background-color: #f8f9fa; padding: 24px 30px; text-align: center; border-top: 1px solid #e9ecef;">
+                                <p style="margin: 0 0 8px 0; color: #6c757d; font-size: 12px;">
+                                    {sent_by} {APP_NAME}
+                                </p>
+                                <p style="margin: 0; color: #6c757d; font-size: 12px;">
+                                    <a href="{APP_URL}" style="color: #d4af37; text-decoration: none;">aisyster.com</a>
+                                </p>
+                            </td>
+                        </tr>
+                    </table>
+                </td>
+            </tr>
+        </table>
+    </body>
+    </html>
+    """
+    head, _, tail = html.partition(_CONTENT_SLOT)
+    return head, tail
+
+
 class EmailService:
-    """Servico de envio de emails via Resend"""
+    """
+    Servico de envio de emails via Resend.
+
+    Um cliente HTTP por processo (conexões reaproveitadas, HTTP/2 se disponível),
+    no máximo EMAIL_MAX_CONCURRENCY requests simultâneos, ritmo de EMAIL_RATE_LIMIT
+    requests/s e retentativa com backoff em 429/5xx. Um 429 pausa todos os envios
+    do processo pelo Retry-After. Campanhas usam /emails/batch (100 por chamada).
+    """
 
     def __init__(self):
         self.api_key = RESEND_API_KEY
         self.base_url = "https://api.resend.com"
         self.from_email = EMAIL_FROM
         self.reply_to = EMAIL_REPLY_TO
+        self.max_concurrency = EMAIL_MAX_CONCURRENCY
+        self.max_retries = EMAIL_MAX_RETRIES
+        self.rate_limit = EMAIL_RATE_LIMIT
+        self.batch_size = EMAIL_BATCH_SIZE
+        self._client: Optional[httpx.AsyncClient] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._next_slot = 0.0  # Próximo horário (loop.time) liberado pelo limitador
+        self._cooldown_until = 0.0  # Pausa global após 429
+        self._interval = 0.0  # Intervalo atual entre requests (cresce com 429, volta ao do rate_limit)
+
+    def _get_client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                http2=HTTP2_AVAILABLE,
+                timeout=httpx.Timeout(15.0, connect=5.0),
+                limits=httpx.Limits(
+                    max_connections=self.max_concurrency,
+                    max_keepalive_connections=self.max_concurrency
+                ),
+                headers={"Authorization": f"Bearer {self.api_key}"}
+            )
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._client
+
+    async def close(self):
+        """Fecha o cliente HTTP (shutdown do app)"""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+            self._semaphore = None
+
+    def _retry_delay(self, response: Optional[httpx.Response], attempt: int) -> float:
+        """Retry-After do provedor quando houver; senão backoff exponencial com jitter"""
+        if response is not None:
+            retry_after = response.headers.get("retry-after")
+            if retry_after:
+                try:
+                    return min(MAX_BACKOFF_SECONDS, max(0.0, float(retry_after)))
+                except ValueError:
+                    pass
+        return min(MAX_BACKOFF_SECONDS, 0.5 * (2 ** attempt)) * (0.5 + random.random() / 2)
+
+    @property
+    def _base_interval(self) -> float:
+        return 1.0 / self.rate_limit if self.rate_limit > 0 else 0.0
+
+    async def _wait_turn(self):
+        """Espaça os requests pelo intervalo atual e respeita a pausa de um 429"""
+        loop = asyncio.get_running_loop()
+        while True:
+            now = loop.time()
+            slot = max(now, self._cooldown_until, self._next_slot)
+            if slot <= now:
+                break
+            # Reavalia ao acordar: um 429 no meio da espera estende a pausa
+            await asyncio.sleep(slot - now)
+        self._next_slot = now + max(self._interval, self._base_interval)
+
+    def _on_rate_limited(self, delay: float):
+        """429: pausa todos os envios do processo e dobra o intervalo entre requests"""
+        loop_time = asyncio.get_running_loop().time()
+        self._cooldown_until = max(self._cooldown_until, loop_time + delay)
+        self._interval = min(MAX_INTERVAL_SECONDS, max(self._interval * 2, self._base_interval, MIN_INTERVAL_SECONDS))
+
+    def _on_success(self):
+        """Sem 429: volta aos poucos para o ritmo configurado"""
+        if self._interval > self._base_interval:
+            self._interval = max(self._base_interval, self._interval * 0.8)
+
+    async def _post(self, path: str, payload) -> Optional[httpx.Response]:
+        """POST com ritmo/concorrência limitados e retentativa; None se a rede falhou em todas"""
+        client = self._get_client()
+        response = None
+        for attempt in range(self.max_retries + 1):
+            await self._wait_turn()
+            try:
+                async with self._semaphore:
+                    response = await client.post(path, json=payload)
+                if response.status_code not in RETRYABLE_STATUS:
+                    self._on_success()
+                    return response
+            except httpx.TransportError as e:
+                response = None
+                print(f"[EMAIL] Erro de rede ({type(e).__name__}), tentativa {attempt + 1}")
+            if attempt < self.max_retries:
+                delay = self._retry_delay(response, attempt)
+                if response is not None and response.status_code == 429:
+                    # Limite do provedor é por conta: freia todos os envios, não só este
+                    self._on_rate_limited(delay)
+                else:
+                    await asyncio.sleep(delay)
+        return response
+
+    def _payload(self, to: str, subject: str, html: str, text: Optional[str] = None) -> dict:
+        return {
+            "from": self.from_email,
+            "to": [to],
+            "subject": subject,
+            "html": html,
+            "text": text or "",
+            "reply_to": self.reply_to
+        }
 
     async def send_email(
         self,
@@ -198,89 +383,54 @@ class EmailService:
             return False
 
         try:
-            async with httpx.AsyncClient() as client:
-                response = await client.post(
-                    f"{self.base_url}/emails",
-                    headers={
-                        "Authorization": f"Bearer {self.api_key}",
-                        "Content-Type": "application/json"
-                    },
-                    json={
-                        "from": self.from_email,
-                        "to": [to],
-                        "subject": subject,
-                        "html": html,
-                        "text": text or "",
-                        "reply_to": self.reply_to
-                    }
-                )
-
-                if response.status_code == 200:
-                    print(f"[EMAIL] Enviado com sucesso para {to}")
-                    return True
-                else:
-                    print(f"[EMAIL] Erro ao enviar: {response.status_code} - {response.text}")
-                    return False
+            response = await self._post("/emails", self._payload(to, subject, html, text))
+            if response is not None and response.status_code == 200:
+                print(f"[EMAIL] Enviado com sucesso para {to}")
+                return True
+            if response is not None:
+                print(f"[EMAIL] Erro ao enviar: {response.status_code} - {response.text}")
+            return False
 
         except Exception as e:
             print(f"[EMAIL] Excecao ao enviar: {e}")
             return False
 
+    async def send_batch(self, messages: List[dict]) -> List[bool]:
+        """
+        Envia vários emails pelo /emails/batch (até batch_size por chamada, lotes em paralelo
+        dentro do limite de concorrência). Retorna o resultado de cada mensagem, na ordem.
+        """
+        if not self.api_key:
+            print("[EMAIL] API Key nao configurada - emails nao enviados")
+            return [False] * len(messages)
+
+        chunks = [messages[i:i + self.batch_size] for i in range(0, len(messages), self.batch_size)]
+
+        async def send_chunk(chunk: List[dict]) -> List[bool]:
+            try:
+                response = await self._post("/emails/batch", chunk)
+            except Exception as e:
+                print(f"[EMAIL] Excecao no lote: {e}")
+                return [False] * len(chunk)
+            if response is not None and response.status_code == 200:
+                return [True] * len(chunk)
+            if response is not None:
+                print(f"[EMAIL] Erro no lote de {len(chunk)}: {response.status_code} - {response.text[:200]}")
+            return [False] * len(chunk)
+
+        results = await asyncio.gather(*(send_chunk(chunk) for chunk in chunks))
+        sent = [ok for chunk_results in results for ok in chunk_results]
+        print(f"[EMAIL] Lote: {sum(sent)}/{len(sent)} enviados em {len(chunks)} chamadas")
+        return sent
+
     # ============================================
     # TEMPLATES DE EMAIL
     # ============================================
 
     def _base_template(self, content: str, language: str = "pt") -> str:
-        """Template base para todos os emails com suporte a i18n"""
-        # Logo via URL publica para melhor compatibilidade com clientes de email
-        logo_url = f"{APP_URL}/static/icons/logo-email-v7.png"
-        tagline = get_email_text("tagline", language)
-        sent_by = get_email_text("sent_by", language)
-
-        return f"""
-        <!DOCTYPE html>
-        <html>
-        <head>
-            <meta charset="utf-8">
-            <meta name="viewport" content="width=device-width, initial-scale=1.0">
-            <title>{APP_NAME}</title>
-        </head>
-        <body style="margin: 0; padding: 0; font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif; background-color: #f5f5f5;">
-            <table width="100%" cellpadding="0" cellspacing="0" style="background-color: #f5f5f5; padding: 40px 20px;">
-                <tr>
-                    <td align="center">
-                        <table width="600" cellpadding="0" cellspacing="0" style="background-color: #ffffff; border-radius: 12px; overflow: hidden; box-shadow: 0 4px 6px rgba(0,0,0,0.1);">
-                            <!-- Header -->
-                            <tr>
-                                <td style="background-color: #1a1a3e; padding: 20px 30px; text-align: center;">
-                                    <img src="{logo_url}" alt="AiSyster" style="max-width: 200px; height: auto; margin-bottom: 4px;">
-                                    <p style="margin: 0; color: #d4af37; font-size: 14px; font-style: italic;">{tagline}</p>
-                                </td>
-                            </tr>
-                            <!-- Content -->
-                            <tr>
-                                <td style="padding: 40px 30px;">
-                                    {content}
-                                </td>
-                            </tr>
-                            <!-- Footer -->
-                            <tr>
-                                <td style="background-color: #f8f9fa; padding: 24px 30px; text-align: center; border-top: 1px solid #e9ecef;">
-                                    <p style="margin: 0 0 8px 0; color: #6c757d; font-size: 12px;">
-                                        {sent_by} {APP_NAME}
-                                    </p>
-                                    <p style="margin: 0; color: #6c757d; font-size: 12px;">
-                                        <a href="{APP_URL}" style="color: #d4af37; text-decoration: none;">aisyster.com</a>
-                                    </p>
-                                </td>
-                            </tr>
-                        </table>
-                    </td>
-                </tr>
-            </table>
-        </body>
-        </html>
-        """
+        """Template base para todos os emails com suporte a i18n (moldura cacheada por idioma)"""
+        head, tail = _base_template_parts(language if language in EMAIL_TRANSLATIONS else "pt")
+        return head + content + tail
 
     async def send_welcome_email(self, to: str, nome: str, language: str = "pt") -> bool:
         """Email de boas-vindas ao se registrar"""
@@ -477,9 +627,33 @@ class EmailService:
 
     async def send_notification_email(self, to: str, nome: str, title: str, message: str, language: str = "pt") -> bool:
         """Email de notificacao/comunicado do AiSyster"""
-        t = lambda key, **kw: get_email_text(key, language, **kw)
+        return await self.send_email(
+            to=to,
+            subject=f"{title} - {APP_NAME}",
+            html=self._notification_html(title, message, language)
+        )
 
-        content = f"""
+    async def send_notification_batch(self, recipients: List[Dict[str, str]], title: str, message: str) -> List[bool]:
+        """
+        Comunicado de campanha para vários destinatários ({"to", "language"}) via /emails/batch.
+        O HTML é o mesmo para todos do mesmo idioma, então é montado uma vez por idioma.
+        """
+        subject = f"{title} - {APP_NAME}"
+        return await self.send_batch([
+            self._payload(r["to"], subject, self._notification_html(title, message, r.get("language") or "pt"))
+            for r in recipients
+        ])
+
+    def _notification_html(self, title: str, message: str, language: str) -> str:
+        return _notification_html(title, message, language if language in EMAIL_TRANSLATIONS else "pt")
+
+
+@lru_cache(maxsize=64)
+def _notification_html(title: str, message: str, language: str) -> str:
+    """Corpo do comunicado (não depende do destinatário): cacheado por campanha e idioma"""
+    t = lambda key, **kw: get_email_text(key, language, **kw)
+
+    content = f"""
         <h2 style="margin: 0 0 20px 0; color: #1a1a2e; font-size: 24px;">{title}</h2>
 
         <p style="margin: 0 0 24px 0; color: #4a4a4a; font-size: 16px; line-height: 1.6;">
@@ -496,12 +670,8 @@ class EmailService:
             {t("notification_footer")}
         </p>
         """
-
-        return await self.send_email(
-            to=to,
-            subject=f"{title} - {APP_NAME}",
-            html=self._base_template(content, language)
-        )
+    head, tail = _base_template_parts(language)
+    return head + content + tail
 
 
 # Instancia global
@@ -0,0 +1,164 @@
+"""
+AiSyster - Serviço de Imagens
+Pré-processa imagens enviadas no chat antes de irem para o Claude:
+reduz ao limite útil do modelo, remove metadados e re-encoda
+"""
+
+import io
+import math
+import base64
+import asyncio
+import hashlib
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+from PIL import Image, ImageOps
+
+from app.config import IMAGE_JPEG_QUALITY, IMAGE_CACHE_MAX_BYTES
+from app.pdf_service import MAX_IMAGE_EDGE, PIXELS_PER_TOKEN
+
+
+# Configurações
+MAX_IMAGE_PIXELS = 1_150_000  # ~1.15 megapixels: acima disso o Claude reduz a imagem (≈1600 tokens)
+MAX_DECODE_PIXELS = 80_000_000  # Proteção contra "decompression bomb"
+
+
+def estimate_image_tokens(width: int, height: int) -> int:
+    """Tokens aproximados que o Claude cobra pela imagem (após o redimensionamento dele)"""
+    scale = min(1.0, MAX_IMAGE_EDGE / max(width, height, 1), math.sqrt(MAX_IMAGE_PIXELS / max(width * height, 1)))
+    return int((width * scale) * (height * scale) / PIXELS_PER_TOKEN)
+
+
+def target_size(width: int, height: int) -> Tuple[int, int]:
+    """Maior tamanho que cabe no lado máximo e no limite de pixels, mantendo proporção"""
+    scale = min(1.0, MAX_IMAGE_EDGE / max(width, height, 1), math.sqrt(MAX_IMAGE_PIXELS / max(width * height, 1)))
+    return max(1, int(width * scale)), max(1, int(height * scale))
+
+
+def _has_alpha(img: Image.Image) -> bool:
+    return img.mode in ("RGBA", "LA") or (img.mode == "P" and "transparency" in img.info)
+
+
+def _preprocess_sync(image_bytes: bytes) -> dict:
+    """Decodifica, corrige orientação, reduz e re-encoda (executado fora do event loop)"""
+    try:
+        img = Image.open(io.BytesIO(image_bytes))
+        original_size = img.size
+        if original_size[0] * original_size[1] > MAX_DECODE_PIXELS:
+            raise ValueError("Imagem com resolução grande demais.")
+
+        # JPEG: decodifica já reduzido (DCT em escala 1/2, 1/4, 1/8) - bem mais rápido
+        img.draft("RGB", target_size(*original_size))
+        img.seek(0)  # GIF/WebP animado: só o primeiro quadro (o modelo só vê esse)
+        img = ImageOps.exif_transpose(img)  # Aplica rotação do EXIF antes de descartá-lo
+        size = target_size(*img.size)
+        if img.size != size:
+            img = img.resize(size, Image.LANCZOS, reducing_gap=3.0)
+    except ValueError:
+        raise
+    except Exception as e:
+        raise ValueError(f"Imagem inválida ou corrompida: {str(e)}")
+
+    # Re-encodar sem metadados (EXIF, GPS, perfis): só os pixels vão para o modelo
+    buffer = io.BytesIO()
+    if _has_alpha(img):
+        # Transparência: WebP com alpha (PNG de foto/ilustração fica grande e lento de comprimir)
+        img.convert("RGBA").save(buffer, format="WEBP", quality=IMAGE_JPEG_QUALITY, method=2)
+        media_type = "image/webp"
+    else:
+        img.convert("RGB").save(buffer, format="JPEG", quality=IMAGE_JPEG_QUALITY)
+        media_type = "image/jpeg"
+
+    return {
+        "data": base64.b64encode(buffer.getvalue()).decode("utf-8"),
+        "media_type": media_type,
+        "width": img.size[0],
+        "height": img.size[1],
+        "original_width": original_size[0],
+        "original_height": original_size[1],
+        "original_bytes": len(image_bytes),
+        "bytes": buffer.tell(),
+        "tokens": estimate_image_tokens(*img.size),
+        "cached": False
+    }
+
+
+# ============================================
+# CACHE POR CONTEÚDO
+# ============================================
+
+class ImageCache:
+    """LRU em memória (limitado por bytes): sha256 da imagem -> imagem processada"""
+
+    def __init__(self, max_bytes: int = IMAGE_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, dict]" = OrderedDict()
+        self._total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> Optional[dict]:
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return dict(entry, cached=True)
+
+    def put(self, key: str, result: dict):
+        size = len(result["data"])
+        if size > self.max_bytes:
+            return
+        if key in self._entries:
+            self._total_bytes -= len(self._entries.pop(key)["data"])
+        self._entries[key] = result
+        self._total_bytes += size
+        while self._total_bytes > self.max_bytes and self._entries:
+            _, evicted = self._entries.popitem(last=False)
+            self._total_bytes -= len(evicted["data"])
+
+    def clear(self):
+        self._entries.clear()
+        self._total_bytes = 0
+
+    def get_stats(self) -> dict:
+        return {
+            "entries": len(self._entries),
+            "total_bytes": self._total_bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses
+        }
+
+
+# Instância global
+image_cache = ImageCache()
+
+
+# ============================================
+# API
+# ============================================
+
+async def preprocess_image(image_bytes: bytes) -> dict:
+    """
+    Prepara a imagem para o Claude fora do event loop.
+
+    Pillow libera o GIL na decodificação/redimensionamento, então uma thread
+    basta (evita copiar até 20MB para outro processo como no PDF).
+
+    Returns:
+        {"data" (base64), "media_type", "width", "height", "original_width",
+         "original_height", "original_bytes", "bytes", "tokens", "cached"}
+
+    Raises:
+        ValueError: Se a imagem for inválida
+    """
+    key = hashlib.sha256(image_bytes).hexdigest()
+    cached = image_cache.get(key)
+    if cached is not None:
+        return cached
+
+    result = await asyncio.to_thread(_preprocess_sync, image_bytes)
+    image_cache.put(key, result)
+    return result
@@ -10,6 +10,10 @@ import json
 import asyncio
 
 
+# Nomes dos dias na ordem de datetime.weekday() (mesmas chaves de strftime("%A"))
+WEEKDAY_NAMES = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
+
+
 # ============================================
 # TIPOS DE FEEDBACK
 # ============================================
@@ -144,7 +148,8 @@ class LearningEngine:
         strategy_used: ResponseStrategy,
         emotion_before: str,
         emotion_after: str,
-        response_time: float
+        response_time: float,
+        themes: List[str] = None
     ):
         """
         Registra uma interação para aprendizado
@@ -158,6 +163,7 @@ class LearningEngine:
             "emotion_before": emotion_before,
             "emotion_after": emotion_after,
             "response_time": response_time,
+            "themes": themes or [],
             "timestamp": datetime.utcnow().isoformat()
         }
 
@@ -270,66 +276,31 @@ class LearningEngine:
 
     async def detect_patterns(self, user_id: str) -> Dict:
         """
-        Detecta padrões de comportamento do usuário
+        Detecta padrões de comportamento do usuário.
+        Lê os agregados mantidos a cada interação (uma linha por usuário).
         """
-        # Buscar histórico de interações
-        interactions = await self._get_interaction_history(user_id, days=30)
+        stats = await self._get_learning_aggregates(user_id)
 
-        if len(interactions) < 5:
+        if not stats or stats.get("interaction_count", 0) < 5:
             return {}
 
         patterns = {}
 
         # Padrão de horário
-        hours = {}
-        for i in interactions:
-            # Usar created_at do banco (pode ser datetime ou string)
-            ts = i.get("created_at") or i.get("timestamp")
-            if ts:
-                if isinstance(ts, str):
-                    ts = datetime.fromisoformat(ts)
-                hours[ts.hour] = hours.get(ts.hour, 0) + 1
-
-        if hours:
-            peak_hour = max(hours, key=hours.get)
-            patterns["peak_activity_hour"] = peak_hour
+        hours = stats.get("hour_counts") or []
+        if any(hours):
+            patterns["peak_activity_hour"] = hours.index(max(hours))
 
         # Padrão de dias da semana
-        days = {}
-        for i in interactions:
-            ts = i.get("created_at") or i.get("timestamp")
-            if ts:
-                if isinstance(ts, str):
-                    ts = datetime.fromisoformat(ts)
-                day = ts.strftime("%A")
-                days[day] = days.get(day, 0) + 1
-
-        if days:
-            peak_day = max(days, key=days.get)
-            patterns["peak_activity_day"] = peak_day
-
-        # Padrão emocional por dia da semana
-        emotional_patterns = {}
-        for i in interactions:
-            ts = i.get("created_at") or i.get("timestamp")
-            if ts:
-                if isinstance(ts, str):
-                    ts = datetime.fromisoformat(ts)
-                day = ts.strftime("%A")
-                emotion = i.get("emotion_before", "neutro")
-                if day not in emotional_patterns:
-                    emotional_patterns[day] = []
-                emotional_patterns[day].append(emotion)
-
-        patterns["emotional_by_day"] = emotional_patterns
+        days = stats.get("day_counts") or []
+        if any(days):
+            patterns["peak_activity_day"] = WEEKDAY_NAMES[days.index(max(days))]
 
-        # Temas recorrentes
-        themes = {}
-        for i in interactions:
-            for theme in i.get("themes", []):
-                themes[theme] = themes.get(theme, 0) + 1
+        # Padrão emocional por dia da semana ({dia: {emoção: contagem}})
+        patterns["emotional_by_day"] = stats.get("emotion_by_day") or {}
 
-        patterns["recurring_themes"] = themes
+        # Temas recorrentes
+        patterns["recurring_themes"] = stats.get("theme_counts") or {}
 
         return patterns
 
@@ -357,7 +328,7 @@ class LearningEngine:
         # Insight sobre padrões emocionais
         emotional = patterns.get("emotional_by_day", {})
         for day, emotions in emotional.items():
-            anxiety_count = emotions.count("ansioso")
+            anxiety_count = emotions.get("ansioso", 0)
             if anxiety_count >= 3:
                 insights.append(
                     f"Percebi que você tende a ficar mais ansioso(a) às {day}s. "
@@ -390,25 +361,18 @@ class LearningEngine:
             emotion_after=interaction.get("emotion_after"),
             response_time=interaction.get("response_time"),
             user_message_length=interaction.get("user_message_length"),
-            ai_response_length=interaction.get("ai_response_length")
+            ai_response_length=interaction.get("ai_response_length"),
+            themes=interaction.get("themes")
         )
 
     async def _save_feedback(self, user_id: str, feedback: FeedbackType, context: str):
         """Salva feedback no banco"""
-        import uuid as uuid_module
-        # Buscar última estratégia usada
+        # Última estratégia usada vem dos agregados (lookup por PK)
         strategy = None
         try:
-            # Converter user_id para UUID
-            user_uuid = uuid_module.UUID(user_id) if isinstance(user_id, str) else user_id
-            async with self.db.pool.acquire() as conn:
-                row = await conn.fetchrow("""
-                    SELECT strategy_used FROM learning_interactions
-                    WHERE user_id = $1
-                    ORDER BY created_at DESC LIMIT 1
-                """, user_uuid)
-                if row:
-                    strategy = row["strategy_used"]
+            stats = await self._get_learning_aggregates(user_id)
+            if stats:
+                strategy = stats.get("last_strategy")
         except Exception as e:
             print(f"[LEARNING] Error getting strategy: {e}")
             pass
@@ -428,33 +392,13 @@ class LearningEngine:
         """Aplica ajustes ao perfil"""
         await self.db.update_user_preferred_style(user_id, adjustments)
 
-    async def _get_interaction_history(self, user_id: str, days: int) -> List[Dict]:
-        """Busca histórico de interações"""
-        import uuid as uuid_module
+    async def _get_learning_aggregates(self, user_id: str) -> Optional[Dict]:
+        """Busca agregados de aprendizado do usuário"""
         try:
-            # Converter user_id para UUID
-            user_uuid = uuid_module.UUID(user_id) if isinstance(user_id, str) else user_id
-            async with self.db.pool.acquire() as conn:
-                # Verificar se tabela existe
-                table_exists = await conn.fetchval("""
-                    SELECT EXISTS (
-                        SELECT FROM information_schema.tables
-                        WHERE table_name = 'learning_interactions'
-                    )
-                """)
-
-                if not table_exists:
-                    return []
-
-                rows = await conn.fetch("""
-                    SELECT * FROM learning_interactions
-                    WHERE user_id = $1 AND created_at > NOW() - INTERVAL '%s days'
-                    ORDER BY created_at DESC
-                """ % days, user_uuid)
-                return [dict(row) for row in rows]
+            return await self.db.get_learning_aggregates(user_id)
         except Exception as e:
-            print(f"[LEARNING] Error getting interaction history: {e}")
-            return []
+            print(f"[LEARNING] Error getting learning aggregates: {e}")
+            return None
 
 
 # ============================================
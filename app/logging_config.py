@@ -0,0 +1,152 @@
+"""
+AiSyster - Logging
+Logs estruturados (JSON) sem bloquear o event loop: o request só enfileira o
+registro; a formatação e a escrita no stdout ficam numa thread (QueueListener)
+"""
+
+import sys
+import json
+import time
+import queue
+import random
+import logging
+import logging.handlers
+from typing import Optional
+
+from app.config import LOG_LEVEL, LOG_FORMAT, LOG_QUEUE_SIZE, LOG_SAMPLE_RATE
+from app.telemetry import current_span
+
+
+# Atributos padrão do LogRecord (o resto veio de extra= e vira campo do JSON)
+_RESERVED = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime", "sampled"}
+
+
+# ============================================
+# FORMATO
+# ============================================
+
+class JsonFormatter(logging.Formatter):
+    """Uma linha JSON por evento: ts, level, logger, event + campos de extra="""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(record.created)) + f".{int(record.msecs):03d}Z",
+            "level": record.levelname.lower(),
+            "logger": record.name,
+            "event": record.getMessage()
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RESERVED and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    """Formato legível para desenvolvimento local (LOG_FORMAT=text)"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        fields = " ".join(
+            f"{key}={value}" for key, value in record.__dict__.items()
+            if key not in _RESERVED and not key.startswith("_")
+        )
+        line = f"{record.levelname:<7} [{record.name}] {record.getMessage()}"
+        if fields:
+            line += f" {fields}"
+        if record.exc_info:
+            line += "\n" + self.formatException(record.exc_info)
+        return line
+
+
+# ============================================
+# HANDLER NÃO BLOQUEANTE
+# ============================================
+
+class NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    """
+    Enfileira o registro sem formatar nem esperar.
+
+    Com a fila cheia (stdout travado), descarta e conta em vez de bloquear
+    o event loop. Eventos de alto volume marcados com extra={"sampled": True}
+    passam só na fração LOG_SAMPLE_RATE, decidida aqui antes de ocupar a fila.
+    """
+
+    def __init__(self, log_queue: queue.Queue, sample_rate: float = LOG_SAMPLE_RATE):
+        super().__init__(log_queue)
+        self.sample_rate = sample_rate
+        self.dropped = 0
+        self.sampled_out = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Fila em processo: o registro vai como está (sem o getMessage/format do QueueHandler)
+        current = current_span()
+        if current is not None:
+            record.trace_id = current.trace_id
+        return record
+
+    def emit(self, record: logging.LogRecord):
+        if getattr(record, "sampled", False) and random.random() >= self.sample_rate:
+            self.sampled_out += 1
+            return
+        try:
+            self.queue.put_nowait(self.prepare(record))
+        except queue.Full:
+            self.dropped += 1
+        except Exception:
+            self.handleError(record)
+
+
+# ============================================
+# SETUP
+# ============================================
+
+_listener: Optional[logging.handlers.QueueListener] = None
+_queue_handler: Optional[NonBlockingQueueHandler] = None
+
+
+def setup_logging(level: str = LOG_LEVEL, fmt: str = LOG_FORMAT, stream=None) -> NonBlockingQueueHandler:
+    """
+    Configura o logger raiz (uma vez por processo): QueueHandler no caminho
+    do request, StreamHandler na thread do QueueListener.
+    """
+    global _listener, _queue_handler
+    if _queue_handler is not None:
+        return _queue_handler
+
+    output = logging.StreamHandler(stream or sys.stdout)
+    output.setFormatter(JsonFormatter() if fmt == "json" else TextFormatter())
+
+    log_queue: queue.Queue = queue.Queue(maxsize=LOG_QUEUE_SIZE)
+    _queue_handler = NonBlockingQueueHandler(log_queue)
+    _listener = logging.handlers.QueueListener(log_queue, output, respect_handler_level=False)
+
+    root = logging.getLogger()
+    root.handlers = [_queue_handler]
+    root.setLevel(level.upper())
+    _listener.start()
+    return _queue_handler
+
+
+def shutdown_logging():
+    """Esvazia a fila e para a thread de escrita (chamado no shutdown do app)"""
+    global _listener, _queue_handler
+    if _listener is not None:
+        _listener.stop()
+    if _queue_handler is not None:
+        logging.getLogger().removeHandler(_queue_handler)
+    _listener = None
+    _queue_handler = None
+
+
+def get_logger(name: str) -> logging.Logger:
+    """Logger do app ("aisyster.<área>"); use %-args ou extra= (nunca f-string) no caminho quente"""
+    return logging.getLogger(f"aisyster.{name}")
+
+
+def get_stats() -> dict:
+    return {
+        "dropped": _queue_handler.dropped if _queue_handler else 0,
+        "sampled_out": _queue_handler.sampled_out if _queue_handler else 0,
+        "queued": _queue_handler.queue.qsize() if _queue_handler else 0
+    }
@@ -3,24 +3,27 @@ AiSyster - Backend Principal
 API completa com memória, autenticação e personalização
 """
 
+import time
+import asyncio
 from contextlib import asynccontextmanager
 from pathlib import Path
 from fastapi import FastAPI, Request, Depends, Query
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse, RedirectResponse, HTMLResponse
+from fastapi.responses import FileResponse, RedirectResponse, HTMLResponse, PlainTextResponse
 
 from app.config import (
     APP_NAME, APP_VERSION, DEBUG, MAINTENANCE_MODE,
     CORS_ORIGINS, CORS_ALLOW_CREDENTIALS, CORS_ALLOW_METHODS, CORS_ALLOW_HEADERS,
-    PRODUCTION_ORIGINS, ENCRYPTION_KEY
+    PRODUCTION_ORIGINS, ENCRYPTION_KEY, TTS_CACHE_PREWARM, METRICS_TOKEN,
+    NOTIFICATION_WORKER_ENABLED, STRIPE_WORKER_ENABLED
 )
-from app.database import init_db, close_db
+from app.database import init_db, close_db, get_db_pool
 from app.auth import router as auth_router
 from app.routes.chat import router as chat_router
 from app.routes.profile import router as profile_router
 from app.routes.prayer import router as prayer_router
-from app.routes.devotional import router as devotional_router
+from app.routes.devotional import router as devotional_router, devotional_store
 from app.routes.admin import router as admin_router
 from app.routes.payment import router as payment_router
 from app.routes.memories import router as memories_router
@@ -28,6 +31,17 @@ from app.routes.push import router as push_router
 from app.routes.notifications import router as notifications_router
 from app.routes.voice import router as voice_router
 from app.notification_scheduler import notification_scheduler
+from app.notification_campaigns import delivery_worker
+from app.stripe_events import stripe_event_worker, stripe_call, shutdown_stripe_pool
+from app.voice_service import voice_service, prewarm_voice_cache
+from app.email_service import email_service
+from app.pdf_service import shutdown_pdf_pool
+from app.telemetry import span, render_metrics, metrics_access, shutdown_telemetry, HTTP_DURATION
+from app.logging_config import setup_logging, shutdown_logging
+from app.static_assets import get_bundle, page_response, hashed_asset_response
+
+# Logs do app (logging.*) passam pela fila; os print() de inicialização continuam diretos
+setup_logging()
 
 
 # ============================================
@@ -47,10 +61,36 @@ async def lifespan(app: FastAPI):
     await init_db()
     print("✅ Banco de dados conectado")
 
+    # Devocional do dia renderizado uma vez (as rotas servem da memória)
+    devotional_store.refresh()
+
+    # Frontend com hash e pré-comprimido (frontend/dist do build ou montado agora)
+    bundle = get_bundle()
+    print(f"✅ Frontend versão {bundle.version} ({len(bundle.url_map)} assets com hash)")
+
     # Iniciar scheduler de notificacoes
     await notification_scheduler.start()
     print("✅ Scheduler de notificacoes iniciado")
 
+    # Worker de entregas de campanha (todos os processos reivindicam lotes com SKIP LOCKED)
+    if NOTIFICATION_WORKER_ENABLED:
+        delivery_worker.start(await get_db_pool())
+        print("✅ Worker de entregas de campanha iniciado")
+
+    # Worker dos eventos do Stripe gravados pelo webhook (SKIP LOCKED: pode rodar em todos os processos)
+    if STRIPE_WORKER_ENABLED:
+        stripe_event_worker.start(await get_db_pool())
+        print("✅ Worker de eventos do Stripe iniciado")
+
+    # Pré-aquecer cache de áudio TTS em background (templates, devocionais)
+    prewarm_task = None
+    if TTS_CACHE_PREWARM and voice_service.enabled:
+        prewarm_task = asyncio.create_task(prewarm_voice_cache())
+        print("✅ Pré-aquecimento do cache de voz iniciado")
+
+    if not METRICS_TOKEN and not DEBUG:
+        print("⚠️  /metrics desligado: defina METRICS_TOKEN para expor as métricas")
+
     if MAINTENANCE_MODE:
         print("🛠️  MODO MANUTENCAO ATIVADO")
     print("✅ API pronta")
@@ -61,8 +101,18 @@ async def lifespan(app: FastAPI):
     yield
 
     # Shutdown
+    if prewarm_task and not prewarm_task.done():
+        prewarm_task.cancel()
     await notification_scheduler.stop()
+    await delivery_worker.stop()
+    await stripe_event_worker.stop()
+    await voice_service.close()
+    await email_service.close()
+    shutdown_pdf_pool()
+    shutdown_stripe_pool()
     await close_db()
+    shutdown_telemetry()
+    shutdown_logging()
     print("\n👋 AiSyster encerrado\n")
 
 
@@ -145,6 +195,26 @@ async def redirect_legacy_domain(request: Request, call_next):
     return await call_next(request)
 
 
+@app.middleware("http")
+async def trace_requests(request: Request, call_next):
+    """Span raiz por requisição (etapas do chat ficam aninhadas) + latência por rota"""
+    start = time.perf_counter()
+    status = 500
+    with span("http.request", method=request.method) as root:
+        try:
+            response = await call_next(request)
+            status = response.status_code
+            return response
+        finally:
+            # Template da rota (/chat/{id}), nunca o caminho cru: cardinalidade baixa
+            route = request.scope.get("route")
+            route_path = getattr(route, "path", None) or "unmatched"
+            if root is not None:
+                root.set_attribute("http.route", route_path)
+                root.set_attribute("http.status_code", status)
+            HTTP_DURATION.observe((request.method, route_path, str(status)), time.perf_counter() - start)
+
+
 # ============================================
 # ROTAS
 # ============================================
@@ -165,6 +235,17 @@ async def health():
     return {"status": "healthy"}
 
 
+@app.get("/metrics", tags=["Status"], include_in_schema=False)
+async def metrics(request: Request):
+    """Métricas no formato Prometheus (latência por etapa, queries, LLM)"""
+    status_code = metrics_access(request.headers.get("authorization"))
+    if status_code == 404:
+        return PlainTextResponse("not found\n", status_code=404)
+    if status_code == 401:
+        return PlainTextResponse("unauthorized\n", status_code=401)
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
+
 # Incluir routers
 app.include_router(auth_router)
 app.include_router(chat_router)
@@ -187,26 +268,26 @@ app.include_router(voice_router)
 FRONTEND_DIR = Path(__file__).parent.parent / "frontend"
 
 @app.get("/maintenance", tags=["Frontend"])
-async def serve_maintenance():
+async def serve_maintenance(request: Request):
     """Serve a pagina de manutencao"""
-    return FileResponse(FRONTEND_DIR / "maintenance.html")
+    return page_response(request, "maintenance.html")
 
 
 @app.get("/", tags=["Frontend"])
 @app.get("/app", tags=["Frontend"])
 @app.get("/app/", tags=["Frontend"])
-async def serve_frontend():
+async def serve_frontend(request: Request):
     """Serve a página principal do AiSyster"""
     if MAINTENANCE_MODE:
-        return FileResponse(FRONTEND_DIR / "maintenance.html")
-    return FileResponse(FRONTEND_DIR / "index.html")
+        return page_response(request, "maintenance.html")
+    return page_response(request, "index.html")
 
 
 @app.get("/admin", tags=["Frontend"])
 @app.get("/admin/", tags=["Frontend"])
-async def serve_admin():
+async def serve_admin(request: Request):
     """Serve o painel de administração"""
-    return FileResponse(FRONTEND_DIR / "admin.html")
+    return page_response(request, "admin.html")
 
 
 # ============================================
@@ -215,16 +296,16 @@ async def serve_admin():
 
 @app.get("/termos", tags=["Legal"])
 @app.get("/termos/", tags=["Legal"])
-async def serve_terms():
+async def serve_terms(request: Request):
     """Serve a página de Termos de Uso"""
-    return FileResponse(FRONTEND_DIR / "termos.html")
+    return page_response(request, "termos.html")
 
 
 @app.get("/privacidade", tags=["Legal"])
 @app.get("/privacidade/", tags=["Legal"])
-async def serve_privacy():
+async def serve_privacy(request: Request):
     """Serve a página de Política de Privacidade"""
-    return FileResponse(FRONTEND_DIR / "privacidade.html")
+    return page_response(request, "privacidade.html")
 
 
 # ============================================
@@ -232,27 +313,27 @@ async def serve_privacy():
 # ============================================
 
 @app.get("/manifest.json", tags=["PWA"])
-async def serve_manifest():
+async def serve_manifest(request: Request):
     """Serve o manifest.json para PWA"""
-    return FileResponse(
-        FRONTEND_DIR / "manifest.json",
-        media_type="application/manifest+json"
-    )
+    return page_response(request, "manifest.json")
 
 
 @app.get("/sw.js", tags=["PWA"])
-async def serve_service_worker():
-    """Serve o Service Worker"""
-    return FileResponse(
-        FRONTEND_DIR / "sw.js",
-        media_type="application/javascript"
-    )
+async def serve_service_worker(request: Request):
+    """Serve o Service Worker (CACHE_NAME e precache seguem a versão do build)"""
+    return page_response(request, "sw.js")
+
+
+@app.get("/assets/{digest}/{path:path}", tags=["PWA"], include_in_schema=False)
+async def serve_hashed_asset(request: Request, digest: str, path: str):
+    """Assets de /static com hash de conteúdo na URL (cache imutável)"""
+    return hashed_asset_response(request, digest, path)
 
 
 @app.get("/offline.html", tags=["PWA"])
-async def serve_offline():
+async def serve_offline(request: Request):
     """Serve a página offline"""
-    return FileResponse(FRONTEND_DIR / "offline.html")
+    return page_response(request, "offline.html")
 
 
 # ============================================
@@ -261,16 +342,16 @@ async def serve_offline():
 
 @app.get("/termos", tags=["Legal"])
 @app.get("/termos.html", tags=["Legal"])
-async def serve_termos():
+async def serve_termos(request: Request):
     """Serve os Termos de Uso"""
-    return FileResponse(FRONTEND_DIR / "termos.html")
+    return page_response(request, "termos.html")
 
 
 @app.get("/privacidade", tags=["Legal"])
 @app.get("/privacidade.html", tags=["Legal"])
-async def serve_privacidade():
+async def serve_privacidade(request: Request):
     """Serve a Política de Privacidade"""
-    return FileResponse(FRONTEND_DIR / "privacidade.html")
+    return page_response(request, "privacidade.html")
 
 
 # ============================================
@@ -279,9 +360,9 @@ async def serve_privacidade():
 
 @app.get("/pitch", tags=["Marketing"])
 @app.get("/pitchdeck", tags=["Marketing"])
-async def serve_pitchdeck():
+async def serve_pitchdeck(request: Request):
     """Serve o Pitch Deck do AiSyster"""
-    return FileResponse(FRONTEND_DIR / "pitch.html")
+    return page_response(request, "pitch.html")
 
 
 # ============================================
@@ -353,7 +434,8 @@ async def checkout_with_token(token: str = Query(None)):
 
     try:
         # Criar sessao de checkout do Stripe
-        checkout_session = stripe.checkout.Session.create(
+        checkout_session = await stripe_call(
+            stripe.checkout.Session.create,
             payment_method_types=["card"],
             mode="subscription",
             customer_email=token_data["email"],
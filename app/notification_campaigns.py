@@ -0,0 +1,445 @@
+"""
+AiSyster - Campanhas de Notificação
+Materialização dos destinatários em uma única query (INSERT ... SELECT a partir
+do filtro de público), worker de entregas em lote (FOR UPDATE SKIP LOCKED)
+e progresso do envio por canal/status
+"""
+
+import asyncio
+import hashlib
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+from uuid import UUID
+
+from app.config import (
+    NOTIFICATION_BATCH_SIZE, NOTIFICATION_SEND_CONCURRENCY,
+    NOTIFICATION_POLL_INTERVAL, NOTIFICATION_LEASE_SECONDS
+)
+from app.email_service import email_service
+from app.telemetry import registry
+from app.logging_config import get_logger
+
+
+logger = get_logger("campaigns")
+
+DELIVERIES = registry.counter(
+    "aisyster_notification_deliveries_total", "Entregas de campanha por canal e resultado", ("channel", "status")
+)
+
+# Filtro de público (mesmas regras do users-preview)
+AUDIENCE_FILTERS = {
+    "all": "u.is_active = TRUE",
+    "premium": "u.is_active = TRUE AND u.is_premium = TRUE",
+    "free": "u.is_active = TRUE AND u.is_premium = FALSE",
+    "specific": "u.is_active = TRUE AND u.id = ANY($4::uuid[])",
+}
+
+CHANNELS = ("push", "email")
+DELIVERY_STATUSES = ("pending", "sending", "sent", "skipped", "failed")
+UNFINISHED_STATUSES = ("pending", "sending")
+
+
+def build_materialize_query(target_audience: str, specific_users: Optional[List[str]] = None):
+    """
+    Monta a query e os argumentos extras do público.
+
+    Um único statement:
+    - audience: usuários do filtro com as preferências de canal (lido uma vez)
+    - campaign: grava recipient_ids (lista compacta de UUIDs) e total na notificação
+    - deliveries: INSERT ... SELECT de uma linha por usuário/canal habilitado
+    """
+    where = AUDIENCE_FILTERS.get(target_audience)
+    extra_args = []
+    if target_audience == "specific":
+        if specific_users:
+            extra_args.append([UUID(uid) for uid in specific_users])
+        else:
+            where = None
+    if where is None:
+        where = "FALSE"  # Público desconhecido/vazio: campanha sem destinatários
+
+    query = f"""
+        WITH audience AS MATERIALIZED (
+            SELECT u.id,
+                   COALESCE(up.push_notifications, TRUE) AS push_ok,
+                   COALESCE(up.email_notifications, TRUE) AS email_ok
+            FROM users u
+            LEFT JOIN user_profiles up ON up.user_id = u.id
+            WHERE {where}
+        ),
+        campaign AS (
+            UPDATE notifications
+            SET recipient_ids = COALESCE((SELECT array_agg(id ORDER BY id) FROM audience), '{{}}'::uuid[]),
+                total_recipients = (SELECT COUNT(*) FROM audience),
+                status = 'sending'
+            WHERE id = $1
+            RETURNING id
+        ),
+        deliveries AS (
+            INSERT INTO notification_deliveries (notification_id, user_id, channel, status)
+            SELECT campaign.id, a.id, c.channel, 'pending'
+            FROM campaign
+            CROSS JOIN audience a
+            CROSS JOIN (VALUES ('push'), ('email')) AS c(channel)
+            WHERE (c.channel = 'push' AND $2::boolean AND a.push_ok)
+               OR (c.channel = 'email' AND $3::boolean AND a.email_ok)
+            ON CONFLICT (notification_id, user_id, channel) DO NOTHING
+            RETURNING channel
+        )
+        SELECT
+            (SELECT COUNT(*) FROM audience) AS total_recipients,
+            (SELECT COUNT(*) FROM campaign) AS updated,
+            COUNT(*) FILTER (WHERE channel = 'push') AS push_deliveries,
+            COUNT(*) FILTER (WHERE channel = 'email') AS email_deliveries
+        FROM deliveries
+    """
+    return query, extra_args
+
+
+async def materialize_campaign(
+    pool,
+    notification_id,
+    target_audience: str,
+    send_push: bool,
+    send_email: bool,
+    specific_users: Optional[List[str]] = None
+) -> dict:
+    """
+    Cria todas as entregas pendentes da campanha no banco, sem trazer usuários
+    para o Python. Retorna total de destinatários e entregas por canal.
+    """
+    notification_uuid = UUID(notification_id) if isinstance(notification_id, str) else notification_id
+    query, extra_args = build_materialize_query(target_audience, specific_users)
+
+    async with pool.acquire() as conn:
+        row = await conn.fetchrow(query, notification_uuid, send_push, send_email, *extra_args)
+
+    if not row["updated"]:
+        raise LookupError(f"Notificação {notification_id} não encontrada")
+
+    result = {
+        "total_recipients": row["total_recipients"],
+        "push_deliveries": row["push_deliveries"],
+        "email_deliveries": row["email_deliveries"],
+    }
+    logger.info("campaign.materialized", extra={"notification_id": str(notification_uuid), **result})
+    return result
+
+
+async def get_campaign_progress(pool, notification_id) -> Optional[dict]:
+    """Status da campanha + entregas agregadas por canal/status (índice por notification_id)"""
+    notification_uuid = UUID(notification_id) if isinstance(notification_id, str) else notification_id
+
+    async with pool.acquire() as conn:
+        notification = await conn.fetchrow(
+            """
+            SELECT status, total_recipients, created_at, sent_at
+            FROM notifications WHERE id = $1
+            """,
+            notification_uuid
+        )
+        if not notification:
+            return None
+        rows = await conn.fetch(
+            """
+            SELECT channel, status, COUNT(*) AS total
+            FROM notification_deliveries
+            WHERE notification_id = $1
+            GROUP BY channel, status
+            """,
+            notification_uuid
+        )
+
+    deliveries = {channel: {status: 0 for status in DELIVERY_STATUSES} for channel in CHANNELS}
+    for row in rows:
+        deliveries.setdefault(row["channel"], {})[row["status"]] = row["total"]
+
+    total = sum(sum(counts.values()) for counts in deliveries.values())
+    pending = sum(counts.get(status, 0) for counts in deliveries.values() for status in UNFINISHED_STATUSES)
+    return {
+        "status": notification["status"],
+        "total_recipients": notification["total_recipients"] or 0,
+        "total_deliveries": total,
+        "processed": total - pending,
+        "progress": round(100 * (total - pending) / total, 1) if total else 100.0,
+        "deliveries": deliveries,
+        "created_at": notification["created_at"].isoformat(),
+        "sent_at": notification["sent_at"].isoformat() if notification["sent_at"] else None
+    }
+
+
+# ============================================
+# WORKER DE ENTREGAS
+# ============================================
+
+Delivery = Dict  # id, notification_id, user_id, channel, email, nome, language, title, message
+DeliveryResult = Tuple[str, Optional[str]]  # (status, error_message)
+
+CLAIM_QUERY = """
+    WITH claimed AS (
+        SELECT id FROM notification_deliveries
+        WHERE status = 'pending'
+           OR (status = 'sending' AND claimed_at < NOW() - make_interval(secs => $2))
+        ORDER BY created_at
+        LIMIT $1
+        FOR UPDATE SKIP LOCKED
+    ),
+    updated AS (
+        UPDATE notification_deliveries nd
+        SET status = 'sending', claimed_at = NOW()
+        FROM claimed
+        WHERE nd.id = claimed.id
+        RETURNING nd.id, nd.notification_id, nd.user_id, nd.channel
+    )
+    SELECT updated.id, updated.notification_id, updated.user_id, updated.channel,
+           u.email, up.nome, up.language, n.title, n.message
+    FROM updated
+    JOIN notifications n ON n.id = updated.notification_id
+    JOIN users u ON u.id = updated.user_id
+    LEFT JOIN user_profiles up ON up.user_id = updated.user_id
+"""
+
+# Chave (canal, usuário, título) vale 24h: mesmo título não chega duas vezes no mesmo canal
+RESERVE_DEDUPE_QUERY = """
+    INSERT INTO notification_dedupe (dedupe_key, sent_at)
+    SELECT unnest($1::text[]), NOW()
+    ON CONFLICT (dedupe_key) DO UPDATE SET sent_at = EXCLUDED.sent_at
+    WHERE notification_dedupe.sent_at < NOW() - INTERVAL '24 hours'
+    RETURNING dedupe_key
+"""
+
+COMPLETE_QUERY = """
+    WITH results AS (
+        SELECT * FROM unnest($1::uuid[], $2::text[], $3::text[]) AS r(id, status, error_message)
+    ),
+    updated AS (
+        UPDATE notification_deliveries nd
+        SET status = r.status, error_message = r.error_message, sent_at = NOW()
+        FROM results r
+        WHERE nd.id = r.id
+        RETURNING nd.notification_id, nd.channel, nd.status
+    ),
+    counts AS (
+        SELECT notification_id,
+               COUNT(*) FILTER (WHERE channel = 'push' AND status <> 'failed') AS push_sent,
+               COUNT(*) FILTER (WHERE channel = 'push' AND status = 'failed') AS push_failed,
+               COUNT(*) FILTER (WHERE channel = 'email' AND status <> 'failed') AS email_sent,
+               COUNT(*) FILTER (WHERE channel = 'email' AND status = 'failed') AS email_failed
+        FROM updated
+        GROUP BY notification_id
+    )
+    UPDATE notifications n
+    SET push_sent = COALESCE(n.push_sent, 0) + c.push_sent,
+        push_failed = COALESCE(n.push_failed, 0) + c.push_failed,
+        email_sent = COALESCE(n.email_sent, 0) + c.email_sent,
+        email_failed = COALESCE(n.email_failed, 0) + c.email_failed,
+        sent_count = COALESCE(n.sent_count, 0) + c.push_sent + c.email_sent,
+        failed_count = COALESCE(n.failed_count, 0) + c.push_failed + c.email_failed
+    FROM counts c
+    WHERE n.id = c.notification_id
+"""
+
+# Fora da transação do COMPLETE: quem grava o último lote vê todos os outros já commitados
+FINALIZE_QUERY = """
+    UPDATE notifications n
+    SET status = 'sent', sent_at = NOW()
+    WHERE n.id = ANY($1::uuid[])
+      AND n.status = 'sending'
+      AND NOT EXISTS (
+          SELECT 1 FROM notification_deliveries nd
+          WHERE nd.notification_id = n.id AND nd.status IN ('pending', 'sending')
+      )
+"""
+
+
+def dedupe_key(delivery: Delivery) -> str:
+    title_hash = hashlib.md5((delivery["title"] or "").encode("utf-8")).hexdigest()[:16]
+    return f"{delivery['channel']}:{delivery['user_id']}:{title_hash}"
+
+
+async def send_push(delivery: Delivery) -> DeliveryResult:
+    """Push em todos os dispositivos do usuário"""
+    from app.routes.push import send_push_to_user
+
+    success = await send_push_to_user(str(delivery["user_id"]), delivery["title"], delivery["message"])
+    return ("sent", None) if success else ("failed", "Push não entregue (sem subscription ativa?)")
+
+
+async def send_deliveries(deliveries: List[Delivery], concurrency: int) -> List[DeliveryResult]:
+    """
+    Envia um lote: emails de cada campanha pelo /emails/batch do Resend (100 por
+    chamada), pushes em paralelo limitado a concurrency. Resultados na ordem do lote.
+    """
+    results: Dict[UUID, DeliveryResult] = {}
+
+    emails_by_campaign: Dict[UUID, List[Delivery]] = {}
+    for delivery in deliveries:
+        if delivery["channel"] == "email":
+            emails_by_campaign.setdefault(delivery["notification_id"], []).append(delivery)
+
+    for emails in emails_by_campaign.values():
+        sent = await email_service.send_notification_batch(
+            [{"to": d["email"], "language": d.get("language")} for d in emails],
+            emails[0]["title"],
+            emails[0]["message"]
+        )
+        for delivery, ok in zip(emails, sent):
+            results[delivery["id"]] = ("sent", None) if ok else ("failed", "Email não enviado")
+
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def push(delivery: Delivery):
+        async with semaphore:
+            try:
+                results[delivery["id"]] = await send_push(delivery)
+            except Exception as e:
+                results[delivery["id"]] = ("failed", str(e)[:500])
+
+    await asyncio.gather(*(push(d) for d in deliveries if d["channel"] != "email"))
+    return [results[delivery["id"]] for delivery in deliveries]
+
+
+class DeliveryWorker:
+    """
+    Worker de entregas de campanha. Pode rodar em todos os processos/servidores ao mesmo tempo:
+
+    - claim: lote de entregas 'pending' com FOR UPDATE SKIP LOCKED, marcadas 'sending'
+      (se o processo morrer, depois de lease_seconds o lote volta a ser reivindicável)
+    - dedupe: uma query por lote reserva as chaves em notification_dedupe; chave já
+      usada nas últimas 24h vira 'skipped' sem enviar
+    - status e contadores da campanha gravados em um UPDATE ... FROM unnest() por lote
+    """
+
+    def __init__(
+        self,
+        batch_size: int = NOTIFICATION_BATCH_SIZE,
+        concurrency: int = NOTIFICATION_SEND_CONCURRENCY,
+        poll_interval: float = NOTIFICATION_POLL_INTERVAL,
+        lease_seconds: int = NOTIFICATION_LEASE_SECONDS,
+        sender: Optional[Callable[[Delivery], Awaitable[DeliveryResult]]] = None
+    ):
+        self.batch_size = batch_size
+        self.concurrency = concurrency
+        self.poll_interval = poll_interval
+        self.lease_seconds = lease_seconds
+        self.sender = sender  # Envio por entrega (testes/benchmark); None = send_deliveries em lote
+        self.pool = None
+        self.processed = 0
+        self._wakeup = asyncio.Event()
+        self._stopping = False
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self, pool):
+        if self.running:
+            return
+        self.pool = pool
+        self._stopping = False
+        self._task = asyncio.create_task(self._run())
+
+    def wake(self):
+        """Nova campanha materializada: busca sem esperar o poll"""
+        self._wakeup.set()
+
+    async def stop(self, timeout: float = 30.0):
+        """Termina o lote em andamento (o que sobrar volta para a fila pelo lease)"""
+        if not self._task:
+            return
+        self._stopping = True
+        self._wakeup.set()
+        try:
+            await asyncio.wait_for(asyncio.shield(self._task), timeout=timeout)
+        except asyncio.TimeoutError:
+            logger.warning("campaign.worker_stop_timeout")
+            self._task.cancel()
+        self._task = None
+
+    async def _run(self):
+        while not self._stopping:
+            try:
+                claimed = await self.run_once()
+            except Exception as e:
+                logger.error("campaign.batch_failed", extra={"error": str(e)})
+                claimed = 0
+            if claimed < self.batch_size and not self._stopping:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                self._wakeup.clear()
+
+    async def run_once(self) -> int:
+        """Reivindica, envia e grava um lote. Retorna quantas entregas processou"""
+        batch = await self.claim_batch()
+        if not batch:
+            return 0
+
+        results = await self.send_batch(batch)
+        await self.complete_batch(results)
+        self.processed += len(batch)
+        return len(batch)
+
+    async def claim_batch(self) -> List[Delivery]:
+        async with self.pool.acquire() as conn:
+            rows = await conn.fetch(CLAIM_QUERY, self.batch_size, self.lease_seconds)
+        return [dict(row) for row in rows]
+
+    async def send_batch(self, batch: List[Delivery]) -> List[Tuple[Delivery, str, Optional[str]]]:
+        keys = {delivery["id"]: dedupe_key(delivery) for delivery in batch}
+        async with self.pool.acquire() as conn:
+            reserved = {row["dedupe_key"] for row in await conn.fetch(RESERVE_DEDUPE_QUERY, list(set(keys.values())))}
+
+        # Mesma chave duas vezes no lote (títulos iguais): só a primeira envia
+        owners, to_send, outcome = {}, [], {}
+        for delivery in batch:
+            key = keys[delivery["id"]]
+            if key not in reserved or owners.setdefault(key, delivery["id"]) != delivery["id"]:
+                outcome[delivery["id"]] = ("skipped", "Já enviado anteriormente")
+            else:
+                to_send.append(delivery)
+
+        for delivery, result in zip(to_send, await self.deliver(to_send)):
+            outcome[delivery["id"]] = result
+        results = [(delivery, *outcome[delivery["id"]]) for delivery in batch]
+
+        # Falhou: libera a chave para um reenvio futuro não ser tratado como duplicado
+        failed_keys = [keys[d["id"]] for d, status, _ in results if status == "failed"]
+        if failed_keys:
+            async with self.pool.acquire() as conn:
+                await conn.execute("DELETE FROM notification_dedupe WHERE dedupe_key = ANY($1::text[])", failed_keys)
+        return results
+
+    async def deliver(self, deliveries: List[Delivery]) -> List[DeliveryResult]:
+        if not deliveries:
+            return []
+        if self.sender is None:
+            return await send_deliveries(deliveries, self.concurrency)
+
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def one(delivery: Delivery) -> DeliveryResult:
+            async with semaphore:
+                try:
+                    return await self.sender(delivery)
+                except Exception as e:
+                    return "failed", str(e)[:500]
+
+        return await asyncio.gather(*(one(delivery) for delivery in deliveries))
+
+    async def complete_batch(self, results: List[Tuple[Delivery, str, Optional[str]]]):
+        ids, statuses, errors = [], [], []
+        for delivery, status, error in results:
+            ids.append(delivery["id"])
+            statuses.append(status)
+            errors.append(error)
+            DELIVERIES.inc((delivery["channel"], status))
+
+        async with self.pool.acquire() as conn:
+            await conn.execute(COMPLETE_QUERY, ids, statuses, errors)
+            await conn.execute(FINALIZE_QUERY, list({d["notification_id"] for d, _, _ in results}))
+
+
+# Instância global (iniciada no lifespan do app; um por processo)
+delivery_worker = DeliveryWorker()
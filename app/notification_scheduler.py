@@ -2,15 +2,26 @@
 AiSyster - Notification Scheduler
 Sistema de lembretes automaticos e notificacoes de engajamento
 Com retry logic, rate limiting e suporte a timezone
+
+Seguro com vários processos/réplicas: cada execução (job + período) é
+dividida em fatias reivindicadas com lease em scheduler_runs, então os nós
+repartem o trabalho e nenhuma fatia roda duas vezes no mesmo período. A
+fila de retry fica no banco (notification_retry_queue), ordenada por retry_at.
+Lembretes têm o próximo disparo em UTC pré-calculado (next_fire_at) no fuso
+IANA do usuário e saem por um range scan nas linhas vencidas.
 """
 
 import asyncio
-from datetime import datetime, timedelta
-from typing import List, Dict, Optional
+import json
+import os
+import socket
+from datetime import datetime, timedelta, timezone
+from typing import Awaitable, Callable, List, Dict
 import random
 import logging
-from collections import defaultdict
+from uuid import UUID
 
+from app.config import SCHEDULER_SHARDS, SCHEDULER_LEASE_SECONDS, SCHEDULER_RETRY_BATCH
 from app.database import get_db
 from app.routes.push import send_push_notification
 
@@ -31,6 +42,18 @@ RETRY_DELAYS = [5, 30, 120]  # segundos entre retries
 # Batch size para processamento
 BATCH_SIZE = 20
 
+# Lembretes vencidos reivindicados por vez
+REMINDER_CLAIM_BATCH = 500
+
+# Lembrete atrasado além disso (ex: todos os nós fora do ar) só é reagendado
+REMINDER_GRACE = timedelta(hours=1)
+
+# Lease de um lote de retries reivindicado (nó que cair devolve o lote à fila)
+RETRY_LEASE_SECONDS = 120
+
+# Identifica o dono das fatias/leases (um por processo)
+NODE_ID = f"{socket.gethostname()}:{os.getpid()}"
+
 # ============================================
 # MENSAGENS DE LEMBRETE
 # ============================================
@@ -99,59 +122,115 @@ ENGAGEMENT_MESSAGES = [
 
 
 # ============================================
-# FILA DE RETRY
+# FILA DE RETRY (persistente)
 # ============================================
 
-class RetryQueue:
-    """Fila de notificacoes para retry com backoff exponencial"""
+ENQUEUE_RETRY_QUERY = """
+    INSERT INTO notification_retry_queue
+        (user_id, notification_type, subscription_info, title, body, url, retry_count, retry_at)
+    VALUES ($1, $2, $3::jsonb, $4, $5, $6, $7, NOW() + make_interval(secs => $8))
+"""
 
-    def __init__(self):
-        self.queue: List[Dict] = []
-        self.processing = False
+# Os retries vencidos saem na ordem do índice de retry_at (como o topo de um heap);
+# adiar o retry_at pelo lease evita que outro nó pegue o mesmo lote
+CLAIM_RETRIES_QUERY = """
+    UPDATE notification_retry_queue q
+    SET retry_at = NOW() + make_interval(secs => $2)
+    FROM (
+        SELECT id FROM notification_retry_queue
+        WHERE retry_at <= NOW()
+        ORDER BY retry_at
+        LIMIT $1
+        FOR UPDATE SKIP LOCKED
+    ) due
+    WHERE q.id = due.id
+    RETURNING q.id, q.user_id, q.notification_type, q.subscription_info, q.title, q.body, q.url, q.retry_count
+"""
 
-    def add(self, notification: Dict, retry_count: int = 0):
-        """Adiciona notificacao na fila de retry"""
-        if retry_count < MAX_RETRIES:
-            delay = RETRY_DELAYS[min(retry_count, len(RETRY_DELAYS) - 1)]
-            notification["retry_count"] = retry_count + 1
-            notification["retry_at"] = datetime.now() + timedelta(seconds=delay)
-            self.queue.append(notification)
-            logger.info(f"[RETRY] Added to queue, retry #{retry_count + 1} in {delay}s")
-
-    async def process(self, db):
-        """Processa notificacoes prontas para retry"""
-        if self.processing:
-            return
+DELETE_RETRIES_QUERY = "DELETE FROM notification_retry_queue WHERE id = ANY($1::uuid[])"
 
-        self.processing = True
-        now = datetime.now()
+RESCHEDULE_RETRIES_QUERY = """
+    UPDATE notification_retry_queue q
+    SET retry_count = q.retry_count + 1,
+        retry_at = NOW() + make_interval(secs => r.delay)
+    FROM unnest($1::uuid[], $2::float8[]) AS r(id, delay)
+    WHERE q.id = r.id
+"""
 
-        # Separar prontas para retry
-        ready = [n for n in self.queue if n["retry_at"] <= now]
-        self.queue = [n for n in self.queue if n["retry_at"] > now]
+COUNT_RETRIES_QUERY = "SELECT COUNT(*) FROM notification_retry_queue"
 
-        for notification in ready:
+
+class RetryQueue:
+    """
+    Fila de notificacoes para retry com backoff exponencial.
+    Persistida em notification_retry_queue: sobrevive a restarts e é
+    consumida por qualquer nó (lotes com SKIP LOCKED).
+    """
+
+    def __init__(self, batch_size: int = SCHEDULER_RETRY_BATCH, lease_seconds: int = RETRY_LEASE_SECONDS):
+        self.batch_size = batch_size
+        self.lease_seconds = lease_seconds
+        self.size = 0  # Tamanho da fila na última passada de process()
+
+    async def add(self, db, notification: Dict, retry_count: int = 0) -> bool:
+        """Adiciona notificacao na fila de retry"""
+        if retry_count >= MAX_RETRIES:
+            return False
+
+        delay = RETRY_DELAYS[min(retry_count, len(RETRY_DELAYS) - 1)]
+        user_id = notification.get("user_id")
+        async with db.pool.acquire() as conn:
+            await conn.execute(
+                ENQUEUE_RETRY_QUERY,
+                UUID(user_id) if isinstance(user_id, str) else user_id,
+                notification.get("notification_type", "retry"),
+                json.dumps(notification["subscription_info"]),
+                notification["title"],
+                notification["body"],
+                notification.get("url", "/app"),
+                retry_count + 1,
+                float(delay)
+            )
+        logger.info(f"[RETRY] Added to queue, retry #{retry_count + 1} in {delay}s")
+        return True
+
+    async def process(self, db) -> int:
+        """Processa um lote de notificacoes prontas para retry"""
+        async with db.pool.acquire() as conn:
+            rows = await conn.fetch(CLAIM_RETRIES_QUERY, self.batch_size, float(self.lease_seconds))
+
+        done, again, delays = [], [], []
+        for row in rows:
+            subscription_info = row["subscription_info"]
             try:
                 success = await send_push_notification(
-                    subscription_info=notification["subscription_info"],
-                    title=notification["title"],
-                    body=notification["body"],
-                    url=notification.get("url", "/app"),
+                    subscription_info=json.loads(subscription_info) if isinstance(subscription_info, str) else subscription_info,
+                    title=row["title"],
+                    body=row["body"],
+                    url=row["url"] or "/app",
                     db=db,
-                    user_id=notification.get("user_id"),
-                    notification_type=notification.get("notification_type", "retry")
+                    user_id=str(row["user_id"]) if row["user_id"] else None,
+                    notification_type=row["notification_type"]
                 )
-
-                if not success:
-                    # Falhou novamente, adicionar de volta se ainda tem retries
-                    self.add(notification, notification["retry_count"])
-
             except Exception as e:
                 logger.error(f"[RETRY] Error processing retry: {e}")
-                self.add(notification, notification["retry_count"])
+                success = False
+
+            if success or row["retry_count"] >= MAX_RETRIES:
+                # Enviada ou sem tentativas restantes: sai da fila
+                done.append(row["id"])
+            else:
+                again.append(row["id"])
+                delays.append(float(RETRY_DELAYS[min(row["retry_count"], len(RETRY_DELAYS) - 1)]))
 
-        self.processing = False
-        return len(ready)
+        async with db.pool.acquire() as conn:
+            if done:
+                await conn.execute(DELETE_RETRIES_QUERY, done)
+            if again:
+                await conn.execute(RESCHEDULE_RETRIES_QUERY, again, delays)
+            self.size = await conn.fetchval(COUNT_RETRIES_QUERY) or 0
+
+        return len(rows)
 
 # Instancia global da fila de retry
 retry_queue = RetryQueue()
@@ -191,33 +270,6 @@ class RateLimiter:
 rate_limiter = RateLimiter()
 
 
-# ============================================
-# TIMEZONE HELPER
-# ============================================
-
-# Mapeamento de timezones comuns do Brasil
-TIMEZONE_OFFSETS = {
-    "America/Sao_Paulo": -3,
-    "America/Manaus": -4,
-    "America/Belem": -3,
-    "America/Fortaleza": -3,
-    "America/Recife": -3,
-    "America/Cuiaba": -4,
-    "America/Porto_Velho": -4,
-    "America/Rio_Branco": -5,
-    "America/Noronha": -2,
-    "UTC": 0,
-    None: -3,  # Default: Brasilia
-    "": -3,
-}
-
-def get_user_local_hour(utc_hour: int, timezone: Optional[str]) -> int:
-    """Converte hora UTC para hora local do usuario"""
-    offset = TIMEZONE_OFFSETS.get(timezone, -3)
-    local_hour = (utc_hour + offset) % 24
-    return local_hour
-
-
 # ============================================
 # SCHEDULER FUNCTIONS
 # ============================================
@@ -231,7 +283,7 @@ async def send_notification_with_retry(
     user_id: str,
     notification_type: str
 ) -> bool:
-    """Envia notificacao com suporte a retry"""
+    """Envia notificacao com suporte a retry (falha vai para a fila persistente)"""
     try:
         await rate_limiter.wait_if_needed()
 
@@ -248,21 +300,13 @@ async def send_notification_with_retry(
         if success:
             rate_limiter.record_send()
             return True
-        else:
-            # Adicionar na fila de retry
-            retry_queue.add({
-                "subscription_info": subscription_info,
-                "title": title,
-                "body": body,
-                "url": url,
-                "user_id": user_id,
-                "notification_type": notification_type
-            })
-            return False
 
     except Exception as e:
         logger.error(f"[NOTIFICATION] Error sending: {e}")
-        retry_queue.add({
+
+    # Adicionar na fila de retry
+    try:
+        await retry_queue.add(db, {
             "subscription_info": subscription_info,
             "title": title,
             "body": body,
@@ -270,105 +314,107 @@ async def send_notification_with_retry(
             "user_id": user_id,
             "notification_type": notification_type
         })
-        return False
+    except Exception as e:
+        logger.error(f"[RETRY] Error enqueuing retry: {e}")
+    return False
 
 
-async def send_reminder_notifications():
+async def send_reminder_notifications(limit: int = REMINDER_CLAIM_BATCH) -> int:
     """
-    Envia lembretes para usuarios que configuraram horario.
-    Considera timezone do usuario.
+    Envia os lembretes vencidos (next_fire_at <= agora, calculado no fuso IANA
+    de cada usuario). Reivindica em lotes ate nao restar nenhum; como cada lote
+    ja sai reagendado, varios nós podem rodar juntos sem duplicar.
     """
     db = await get_db()
-    utc_now = datetime.utcnow()
-    utc_hour = utc_now.hour
-
-    # Mapear dia da semana
-    days_map = ['mon', 'tue', 'wed', 'thu', 'fri', 'sat', 'sun']
-    current_day = days_map[utc_now.weekday()]
-
-    logger.info(f"[SCHEDULER] Checking reminders for UTC hour {utc_hour}, day {current_day}")
 
     sent_count = 0
     failed_count = 0
+    late_count = 0
 
     try:
-        # Buscar usuarios que querem lembrete nesta hora (considerando timezone)
-        users = await db.get_users_for_reminder_with_timezone(utc_hour, current_day)
-        logger.info(f"[SCHEDULER] Found {len(users)} users for reminder")
-
-        # Processar em batches
-        for i in range(0, len(users), BATCH_SIZE):
-            batch = users[i:i + BATCH_SIZE]
-
-            tasks = []
-            for user in batch:
-                message = random.choice(REMINDER_MESSAGES)
-
-                subscription_info = {
-                    "endpoint": user["endpoint"],
-                    "keys": {
-                        "p256dh": user["p256dh"],
-                        "auth": user["auth"]
+        while True:
+            rows = await db.claim_due_reminders(limit)
+            if not rows:
+                break
+
+            now = datetime.now(timezone.utc)
+            due = [row for row in rows if row["endpoint"] and now - row["fire_at"] <= REMINDER_GRACE]
+            late_count += sum(1 for row in rows if row["endpoint"] and now - row["fire_at"] > REMINDER_GRACE)
+            logger.info(f"[SCHEDULER] Claimed {len(rows)} due reminders, sending {len(due)}")
+
+            # Processar em batches
+            for i in range(0, len(due), BATCH_SIZE):
+                batch = due[i:i + BATCH_SIZE]
+
+                tasks = []
+                for user in batch:
+                    message = random.choice(REMINDER_MESSAGES)
+
+                    subscription_info = {
+                        "endpoint": user["endpoint"],
+                        "keys": {
+                            "p256dh": user["p256dh"],
+                            "auth": user["auth"]
+                        }
                     }
-                }
-
-                tasks.append(
-                    send_notification_with_retry(
-                        subscription_info=subscription_info,
-                        title=message["title"],
-                        body=message["body"],
-                        url="/app",
-                        db=db,
-                        user_id=str(user["user_id"]),
-                        notification_type="reminder"
+
+                    tasks.append(
+                        send_notification_with_retry(
+                            subscription_info=subscription_info,
+                            title=message["title"],
+                            body=message["body"],
+                            url="/app",
+                            db=db,
+                            user_id=str(user["user_id"]),
+                            notification_type="reminder"
+                        )
                     )
-                )
 
-            # Executar batch
-            results = await asyncio.gather(*tasks, return_exceptions=True)
+                # Executar batch
+                results = await asyncio.gather(*tasks, return_exceptions=True)
 
-            for result in results:
-                if result is True:
-                    sent_count += 1
-                else:
-                    failed_count += 1
+                for result in results:
+                    if result is True:
+                        sent_count += 1
+                    else:
+                        failed_count += 1
 
-            # Pequena pausa entre batches
-            if i + BATCH_SIZE < len(users):
-                await asyncio.sleep(2)
+                # Pequena pausa entre batches
+                if i + BATCH_SIZE < len(due):
+                    await asyncio.sleep(2)
 
-        logger.info(f"[SCHEDULER] Reminders: {sent_count} sent, {failed_count} failed")
+        logger.info(f"[SCHEDULER] Reminders: {sent_count} sent, {failed_count} failed, {late_count} too late")
         return sent_count
 
     except Exception as e:
         logger.error(f"[SCHEDULER] Error sending reminders: {e}")
-        return 0
+        return sent_count
 
 
-async def send_engagement_notifications():
+async def send_engagement_notifications(shard: int = 0, shards: int = 1) -> int:
     """
     Envia notificacoes para usuarios inativos.
-    Processamento em batches com rate limiting.
+    Processamento em batches com rate limiting; shard/shards como nos lembretes.
     """
     db = await get_db()
 
-    logger.info("[SCHEDULER] Checking engagement notifications")
+    logger.info(f"[SCHEDULER] Checking engagement notifications, shard {shard}/{shards}")
 
     sent_count = 0
     failed_count = 0
 
     try:
-        # Usar paginacao para usuarios inativos
-        offset = 0
+        # Paginacao por keyset: cada pagina continua de (last_login, user_id) da anterior
+        cursor = None
         limit = 100
 
         while True:
-            users = await db.get_users_for_engagement(limit=limit, offset=offset)
+            users = await db.get_users_for_engagement(limit=limit, after=cursor, shard=shard, shards=shards)
 
             if not users:
                 break
 
-            logger.info(f"[SCHEDULER] Processing {len(users)} inactive users (offset {offset})")
+            logger.info(f"[SCHEDULER] Processing {len(users)} inactive users (after {cursor})")
 
             for i in range(0, len(users), BATCH_SIZE):
                 batch = users[i:i + BATCH_SIZE]
@@ -408,12 +454,10 @@ async def send_engagement_notifications():
                 # Pausa entre batches
                 await asyncio.sleep(2)
 
-            offset += limit
-
-            # Safety limit
-            if offset > 10000:
-                logger.warning("[SCHEDULER] Safety limit reached for engagement")
+            # Uma linha por subscription: a pagina tem no maximo limit usuarios
+            if len({user["user_id"] for user in users}) < limit:
                 break
+            cursor = (users[-1]["last_login"], users[-1]["user_id"])
 
         logger.info(f"[SCHEDULER] Engagement: {sent_count} sent, {failed_count} failed")
         return sent_count
@@ -423,6 +467,80 @@ async def send_engagement_notifications():
         return 0
 
 
+async def run_daily_maintenance():
+    """
+    Manutencao diaria do banco: compacta a timeline emocional bruta
+    (o historico agregado continua em emotional_daily_rollups), remove
+    sessoes de visitantes expiradas, cria as proximas particoes do audit_log
+    e expira as chaves de dedupe das campanhas e o registro de fatias do scheduler.
+    """
+    db = await get_db()
+
+    try:
+        removed = await db.compact_emotional_timeline()
+        logger.info(f"[SCHEDULER] Maintenance: {removed} emotional_timeline rows compacted")
+
+        expired = await db.purge_expired_trial_sessions()
+        logger.info(f"[SCHEDULER] Maintenance: {expired} expired trial sessions removed")
+
+        partitions = await db.ensure_audit_partitions()
+        logger.info(f"[SCHEDULER] Maintenance: {partitions} audit_log partitions created")
+
+        dedupe = await db.purge_notification_dedupe()
+        logger.info(f"[SCHEDULER] Maintenance: {dedupe} notification dedupe keys expired")
+
+        runs = await db.purge_scheduler_runs()
+        logger.info(f"[SCHEDULER] Maintenance: {runs} old scheduler runs removed")
+
+        tokens = await db.purge_revoked_tokens()
+        logger.info(f"[SCHEDULER] Maintenance: {tokens} expired token revocations removed")
+
+        stripe_events = await db.purge_stripe_events()
+        logger.info(f"[SCHEDULER] Maintenance: {stripe_events} processed Stripe events removed")
+        return removed
+
+    except Exception as e:
+        logger.error(f"[SCHEDULER] Error in daily maintenance: {e}")
+        return 0
+
+
+# ============================================
+# FATIAS COM LEASE (vários nós)
+# ============================================
+
+# Fatias já concluídas ou com lease vigente de outro nó (não adianta tentar)
+BUSY_SHARDS_QUERY = """
+    SELECT shard FROM scheduler_runs
+    WHERE job_name = $1 AND run_key = $2
+    AND (finished_at IS NOT NULL OR lease_until > NOW())
+"""
+
+# Reivindica a fatia: primeira vez no período, ou lease de um nó que caiu expirou
+CLAIM_SHARD_QUERY = """
+    INSERT INTO scheduler_runs (job_name, run_key, shard, owner, lease_until)
+    VALUES ($1, $2, $3, $4, NOW() + make_interval(secs => $5))
+    ON CONFLICT (job_name, run_key, shard) DO UPDATE
+    SET owner = EXCLUDED.owner,
+        lease_until = EXCLUDED.lease_until,
+        attempts = scheduler_runs.attempts + 1
+    WHERE scheduler_runs.finished_at IS NULL
+    AND scheduler_runs.lease_until <= NOW()
+    RETURNING shard
+"""
+
+RENEW_SHARD_QUERY = """
+    UPDATE scheduler_runs SET lease_until = NOW() + make_interval(secs => $5)
+    WHERE job_name = $1 AND run_key = $2 AND shard = $3 AND owner = $4 AND finished_at IS NULL
+"""
+
+FINISH_SHARD_QUERY = """
+    UPDATE scheduler_runs SET finished_at = NOW(), processed = $5
+    WHERE job_name = $1 AND run_key = $2 AND shard = $3 AND owner = $4
+"""
+
+ShardHandler = Callable[[int, int], Awaitable[int]]
+
+
 # ============================================
 # BACKGROUND SCHEDULER
 # ============================================
@@ -431,18 +549,30 @@ class NotificationScheduler:
     """
     Scheduler robusto que roda em background para enviar notificacoes.
     Com retry queue, rate limiting e tratamento de erros.
+
+    Todo processo roda o loop; o trabalho diário é repartido em fatias
+    (hash do user_id) e cada fatia é reivindicada por um único nó. Lembretes
+    são reivindicados direto da fila de next_fire_at.
     """
 
-    def __init__(self):
+    def __init__(
+        self,
+        shards: int = SCHEDULER_SHARDS,
+        lease_seconds: int = SCHEDULER_LEASE_SECONDS,
+        owner: str = NODE_ID
+    ):
+        self.shards = max(1, shards)
+        self.lease_seconds = lease_seconds
+        self.owner = owner
         self.running = False
         self.task = None
         self.retry_task = None
-        self.last_reminder_check = None
-        self.last_engagement_check = None
         self.stats = {
             "reminders_sent": 0,
             "engagement_sent": 0,
+            "timeline_rows_compacted": 0,
             "retries_processed": 0,
+            "shards_run": 0,
             "errors": 0
         }
 
@@ -454,7 +584,7 @@ class NotificationScheduler:
         self.running = True
         self.task = asyncio.create_task(self._run_loop())
         self.retry_task = asyncio.create_task(self._retry_loop())
-        logger.info("[SCHEDULER] Notification scheduler started")
+        logger.info(f"[SCHEDULER] Notification scheduler started ({self.owner}, {self.shards} shards)")
 
     async def stop(self):
         """Para o scheduler"""
@@ -477,36 +607,77 @@ class NotificationScheduler:
         logger.info("[SCHEDULER] Notification scheduler stopped")
         logger.info(f"[SCHEDULER] Final stats: {self.stats}")
 
+    async def run_job(self, pool, job_name: str, run_key: str, shards: int, handler: ShardHandler) -> int:
+        """
+        Roda as fatias livres de um job no período run_key.
+        Cada fatia reivindicada tem o lease renovado enquanto roda e é
+        marcada como concluída no fim; se o handler falhar, o lease expira
+        e a fatia volta a ser reivindicável (por este ou outro nó).
+        """
+        async with pool.acquire() as conn:
+            busy = {row["shard"] for row in await conn.fetch(BUSY_SHARDS_QUERY, job_name, run_key)}
+
+        total = 0
+        # Ordem aleatória: nós que começam juntos tendem a pegar fatias diferentes
+        for shard in random.sample(range(shards), shards):
+            if shard in busy:
+                continue
+            async with pool.acquire() as conn:
+                claimed = await conn.fetchval(
+                    CLAIM_SHARD_QUERY, job_name, run_key, shard, self.owner, float(self.lease_seconds)
+                )
+            if claimed is None:
+                continue
+
+            heartbeat = asyncio.create_task(self._renew_lease(pool, job_name, run_key, shard))
+            try:
+                count = await handler(shard, shards)
+            finally:
+                heartbeat.cancel()
+
+            async with pool.acquire() as conn:
+                await conn.execute(FINISH_SHARD_QUERY, job_name, run_key, shard, self.owner, count or 0)
+            self.stats["shards_run"] += 1
+            total += count or 0
+        return total
+
+    async def _renew_lease(self, pool, job_name: str, run_key: str, shard: int):
+        """Mantém o lease da fatia enquanto o handler roda"""
+        while True:
+            await asyncio.sleep(self.lease_seconds / 3)
+            try:
+                async with pool.acquire() as conn:
+                    await conn.execute(
+                        RENEW_SHARD_QUERY, job_name, run_key, shard, self.owner, float(self.lease_seconds)
+                    )
+            except Exception as e:
+                logger.error(f"[SCHEDULER] Error renewing lease {job_name}/{run_key}/{shard}: {e}")
+
+    async def run_due_jobs(self, pool, now: datetime):
+        """Jobs do momento; o run_key define o período (uma execução por período)"""
+        # Lembretes vencidos a cada minuto: a reivindicação (SKIP LOCKED) já reparte entre os nós
+        self.stats["reminders_sent"] += await send_reminder_notifications()
+
+        # Enviar engajamento uma vez por dia (as 13h UTC = 10h Brasilia)
+        if now.hour == 13:
+            count = await self.run_job(
+                pool, "engagement", now.strftime("%Y-%m-%d"), self.shards, send_engagement_notifications
+            )
+            self.stats["engagement_sent"] += count
+
+        # Manutencao uma vez por dia (as 6h UTC, fora do pico), em um único nó
+        if now.hour == 6:
+            count = await self.run_job(
+                pool, "maintenance", now.strftime("%Y-%m-%d"), 1, lambda shard, shards: run_daily_maintenance()
+            )
+            self.stats["timeline_rows_compacted"] += count
+
     async def _run_loop(self):
         """Loop principal do scheduler"""
         while self.running:
             try:
-                now = datetime.utcnow()
-
-                # Enviar lembretes a cada hora (nos primeiros 5 minutos)
-                should_send_reminders = (
-                    now.minute < 5 and
-                    (self.last_reminder_check is None or
-                     self.last_reminder_check.hour != now.hour or
-                     self.last_reminder_check.day != now.day)
-                )
-
-                if should_send_reminders:
-                    count = await send_reminder_notifications()
-                    self.stats["reminders_sent"] += count
-                    self.last_reminder_check = now
-
-                # Enviar engajamento uma vez por dia (as 13h UTC = 10h Brasilia)
-                should_send_engagement = (
-                    now.hour == 13 and
-                    (self.last_engagement_check is None or
-                     self.last_engagement_check.day != now.day)
-                )
-
-                if should_send_engagement:
-                    count = await send_engagement_notifications()
-                    self.stats["engagement_sent"] += count
-                    self.last_engagement_check = now
+                db = await get_db()
+                await self.run_due_jobs(db.pool, datetime.utcnow())
 
                 # Esperar 1 minuto antes de verificar novamente
                 await asyncio.sleep(60)
@@ -527,8 +698,9 @@ class NotificationScheduler:
                 if count:
                     self.stats["retries_processed"] += count
 
-                # Verificar retry queue a cada 30 segundos
-                await asyncio.sleep(30)
+                # Lote cheio: pode haver mais vencidos; senão verificar a cada 30 segundos
+                if count < retry_queue.batch_size:
+                    await asyncio.sleep(30)
 
             except asyncio.CancelledError:
                 break
@@ -540,9 +712,10 @@ class NotificationScheduler:
         """Retorna estatisticas do scheduler"""
         return {
             **self.stats,
-            "retry_queue_size": len(retry_queue.queue),
+            "retry_queue_size": retry_queue.size,
             "rate_limit_remaining": rate_limiter.max_per_minute - len(rate_limiter.timestamps),
-            "running": self.running
+            "running": self.running,
+            "owner": self.owner
         }
 
 
@@ -1,76 +1,328 @@
 """
 AiSyster - Serviço de PDF
-Converte PDFs em imagens para análise pelo Claude
+Converte PDFs em texto (quando há camada de texto) ou imagens para análise pelo Claude
 """
 
 import io
+import math
 import base64
-from typing import List, Tuple
+import asyncio
+import hashlib
+import multiprocessing
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import List, Optional, Tuple
 
 import pypdfium2 as pdfium
 
+from app.config import PDF_WORKERS, PDF_IMAGE_TOKEN_BUDGET, PDF_CACHE_MAX_BYTES
+
 
 # Configurações
-MAX_PDF_PAGES = 5  # Máximo de páginas por PDF
+MAX_PDF_PAGES = 5  # Máximo de páginas por PDF (modo imagem)
 MAX_PDF_SIZE = 10 * 1024 * 1024  # 10MB
-DPI = 150  # Resolução das imagens (150 é bom equilíbrio qualidade/tamanho)
+DPI = 150  # Resolução máxima das imagens (150 é bom equilíbrio qualidade/tamanho)
+MIN_DPI = 72  # Abaixo disso o texto fica ilegível
+MAX_IMAGE_EDGE = 1568  # Claude reduz imagens com lado maior que isso (pixels além são desperdício)
+PIXELS_PER_TOKEN = 750  # Custo aproximado de imagem no Claude: (largura * altura) / 750
 
+# Camada de texto: PDFs digitais vão como texto (mais barato e mais fiel que imagem)
+MIN_TEXT_CHARS_PER_PAGE = 100  # Página "escaneada" tem pouco ou nenhum texto extraível
+MAX_PDF_TEXT_PAGES = 50
+MAX_PDF_TEXT_CHARS = 60000  # ~15k tokens
 
-def pdf_to_images(pdf_bytes: bytes) -> List[Tuple[str, str]]:
+
+# ============================================
+# RENDERIZAÇÃO (executada nos processos do pool)
+# ============================================
+
+def _open_pdf(pdf_bytes: bytes) -> pdfium.PdfDocument:
+    try:
+        return pdfium.PdfDocument(pdf_bytes)
+    except Exception as e:
+        raise ValueError(f"PDF inválido ou corrompido: {str(e)}")
+
+
+def _inspect_pdf(pdf_bytes: bytes) -> dict:
     """
-    Converte PDF em lista de imagens base64.
+    Lê estrutura do PDF: total de páginas, tamanho (pontos) das páginas
+    que iriam como imagem e o texto extraível das primeiras páginas.
+    """
+    pdf = _open_pdf(pdf_bytes)
+    try:
+        n_pages = len(pdf)
+        sizes = []
+        texts = []
+        for i in range(min(n_pages, MAX_PDF_TEXT_PAGES)):
+            page = pdf[i]
+            if i < MAX_PDF_PAGES:
+                sizes.append(page.get_size())
+            textpage = page.get_textpage()
+            texts.append(textpage.get_text_range().strip())
+            textpage.close()
+            page.close()
+        return {"pages": n_pages, "sizes": sizes, "texts": texts}
+    finally:
+        pdf.close()
 
-    Args:
-        pdf_bytes: Bytes do arquivo PDF
 
-    Returns:
-        Lista de tuplas (base64_data, media_type)
+def _render_page(pdf_bytes: bytes, index: int, scale: float, quality: int) -> str:
+    """Renderiza uma página como JPEG base64"""
+    pdf = _open_pdf(pdf_bytes)
+    try:
+        page = pdf[index]
+        # scale = DPI / 72 (72 é o DPI padrão do PDF)
+        bitmap = page.render(scale=scale)
+        pil_image = bitmap.to_pil()
 
-    Raises:
-        ValueError: Se PDF inválido ou muito grande
+        # JPEG sem optimize=True: o passe extra de Huffman custa mais CPU do que economiza em bytes
+        img_buffer = io.BytesIO()
+        pil_image.save(img_buffer, format='JPEG', quality=quality)
+        bitmap.close()
+        page.close()
+        return base64.b64encode(img_buffer.getvalue()).decode('utf-8')
+    finally:
+        pdf.close()
+
+
+# ============================================
+# PLANEJAMENTO (DPI/qualidade pelo orçamento de tokens)
+# ============================================
+
+def plan_render(sizes: List[Tuple[float, float]], token_budget: int = PDF_IMAGE_TOKEN_BUDGET) -> List[Tuple[float, int]]:
+    """
+    Escolhe (scale, qualidade JPEG) por página para caber no orçamento de tokens.
+
+    Cada página recebe budget/páginas tokens -> área em pixels -> escala,
+    limitada entre MIN_DPI e DPI e ao lado máximo útil do Claude.
+    Páginas com resolução menor ganham JPEG de qualidade maior para manter o texto legível.
     """
+    if not sizes:
+        return []
+    per_page_pixels = (token_budget / len(sizes)) * PIXELS_PER_TOKEN
+
+    plan = []
+    for width, height in sizes:
+        scale = math.sqrt(per_page_pixels / max(width * height, 1.0))
+        scale = min(scale, DPI / 72, MAX_IMAGE_EDGE / max(width, height, 1.0))
+        scale = max(scale, MIN_DPI / 72)
+        quality = 85 if scale * 72 >= 110 else 90
+        plan.append((scale, quality))
+    return plan
+
+
+def _text_content(inspection: dict) -> Optional[str]:
+    """Texto do PDF se todas as páginas têm camada de texto; None para PDFs escaneados"""
+    texts = inspection["texts"]
+    if not texts or any(len(t) < MIN_TEXT_CHARS_PER_PAGE for t in texts):
+        return None
+
+    parts = []
+    total = 0
+    for i, text in enumerate(texts):
+        chunk = f"--- Página {i + 1} ---\n{text}"
+        if total + len(chunk) > MAX_PDF_TEXT_CHARS:
+            parts.append(chunk[:max(MAX_PDF_TEXT_CHARS - total, 0)])
+            parts.append("[... texto truncado ...]")
+            break
+        parts.append(chunk)
+        total += len(chunk)
+
+    if inspection["pages"] > len(texts):
+        parts.append(f"[... PDF tem {inspection['pages']} páginas, apenas as primeiras {len(texts)} foram incluídas ...]")
+    return "\n\n".join(parts)
+
+
+def _validate(pdf_bytes: bytes):
     if len(pdf_bytes) > MAX_PDF_SIZE:
         raise ValueError(f"PDF muito grande. Máximo {MAX_PDF_SIZE // (1024*1024)}MB.")
 
+
+def _build_result(inspection: dict, images: Optional[List[Tuple[str, str]]], text: Optional[str], plan) -> dict:
+    return {
+        "mode": "text" if text is not None else "images",
+        "pages": inspection["pages"],
+        "pages_processed": len(inspection["texts"]) if text is not None else len(images or []),
+        "text": text,
+        "images": images,
+        "dpi": [round(scale * 72) for scale, _ in plan] if plan else None,
+        "cached": False
+    }
+
+
+# ============================================
+# CACHE POR CONTEÚDO
+# ============================================
+
+class PdfCache:
+    """LRU em memória (limitado por bytes): sha256 do PDF -> resultado processado"""
+
+    def __init__(self, max_bytes: int = PDF_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, Tuple[dict, int]]" = OrderedDict()
+        self._total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(pdf_bytes: bytes, token_budget: int) -> str:
+        return f"{hashlib.sha256(pdf_bytes).hexdigest()}:{token_budget}"
+
+    @staticmethod
+    def _size(result: dict) -> int:
+        size = len(result.get("text") or "")
+        for data, _ in result.get("images") or []:
+            size += len(data)
+        return size
+
+    def get(self, key: str) -> Optional[dict]:
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return dict(entry[0], cached=True)
+
+    def put(self, key: str, result: dict):
+        size = self._size(result)
+        if size > self.max_bytes:
+            return
+        if key in self._entries:
+            self._total_bytes -= self._entries.pop(key)[1]
+        self._entries[key] = (result, size)
+        self._total_bytes += size
+        while self._total_bytes > self.max_bytes and self._entries:
+            _, (_, evicted) = self._entries.popitem(last=False)
+            self._total_bytes -= evicted
+
+    def clear(self):
+        self._entries.clear()
+        self._total_bytes = 0
+
+    def get_stats(self) -> dict:
+        return {
+            "entries": len(self._entries),
+            "total_bytes": self._total_bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses
+        }
+
+
+# Instância global
+pdf_cache = PdfCache()
+
+
+# ============================================
+# POOL DE PROCESSOS
+# ============================================
+
+_executor: Optional[ProcessPoolExecutor] = None
+
+
+def _get_executor() -> ProcessPoolExecutor:
+    """Pool criado sob demanda (spawn: seguro mesmo com threads no processo principal)"""
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(
+            max_workers=max(PDF_WORKERS, 1),
+            mp_context=multiprocessing.get_context("spawn")
+        )
+    return _executor
+
+
+def shutdown_pdf_pool():
+    """Encerra o pool (shutdown da aplicação)"""
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+
+async def _run_in_pool(func, *args):
+    global _executor
+    loop = asyncio.get_running_loop()
     try:
-        pdf = pdfium.PdfDocument(pdf_bytes)
-    except Exception as e:
-        raise ValueError(f"PDF inválido ou corrompido: {str(e)}")
+        return await loop.run_in_executor(_get_executor(), func, *args)
+    except BrokenProcessPool:
+        # Worker morreu (OOM, PDF malicioso...): recriar o pool e tentar de novo uma vez
+        print("[PDF] Pool de processos quebrado, recriando")
+        _executor = None
+        return await loop.run_in_executor(_get_executor(), func, *args)
 
-    n_pages = len(pdf)
-    if n_pages == 0:
-        raise ValueError("PDF está vazio.")
 
-    # Limitar número de páginas
-    pages_to_process = min(n_pages, MAX_PDF_PAGES)
+# ============================================
+# API
+# ============================================
 
-    images = []
-    for i in range(pages_to_process):
-        page = pdf[i]
+async def process_pdf(pdf_bytes: bytes, token_budget: int = PDF_IMAGE_TOKEN_BUDGET) -> dict:
+    """
+    Processa o PDF fora do event loop.
 
-        # Renderizar página como imagem
-        # scale = DPI / 72 (72 é o DPI padrão do PDF)
-        scale = DPI / 72
-        bitmap = page.render(scale=scale)
+    - PDF com camada de texto em todas as páginas -> texto (sem rasterizar)
+    - Caso contrário -> páginas renderizadas em paralelo no pool de processos,
+      com DPI/qualidade ajustados ao orçamento de tokens
+    - Resultado guardado por hash do conteúdo: reenvio do mesmo PDF não reprocessa
 
-        # Converter para PIL Image
-        pil_image = bitmap.to_pil()
+    Returns:
+        {"mode": "text"|"images", "pages", "pages_processed", "text", "images", "dpi", "cached"}
 
-        # Converter para JPEG (menor tamanho que PNG)
-        img_buffer = io.BytesIO()
-        pil_image.save(img_buffer, format='JPEG', quality=85, optimize=True)
-        img_bytes = img_buffer.getvalue()
+    Raises:
+        ValueError: Se PDF inválido ou muito grande
+    """
+    _validate(pdf_bytes)
 
-        # Converter para base64
-        img_base64 = base64.b64encode(img_bytes).decode('utf-8')
-        images.append((img_base64, 'image/jpeg'))
+    key = PdfCache.key(pdf_bytes, token_budget)
+    cached = pdf_cache.get(key)
+    if cached is not None:
+        return cached
 
-        # Limpar memória
-        bitmap.close()
+    inspection = await _run_in_pool(_inspect_pdf, pdf_bytes)
+    if inspection["pages"] == 0:
+        raise ValueError("PDF está vazio.")
+
+    text = _text_content(inspection)
+    plan = None
+    images = None
+    if text is None:
+        plan = plan_render(inspection["sizes"], token_budget)
+        encoded = await asyncio.gather(*(
+            _run_in_pool(_render_page, pdf_bytes, i, scale, quality)
+            for i, (scale, quality) in enumerate(plan)
+        ))
+        images = [(data, 'image/jpeg') for data in encoded]
+
+    result = _build_result(inspection, images, text, plan)
+    pdf_cache.put(key, result)
+    return result
 
-    pdf.close()
 
-    return images
+def pdf_to_images(pdf_bytes: bytes) -> List[Tuple[str, str]]:
+    """
+    Converte PDF em lista de imagens base64 (síncrono, no processo atual).
+    Use process_pdf em código assíncrono.
+
+    Args:
+        pdf_bytes: Bytes do arquivo PDF
+
+    Returns:
+        Lista de tuplas (base64_data, media_type)
+
+    Raises:
+        ValueError: Se PDF inválido ou muito grande
+    """
+    _validate(pdf_bytes)
+    inspection = _inspect_pdf(pdf_bytes)
+    if inspection["pages"] == 0:
+        raise ValueError("PDF está vazio.")
+
+    plan = plan_render(inspection["sizes"])
+    return [
+        (_render_page(pdf_bytes, i, scale, quality), 'image/jpeg')
+        for i, (scale, quality) in enumerate(plan)
+    ]
 
 
 def get_pdf_info(pdf_bytes: bytes) -> dict:
@@ -205,8 +205,19 @@ class PolicyRouter:
         - user_hash
         - safety_flags
         """
+        # Nível decidido antes de montar o dicionário: sem custo quando o nível está desligado
+        if result.risk_level in [RiskLevel.CRITICAL, RiskLevel.HIGH]:
+            level = logging.WARNING
+        elif result.risk_level == RiskLevel.MEDIUM:
+            level = logging.INFO
+        elif self.config.log_all:
+            level = logging.DEBUG
+        else:
+            return
+        if not logger.isEnabledFor(level):
+            return
+
         log_data = {
-            "event": event_type,
             "request_id": result.request_id,
             "user_hash": user_id[:8] + "...",  # Hash parcial para privacidade
             "risk_level": result.risk_level.value,
@@ -220,13 +231,9 @@ class PolicyRouter:
         if extra:
             log_data.update(extra)
 
-        # Log nivel baseado no risco
-        if result.risk_level in [RiskLevel.CRITICAL, RiskLevel.HIGH]:
-            logger.warning(f"[POLICY] {event_type}: {log_data}")
-        elif result.risk_level == RiskLevel.MEDIUM:
-            logger.info(f"[POLICY] {event_type}: {log_data}")
-        elif self.config.log_all:
-            logger.debug(f"[POLICY] {event_type}: {log_data}")
+        # log_all (risco baixo) = um evento por mensagem: amostrado
+        log_data["sampled"] = level == logging.DEBUG
+        logger.log(level, "policy.%s", event_type, extra=log_data)
 
 
 # Instancia global (sera configurada pelo config.py)
@@ -1203,7 +1203,7 @@ async def get_emotional_alerts(
         table_exists = await conn.fetchval("""
             SELECT EXISTS (
                 SELECT FROM information_schema.tables
-                WHERE table_name = 'emotional_timeline'
+                WHERE table_name = 'emotional_daily_rollups'
             )
         """)
 
@@ -1219,10 +1219,10 @@ async def get_emotional_alerts(
                 SELECT
                     user_id,
                     emotion,
-                    AVG(intensity) as avg_intensity,
-                    COUNT(*) as count
-                FROM emotional_timeline
-                WHERE created_at > NOW() - INTERVAL '7 days'
+                    SUM(intensity_sum) / SUM(entry_count) as avg_intensity,
+                    SUM(entry_count) as count
+                FROM emotional_daily_rollups
+                WHERE day > (NOW() AT TIME ZONE 'UTC')::date - 7
                 AND emotion IN ('ansioso', 'triste', 'angustiado', 'estressado', 'deprimido', 'medo', 'solitário')
                 GROUP BY user_id, emotion
             ),
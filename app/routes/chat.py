@@ -2,17 +2,18 @@
 AiSyster - Rotas de Chat
 """
 
-import base64
 from typing import Optional, List, Dict
 from fastapi import APIRouter, Depends, HTTPException, Request, UploadFile, File, Form
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 
 from app.auth import get_current_user
 from app.database import get_db, Database
-from app.ai_service import AIService
+from app.ai_service import AIService, MessageLimitReached
 from app.security import rate_limiter
 from app.config import FREE_MESSAGE_LIMIT, FREE_WARNING_AT, FREE_URGENT_AT, TRIAL_MESSAGES_LIMIT_ANONYMOUS
-from app.pdf_service import pdf_to_images, MAX_PDF_SIZE
+from app.pdf_service import process_pdf, MAX_PDF_SIZE
+from app.image_service import preprocess_image
+from app.trial_sessions import get_trial_store
 
 # Tipos de arquivo aceitos
 ALLOWED_IMAGE_TYPES = ["image/jpeg", "image/png", "image/gif", "image/webp"]
@@ -22,8 +23,6 @@ MAX_IMAGE_SIZE = 20 * 1024 * 1024  # 20MB (fotos de celular podem ser grandes)
 
 router = APIRouter(prefix="/chat", tags=["Chat"])
 
-# In-memory storage for trial sessions (in production, use Redis)
-trial_sessions: Dict[str, dict] = {}
 
 
 # ============================================
@@ -37,7 +36,7 @@ class ChatRequest(BaseModel):
 
 class TrialChatRequest(BaseModel):
     message: str
-    session_id: str
+    session_id: str = Field(..., min_length=1, max_length=128)
 
 
 class WebSource(BaseModel):
@@ -141,6 +140,8 @@ async def send_message(
             conversation_id=request.conversation_id,
             detected_location=detected_location  # Localizacao detectada pelo IP
         )
+    except MessageLimitReached as e:
+        raise HTTPException(status_code=402, detail=str(e))
     except Exception as e:
         # Log detalhado do erro para debug
         import traceback
@@ -154,11 +155,10 @@ async def send_message(
             detail=f"Erro ao processar mensagem: {str(e)}"
         )
 
-    # Contador já é incrementado no ai_service.chat()
+    # Contador incrementado atomicamente pelo ai_service.chat() (valor já atualizado)
     # Aqui só calculamos o aviso de limite para usuários free
     if not is_premium:
-        # Mensagem já foi contada pelo ai_service, então +1 no valor lido
-        messages_used += 1
+        messages_used = result["messages_used"]
 
         # Definir aviso de limite
         if messages_used >= FREE_MESSAGE_LIMIT:
@@ -245,10 +245,16 @@ async def send_message_with_file(
     image_data = None
     image_media_type = None
     images = None
+    pdf_text = None
+    pdf_pages = 0
 
     if is_pdf:
         try:
-            images = pdf_to_images(file_bytes)
+            # Fora do event loop (pool de processos), com cache por conteúdo
+            pdf = await process_pdf(file_bytes)
+            images = pdf["images"]
+            pdf_text = pdf["text"]
+            pdf_pages = pdf["pages"]
         except ValueError as e:
             raise HTTPException(status_code=400, detail=str(e))
         except Exception as e:
@@ -257,9 +263,13 @@ async def send_message_with_file(
                 detail=f"Erro ao processar PDF: {str(e)}"
             )
     else:
-        # Imagem normal
-        image_data = base64.b64encode(file_bytes).decode('utf-8')
-        image_media_type = file.content_type
+        # Imagem: reduzida ao limite útil do modelo, sem metadados (fora do event loop)
+        try:
+            processed = await preprocess_image(file_bytes)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        image_data = processed["data"]
+        image_media_type = processed["media_type"]
 
     # Buscar usuário e verificar limites
     user = await db.get_user_by_id(user_id)
@@ -285,8 +295,12 @@ async def send_message_with_file(
             conversation_id=conversation_id,
             image_data=image_data,
             image_media_type=image_media_type,
-            images=images
+            images=images,
+            pdf_text=pdf_text,
+            pdf_pages=pdf_pages
         )
+    except MessageLimitReached as e:
+        raise HTTPException(status_code=402, detail=str(e))
     except Exception as e:
         import traceback
         error_details = traceback.format_exc()
@@ -299,7 +313,7 @@ async def send_message_with_file(
 
     # Calcular aviso de limite
     if not is_premium:
-        messages_used += 1
+        messages_used = result["messages_used"]
         if messages_used >= FREE_MESSAGE_LIMIT:
             limit_warning = "reached"
         elif messages_used >= FREE_URGENT_AT:
@@ -370,18 +384,12 @@ async def trial_chat(
             detail="Muitas mensagens. Aguarde um momento."
         )
 
-    # Inicializar ou buscar sessão
-    if session_id not in trial_sessions:
-        trial_sessions[session_id] = {
-            "messages_count": 0,
-            "messages": [],
-            "ip": client_ip
-        }
-
-    session = trial_sessions[session_id]
+    # Buscar sessão (nova se não existe ou expirou)
+    trial_store = get_trial_store()
+    session = await trial_store.get(session_id)
 
     # Verificar limite
-    if session["messages_count"] >= TRIAL_MESSAGES_LIMIT_ANONYMOUS:
+    if session.messages_count >= TRIAL_MESSAGES_LIMIT_ANONYMOUS:
         raise HTTPException(
             status_code=402,
             detail="Limite de mensagens atingido. Crie uma conta para continuar."
@@ -403,21 +411,24 @@ async def trial_chat(
         "nome": "Visitante"
     }
 
-    # Construir histórico simples
-    history = session["messages"][-6:]  # Últimas 3 trocas
-
     response = await ai_service.chat_trial(
         message=request.message,
-        history=history,
+        history=session.history,  # Últimas 3 trocas (buffer circular)
         user=trial_user
     )
 
-    # Atualizar sessão
-    session["messages_count"] += 1
-    session["messages"].append({"role": "user", "content": request.message})
-    session["messages"].append({"role": "assistant", "content": response})
+    # Atualizar sessão (o limite é conferido de novo na gravação, atomicamente:
+    # pedidos simultâneos da mesma sessão passam juntos pela checagem acima)
+    messages_count = await trial_store.record_turn(
+        session_id, client_ip, request.message, response, limit=TRIAL_MESSAGES_LIMIT_ANONYMOUS
+    )
+    if messages_count is None:
+        raise HTTPException(
+            status_code=402,
+            detail="Limite de mensagens atingido. Crie uma conta para continuar."
+        )
 
-    remaining = TRIAL_MESSAGES_LIMIT_ANONYMOUS - session["messages_count"]
+    remaining = max(TRIAL_MESSAGES_LIMIT_ANONYMOUS - messages_count, 0)
 
     return TrialChatResponse(
         response=response,
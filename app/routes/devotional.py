@@ -4,12 +4,15 @@ AiSyster - Rotas de Devocional
 
 from datetime import date
 from typing import Optional
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, HTTPException, Header
+from fastapi.responses import StreamingResponse, Response
 from pydantic import BaseModel
 
 from app.auth import get_current_user
 from app.database import get_db, Database
 from app.ai_service import AIService
+from app.voice_service import voice_service
+from app.devotional_cache import DevotionalStore, generated_devotional_cache, etag_matches
 
 router = APIRouter(prefix="/devotional", tags=["Devocional"])
 
@@ -129,6 +132,19 @@ Ele vê o quadro completo. Nós vemos um fragmento.""",
 ]
 
 
+def devotional_speech_text(devotional: dict) -> str:
+    """Texto lido no áudio do devocional (mesmo texto no pré-aquecimento do cache TTS)"""
+    return (
+        f"{devotional['versiculo']} {devotional['referencia']}.\n\n"
+        f"{devotional['meditacao']}\n\n"
+        f"{devotional['oracao']}"
+    )
+
+
+# Devocional do dia pré-renderizado (igual para todos os usuários)
+devotional_store = DevotionalStore(DEVOTIONALS)
+
+
 # ============================================
 # ROTAS
 # ============================================
@@ -136,31 +152,55 @@ Ele vê o quadro completo. Nós vemos um fragmento.""",
 @router.get("/today", response_model=DevotionalResponse)
 async def get_today_devotional(
     current_user: dict = Depends(get_current_user),
-    db: Database = Depends(get_db)
+    db: Database = Depends(get_db),
+    if_none_match: Optional[str] = Header(None)
 ):
     """
-    Retorna o devocional do dia
+    Retorna o devocional do dia (da memória, com ETag/Cache-Control).
+    Com If-None-Match igual ao ETag, responde 304 sem corpo.
     """
-    today = date.today()
-
-    # Usa o dia do ano para selecionar devocional (rotaciona)
-    day_of_year = today.timetuple().tm_yday
-    devotional_index = day_of_year % len(DEVOTIONALS)
-    devotional = DEVOTIONALS[devotional_index]
+    rendered = devotional_store.get()
 
-    # Registra que o usuário viu o devocional
+    # Registra que o usuário viu o devocional (enfileirado, gravado em lote)
     await db.log_audit(
         user_id=current_user["user_id"],
         action="devotional_viewed",
-        details={"date": today.isoformat()}
+        details={"date": rendered.day.isoformat()}
     )
 
-    return DevotionalResponse(
-        date=today.isoformat(),
-        versiculo=devotional["versiculo"],
-        referencia=devotional["referencia"],
-        meditacao=devotional["meditacao"],
-        oracao=devotional["oracao"]
+    if etag_matches(if_none_match, rendered.etag):
+        return Response(status_code=304, headers=rendered.headers())
+    return Response(content=rendered.body, media_type="application/json", headers=rendered.headers())
+
+
+@router.get("/today/audio")
+async def get_today_devotional_audio(
+    current_user: dict = Depends(get_current_user),
+    db: Database = Depends(get_db)
+):
+    """
+    Áudio (MP3) do devocional do dia, na voz do usuário.
+    Devocionais são iguais para todos: o áudio vem do cache TTS.
+    """
+    if not voice_service.enabled:
+        raise HTTPException(status_code=503, detail="Serviço de voz indisponível")
+
+    devotional = devotional_store.get().devotional
+
+    profile = await db.get_user_profile(current_user["user_id"])
+    user_voice = profile.get("voice", "nova") if profile else "nova"
+
+    success, audio_stream, error = await voice_service.stream_text_to_speech(
+        devotional_speech_text(devotional),
+        voice=user_voice
+    )
+    if not success:
+        raise HTTPException(status_code=500, detail=error)
+
+    return StreamingResponse(
+        audio_stream,
+        media_type="audio/mpeg",
+        headers={"Content-Disposition": "inline; filename=devocional.mp3"}
     )
 
 
@@ -173,10 +213,7 @@ async def save_devotional(
     """
     Salva o devocional do dia na coleção do usuário
     """
-    today = date.today()
-    day_of_year = today.timetuple().tm_yday
-    devotional_index = day_of_year % len(DEVOTIONALS)
-    devotional = DEVOTIONALS[devotional_index]
+    devotional = devotional_store.get().devotional
 
     # Salva como conteúdo salvo
     async with db.pool.acquire() as conn:
@@ -212,8 +249,9 @@ async def generate_devotional(
             "message": "Devocionais personalizados estão disponíveis para assinantes."
         }
 
+    # Mesmo tema no mesmo dia = mesma geração para todos os assinantes
     ai_service = AIService(db)
-    devotional = await ai_service.generate_devotional(tema)
+    devotional = await generated_devotional_cache.get_or_create(tema, ai_service.generate_devotional)
 
     return DevotionalResponse(
         date=date.today().isoformat(),
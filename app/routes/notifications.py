@@ -12,8 +12,7 @@ from uuid import UUID
 from app.auth import get_current_user
 from app.database import get_db, Database
 from app.config import ADMIN_EMAILS
-from app.email_service import email_service
-from app.routes.push import send_push_to_user
+from app.notification_campaigns import materialize_campaign, get_campaign_progress, delivery_worker
 
 router = APIRouter(prefix="/notifications", tags=["Notificações"])
 
@@ -106,288 +105,67 @@ async def send_notification(
 
         notification_id = row["id"]
 
-        # Se tem agendamento, apenas salva
-        if notification.scheduled_at:
-            return {
-                "message": "Notificação agendada com sucesso",
-                "notification_id": str(notification_id),
-                "scheduled_at": notification.scheduled_at.isoformat()
-            }
-
-        # Buscar destinatários com base no público-alvo
-        if notification.target_audience == "all":
-            users = await conn.fetch(
-                """
-                SELECT u.id, u.email, up.nome, up.push_notifications, up.email_notifications, up.language
-                FROM users u
-                LEFT JOIN user_profiles up ON u.id = up.user_id
-                WHERE u.is_active = TRUE
-                """
-            )
-        elif notification.target_audience == "premium":
-            users = await conn.fetch(
-                """
-                SELECT u.id, u.email, up.nome, up.push_notifications, up.email_notifications, up.language
-                FROM users u
-                LEFT JOIN user_profiles up ON u.id = up.user_id
-                WHERE u.is_active = TRUE AND u.is_premium = TRUE
-                """
-            )
-        elif notification.target_audience == "free":
-            users = await conn.fetch(
-                """
-                SELECT u.id, u.email, up.nome, up.push_notifications, up.email_notifications, up.language
-                FROM users u
-                LEFT JOIN user_profiles up ON u.id = up.user_id
-                WHERE u.is_active = TRUE AND u.is_premium = FALSE
-                """
-            )
-        elif notification.target_audience == "specific" and notification.specific_users:
-            user_ids = [UUID(uid) for uid in notification.specific_users]
-            users = await conn.fetch(
-                """
-                SELECT u.id, u.email, up.nome, up.push_notifications, up.email_notifications, up.language
-                FROM users u
-                LEFT JOIN user_profiles up ON u.id = up.user_id
-                WHERE u.id = ANY($1) AND u.is_active = TRUE
-                """,
-                user_ids
-            )
-        else:
-            users = []
-
-        # Atualizar total de destinatários
-        await conn.execute(
-            "UPDATE notifications SET total_recipients = $1 WHERE id = $2",
-            len(users), notification_id
-        )
+    # Se tem agendamento, apenas salva
+    if notification.scheduled_at:
+        return {
+            "message": "Notificação agendada com sucesso",
+            "notification_id": str(notification_id),
+            "scheduled_at": notification.scheduled_at.isoformat()
+        }
 
-        # Criar registros de entrega para cada usuário
-        for user in users:
-            # Registrar para push se habilitado
-            if notification.send_push and user.get("push_notifications", True):
-                await conn.execute(
-                    """
-                    INSERT INTO notification_deliveries
-                    (notification_id, user_id, channel, status)
-                    VALUES ($1, $2, 'push', 'pending')
-                    """,
-                    notification_id, user["id"]
-                )
-
-            # Registrar para email se habilitado
-            if notification.send_email and user.get("email_notifications", True):
-                await conn.execute(
-                    """
-                    INSERT INTO notification_deliveries
-                    (notification_id, user_id, channel, status)
-                    VALUES ($1, $2, 'email', 'pending')
-                    """,
-                    notification_id, user["id"]
-                )
-
-    # Enviar em background
+    # Destinatários e envio em background: o admin recebe o id na hora e acompanha por /progress
     background_tasks.add_task(
-        process_notification_delivery,
+        run_campaign,
         str(notification_id),
-        notification.title,
-        notification.message,
         notification.send_push,
         notification.send_email,
-        users
+        notification.target_audience,
+        notification.specific_users
     )
 
     return {
         "message": "Notificação sendo enviada",
         "notification_id": str(notification_id),
-        "total_recipients": len(users)
+        "progress_url": f"/notifications/{notification_id}/progress"
     }
 
 
-async def process_notification_delivery(
+async def run_campaign(
     notification_id: str,
-    title: str,
-    message: str,
     send_push: bool,
     send_email: bool,
-    users: list
+    target_audience: str,
+    specific_users: Optional[List[str]] = None
 ):
-    """Processa o envio das notificações em background"""
+    """Materializa as entregas (uma query) e acorda o worker de envio"""
     from app.database import get_db_pool
-    import asyncio
 
     pool = await get_db_pool()
+    try:
+        result = await materialize_campaign(
+            pool, notification_id, target_audience, send_push, send_email, specific_users
+        )
+    except Exception as e:
+        print(f"[NOTIFICATION] Erro ao preparar destinatários: {e}")
+        await pool.execute(
+            "UPDATE notifications SET status = 'failed' WHERE id = $1",
+            UUID(notification_id)
+        )
+        return
 
-    # Contadores separados para Push e Email
-    push_sent = 0
-    push_failed = 0
-    email_sent = 0
-    email_failed = 0
-    total_users = len(users)
-
-    print(f"[NOTIFICATION] Iniciando envio para {total_users} usuários...")
-
-    for i, user in enumerate(users):
-        user_id = str(user["id"])
-        email = user["email"]
-        nome = user.get("nome") or email.split("@")[0]
-        language = user.get("language", "pt") or "pt"
-        if language == "auto" or language not in ["pt", "en", "es"]:
-            language = "pt"
-
-        # Enviar Push (só se tiver subscription)
-        if send_push and user.get("push_notifications", True):
-            try:
-                # Verificar se já enviou este push para este usuário (evita duplicados)
-                already_sent = await pool.fetchval(
-                    """
-                    SELECT COUNT(*) FROM notification_deliveries nd
-                    JOIN notifications n ON nd.notification_id = n.id
-                    WHERE nd.user_id = $1
-                    AND nd.channel = 'push'
-                    AND nd.status = 'sent'
-                    AND n.title = $2
-                    AND nd.sent_at > NOW() - INTERVAL '24 hours'
-                    """,
-                    user["id"], title
-                )
-
-                if already_sent and already_sent > 0:
-                    print(f"[NOTIFICATION] Push já enviado para {email}, pulando...")
-                    await pool.execute(
-                        """
-                        UPDATE notification_deliveries
-                        SET status = 'sent', sent_at = NOW(), error_message = 'Já enviado anteriormente'
-                        WHERE notification_id = $1 AND user_id = $2 AND channel = 'push'
-                        """,
-                        UUID(notification_id), user["id"]
-                    )
-                    push_sent += 1
-                    continue
-
-                success = await send_push_to_user(user_id, title, message)
-                status = "sent" if success else "failed"
-
-                await pool.execute(
-                    """
-                    UPDATE notification_deliveries
-                    SET status = $1, sent_at = NOW()
-                    WHERE notification_id = $2 AND user_id = $3 AND channel = 'push'
-                    """,
-                    status, UUID(notification_id), user["id"]
-                )
-
-                if success:
-                    push_sent += 1
-                else:
-                    push_failed += 1
-            except Exception as e:
-                print(f"[NOTIFICATION] Erro push {email}: {e}")
-                push_failed += 1
-
-        # Enviar Email
-        if send_email and user.get("email_notifications", True):
-            try:
-                # Verificar se já enviou este email para este usuário (evita duplicados)
-                already_sent = await pool.fetchval(
-                    """
-                    SELECT COUNT(*) FROM notification_deliveries nd
-                    JOIN notifications n ON nd.notification_id = n.id
-                    WHERE nd.user_id = $1
-                    AND nd.channel = 'email'
-                    AND nd.status = 'sent'
-                    AND n.title = $2
-                    AND nd.sent_at > NOW() - INTERVAL '24 hours'
-                    """,
-                    user["id"], title
-                )
-
-                if already_sent and already_sent > 0:
-                    print(f"[NOTIFICATION] Email já enviado para {email}, pulando...")
-                    # Marcar como já enviado
-                    await pool.execute(
-                        """
-                        UPDATE notification_deliveries
-                        SET status = 'sent', sent_at = NOW(), error_message = 'Já enviado anteriormente'
-                        WHERE notification_id = $1 AND user_id = $2 AND channel = 'email'
-                        """,
-                        UUID(notification_id), user["id"]
-                    )
-                    email_sent += 1
-                    continue
-
-                success = await email_service.send_notification_email(
-                    to=email,
-                    nome=nome,
-                    title=title,
-                    message=message,
-                    language=language
-                )
-                status = "sent" if success else "failed"
-
-                await pool.execute(
-                    """
-                    UPDATE notification_deliveries
-                    SET status = $1, sent_at = NOW()
-                    WHERE notification_id = $2 AND user_id = $3 AND channel = 'email'
-                    """,
-                    status, UUID(notification_id), user["id"]
-                )
-
-                if success:
-                    email_sent += 1
-                else:
-                    email_failed += 1
-            except Exception as e:
-                print(f"[NOTIFICATION] Erro email {email}: {e}")
-                email_failed += 1
-
-        # Calcular totais
-        total_sent = push_sent + email_sent
-        total_failed = push_failed + email_failed
-
-        # Atualizar contagem a cada 5 usuários
-        if (i + 1) % 5 == 0 or (i + 1) == total_users:
-            await pool.execute(
-                """
-                UPDATE notifications
-                SET sent_count = $1, failed_count = $2,
-                    push_sent = $3, push_failed = $4,
-                    email_sent = $5, email_failed = $6
-                WHERE id = $7
-                """,
-                total_sent, total_failed,
-                push_sent, push_failed,
-                email_sent, email_failed,
-                UUID(notification_id)
-            )
-            print(f"[NOTIFICATION] Progresso: {i+1}/{total_users} | Push: {push_sent}ok/{push_failed}falhas | Email: {email_sent}ok/{email_failed}falhas")
-
-        # Pequeno delay para evitar rate limiting (100ms entre emails)
-        if send_email and (i + 1) < total_users:
-            await asyncio.sleep(0.1)
-
-    # Calcular totais finais
-    total_sent = push_sent + email_sent
-    total_failed = push_failed + email_failed
-
-    # Marcar como concluído
-    await pool.execute(
-        """
-        UPDATE notifications
-        SET status = 'sent', sent_at = NOW(),
-            sent_count = $1, failed_count = $2,
-            push_sent = $3, push_failed = $4,
-            email_sent = $5, email_failed = $6
-        WHERE id = $7
-        """,
-        total_sent, total_failed,
-        push_sent, push_failed,
-        email_sent, email_failed,
-        UUID(notification_id)
-    )
+    print(f"[NOTIFICATION] {result['total_recipients']} destinatários | "
+          f"{result['push_deliveries']} push, {result['email_deliveries']} email")
 
-    print(f"[NOTIFICATION] Envio concluído | Push: {push_sent}ok/{push_failed}falhas | Email: {email_sent}ok/{email_failed}falhas")
+    if not result["push_deliveries"] and not result["email_deliveries"]:
+        await pool.execute(
+            "UPDATE notifications SET status = 'sent', sent_at = NOW() WHERE id = $1",
+            UUID(notification_id)
+        )
+        return
+
+    # Entregas ficam 'pending' no banco: o worker deste processo acorda já e os
+    # dos outros processos pegam lotes no próximo poll (SKIP LOCKED)
+    delivery_worker.wake()
 
 
 @router.get("/list")
@@ -477,6 +255,23 @@ async def list_notifications(
     ]
 
 
+@router.get("/{notification_id}/progress")
+async def get_notification_progress(
+    notification_id: str,
+    admin: dict = Depends(verify_admin),
+    db: Database = Depends(get_db)
+):
+    """Progresso do envio de uma campanha (entregas por canal e status)"""
+    try:
+        progress = await get_campaign_progress(db.pool, notification_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="ID inválido")
+
+    if progress is None:
+        raise HTTPException(status_code=404, detail="Notificação não encontrada")
+    return progress
+
+
 @router.get("/stats")
 async def get_notification_stats(
     admin: dict = Depends(verify_admin),
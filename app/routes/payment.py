@@ -9,6 +9,7 @@ import stripe
 
 from app.auth import get_current_user
 from app.database import get_db, Database
+from app.stripe_events import stripe_call, record_event, stripe_event_worker
 from app.config import (
     STRIPE_SECRET_KEY,
     STRIPE_WEBHOOK_SECRET,
@@ -110,7 +111,8 @@ async def create_checkout_session(
     # ============================================
     try:
         # Criar sessão de checkout
-        checkout_session = stripe.checkout.Session.create(
+        checkout_session = await stripe_call(
+            stripe.checkout.Session.create,
             payment_method_types=["card"],
             mode="subscription",
             customer_email=user["email"],
@@ -189,7 +191,8 @@ async def create_portal_session(
 
     try:
         # Criar sessao do portal
-        portal_session = stripe.billing_portal.Session.create(
+        portal_session = await stripe_call(
+            stripe.billing_portal.Session.create,
             customer=customer_id,
             return_url=return_url
         )
@@ -216,7 +219,8 @@ async def cancel_subscription(
 
     try:
         # Cancelar ao final do período (não imediatamente)
-        stripe.Subscription.modify(
+        await stripe_call(
+            stripe.Subscription.modify,
             user["stripe_subscription_id"],
             cancel_at_period_end=True
         )
@@ -249,7 +253,8 @@ async def reactivate_subscription(
         raise HTTPException(status_code=400, detail="Nenhuma assinatura encontrada")
 
     try:
-        stripe.Subscription.modify(
+        await stripe_call(
+            stripe.Subscription.modify,
             user["stripe_subscription_id"],
             cancel_at_period_end=False
         )
@@ -272,7 +277,8 @@ async def stripe_webhook(
     db: Database = Depends(get_db)
 ):
     """
-    Webhook para eventos do Stripe
+    Webhook para eventos do Stripe: verifica a assinatura, grava o evento em
+    stripe_events e responde na hora; o stripe_event_worker aplica o evento
     """
     payload = await request.body()
     sig_header = request.headers.get("stripe-signature")
@@ -286,137 +292,8 @@ async def stripe_webhook(
     except stripe.error.SignatureVerificationError:
         raise HTTPException(status_code=400, detail="Invalid signature")
 
-    # Processar eventos
-    event_type = event["type"]
-    data = event["data"]["object"]
-
-    if event_type == "checkout.session.completed":
-        # Pagamento inicial concluído
-        await handle_checkout_completed(db, data)
-
-    elif event_type == "customer.subscription.updated":
-        # Assinatura atualizada
-        await handle_subscription_updated(db, data)
-
-    elif event_type == "customer.subscription.deleted":
-        # Assinatura cancelada/expirada
-        await handle_subscription_deleted(db, data)
-
-    elif event_type == "invoice.payment_failed":
-        # Pagamento falhou
-        await handle_payment_failed(db, data)
+    # Só grava: o worker processa fora da requisição (reentrega do Stripe = mesmo id, ignorada)
+    if await record_event(db, event, payload):
+        stripe_event_worker.wake()
 
     return {"received": True}
-
-
-# ============================================
-# HANDLERS DE WEBHOOK
-# ============================================
-
-async def handle_checkout_completed(db: Database, session: dict):
-    """
-    Processa checkout concluído - ativa premium
-    """
-    user_id = session.get("metadata", {}).get("user_id")
-    subscription_id = session.get("subscription")
-    customer_id = session.get("customer")
-
-    if not user_id:
-        return
-
-    async with db.pool.acquire() as conn:
-        await conn.execute("""
-            UPDATE users SET
-                is_premium = TRUE,
-                stripe_customer_id = $2,
-                stripe_subscription_id = $3,
-                subscription_status = 'active',
-                subscription_start_date = NOW(),
-                cancel_at_period_end = FALSE
-            WHERE id = $1
-        """, user_id, customer_id, subscription_id)
-
-        # Log de auditoria
-        await db.log_audit(
-            user_id=user_id,
-            action="subscription_created",
-            details={"subscription_id": subscription_id}
-        )
-
-
-async def handle_subscription_updated(db: Database, subscription: dict):
-    """
-    Processa atualização de assinatura
-    """
-    subscription_id = subscription.get("id")
-    status = subscription.get("status")
-    cancel_at_period_end = subscription.get("cancel_at_period_end", False)
-    current_period_end = subscription.get("current_period_end")
-
-    async with db.pool.acquire() as conn:
-        # Buscar usuário pela subscription_id
-        user = await conn.fetchrow(
-            "SELECT id FROM users WHERE stripe_subscription_id = $1",
-            subscription_id
-        )
-
-        if user:
-            # Determinar se ainda é premium
-            is_premium = status in ["active", "trialing", "past_due"]
-
-            await conn.execute("""
-                UPDATE users SET
-                    subscription_status = $2,
-                    is_premium = $3,
-                    cancel_at_period_end = $4,
-                    subscription_end_date = to_timestamp($5)
-                WHERE id = $1
-            """, user["id"], status, is_premium, cancel_at_period_end, current_period_end)
-
-
-async def handle_subscription_deleted(db: Database, subscription: dict):
-    """
-    Processa cancelamento/expiração de assinatura
-    """
-    subscription_id = subscription.get("id")
-
-    async with db.pool.acquire() as conn:
-        user = await conn.fetchrow(
-            "SELECT id FROM users WHERE stripe_subscription_id = $1",
-            subscription_id
-        )
-
-        if user:
-            await conn.execute("""
-                UPDATE users SET
-                    is_premium = FALSE,
-                    subscription_status = 'cancelled'
-                WHERE id = $1
-            """, user["id"])
-
-            await db.log_audit(
-                user_id=str(user["id"]),
-                action="subscription_cancelled",
-                details={"subscription_id": subscription_id}
-            )
-
-
-async def handle_payment_failed(db: Database, invoice: dict):
-    """
-    Processa falha de pagamento
-    """
-    subscription_id = invoice.get("subscription")
-
-    if subscription_id:
-        async with db.pool.acquire() as conn:
-            user = await conn.fetchrow(
-                "SELECT id FROM users WHERE stripe_subscription_id = $1",
-                subscription_id
-            )
-
-            if user:
-                await conn.execute("""
-                    UPDATE users SET
-                        subscription_status = 'past_due'
-                    WHERE id = $1
-                """, user["id"])
@@ -6,11 +6,11 @@ Endpoints para gerenciar push notifications
 import json
 from typing import Optional, List
 from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks
-from pydantic import BaseModel
+from pydantic import BaseModel, field_validator
 
 from pywebpush import webpush, WebPushException
 
-from app.database import Database, get_db
+from app.database import Database, get_db, normalize_timezone
 from app.auth import get_current_user
 from app.config import VAPID_PUBLIC_KEY, VAPID_PRIVATE_KEY, VAPID_CLAIMS_EMAIL
 
@@ -35,7 +35,14 @@ class NotificationPreferences(BaseModel):
     engagement_enabled: Optional[bool] = None
     engagement_after_days: Optional[int] = None
     marketing_enabled: Optional[bool] = None
-    timezone: Optional[str] = None
+    timezone: Optional[str] = None  # Nome IANA (ex: America/Sao_Paulo, Europe/Lisbon)
+
+    @field_validator("timezone")
+    @classmethod
+    def check_timezone(cls, value: Optional[str]) -> Optional[str]:
+        if value is not None and normalize_timezone(value) != value:
+            raise ValueError("timezone deve ser um nome IANA, ex: America/Sao_Paulo")
+        return value
 
 
 # ============================================
@@ -4,14 +4,15 @@ STT (Speech-to-Text) e TTS (Text-to-Speech)
 """
 
 import base64
+import time
 from typing import Optional
 from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form
-from fastapi.responses import Response
+from fastapi.responses import Response, StreamingResponse
 from pydantic import BaseModel
 
 from app.auth import get_current_user
 from app.database import get_db, Database
-from app.ai_service import AIService
+from app.ai_service import AIService, MessageLimitReached
 from app.voice_service import voice_service
 from app.security import rate_limiter
 from app.config import VOICE_ENABLED, FREE_MESSAGE_LIMIT
@@ -130,8 +131,8 @@ async def text_to_speech(
     if not rate_limiter.is_allowed(user_id, max_requests=20, window_seconds=60):
         raise HTTPException(status_code=429, detail="Muitas requisições. Aguarde um momento.")
 
-    # Gerar áudio
-    success, audio_bytes, error = await voice_service.text_to_speech(
+    # Gerar áudio (enviado ao cliente conforme é sintetizado)
+    success, audio_stream, error = await voice_service.stream_text_to_speech(
         text=request.text,
         voice=request.voice,
         speed=request.speed
@@ -140,8 +141,8 @@ async def text_to_speech(
     if not success:
         raise HTTPException(status_code=500, detail=error)
 
-    return Response(
-        content=audio_bytes,
+    return StreamingResponse(
+        audio_stream,
         media_type="audio/mpeg",
         headers={
             "Content-Disposition": "attachment; filename=aisyster_response.mp3"
@@ -151,6 +152,7 @@ async def text_to_speech(
 
 @router.post("/chat", response_model=VoiceChatResponse)
 async def voice_chat(
+    response: Response,
     audio: UploadFile = File(...),
     conversation_id: Optional[str] = Form(None),
     return_audio: bool = Form(True),
@@ -199,18 +201,22 @@ async def voice_chat(
     # Criar AI service
     ai_service = AIService(db)
 
-    # Processar voz completo
-    result = await voice_service.chat_with_voice(
-        audio_bytes=audio_bytes,
-        filename=audio.filename or "audio.webm",
-        chat_callback=ai_service.chat,
-        user_id=user_id,
-        conversation_id=conversation_id,
-        return_audio=return_audio,
-        language=user_language,
-        spoken_language=spoken_language,
-        voice=user_voice
-    )
+    # Processar voz completo (cota esgotada na gravação do turno -> 402, como no chat)
+    try:
+        result = await voice_service.chat_with_voice(
+            audio_bytes=audio_bytes,
+            filename=audio.filename or "audio.webm",
+            chat_callback=ai_service.chat,
+            user_id=user_id,
+            conversation_id=conversation_id,
+            return_audio=return_audio,
+            language=user_language,
+            spoken_language=spoken_language,
+            voice=user_voice,
+            propagate=(MessageLimitReached,)
+        )
+    except MessageLimitReached as e:
+        raise HTTPException(status_code=402, detail=str(e))
 
     if not result["success"]:
         return VoiceChatResponse(
@@ -221,6 +227,9 @@ async def voice_chat(
             error=result.get("error", "Erro desconhecido")
         )
 
+    # Latência por etapa (STT, chat, TTS)
+    response.headers["Server-Timing"] = voice_service.server_timing_header(result["timings"])
+
     # Converter áudio para base64 se disponível
     audio_base64 = None
     if result.get("response_audio"):
@@ -288,32 +297,46 @@ async def voice_chat_audio_response(
     # Criar AI service
     ai_service = AIService(db)
 
-    # Processar
-    result = await voice_service.chat_with_voice(
-        audio_bytes=audio_bytes,
-        filename=audio.filename or "audio.webm",
-        chat_callback=ai_service.chat,
-        user_id=user_id,
-        conversation_id=conversation_id,
-        return_audio=True,
-        language=user_language,
-        spoken_language=spoken_language,
-        voice=user_voice
-    )
+    # Processar (STT + chat); o áudio da resposta vai em streaming
+    try:
+        result = await voice_service.chat_with_voice(
+            audio_bytes=audio_bytes,
+            filename=audio.filename or "audio.webm",
+            chat_callback=ai_service.chat,
+            user_id=user_id,
+            conversation_id=conversation_id,
+            return_audio=False,
+            language=user_language,
+            spoken_language=spoken_language,
+            voice=user_voice,
+            propagate=(MessageLimitReached,)
+        )
+    except MessageLimitReached as e:
+        raise HTTPException(status_code=402, detail=str(e))
 
-    if not result["success"] or not result.get("response_audio"):
+    if not result["success"]:
         raise HTTPException(
             status_code=500,
             detail=result.get("error", "Erro ao processar áudio")
         )
 
-    # Retornar áudio direto
-    return Response(
-        content=result["response_audio"],
+    tts_start = time.perf_counter()
+    tts_success, audio_stream, tts_error = await voice_service.stream_text_to_speech(
+        result["response_text"],
+        voice=user_voice
+    )
+    if not tts_success:
+        raise HTTPException(status_code=500, detail=tts_error or "Erro ao processar áudio")
+    result["timings"]["tts_first_chunk_ms"] = round((time.perf_counter() - tts_start) * 1000, 1)
+
+    # Retornar áudio direto, conforme é gerado
+    return StreamingResponse(
+        audio_stream,
         media_type="audio/mpeg",
         headers={
             "X-User-Text": result["user_text"][:200],  # Primeiros 200 chars
             "X-Conversation-Id": result["conversation_id"],
+            "Server-Timing": voice_service.server_timing_header(result["timings"]),
             "Content-Disposition": "inline; filename=aisyster_response.mp3"
         }
     )
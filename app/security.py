@@ -4,10 +4,13 @@ Sistema de autenticação e proteção de dados sensíveis
 """
 
 import os
+import time
 import hashlib
 import secrets
+from collections import OrderedDict
+from contextvars import ContextVar
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Optional, Dict, List, Tuple
 from base64 import b64encode, b64decode
 
 from cryptography.fernet import Fernet
@@ -16,7 +19,10 @@ from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
 import bcrypt
 import jwt
 
-from app.config import SECRET_KEY, ENCRYPTION_KEY, JWT_ALGORITHM, JWT_ACCESS_TOKEN_HOURS, JWT_REFRESH_TOKEN_DAYS
+from app.config import (
+    SECRET_KEY, ENCRYPTION_KEY, JWT_ALGORITHM, JWT_ACCESS_TOKEN_HOURS, JWT_REFRESH_TOKEN_DAYS,
+    JWT_CACHE_MAX_SIZE
+)
 
 
 # ============================================
@@ -43,13 +49,16 @@ def verify_password(password: str, hashed: str) -> bool:
 # JWT TOKENS
 # ============================================
 
-def create_access_token(user_id: str, email: str) -> str:
+def create_access_token(user_id: str, email: str, session_id: Optional[str] = None) -> str:
     """
     Cria token JWT para autenticação (curta duração - 1h)
+    session_id (sid) liga o token à sessão do login: o logout revoga a sessão inteira
     """
     payload = {
         "sub": str(user_id),
         "email": email,
+        "sid": session_id or secrets.token_hex(16),
+        "jti": secrets.token_hex(16),
         "iat": datetime.utcnow(),
         "exp": datetime.utcnow() + timedelta(hours=JWT_ACCESS_TOKEN_HOURS),
         "type": "access"
@@ -57,12 +66,14 @@ def create_access_token(user_id: str, email: str) -> str:
     return jwt.encode(payload, SECRET_KEY, algorithm=JWT_ALGORITHM)
 
 
-def create_refresh_token(user_id: str) -> str:
+def create_refresh_token(user_id: str, session_id: Optional[str] = None) -> str:
     """
     Cria refresh token para renovação (longa duração - 30 dias)
     """
     payload = {
         "sub": str(user_id),
+        "sid": session_id or secrets.token_hex(16),
+        "jti": secrets.token_hex(16),
         "iat": datetime.utcnow(),
         "exp": datetime.utcnow() + timedelta(days=JWT_REFRESH_TOKEN_DAYS),
         "type": "refresh"
@@ -70,6 +81,14 @@ def create_refresh_token(user_id: str) -> str:
     return jwt.encode(payload, SECRET_KEY, algorithm=JWT_ALGORITHM)
 
 
+def create_token_pair(user_id: str, email: str, session_id: Optional[str] = None) -> Tuple[str, str]:
+    """
+    Access + refresh da mesma sessão (login: sessão nova; refresh: mantém a do refresh token)
+    """
+    session_id = session_id or secrets.token_hex(16)
+    return create_access_token(user_id, email, session_id), create_refresh_token(user_id, session_id)
+
+
 def verify_token(token: str) -> Optional[dict]:
     """
     Verifica e decodifica token JWT
@@ -84,10 +103,188 @@ def verify_token(token: str) -> Optional[dict]:
         return None
 
 
+# ============================================
+# JWT VERIFICATION CACHE
+# ============================================
+
+def _token_hash(token: str) -> str:
+    """Chave do cache/revogacao: nunca guardamos o token em si"""
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+class TokenCache:
+    """
+    Cache LRU limitado de tokens ja verificados (hash do token -> claims).
+    Evita decodificar e verificar o HMAC do JWT a cada request autenticado.
+    Respeita o 'exp': entradas expiradas nunca sao retornadas.
+    """
+
+    def __init__(self, max_size: int = JWT_CACHE_MAX_SIZE):
+        self.max_size = max_size
+        self._entries: "OrderedDict[str, Tuple[float, dict]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> Optional[dict]:
+        """Retorna claims se o token esta no cache e ainda nao expirou"""
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        exp, payload = entry
+        if exp <= time.time():
+            del self._entries[key]
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return payload
+
+    def set(self, key: str, payload: dict):
+        """Guarda claims verificados (descarta o menos usado se cheio)"""
+        exp = payload.get("exp")
+        if not exp or self.max_size <= 0:
+            return
+
+        self._entries[key] = (float(exp), payload)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def discard(self, key: str):
+        """Remove um token do cache"""
+        self._entries.pop(key, None)
+
+    def clear(self):
+        """Limpa o cache (para testes)"""
+        self._entries.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class TokenRevocationList:
+    """
+    Revogacoes do logout ate o 'exp' original: hash do token e sessao ("sid:...").
+    Consulta O(1) em memoria, so deste worker. O logout tambem grava no banco
+    (revoked_tokens), conferido no /auth/refresh: em outro worker um access
+    token revogado vale ate expirar (JWT_ACCESS_TOKEN_HOURS), mas a sessao
+    nao se renova.
+    """
+
+    # Limpa revogacoes expiradas quando a lista passa deste tamanho
+    PURGE_THRESHOLD = 1000
+
+    def __init__(self):
+        self._revoked: Dict[str, float] = {}
+
+    def revoke(self, key: str, exp: float):
+        """Revoga um token ate sua expiracao natural"""
+        self._revoked[key] = float(exp)
+        if len(self._revoked) > self.PURGE_THRESHOLD:
+            self._purge()
+
+    def is_revoked(self, key: str) -> bool:
+        """Verifica se o token foi revogado"""
+        if not self._revoked:
+            return False
+
+        exp = self._revoked.get(key)
+        if exp is None:
+            return False
+
+        if exp <= time.time():
+            # Token ja expirou sozinho, revogacao nao e mais necessaria
+            del self._revoked[key]
+            return False
+
+        return True
+
+    def _purge(self):
+        """Remove revogacoes de tokens que ja expiraram"""
+        now = time.time()
+        self._revoked = {k: exp for k, exp in self._revoked.items() if exp > now}
+
+    def clear(self):
+        """Limpa a lista (para testes)"""
+        self._revoked.clear()
+
+    def __len__(self) -> int:
+        return len(self._revoked)
+
+
+# Instâncias globais
+token_cache = TokenCache()
+revoked_tokens = TokenRevocationList()
+
+
+def _session_key(session_id: str) -> str:
+    return f"sid:{session_id}"
+
+
+def revocation_keys(token: str, payload: dict) -> List[Tuple[str, float]]:
+    """
+    Chaves (e ate quando valem) que revogam o token: o proprio token e a
+    sessao dele, que dura ate o refresh token mais novo possivel expirar
+    """
+    keys = [(_token_hash(token), float(payload["exp"]))]
+    if payload.get("sid"):
+        session_exp = time.time() + JWT_REFRESH_TOKEN_DAYS * 86400
+        keys.append((_session_key(payload["sid"]), session_exp))
+    return keys
+
+
+def verify_token_cached(token: str) -> Optional[dict]:
+    """
+    Igual a verify_token, mas reaproveita verificacoes anteriores do mesmo token.
+    Tokens revogados (logout do token ou da sessao) sao rejeitados.
+    """
+    key = _token_hash(token)
+
+    if revoked_tokens.is_revoked(key):
+        return None
+
+    payload = token_cache.get(key)
+    if payload is None:
+        payload = verify_token(token)
+        if not payload:
+            return None
+        token_cache.set(key, payload)
+
+    if payload.get("sid") and revoked_tokens.is_revoked(_session_key(payload["sid"])):
+        token_cache.discard(key)
+        return None
+    return payload
+
+
+def revoke_token(token: str) -> bool:
+    """
+    Revoga um token e a sessao dele (logout: o refresh token do mesmo login
+    tambem para de valer). Retorna False se o token ja era invalido.
+    """
+    payload = verify_token(token)
+    if not payload or not payload.get("exp"):
+        return False
+
+    for key, exp in revocation_keys(token, payload):
+        revoked_tokens.revoke(key, exp)
+    token_cache.discard(_token_hash(token))
+    return True
+
+
 # ============================================
 # DATA ENCRYPTION (Fernet - AES 128)
 # ============================================
 
+# Contador de descriptografias do trecho em execução (perfil de contexto do chat).
+# None = ninguém medindo; cada derivação PBKDF2 custa ~100k iterações.
+decrypt_counter: ContextVar[Optional[List[int]]] = ContextVar("decrypt_counter", default=None)
+
+
 def _get_fernet_key(user_salt: str = "") -> bytes:
     """
     Deriva uma chave Fernet a partir da chave mestra + salt do usuário
@@ -128,6 +325,10 @@ def decrypt_data(encrypted_data: bytes, user_id: str = "") -> str:
     if not encrypted_data:
         return ""
 
+    counter = decrypt_counter.get()
+    if counter is not None:
+        counter[0] += 1
+
     try:
         key = _get_fernet_key(user_id)
         fernet = Fernet(key)
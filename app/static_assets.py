@@ -0,0 +1,304 @@
+"""
+AiSyster - Assets Estáticos
+Build e serviço do frontend: páginas HTML e sw.js pré-comprimidos (gzip/brotli)
+com ETag, e assets de /static com URL por conteúdo (/assets/<hash>/...) e
+cache imutável.
+
+Build (gera frontend/dist, usado no startup se existir):
+  python -m app.static_assets build
+"""
+
+import re
+import sys
+import gzip
+import json
+import hashlib
+import mimetypes
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+from fastapi import Request
+from fastapi.responses import FileResponse, Response
+
+from app.devotional_cache import etag_matches
+
+try:
+    import brotli  # Opcional: sem ele, só gzip
+except ImportError:
+    brotli = None
+
+
+FRONTEND_DIR = Path(__file__).parent.parent / "frontend"
+DIST_DIR = FRONTEND_DIR / "dist"
+MANIFEST_NAME = "asset-manifest.json"
+
+# Páginas servidas por rotas próprias (URL estável, revalidadas pelo ETag)
+PAGES = (
+    "index.html", "admin.html", "maintenance.html", "offline.html",
+    "termos.html", "privacidade.html", "pitch.html", "manifest.json", "sw.js"
+)
+COMPRESSIBLE = {".html", ".js", ".json", ".css", ".svg", ".txt", ".xml", ".ico"}
+MIN_COMPRESS_BYTES = 1024
+
+IMMUTABLE_CACHE = "public, max-age=31536000, immutable"
+REVALIDATE_CACHE = "no-cache"  # Pode guardar, mas confirma o ETag a cada abertura (304 = ~0 bytes)
+
+_STATIC_REF = re.compile(r"""(?<=["'(])/static/[^"'()\s?#]+""")
+
+
+def content_hash(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()[:12]
+
+
+def media_type_for(name: str) -> str:
+    if name == "manifest.json":
+        return "application/manifest+json"
+    if name.endswith(".js"):
+        return "application/javascript"
+    if name.endswith(".json"):
+        return "application/json"
+    return mimetypes.guess_type(name)[0] or "application/octet-stream"
+
+
+def negotiate_encoding(accept_encoding: Optional[str], available) -> str:
+    """Escolhe br > gzip > identity respeitando q=0 do Accept-Encoding"""
+    accepted = {}
+    for part in (accept_encoding or "").split(","):
+        token, _, params = part.strip().partition(";")
+        if not token:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        accepted[token.strip().lower()] = q
+    for encoding in ("br", "gzip"):
+        if encoding in available and accepted.get(encoding, accepted.get("*", 0.0)) > 0:
+            return encoding
+    return "identity"
+
+
+class CompressedAsset:
+    """Corpo em memória com variantes pré-comprimidas e ETag por conteúdo"""
+
+    __slots__ = ("name", "media_type", "variants", "etag")
+
+    def __init__(self, name: str, body: bytes, variants: Optional[Dict[str, bytes]] = None):
+        self.name = name
+        self.media_type = media_type_for(name)
+        self.variants = {"identity": body}
+        self.variants.update(variants if variants is not None else compress(name, body))
+        self.etag = '"' + content_hash(body) + '"'
+
+    def select(self, accept_encoding: Optional[str]) -> Tuple[str, bytes]:
+        encoding = negotiate_encoding(accept_encoding, self.variants)
+        return encoding, self.variants[encoding]
+
+
+def compress(name: str, body: bytes) -> Dict[str, bytes]:
+    if Path(name).suffix not in COMPRESSIBLE or len(body) < MIN_COMPRESS_BYTES:
+        return {}
+    variants = {"gzip": gzip.compress(body, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        variants["br"] = brotli.compress(body, quality=11)
+    return variants
+
+
+# ============================================
+# BUILD
+# ============================================
+
+class AssetBundle:
+    """
+    Resultado do build:
+    - url_map: /static/x.png -> /assets/<hash>/x.png
+    - files: /assets/<hash>/x.png -> arquivo de origem (binários grandes ficam no disco)
+    - compressed: /assets/<hash>/x.json -> CompressedAsset (texto em memória)
+    - pages: index.html, sw.js... já com as URLs reescritas
+    """
+
+    def __init__(self):
+        self.version = ""
+        self.url_map: Dict[str, str] = {}
+        self.files: Dict[str, Path] = {}
+        self.compressed: Dict[str, CompressedAsset] = {}
+        self.pages: Dict[str, CompressedAsset] = {}
+
+    def rewrite(self, text: str) -> str:
+        return _STATIC_REF.sub(lambda m: self.url_map.get(m.group(0), m.group(0)), text)
+
+
+def _rewrite_service_worker(bundle: AssetBundle, source: str) -> str:
+    """
+    Versiona o cache do SW pelo build, pré-cacheia as URLs com hash e
+    lista os assets atuais (o resto é podado do cache de assets na ativação)
+    """
+    source = re.sub(
+        r"const CACHE_NAME = '[^']*';",
+        f"const CACHE_NAME = 'aisyster-{bundle.version}';",
+        source, count=1
+    )
+    current_assets = json.dumps(sorted(bundle.url_map.values()))
+    source = re.sub(
+        r"const CURRENT_ASSETS = \[[^\]]*\];",
+        lambda _: f"const CURRENT_ASSETS = {current_assets};",
+        source, count=1
+    )
+    return bundle.rewrite(source)
+
+
+def build_bundle(frontend_dir: Path = FRONTEND_DIR) -> AssetBundle:
+    bundle = AssetBundle()
+    static_dir = frontend_dir / "static"
+    digest = hashlib.sha256()
+
+    if static_dir.exists():
+        for path in sorted(p for p in static_dir.rglob("*") if p.is_file()):
+            data = path.read_bytes()
+            relative = path.relative_to(static_dir).as_posix()
+            hashed_url = f"/assets/{content_hash(data)}/{relative}"
+            bundle.url_map[f"/static/{relative}"] = hashed_url
+            digest.update(hashed_url.encode())
+            if path.suffix in COMPRESSIBLE:
+                bundle.compressed[hashed_url] = CompressedAsset(relative, data)
+            else:
+                bundle.files[hashed_url] = path
+
+    for name in PAGES:
+        path = frontend_dir / name
+        if path.exists():
+            digest.update(path.read_bytes())
+    bundle.version = digest.hexdigest()[:12]
+
+    for name in PAGES:
+        path = frontend_dir / name
+        if not path.exists():
+            continue
+        text = path.read_text(encoding="utf-8")
+        text = _rewrite_service_worker(bundle, text) if name == "sw.js" else bundle.rewrite(text)
+        bundle.pages[name] = CompressedAsset(name, text.encode("utf-8"))
+    return bundle
+
+
+def write_bundle(bundle: AssetBundle, dist_dir: Path = DIST_DIR):
+    """Grava páginas (+ .gz/.br) e o manifesto; assets de /static continuam no lugar"""
+    dist_dir.mkdir(parents=True, exist_ok=True)
+    for name, asset in bundle.pages.items():
+        (dist_dir / name).write_bytes(asset.variants["identity"])
+        for encoding, suffix in (("gzip", ".gz"), ("br", ".br")):
+            if encoding in asset.variants:
+                (dist_dir / (name + suffix)).write_bytes(asset.variants[encoding])
+    manifest = {
+        "version": bundle.version,
+        "url_map": bundle.url_map,
+        "pages": sorted(bundle.pages)
+    }
+    (dist_dir / MANIFEST_NAME).write_text(json.dumps(manifest, indent=2), encoding="utf-8")
+
+
+def load_bundle(frontend_dir: Path = FRONTEND_DIR, dist_dir: Path = DIST_DIR) -> AssetBundle:
+    """
+    Usa o build pré-comprimido se existir; senão monta em memória no startup
+    (mesmo resultado, só gasta a compressão no boot).
+    """
+    manifest_path = dist_dir / MANIFEST_NAME
+    if not manifest_path.exists():
+        return build_bundle(frontend_dir)
+
+    manifest = json.loads(manifest_path.read_text(encoding="utf-8"))
+    bundle = AssetBundle()
+    bundle.version = manifest["version"]
+    bundle.url_map = manifest["url_map"]
+    static_dir = frontend_dir / "static"
+    for original, hashed_url in bundle.url_map.items():
+        path = static_dir / original[len("/static/"):]
+        if path.suffix in COMPRESSIBLE:
+            bundle.compressed[hashed_url] = CompressedAsset(path.name, path.read_bytes())
+        else:
+            bundle.files[hashed_url] = path
+    for name in manifest["pages"]:
+        variants = {}
+        for encoding, suffix in (("gzip", ".gz"), ("br", ".br")):
+            compressed_path = dist_dir / (name + suffix)
+            if compressed_path.exists():
+                variants[encoding] = compressed_path.read_bytes()
+        bundle.pages[name] = CompressedAsset(name, (dist_dir / name).read_bytes(), variants)
+    return bundle
+
+
+# ============================================
+# SERVIÇO
+# ============================================
+
+_bundle: Optional[AssetBundle] = None
+
+
+def get_bundle() -> AssetBundle:
+    global _bundle
+    if _bundle is None:
+        _bundle = load_bundle()
+    return _bundle
+
+
+def asset_headers(asset: CompressedAsset, encoding: str, cache_control: str) -> Dict[str, str]:
+    headers = {"ETag": asset.etag, "Cache-Control": cache_control, "Vary": "Accept-Encoding"}
+    if encoding != "identity":
+        headers["Content-Encoding"] = encoding
+    return headers
+
+
+def _compressed_response(request: Request, asset: CompressedAsset, cache_control: str) -> Response:
+    if etag_matches(request.headers.get("if-none-match"), asset.etag):
+        return Response(status_code=304, headers=asset_headers(asset, "identity", cache_control))
+    encoding, body = asset.select(request.headers.get("accept-encoding"))
+    return Response(body, media_type=asset.media_type, headers=asset_headers(asset, encoding, cache_control))
+
+
+def page_response(request: Request, name: str) -> Response:
+    """Página com URL estável: variante comprimida negociada + ETag (304 no warm load)"""
+    asset = get_bundle().pages.get(name)
+    if asset is None:
+        return FileResponse(FRONTEND_DIR / name, media_type=media_type_for(name))
+    return _compressed_response(request, asset, REVALIDATE_CACHE)
+
+
+def hashed_asset_response(request: Request, digest: str, path: str) -> Response:
+    """
+    /assets/<hash>/<path>: hash confere = imutável por um ano.
+    Hash antigo (HTML de antes do deploy) ainda recebe o arquivo atual, mas sem cache longo.
+    """
+    bundle = get_bundle()
+    url = f"/assets/{digest}/{path}"
+    cache_control = IMMUTABLE_CACHE
+    if url not in bundle.compressed and url not in bundle.files:
+        current = bundle.url_map.get(f"/static/{path}")
+        if current is None:
+            return Response(status_code=404)
+        url, cache_control = current, REVALIDATE_CACHE
+
+    if url in bundle.compressed:
+        return _compressed_response(request, bundle.compressed[url], cache_control)
+    return FileResponse(
+        bundle.files[url],
+        media_type=media_type_for(path),
+        headers={"Cache-Control": cache_control}
+    )
+
+
+def main():
+    if len(sys.argv) < 2 or sys.argv[1] != "build":
+        print("Uso: python -m app.static_assets build")
+        sys.exit(1)
+    bundle = build_bundle()
+    write_bundle(bundle)
+    for name, asset in sorted(bundle.pages.items()):
+        sizes = " ".join(f"{enc}={len(body) // 1024}KB" for enc, body in asset.variants.items())
+        print(f"[ASSETS] {name}: {sizes}")
+    print(f"[ASSETS] {len(bundle.url_map)} assets com hash, versão {bundle.version} -> {DIST_DIR}")
+
+
+if __name__ == "__main__":
+    main()
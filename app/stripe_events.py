@@ -0,0 +1,358 @@
+"""
+AiSyster - Eventos do Stripe
+Webhook idempotente (eventos gravados em stripe_events pelo id do Stripe e
+processados por um worker, fora da requisição) e chamadas à API do Stripe
+fora do event loop, num pool de threads com conexões reaproveitadas
+"""
+
+import asyncio
+import functools
+import json
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Awaitable, Callable, Dict, Optional
+
+import stripe
+from stripe.http_client import RequestsClient
+
+from app.config import (
+    STRIPE_HTTP_WORKERS, STRIPE_TIMEOUT,
+    STRIPE_EVENT_BATCH_SIZE, STRIPE_EVENT_POLL_INTERVAL,
+    STRIPE_EVENT_LEASE_SECONDS, STRIPE_EVENT_MAX_ATTEMPTS
+)
+from app.database import Database
+from app.telemetry import registry
+from app.logging_config import get_logger
+
+
+logger = get_logger("stripe")
+
+STRIPE_EVENTS = registry.counter(
+    "aisyster_stripe_events_total", "Eventos do Stripe por tipo e resultado", ("type", "status")
+)
+
+
+# ============================================
+# CHAMADAS À API (fora do event loop)
+# ============================================
+
+# O RequestsClient guarda uma requests.Session por thread: com um pool fixo,
+# cada thread mantém sua conexão keep-alive com api.stripe.com
+stripe.default_http_client = RequestsClient(timeout=STRIPE_TIMEOUT)
+
+_executor: Optional[ThreadPoolExecutor] = None
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=max(STRIPE_HTTP_WORKERS, 1), thread_name_prefix="stripe")
+    return _executor
+
+
+async def stripe_call(func: Callable, *args, **kwargs):
+    """Executa uma chamada do SDK do Stripe (síncrono) no pool de threads"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_get_executor(), functools.partial(func, *args, **kwargs))
+
+
+def shutdown_stripe_pool():
+    """Encerra o pool (shutdown da aplicação)"""
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+
+# ============================================
+# LOG DE EVENTOS
+# ============================================
+
+# Reentrega do Stripe (mesmo id) não insere nada: RETURNING vazio
+RECORD_EVENT_QUERY = """
+    INSERT INTO stripe_events (id, type, payload, stripe_created)
+    VALUES ($1, $2, $3::jsonb, $4)
+    ON CONFLICT (id) DO NOTHING
+    RETURNING id
+"""
+
+# Pendentes (ou 'processing' com lease vencido) na ordem em que o Stripe os criou
+CLAIM_EVENTS_QUERY = """
+    UPDATE stripe_events e
+    SET status = 'processing', claimed_at = NOW(), attempts = e.attempts + 1
+    WHERE e.id IN (
+        SELECT id FROM stripe_events
+        WHERE status = 'pending'
+           OR (status = 'processing' AND claimed_at < NOW() - make_interval(secs => $2))
+        ORDER BY stripe_created, received_at
+        LIMIT $1
+        FOR UPDATE SKIP LOCKED
+    )
+    RETURNING e.id, e.type, e.payload, e.attempts, e.stripe_created
+"""
+
+COMPLETE_EVENT_QUERY = """
+    UPDATE stripe_events
+    SET status = 'processed', processed_at = NOW(), last_error = NULL
+    WHERE id = $1
+"""
+
+# Falhou: volta para a fila até max_attempts, depois fica 'failed' para análise
+FAIL_EVENT_QUERY = """
+    UPDATE stripe_events
+    SET status = CASE WHEN attempts >= $3 THEN 'failed' ELSE 'pending' END,
+        last_error = $2
+    WHERE id = $1
+"""
+
+
+async def record_event(db: Database, event: dict, payload: bytes) -> bool:
+    """
+    Grava o evento verificado do webhook. Retorna False se o id já estava
+    registrado (reentrega do Stripe: nada a fazer).
+    """
+    created = event.get("created")
+    stripe_created = datetime.fromtimestamp(created, tz=timezone.utc) if created else datetime.now(timezone.utc)
+    async with db.pool.acquire() as conn:
+        inserted = await conn.fetchval(
+            RECORD_EVENT_QUERY, event["id"], event["type"], payload.decode("utf-8"), stripe_created
+        )
+    STRIPE_EVENTS.inc((event["type"], "received" if inserted else "duplicate"))
+    return inserted is not None
+
+
+# ============================================
+# HANDLERS
+# ============================================
+
+async def handle_checkout_completed(db: Database, session: dict):
+    """
+    Processa checkout concluído - ativa premium
+    """
+    user_id = session.get("metadata", {}).get("user_id")
+    subscription_id = session.get("subscription")
+    customer_id = session.get("customer")
+
+    if not user_id:
+        return
+
+    async with db.pool.acquire() as conn:
+        await conn.execute("""
+            UPDATE users SET
+                is_premium = TRUE,
+                stripe_customer_id = $2,
+                stripe_subscription_id = $3,
+                subscription_status = 'active',
+                subscription_start_date = NOW(),
+                cancel_at_period_end = FALSE
+            WHERE id = $1
+        """, user_id, customer_id, subscription_id)
+
+        # Log de auditoria
+        await db.log_audit(
+            user_id=user_id,
+            action="subscription_created",
+            details={"subscription_id": subscription_id}
+        )
+
+
+async def handle_subscription_updated(db: Database, subscription: dict):
+    """
+    Processa atualização de assinatura
+    """
+    subscription_id = subscription.get("id")
+    status = subscription.get("status")
+    cancel_at_period_end = subscription.get("cancel_at_period_end", False)
+    current_period_end = subscription.get("current_period_end")
+
+    async with db.pool.acquire() as conn:
+        # Buscar usuário pela subscription_id
+        user = await conn.fetchrow(
+            "SELECT id FROM users WHERE stripe_subscription_id = $1",
+            subscription_id
+        )
+
+        if user:
+            # Determinar se ainda é premium
+            is_premium = status in ["active", "trialing", "past_due"]
+
+            await conn.execute("""
+                UPDATE users SET
+                    subscription_status = $2,
+                    is_premium = $3,
+                    cancel_at_period_end = $4,
+                    subscription_end_date = to_timestamp($5)
+                WHERE id = $1
+            """, user["id"], status, is_premium, cancel_at_period_end, current_period_end)
+
+
+async def handle_subscription_deleted(db: Database, subscription: dict):
+    """
+    Processa cancelamento/expiração de assinatura
+    """
+    subscription_id = subscription.get("id")
+
+    async with db.pool.acquire() as conn:
+        user = await conn.fetchrow(
+            "SELECT id FROM users WHERE stripe_subscription_id = $1",
+            subscription_id
+        )
+
+        if user:
+            await conn.execute("""
+                UPDATE users SET
+                    is_premium = FALSE,
+                    subscription_status = 'cancelled'
+                WHERE id = $1
+            """, user["id"])
+
+            await db.log_audit(
+                user_id=str(user["id"]),
+                action="subscription_cancelled",
+                details={"subscription_id": subscription_id}
+            )
+
+
+async def handle_payment_failed(db: Database, invoice: dict):
+    """
+    Processa falha de pagamento
+    """
+    subscription_id = invoice.get("subscription")
+
+    if subscription_id:
+        async with db.pool.acquire() as conn:
+            user = await conn.fetchrow(
+                "SELECT id FROM users WHERE stripe_subscription_id = $1",
+                subscription_id
+            )
+
+            if user:
+                await conn.execute("""
+                    UPDATE users SET
+                        subscription_status = 'past_due'
+                    WHERE id = $1
+                """, user["id"])
+
+
+EventHandler = Callable[[Database, dict], Awaitable[None]]
+
+# Tipos sem handler são gravados e marcados como processados
+EVENT_HANDLERS: Dict[str, EventHandler] = {
+    "checkout.session.completed": handle_checkout_completed,      # Pagamento inicial concluído
+    "customer.subscription.updated": handle_subscription_updated,  # Assinatura atualizada
+    "customer.subscription.deleted": handle_subscription_deleted,  # Assinatura cancelada/expirada
+    "invoice.payment_failed": handle_payment_failed,               # Pagamento falhou
+}
+
+
+# ============================================
+# WORKER
+# ============================================
+
+class StripeEventWorker:
+    """
+    Processa os eventos gravados pelo webhook. Pode rodar em todos os processos:
+
+    - claim: lote de eventos 'pending' com FOR UPDATE SKIP LOCKED, marcados 'processing'
+      (se o processo morrer, depois de lease_seconds o evento volta a ser reivindicável)
+    - cada evento roda o handler do seu tipo, em ordem de criação no Stripe
+    - falha volta para 'pending' até max_attempts; depois fica 'failed' com o erro
+    """
+
+    def __init__(
+        self,
+        batch_size: int = STRIPE_EVENT_BATCH_SIZE,
+        poll_interval: float = STRIPE_EVENT_POLL_INTERVAL,
+        lease_seconds: int = STRIPE_EVENT_LEASE_SECONDS,
+        max_attempts: int = STRIPE_EVENT_MAX_ATTEMPTS,
+        handlers: Optional[Dict[str, EventHandler]] = None
+    ):
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.handlers = handlers if handlers is not None else EVENT_HANDLERS
+        self.pool = None
+        self.processed = 0
+        self._wakeup = asyncio.Event()
+        self._stopping = False
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self, pool):
+        if self.running:
+            return
+        self.pool = pool
+        self._stopping = False
+        self._task = asyncio.create_task(self._run())
+
+    def wake(self):
+        """Evento novo gravado pelo webhook: busca sem esperar o poll"""
+        self._wakeup.set()
+
+    async def stop(self, timeout: float = 30.0):
+        """Termina o lote em andamento (o que sobrar volta para a fila pelo lease)"""
+        if not self._task:
+            return
+        self._stopping = True
+        self._wakeup.set()
+        try:
+            await asyncio.wait_for(asyncio.shield(self._task), timeout=timeout)
+        except asyncio.TimeoutError:
+            logger.warning("stripe.worker_stop_timeout")
+            self._task.cancel()
+        self._task = None
+
+    async def _run(self):
+        while not self._stopping:
+            try:
+                claimed = await self.run_once()
+            except Exception as e:
+                logger.error("stripe.batch_failed", extra={"error": str(e)})
+                claimed = 0
+            if claimed < self.batch_size and not self._stopping:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                self._wakeup.clear()
+
+    async def run_once(self) -> int:
+        """Reivindica e processa um lote. Retorna quantos eventos processou"""
+        async with self.pool.acquire() as conn:
+            batch = [dict(row) for row in await conn.fetch(CLAIM_EVENTS_QUERY, self.batch_size, self.lease_seconds)]
+        if not batch:
+            return 0
+
+        # Em ordem: um checkout e a atualização da mesma assinatura não se cruzam
+        batch.sort(key=lambda event: event["stripe_created"])
+        for event in batch:
+            await self.process(event)
+        self.processed += len(batch)
+        return len(batch)
+
+    async def process(self, event: dict):
+        handler = self.handlers.get(event["type"])
+        try:
+            if handler:
+                payload = json.loads(event["payload"]) if isinstance(event["payload"], str) else event["payload"]
+                await handler(Database(self.pool), payload["data"]["object"])
+        except Exception as e:
+            logger.error("stripe.event_failed", extra={
+                "event_id": event["id"], "type": event["type"], "attempt": event["attempts"], "error": str(e)
+            })
+            async with self.pool.acquire() as conn:
+                await conn.execute(FAIL_EVENT_QUERY, event["id"], str(e)[:500], self.max_attempts)
+            STRIPE_EVENTS.inc((event["type"], "failed"))
+            return
+
+        async with self.pool.acquire() as conn:
+            await conn.execute(COMPLETE_EVENT_QUERY, event["id"])
+        STRIPE_EVENTS.inc((event["type"], "processed" if handler else "ignored"))
+
+
+# Instância global (iniciada no lifespan do app; um por processo)
+stripe_event_worker = StripeEventWorker()
@@ -0,0 +1,433 @@
+"""
+AiSyster - Telemetria
+Spans por requisição, tempo de queries (asyncpg) e chamadas ao LLM,
+exportados em /metrics (formato Prometheus) e opcionalmente em arquivo
+(linhas OTLP/JSON, compatível com o OpenTelemetry Collector)
+"""
+
+import re
+import json
+import time
+import queue
+import secrets
+import threading
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.config import TELEMETRY_ENABLED, TELEMETRY_TRACE_FILE, METRICS_TOKEN, DEBUG
+
+
+# Segundos; cobre de query rápida (5ms) a resposta longa do LLM (60s)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+# ============================================
+# MÉTRICAS (formato Prometheus)
+# ============================================
+
+def _escape(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class Counter:
+    def __init__(self, name: str, help_text: str, label_names: Tuple[str, ...] = ()):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, labels: Tuple[str, ...] = (), value: float = 1.0):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + value
+
+    def get(self, labels: Tuple[str, ...] = ()) -> float:
+        return self._values.get(labels, 0.0)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        for labels, value in sorted(self._values.items()):
+            lines.append(f"{self.name}{_format_labels(self.label_names, labels)} {value:g}")
+        return lines
+
+
+class Histogram:
+    """Histograma cumulativo por série; p50/p95/p99 via histogram_quantile no Prometheus"""
+
+    def __init__(self, name: str, help_text: str, label_names: Tuple[str, ...] = (),
+                 buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self.buckets = buckets
+        # labels -> [contagem por bucket (não cumulativa, +Inf no fim), soma, total]
+        self._series: Dict[Tuple[str, ...], list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, labels: Tuple[str, ...], value: float):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def count(self, labels: Tuple[str, ...] = ()) -> int:
+        series = self._series.get(labels)
+        return series[2] if series else 0
+
+    def quantile(self, labels: Tuple[str, ...], q: float) -> Optional[float]:
+        """Estimativa por interpolação linear no bucket (mesma regra do histogram_quantile)"""
+        series = self._series.get(labels)
+        if not series or not series[2]:
+            return None
+        rank = q * series[2]
+        cumulative = 0
+        for i, bucket_count in enumerate(series[0]):
+            if cumulative + bucket_count >= rank and bucket_count:
+                if i == len(self.buckets):
+                    return self.buckets[-1]
+                lower = self.buckets[i - 1] if i else 0.0
+                return lower + (self.buckets[i] - lower) * ((rank - cumulative) / bucket_count)
+            cumulative += bucket_count
+        return self.buckets[-1]
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        for labels, (counts, total, n) in sorted(self._series.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = "+Inf" if bound == float("inf") else f"{bound:g}"
+                bucket_labels = _format_labels(self.label_names, labels, f'le="{le}"')
+                lines.append(f"{self.name}_bucket{bucket_labels} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.label_names, labels)} {total:.6f}")
+            lines.append(f"{self.name}_count{_format_labels(self.label_names, labels)} {n}")
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self.metrics: List[Any] = []
+
+    def counter(self, name: str, help_text: str, label_names: Tuple[str, ...] = ()) -> Counter:
+        metric = Counter(name, help_text, label_names)
+        self.metrics.append(metric)
+        return metric
+
+    def histogram(self, name: str, help_text: str, label_names: Tuple[str, ...] = ()) -> Histogram:
+        metric = Histogram(name, help_text, label_names)
+        self.metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+HTTP_DURATION = registry.histogram(
+    "aisyster_http_request_duration_seconds", "Duração das requisições HTTP", ("method", "route", "status")
+)
+STAGE_DURATION = registry.histogram(
+    "aisyster_stage_duration_seconds", "Duração de cada etapa instrumentada (spans)", ("stage",)
+)
+STAGE_ERRORS = registry.counter(
+    "aisyster_stage_errors_total", "Etapas que terminaram com exceção", ("stage",)
+)
+DB_QUERY_DURATION = registry.histogram(
+    "aisyster_db_query_duration_seconds", "Duração das queries no Postgres", ("operation", "table")
+)
+DB_QUERY_ERRORS = registry.counter(
+    "aisyster_db_query_errors_total", "Queries que falharam", ("operation", "table")
+)
+LLM_DURATION = registry.histogram(
+    "aisyster_llm_request_duration_seconds", "Latência das chamadas ao LLM por ponto de chamada", ("site", "model")
+)
+LLM_TOKENS = registry.counter(
+    "aisyster_llm_tokens_total", "Tokens consumidos por ponto de chamada", ("site", "model", "kind")
+)
+LLM_ERRORS = registry.counter(
+    "aisyster_llm_errors_total", "Chamadas ao LLM que falharam", ("site", "model")
+)
+
+
+# ============================================
+# SPANS
+# ============================================
+
+class Span:
+    __slots__ = ("trace_id", "span_id", "parent_id", "name", "start_ns", "end_ns", "attributes", "error")
+
+    def __init__(self, name: str, parent: Optional["Span"], attributes: Dict[str, Any]):
+        self.trace_id = parent.trace_id if parent else secrets.token_hex(16)
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent.span_id if parent else None
+        self.name = name
+        self.start_ns = time.time_ns()
+        self.end_ns = 0
+        self.attributes = attributes
+        self.error: Optional[str] = None
+
+    def set_attribute(self, key: str, value: Any):
+        self.attributes[key] = value
+
+    @property
+    def duration(self) -> float:
+        return (self.end_ns - self.start_ns) / 1e9
+
+
+_current_span: ContextVar[Optional[Span]] = ContextVar("current_span", default=None)
+
+
+def current_span() -> Optional[Span]:
+    return _current_span.get()
+
+
+@contextmanager
+def span(name: str, **attributes):
+    """
+    Mede uma etapa. Funciona em código síncrono e assíncrono (with normal):
+    o span pai vem do contexto da task atual.
+    """
+    if not TELEMETRY_ENABLED:
+        yield None
+        return
+
+    parent = _current_span.get()
+    current = Span(name, parent, attributes)
+    token = _current_span.set(current)
+    perf_start = time.perf_counter()
+    try:
+        yield current
+    except BaseException as e:
+        current.error = type(e).__name__
+        STAGE_ERRORS.inc((name,))
+        raise
+    finally:
+        elapsed = time.perf_counter() - perf_start
+        current.end_ns = current.start_ns + int(elapsed * 1e9)
+        _current_span.reset(token)
+        STAGE_DURATION.observe((name,), elapsed)
+        if span_exporter:
+            span_exporter.export(current, is_root=parent is None)
+
+
+# ============================================
+# EXPORTADOR EM ARQUIVO (OTLP/JSON)
+# ============================================
+
+def _otlp_value(value: Any) -> dict:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+class FileSpanExporter:
+    """
+    Acumula spans e grava uma linha OTLP/JSON (ExportTraceServiceRequest)
+    quando o span raiz termina. O arquivo pode ser lido pelo receiver
+    otlpjsonfile do OpenTelemetry Collector.
+
+    A escrita fica numa thread (como os logs): o request só enfileira o lote.
+    Com a fila cheia (disco travado), o lote é descartado e contado.
+    """
+
+    def __init__(self, path: str, max_buffer: int = 200, max_queue: int = 1000):
+        self.path = path
+        self.max_buffer = max_buffer
+        self.dropped = 0
+        self._buffer: List[dict] = []
+        self._lock = threading.Lock()
+        self._queue: "queue.Queue[Optional[List[dict]]]" = queue.Queue(maxsize=max_queue)
+        self._thread: Optional[threading.Thread] = None
+
+    def export(self, finished: Span, is_root: bool = False):
+        record = {
+            "traceId": finished.trace_id,
+            "spanId": finished.span_id,
+            "name": finished.name,
+            "kind": 1,
+            "startTimeUnixNano": str(finished.start_ns),
+            "endTimeUnixNano": str(finished.end_ns),
+            "attributes": [{"key": k, "value": _otlp_value(v)} for k, v in finished.attributes.items()],
+            "status": {"code": 2, "message": finished.error} if finished.error else {"code": 1}
+        }
+        if finished.parent_id:
+            record["parentSpanId"] = finished.parent_id
+        with self._lock:
+            self._buffer.append(record)
+            if not is_root and len(self._buffer) < self.max_buffer:
+                return
+            spans, self._buffer = self._buffer, []
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="span-exporter", daemon=True)
+                self._thread.start()
+        try:
+            self._queue.put_nowait(spans)
+        except queue.Full:
+            self.dropped += len(spans)
+
+    def _run(self):
+        while True:
+            batches = [self._queue.get()]
+            # Tudo o que já está na fila vai numa única abertura do arquivo
+            while True:
+                try:
+                    batches.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            self._write([spans for spans in batches if spans is not None])
+            for _ in batches:
+                self._queue.task_done()
+            if None in batches:
+                return
+
+    def _write(self, batches: List[List[dict]]):
+        if not batches:
+            return
+        lines = "".join(
+            json.dumps({
+                "resourceSpans": [{
+                    "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": "aisyster"}}]},
+                    "scopeSpans": [{"scope": {"name": "app.telemetry"}, "spans": spans}]
+                }]
+            }, ensure_ascii=False) + "\n"
+            for spans in batches
+        )
+        try:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(lines)
+        except OSError as e:
+            print(f"[TELEMETRY] Erro ao gravar spans: {e}")
+
+    def flush(self):
+        """Espera a thread gravar os lotes já enfileirados (testes)"""
+        if self._thread is not None:
+            self._queue.join()
+
+    def close(self):
+        """Grava o que sobrou no buffer e para a thread (shutdown do app)"""
+        with self._lock:
+            spans, self._buffer = self._buffer, []
+            thread, self._thread = self._thread, None
+        if thread is None:
+            if spans:
+                self._write([spans])
+            return
+        if spans:
+            self._queue.put(spans)
+        self._queue.put(None)
+        thread.join(timeout=5)
+
+
+span_exporter: Optional[FileSpanExporter] = (
+    FileSpanExporter(TELEMETRY_TRACE_FILE) if TELEMETRY_ENABLED and TELEMETRY_TRACE_FILE else None
+)
+
+
+def shutdown_telemetry():
+    """Esvazia a fila de spans e para a thread de escrita (chamado no shutdown do app)"""
+    if isinstance(span_exporter, FileSpanExporter):
+        span_exporter.close()
+
+
+# ============================================
+# POSTGRES (query logger do asyncpg)
+# ============================================
+
+_TABLE_RE = re.compile(r"\b(?:FROM|INTO|UPDATE|JOIN)\s+([a-zA-Z_][a-zA-Z0-9_.]*)", re.IGNORECASE)
+_query_labels: Dict[str, Tuple[str, str]] = {}
+
+
+def query_labels(query: str) -> Tuple[str, str]:
+    """(operação, tabela) com cardinalidade baixa; memorizado por texto da query"""
+    labels = _query_labels.get(query)
+    if labels is None:
+        words = query.split(None, 1)
+        operation = words[0].upper() if words else "OTHER"
+        match = _TABLE_RE.search(query)
+        labels = (operation, match.group(1).lower() if match else "-")
+        if len(_query_labels) < 2000:
+            _query_labels[query] = labels
+    return labels
+
+
+def record_query(record):
+    """Callback de Connection.add_query_logger (LoggedQuery do asyncpg)"""
+    labels = query_labels(record.query)
+    DB_QUERY_DURATION.observe(labels, record.elapsed)
+    if record.exception is not None:
+        DB_QUERY_ERRORS.inc(labels)
+
+
+async def instrument_connection(conn):
+    """init= do pool: registra o logger de queries em cada conexão nova"""
+    if TELEMETRY_ENABLED:
+        conn.add_query_logger(record_query)
+
+
+# ============================================
+# LLM
+# ============================================
+
+def traced_llm_call(site: str, client, **kwargs):
+    """
+    client.messages.create(**kwargs) com latência, tokens e erros
+    registrados por ponto de chamada (site) e modelo.
+    """
+    model = kwargs.get("model", "-")
+    with span(f"llm.{site}", model=model) as current:
+        start = time.perf_counter()
+        try:
+            response = client.messages.create(**kwargs)
+        except Exception:
+            LLM_ERRORS.inc((site, model))
+            raise
+        finally:
+            LLM_DURATION.observe((site, model), time.perf_counter() - start)
+
+        usage = getattr(response, "usage", None)
+        if usage is not None:
+            LLM_TOKENS.inc((site, model, "input"), usage.input_tokens or 0)
+            LLM_TOKENS.inc((site, model, "output"), usage.output_tokens or 0)
+            if current is not None:
+                current.set_attribute("llm.input_tokens", usage.input_tokens or 0)
+                current.set_attribute("llm.output_tokens", usage.output_tokens or 0)
+        return response
+
+
+def render_metrics() -> str:
+    """Texto para o endpoint /metrics"""
+    return registry.render()
+
+
+def metrics_access(authorization: Optional[str], token: str = METRICS_TOKEN, debug: bool = DEBUG) -> int:
+    """
+    Status HTTP do acesso ao /metrics (fecha por padrão):
+    - sem METRICS_TOKEN: 404 em produção (endpoint desligado), aberto só em DEBUG
+    - com METRICS_TOKEN: exige "Authorization: Bearer <token>", senão 401
+    """
+    if not token:
+        return 200 if debug else 404
+    if secrets.compare_digest((authorization or "").encode(), f"Bearer {token}".encode()):
+        return 200
+    return 401
@@ -0,0 +1,215 @@
+"""
+AiSyster - Sessões de Visitantes
+Estado compacto do chat trial (sem conta): contador + buffer circular das
+últimas mensagens, com expiração por inatividade e tamanho máximo
+"""
+
+import json
+import time
+from collections import OrderedDict, deque
+from typing import Callable, Deque, List, Optional, Tuple
+
+from app.config import (
+    TRIAL_SESSION_BACKEND,
+    TRIAL_SESSION_TTL_SECONDS,
+    TRIAL_SESSION_MAX,
+    TRIAL_SESSION_TURNS,
+    REDIS_URL
+)
+
+
+class TrialSession:
+    """Estado de um visitante: só o necessário para o limite e o histórico curto"""
+
+    __slots__ = ("messages_count", "turns", "ip", "expires_at")
+
+    def __init__(self, messages_count: int = 0, turns=None, ip: str = "", expires_at: float = 0.0):
+        self.messages_count = messages_count
+        # Buffer circular: (role, content); entradas antigas saem sozinhas
+        self.turns: Deque[Tuple[str, str]] = deque(turns or (), maxlen=TRIAL_SESSION_TURNS)
+        self.ip = ip
+        self.expires_at = expires_at
+
+    @property
+    def history(self) -> List[dict]:
+        """Histórico no formato da API do Claude"""
+        return [{"role": role, "content": content} for role, content in self.turns]
+
+
+# ============================================
+# MEMÓRIA (padrão - por worker)
+# ============================================
+
+class MemoryTrialStore:
+    """
+    LRU em memória com TTL deslizante.
+
+    Ordem do OrderedDict = ordem de último uso, que é também a ordem de
+    expiração; expirados são removidos da frente a cada escrita (custo amortizado O(1)).
+    """
+
+    def __init__(
+        self,
+        max_sessions: int = TRIAL_SESSION_MAX,
+        ttl_seconds: int = TRIAL_SESSION_TTL_SECONDS,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        self.max_sessions = max_sessions
+        self.ttl_seconds = ttl_seconds
+        self.clock = clock
+        self._sessions: "OrderedDict[str, TrialSession]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def _purge(self, now: float):
+        while self._sessions:
+            oldest = next(iter(self._sessions.values()))
+            if oldest.expires_at > now and len(self._sessions) <= self.max_sessions:
+                break
+            self._sessions.popitem(last=False)
+
+    async def get(self, session_id: str) -> TrialSession:
+        session = self._sessions.get(session_id)
+        if session is None or session.expires_at <= self.clock():
+            return TrialSession()
+        return session
+
+    async def record_turn(
+        self, session_id: str, ip: str, user_message: str, reply: str, limit: Optional[int] = None
+    ) -> Optional[int]:
+        now = self.clock()
+        session = self._sessions.get(session_id)
+        if session is None or session.expires_at <= now:
+            session = TrialSession()
+        elif limit is not None and session.messages_count >= limit:
+            return None  # Sem await entre a checagem e a escrita: atômico no loop
+        self._sessions.pop(session_id, None)
+        session.messages_count += 1
+        session.turns.append(("user", user_message))
+        session.turns.append(("assistant", reply))
+        session.ip = ip
+        session.expires_at = now + self.ttl_seconds
+        self._sessions[session_id] = session  # Fim da fila = usado mais recentemente
+        self._purge(now)
+        return session.messages_count
+
+
+# ============================================
+# POSTGRES (compartilhado entre workers)
+# ============================================
+
+class PostgresTrialStore:
+    """Sessões na tabela trial_sessions; limpeza na manutenção diária"""
+
+    def __init__(self, ttl_seconds: int = TRIAL_SESSION_TTL_SECONDS):
+        self.ttl_seconds = ttl_seconds
+
+    async def _db(self):
+        from app.database import get_db_instance
+        return await get_db_instance()
+
+    async def get(self, session_id: str) -> TrialSession:
+        row = await (await self._db()).get_trial_session(session_id)
+        if not row:
+            return TrialSession()
+        return TrialSession(
+            messages_count=row["messages_count"],
+            turns=[(t["role"], t["content"]) for t in row["turns"]],
+            ip=row["ip"] or ""
+        )
+
+    async def record_turn(
+        self, session_id: str, ip: str, user_message: str, reply: str, limit: Optional[int] = None
+    ) -> Optional[int]:
+        return await (await self._db()).record_trial_turn(
+            session_id=session_id,
+            ip=ip,
+            turns=[{"role": "user", "content": user_message}, {"role": "assistant", "content": reply}],
+            ttl_seconds=self.ttl_seconds,
+            max_turns=TRIAL_SESSION_TURNS,
+            limit=limit
+        )
+
+
+# ============================================
+# REDIS (ou compatível: Valkey, KeyDB, Dragonfly)
+# ============================================
+
+# Checagem do limite e gravação no mesmo script: atômico no servidor (-1 = limite atingido)
+RECORD_TURN_SCRIPT = """
+local limit = tonumber(ARGV[1])
+local count = tonumber(redis.call('HGET', KEYS[1], 'messages_count') or '0')
+if limit >= 0 and count >= limit then
+    return -1
+end
+count = redis.call('HINCRBY', KEYS[1], 'messages_count', 1)
+redis.call('HSET', KEYS[1], 'ip', ARGV[2])
+redis.call('RPUSH', KEYS[2], ARGV[3], ARGV[4])
+redis.call('LTRIM', KEYS[2], -tonumber(ARGV[5]), -1)
+redis.call('EXPIRE', KEYS[1], ARGV[6])
+redis.call('EXPIRE', KEYS[2], ARGV[6])
+return count
+"""
+
+
+class RedisTrialStore:
+    """
+    Hash trial:<id> (contador, ip) + lista trial:<id>:turns (LTRIM = buffer circular).
+    O TTL é do próprio Redis; o limite de memória fica com a maxmemory-policy do servidor.
+    """
+
+    def __init__(self, url: str = REDIS_URL, ttl_seconds: int = TRIAL_SESSION_TTL_SECONDS):
+        import redis.asyncio as redis  # Dependência opcional (só com TRIAL_SESSION_BACKEND=redis)
+        self.client = redis.from_url(url, decode_responses=True)
+        self.ttl_seconds = ttl_seconds
+        self._record_script = self.client.register_script(RECORD_TURN_SCRIPT)
+
+    async def get(self, session_id: str) -> TrialSession:
+        key = f"trial:{session_id}"
+        pipe = self.client.pipeline(transaction=False)
+        pipe.hgetall(key)
+        pipe.lrange(f"{key}:turns", 0, -1)
+        data, turns = await pipe.execute()
+        if not data:
+            return TrialSession()
+        return TrialSession(
+            messages_count=int(data.get("messages_count", 0)),
+            turns=[tuple(json.loads(t)) for t in turns],
+            ip=data.get("ip", "")
+        )
+
+    async def record_turn(
+        self, session_id: str, ip: str, user_message: str, reply: str, limit: Optional[int] = None
+    ) -> Optional[int]:
+        key = f"trial:{session_id}"
+        count = await self._record_script(
+            keys=[key, f"{key}:turns"],
+            args=[
+                -1 if limit is None else limit, ip,
+                json.dumps(["user", user_message]), json.dumps(["assistant", reply]),
+                TRIAL_SESSION_TURNS, self.ttl_seconds
+            ]
+        )
+        return None if int(count) < 0 else int(count)
+
+
+# ============================================
+# INSTÂNCIA GLOBAL
+# ============================================
+
+_store = None
+
+
+def get_trial_store():
+    """Store configurado por TRIAL_SESSION_BACKEND (memory, postgres, redis)"""
+    global _store
+    if _store is None:
+        if TRIAL_SESSION_BACKEND == "postgres":
+            _store = PostgresTrialStore()
+        elif TRIAL_SESSION_BACKEND == "redis":
+            _store = RedisTrialStore()
+        else:
+            _store = MemoryTrialStore()
+        print(f"[TRIAL] Sessões de visitantes: {type(_store).__name__}")
+    return _store
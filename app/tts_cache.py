@@ -0,0 +1,388 @@
+"""
+AiSyster - Cache de Áudio TTS
+Cache em disco endereçado por conteúdo (texto, voz, modelo, velocidade)
+para nunca sintetizar duas vezes a mesma frase
+"""
+
+import asyncio
+import hashlib
+import mmap
+import os
+import tempfile
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from pathlib import Path
+from typing import AsyncIterator, Awaitable, Callable, Dict, Iterator, List, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows: sem lock entre processos
+    fcntl = None
+
+from app.config import (
+    TTS_CACHE_ENABLED,
+    TTS_CACHE_DIR,
+    TTS_CACHE_MAX_BYTES,
+    TTS_CACHE_RESCAN_SECONDS,
+    TTS_STREAM_CHUNK_SIZE,
+    VOICE_REQUEST_TIMEOUT
+)
+
+
+def tts_cache_key(text: str, voice: str, model: str, speed: float) -> str:
+    """Chave de conteúdo: sha256 exatamente dos parâmetros enviados à API de TTS"""
+    material = "\x1f".join([model, voice, f"{speed:.2f}", text])
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+class TTSAudioCache:
+    """
+    Áudio MP3 em disco, um arquivo por chave (<dir>/<ab>/<chave>.mp3).
+
+    - Índice LRU em memória (chave -> tamanho), limitado por bytes totais.
+      O diretório é compartilhado pelos workers: o índice é relido do disco a
+      cada TTS_CACHE_RESCAN_SECONDS (mtime = último uso), então o limite vale
+      para o diretório inteiro, não por worker
+    - No event loop, todo acesso a disco (aget/aiter_chunks/aput) roda em thread;
+      get/iter_chunks/put síncronos ficam para scripts e testes
+    - Leitura via mmap, em chunks, sem copiar o arquivo inteiro
+    - Escrita atômica (arquivo temporário + rename)
+    - Single-flight: pedidos simultâneos da mesma chave esperam a
+      primeira síntese em vez de chamar a API de novo
+    """
+
+    def __init__(self, directory: str = TTS_CACHE_DIR, max_bytes: int = TTS_CACHE_MAX_BYTES):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self._index: "OrderedDict[str, int]" = OrderedDict()
+        self._total_bytes = 0
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._loaded = False
+        self._scanned_at = 0.0
+        self.hits = 0
+        self.misses = 0
+
+    # ==========================================
+    # ÍNDICE
+    # ==========================================
+
+    def _path(self, key: str) -> Path:
+        return self.directory / key[:2] / f"{key}.mp3"
+
+    def _scan_disk(self) -> List[Tuple[float, str, int]]:
+        """(mtime, chave, tamanho) de cada áudio no diretório (só I/O: roda em thread)"""
+        if not self.directory.exists():
+            return []
+        entries = []
+        for path in self.directory.glob("*/*.mp3"):
+            try:
+                stat = path.stat()
+                entries.append((stat.st_mtime, path.stem, stat.st_size))
+            except OSError:
+                continue
+        return entries
+
+    def _apply_scan(self, entries: List[Tuple[float, str, int]]):
+        """Substitui o índice pelo conteúdo do disco (mais antigos primeiro)"""
+        self._index = OrderedDict((key, size) for _, key, size in sorted(entries))
+        self._total_bytes = sum(self._index.values())
+        self._loaded = True
+        self._scanned_at = time.monotonic()
+
+    def _load_index(self):
+        if not self._loaded:
+            self._apply_scan(self._scan_disk())
+            self._evict()
+
+    async def _aload_index(self):
+        if not self._loaded:
+            entries = await asyncio.to_thread(self._scan_disk)
+            if not self._loaded:
+                self._apply_scan(entries)
+                await self._aevict()
+
+    def _take_evictions(self) -> List[str]:
+        """Tira do índice as entradas menos usadas até caber no limite"""
+        evicted = []
+        while self._total_bytes > self.max_bytes and self._index:
+            key, size = self._index.popitem(last=False)
+            self._total_bytes -= size
+            evicted.append(key)
+        return evicted
+
+    def _unlink(self, keys: List[str]):
+        for key in keys:
+            try:
+                self._path(key).unlink()
+            except OSError:
+                pass
+
+    def _evict(self):
+        self._unlink(self._take_evictions())
+
+    async def _aevict(self):
+        evicted = self._take_evictions()
+        if evicted:
+            await asyncio.to_thread(self._unlink, evicted)
+
+    def __contains__(self, key: str) -> bool:
+        self._load_index()
+        return key in self._index
+
+    async def acontains(self, key: str) -> bool:
+        await self._aload_index()
+        return key in self._index
+
+    def __len__(self) -> int:
+        self._load_index()
+        return len(self._index)
+
+    @property
+    def total_bytes(self) -> int:
+        self._load_index()
+        return self._total_bytes
+
+    # ==========================================
+    # LEITURA / ESCRITA
+    # ==========================================
+
+    def _open(self, key: str):
+        """Abre o áudio e marca o uso (mtime); None se não existe (só I/O)"""
+        path = self._path(key)
+        try:
+            handle = open(path, "rb")
+        except OSError:
+            return None
+        try:
+            os.utime(path)  # mtime = último uso (LRU entre workers e após restart)
+        except OSError:
+            pass
+        return handle
+
+    def _opened(self, key: str, handle) -> bool:
+        """Atualiza índice/contadores depois de tentar abrir a chave"""
+        if handle is None:
+            # Ausente ou removido por outro worker: esquecer a entrada
+            self._total_bytes -= self._index.pop(key, 0)
+            self.misses += 1
+            return False
+
+        if key not in self._index:
+            # Gravado por outro worker depois da última leitura do diretório
+            size = os.fstat(handle.fileno()).st_size
+            self._index[key] = size
+            self._total_bytes += size
+        self._index.move_to_end(key)
+        self.hits += 1
+        return True
+
+    def get(self, key: str) -> Optional[bytes]:
+        """Retorna o áudio completo ou None"""
+        chunks = self.iter_chunks(key)
+        if chunks is None:
+            return None
+        return b"".join(chunks)
+
+    async def aget(self, key: str) -> Optional[bytes]:
+        """get() sem bloquear o event loop"""
+        chunks = await self.aiter_chunks(key)
+        if chunks is None:
+            return None
+        return b"".join([chunk async for chunk in chunks])
+
+    def iter_chunks(self, key: str, chunk_size: int = TTS_STREAM_CHUNK_SIZE) -> Optional[Iterator[bytes]]:
+        """Abre o áudio em cache para leitura em chunks (mmap). None se ausente"""
+        self._load_index()
+        handle = self._open(key) if key in self._index else None
+        if not self._opened(key, handle):
+            return None
+        return self._read_mapped(handle, chunk_size)
+
+    async def aiter_chunks(self, key: str, chunk_size: int = TTS_STREAM_CHUNK_SIZE) -> Optional[AsyncIterator[bytes]]:
+        """iter_chunks() com abertura e leituras em thread (confere o disco: pode ser de outro worker)"""
+        await self._aload_index()
+        handle = await asyncio.to_thread(self._open, key)
+        if not self._opened(key, handle):
+            return None
+        return self._aread_mapped(self._read_mapped(handle, chunk_size))
+
+    @staticmethod
+    def _read_mapped(handle, chunk_size: int) -> Iterator[bytes]:
+        with handle:
+            if os.fstat(handle.fileno()).st_size == 0:
+                return
+            with mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                for offset in range(0, len(mapped), chunk_size):
+                    yield mapped[offset:offset + chunk_size]
+
+    @staticmethod
+    async def _aread_mapped(chunks: Iterator[bytes]) -> AsyncIterator[bytes]:
+        try:
+            while True:
+                chunk = await asyncio.to_thread(next, chunks, None)
+                if chunk is None:
+                    return
+                yield chunk
+        finally:
+            await asyncio.to_thread(chunks.close)
+
+    def _write(self, key: str, audio: bytes) -> bool:
+        """Grava o arquivo de forma atômica (só I/O)"""
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as tmp:
+                tmp.write(audio)
+            os.replace(tmp_path, path)
+            return True
+        except OSError as e:
+            print(f"[TTS_CACHE] Erro ao gravar {key[:12]}: {e}")
+            try:
+                os.unlink(tmp_path)
+            except OSError:
+                pass
+            return False
+
+    def _written(self, key: str, size: int):
+        self._total_bytes -= self._index.pop(key, 0)
+        self._index[key] = size
+        self._total_bytes += size
+
+    def put(self, key: str, audio: bytes):
+        """Grava o áudio (atômico) e aplica o limite de tamanho"""
+        if not audio or len(audio) > self.max_bytes:
+            return
+        self._load_index()
+        if self._write(key, audio):
+            self._written(key, len(audio))
+            self._evict()
+
+    async def aput(self, key: str, audio: bytes):
+        """put() sem bloquear o event loop; relê o diretório periodicamente (limite global)"""
+        if not audio or len(audio) > self.max_bytes:
+            return
+        await self._aload_index()
+        if not await asyncio.to_thread(self._write, key, audio):
+            return
+
+        if time.monotonic() - self._scanned_at >= TTS_CACHE_RESCAN_SECONDS:
+            self._apply_scan(await asyncio.to_thread(self._scan_disk))
+        else:
+            self._written(key, len(audio))
+        await self._aevict()
+
+    # ==========================================
+    # SINGLE-FLIGHT
+    # ==========================================
+
+    def begin(self, key: str) -> Optional[asyncio.Future]:
+        """
+        Marca a chave como em síntese. Retorna None se este chamador é o
+        responsável por sintetizar, ou o Future de quem já está sintetizando.
+        """
+        pending = self._inflight.get(key)
+        if pending is not None:
+            return pending
+        self._inflight[key] = asyncio.get_running_loop().create_future()
+        return None
+
+    async def wait(self, pending: asyncio.Future) -> Optional[bytes]:
+        """Espera a síntese em andamento (None se falhou ou demorou demais)"""
+        try:
+            return await asyncio.wait_for(asyncio.shield(pending), VOICE_REQUEST_TIMEOUT)
+        except asyncio.TimeoutError:
+            return None
+
+    async def finish(self, key: str, audio: Optional[bytes]):
+        """Grava (se houver áudio) e acorda quem estava esperando a chave"""
+        try:
+            if audio:
+                await self.aput(key, audio)
+        finally:
+            pending = self._inflight.pop(key, None)
+            if pending is not None and not pending.done():
+                pending.set_result(audio)
+
+    async def get_or_create(self, key: str, synthesize: Callable[[], Awaitable[bytes]]) -> bytes:
+        """Retorna do cache ou sintetiza uma única vez (chamadas concorrentes compartilham)"""
+        cached = await self.aget(key)
+        if cached is not None:
+            return cached
+
+        pending = self.begin(key)
+        if pending is not None:
+            audio = await self.wait(pending)
+            if audio:
+                return audio
+            return await synthesize()
+
+        audio = None
+        try:
+            audio = await synthesize()
+            return audio
+        finally:
+            await self.finish(key, audio)
+
+    # ==========================================
+    # PRÉ-AQUECIMENTO
+    # ==========================================
+
+    @contextmanager
+    def prewarm_lock(self) -> Iterator[bool]:
+        """
+        Lock exclusivo (flock, sem esperar) no diretório do cache: só um worker
+        pré-aquece. Entrega False se outro processo já está com o lock.
+        """
+        if fcntl is None:
+            yield True
+            return
+
+        self.directory.mkdir(parents=True, exist_ok=True)
+        with open(self.directory / ".prewarm.lock", "w") as lock_file:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                yield False
+                return
+            try:
+                yield True
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def prewarm_done(self, fingerprint: str) -> bool:
+        """O pré-aquecimento deste conjunto de frases já rodou (marcador no diretório)"""
+        try:
+            return (self.directory / ".prewarm.done").read_text() == fingerprint
+        except OSError:
+            return False
+
+    def mark_prewarm_done(self, fingerprint: str):
+        try:
+            (self.directory / ".prewarm.done").write_text(fingerprint)
+        except OSError as e:
+            print(f"[TTS_CACHE] Erro ao gravar marcador de pré-aquecimento: {e}")
+
+    def clear(self):
+        """Remove todo o cache (testes/manutenção)"""
+        self._load_index()
+        self._unlink(list(self._index))
+        self._index.clear()
+        self._total_bytes = 0
+
+    async def get_stats(self) -> dict:
+        """Estatísticas para o painel admin (varredura do disco fora do event loop)"""
+        await self._aload_index()
+        return {
+            "enabled": TTS_CACHE_ENABLED,
+            "entries": len(self._index),
+            "total_bytes": self._total_bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses
+        }
+
+
+# Instância global
+tts_audio_cache = TTSAudioCache()
@@ -3,23 +3,46 @@ AiSyster - Serviço de Voz
 STT (Speech-to-Text) via Whisper e TTS (Text-to-Speech) via OpenAI
 """
 
+import asyncio
+import hashlib
 import io
-import tempfile
-import os
-from typing import Optional, Tuple
-from pathlib import Path
+import time
+from typing import AsyncIterator, Dict, Iterator, List, Optional, Tuple
 
-from openai import OpenAI
+from openai import AsyncOpenAI
 
 from app.config import (
     OPENAI_API_KEY,
+    OPENAI_BASE_URL,
     VOICE_ENABLED,
+    VOICE_REQUEST_TIMEOUT,
     STT_MODEL,
     STT_MAX_FILE_SIZE,
     TTS_MODEL,
     TTS_VOICE,
-    TTS_SPEED
+    TTS_SPEED,
+    TTS_STREAM_CHUNK_SIZE,
+    TTS_CACHE_ENABLED
 )
+from app.tts_cache import tts_audio_cache, tts_cache_key
+from app.logging_config import get_logger
+
+
+logger = get_logger("voice")
+
+# Limite de caracteres do TTS (~4096 na API)
+TTS_MAX_CHARS = 4000
+
+# Frases de teste de voz do app (frontend, botão "testar voz")
+VOICE_TEST_PHRASES = [
+    "Olá! Eu sou a AiSyster, sua companheira espiritual.",
+    "Hello! I am AiSyster, your spiritual companion.",
+    "Hola! Soy AiSyster, tu compañera espiritual.",
+]
+
+
+def _elapsed_ms(start: float) -> float:
+    return round((time.perf_counter() - start) * 1000, 1)
 
 
 class VoiceService:
@@ -29,9 +52,33 @@ class VoiceService:
     - TTS: Converte resposta da AiSyster em áudio (OpenAI TTS)
     """
 
-    def __init__(self):
-        self.client = OpenAI(api_key=OPENAI_API_KEY)
-        self.enabled = VOICE_ENABLED and bool(OPENAI_API_KEY)
+    def __init__(self, api_key: str = OPENAI_API_KEY, base_url: Optional[str] = OPENAI_BASE_URL):
+        self.api_key = api_key
+        self.base_url = base_url
+        self.enabled = VOICE_ENABLED and bool(api_key)
+        self._client: Optional[AsyncOpenAI] = None
+
+    @property
+    def client(self) -> AsyncOpenAI:
+        """
+        Cliente assíncrono único (criado no primeiro uso).
+        Reaproveitar a instância mantém o pool de conexões keep-alive
+        com a API entre requisições.
+        """
+        if self._client is None:
+            self._client = AsyncOpenAI(
+                api_key=self.api_key,
+                base_url=self.base_url,
+                timeout=VOICE_REQUEST_TIMEOUT,
+                max_retries=1
+            )
+        return self._client
+
+    async def close(self):
+        """Fecha o pool de conexões (shutdown da aplicação)"""
+        if self._client is not None:
+            await self._client.close()
+            self._client = None
 
     async def speech_to_text(
         self,
@@ -61,40 +108,28 @@ class VoiceService:
             return False, "Áudio muito curto ou vazio"
 
         try:
-            # Criar arquivo temporário com a extensão correta
-            suffix = Path(filename).suffix or ".webm"
-            with tempfile.NamedTemporaryFile(suffix=suffix, delete=False) as tmp:
-                tmp.write(audio_bytes)
-                tmp_path = tmp.name
-
-            try:
-                # Chamar Whisper
-                with open(tmp_path, "rb") as audio_file:
-                    transcript = self.client.audio.transcriptions.create(
-                        model=STT_MODEL,
-                        file=audio_file,
-                        language=language,
-                        response_format="text"
-                    )
+            # Upload direto da memória (o nome define o formato para o Whisper)
+            audio_file = io.BytesIO(audio_bytes)
+            audio_file.name = filename or "audio.webm"
+
+            transcript = await self.client.audio.transcriptions.create(
+                model=STT_MODEL,
+                file=audio_file,
+                language=language,
+                response_format="text"
+            )
 
-                # Limpar texto
-                text = transcript.strip() if isinstance(transcript, str) else str(transcript).strip()
+            # Limpar texto
+            text = transcript.strip() if isinstance(transcript, str) else str(transcript).strip()
 
-                if not text:
-                    return False, "Não consegui entender o áudio. Tente falar mais claramente."
+            if not text:
+                return False, "Não consegui entender o áudio. Tente falar mais claramente."
 
-                print(f"[STT] Transcrito: {text[:100]}...")
-                return True, text
-
-            finally:
-                # Limpar arquivo temporário
-                try:
-                    os.unlink(tmp_path)
-                except:
-                    pass
+            logger.info("stt.done", extra={"chars": len(text), "audio_bytes": len(audio_bytes)})
+            return True, text
 
         except Exception as e:
-            print(f"[STT] Erro: {e}")
+            logger.warning("stt.failed", extra={"error": str(e)})
             return False, f"Erro ao transcrever: {str(e)}"
 
     async def text_to_speech(
@@ -105,6 +140,7 @@ class VoiceService:
     ) -> Tuple[bool, bytes, str]:
         """
         Converte texto em áudio usando OpenAI TTS.
+        Frases já sintetizadas vêm do cache de áudio.
 
         Args:
             text: Texto para converter em áudio
@@ -117,34 +153,150 @@ class VoiceService:
         if not self.enabled:
             return False, b"", "Serviço de voz desabilitado"
 
-        if not text or len(text.strip()) == 0:
-            return False, b"", "Texto vazio"
+        text, error = self._prepare_tts_text(text)
+        if error:
+            return False, b"", error
 
-        # Limitar tamanho do texto (TTS tem limite de ~4096 chars)
-        max_chars = 4000
-        if len(text) > max_chars:
-            text = text[:max_chars] + "..."
-            print(f"[TTS] Texto truncado para {max_chars} caracteres")
+        voice = voice or TTS_VOICE
+        speed = speed or TTS_SPEED
 
-        try:
-            response = self.client.audio.speech.create(
+        async def synthesize() -> bytes:
+            response = await self.client.audio.speech.create(
                 model=TTS_MODEL,
-                voice=voice or TTS_VOICE,
+                voice=voice,
                 input=text,
-                speed=speed or TTS_SPEED,
+                speed=speed,
                 response_format="mp3"  # MP3 é mais compatível
             )
+            audio = response.content
+            logger.debug("tts.done", extra={"bytes": len(audio)})
+            return audio
 
-            # Ler bytes do áudio
-            audio_bytes = response.content
-
-            print(f"[TTS] Gerado áudio de {len(audio_bytes)} bytes")
+        try:
+            if TTS_CACHE_ENABLED:
+                key = tts_cache_key(text, voice, TTS_MODEL, speed)
+                audio_bytes = await tts_audio_cache.get_or_create(key, synthesize)
+            else:
+                audio_bytes = await synthesize()
             return True, audio_bytes, ""
 
         except Exception as e:
-            print(f"[TTS] Erro: {e}")
+            logger.warning("tts.failed", extra={"error": str(e)})
             return False, b"", f"Erro ao gerar áudio: {str(e)}"
 
+    async def stream_text_to_speech(
+        self,
+        text: str,
+        voice: Optional[str] = None,
+        speed: Optional[float] = None
+    ) -> Tuple[bool, Optional[AsyncIterator[bytes]], str]:
+        """
+        Converte texto em áudio e devolve os chunks MP3 conforme são gerados.
+
+        O primeiro chunk é aguardado aqui, então erros da API aparecem
+        antes de a resposta HTTP começar (e viram 500 normalmente).
+        Áudio em cache é servido do disco; áudio novo é gravado no cache
+        ao final do stream.
+
+        Returns:
+            Tuple[bool, AsyncIterator[bytes], str]: (sucesso, chunks, mensagem_erro)
+        """
+        if not self.enabled:
+            return False, None, "Serviço de voz desabilitado"
+
+        text, error = self._prepare_tts_text(text)
+        if error:
+            return False, None, error
+
+        voice = voice or TTS_VOICE
+        speed = speed or TTS_SPEED
+        key = None
+
+        if TTS_CACHE_ENABLED:
+            key = tts_cache_key(text, voice, TTS_MODEL, speed)
+            cached = await tts_audio_cache.aiter_chunks(key)
+            if cached is not None:
+                return True, cached, ""
+
+            pending = tts_audio_cache.begin(key)
+            if pending is not None:
+                # Mesma frase já está sendo sintetizada: reaproveitar
+                audio = await tts_audio_cache.wait(pending)
+                if audio:
+                    return True, self._from_memory(self._split(audio)), ""
+                key = None  # Síntese anterior falhou: seguir sem cache
+
+        chunks = self._speech_chunks(text, voice, speed)
+        if key:
+            chunks = self._tee_to_cache(key, chunks)
+
+        try:
+            first_chunk = await chunks.__anext__()
+        except StopAsyncIteration:
+            return False, None, "Áudio vazio"
+        except Exception as e:
+            await chunks.aclose()
+            logger.warning("tts.failed", extra={"error": str(e)})
+            return False, None, f"Erro ao gerar áudio: {str(e)}"
+
+        async def audio_stream():
+            try:
+                yield first_chunk
+                async for chunk in chunks:
+                    yield chunk
+            finally:
+                await chunks.aclose()
+
+        return True, audio_stream(), ""
+
+    async def _tee_to_cache(self, key: str, chunks: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+        """Repassa os chunks e grava o áudio completo no cache (só se o stream terminar)"""
+        parts = []
+        audio = None
+        try:
+            async for chunk in chunks:
+                parts.append(chunk)
+                yield chunk
+            audio = b"".join(parts)
+        finally:
+            await tts_audio_cache.finish(key, audio)
+
+    @staticmethod
+    def _split(audio: bytes) -> Iterator[bytes]:
+        for offset in range(0, len(audio), TTS_STREAM_CHUNK_SIZE):
+            yield audio[offset:offset + TTS_STREAM_CHUNK_SIZE]
+
+    @staticmethod
+    async def _from_memory(chunks: Iterator[bytes]) -> AsyncIterator[bytes]:
+        for chunk in chunks:
+            yield chunk
+
+    async def _speech_chunks(self, text: str, voice: str, speed: float) -> AsyncIterator[bytes]:
+        """Lê o áudio da API em chunks, sem bufferizar a resposta inteira"""
+        total = 0
+        async with self.client.audio.speech.with_streaming_response.create(
+            model=TTS_MODEL,
+            voice=voice,
+            input=text,
+            speed=speed,
+            response_format="mp3"
+        ) as response:
+            async for chunk in response.iter_bytes(TTS_STREAM_CHUNK_SIZE):
+                total += len(chunk)
+                yield chunk
+        logger.debug("tts.stream_done", extra={"bytes": total})
+
+    def _prepare_tts_text(self, text: str) -> Tuple[str, str]:
+        """Valida e limita o texto do TTS. Retorna (texto, mensagem_erro)"""
+        if not text or len(text.strip()) == 0:
+            return "", "Texto vazio"
+
+        if len(text) > TTS_MAX_CHARS:
+            text = text[:TTS_MAX_CHARS] + "..."
+            logger.info("tts.truncated", extra={"max_chars": TTS_MAX_CHARS})
+
+        return text, ""
+
     async def chat_with_voice(
         self,
         audio_bytes: bytes,
@@ -155,7 +307,8 @@ class VoiceService:
         return_audio: bool = True,
         language: str = "pt",
         spoken_language: Optional[str] = None,
-        voice: Optional[str] = None
+        voice: Optional[str] = None,
+        propagate: Tuple[type, ...] = ()
     ) -> dict:
         """
         Fluxo completo: Áudio do usuário -> Texto -> Chat -> Áudio da resposta
@@ -166,31 +319,38 @@ class VoiceService:
             chat_callback: Função assíncrona de chat (ai_service.chat)
             user_id: ID do usuário
             conversation_id: ID da conversa (opcional)
-            return_audio: Se deve retornar áudio da resposta
+            return_audio: Se deve retornar áudio da resposta (bufferizado).
+                Para streaming, chamar com False e usar stream_text_to_speech.
             language: Idioma do usuário para STT (pt, en, es, auto)
             spoken_language: Idioma para TTS (se diferente do language)
             voice: Voz preferida do usuário para TTS
+            propagate: Exceções do chat que sobem para a rota em vez de virar
+                result["error"] (ex: cota esgotada -> 402)
 
         Returns:
-            dict com: success, user_text, response_text, response_audio, conversation_id
+            dict com: success, user_text, response_text, response_audio,
+            conversation_id e timings (latência por etapa em ms)
         """
+        timings: Dict[str, float] = {}
         result = {
             "success": False,
             "user_text": "",
             "response_text": "",
             "response_audio": None,
             "conversation_id": conversation_id,
-            "error": ""
+            "error": "",
+            "timings": timings
         }
 
         # Mapear idioma para código Whisper (auto = None para autodetectar)
         stt_language = None if language == "auto" else language
         tts_voice = voice or TTS_VOICE
 
-        print(f"[VOICE] language={language}, spoken_language={spoken_language}, voice={tts_voice}")
 
         # 1. Transcrever áudio do usuário
+        stage_start = time.perf_counter()
         stt_success, user_text = await self.speech_to_text(audio_bytes, filename, language=stt_language)
+        timings["stt_ms"] = _elapsed_ms(stage_start)
 
         if not stt_success:
             result["error"] = user_text  # Mensagem de erro
@@ -201,6 +361,7 @@ class VoiceService:
         # 2. Processar no chat (com instrução para resposta curta - modo voz)
         # Adicionar prefixo invisível para forçar resposta concisa
         voice_instruction = "[MODO VOZ - Responda em 1-2 frases curtas e diretas. Seja objetiva.]\n"
+        stage_start = time.perf_counter()
         try:
             chat_result = await chat_callback(
                 user_id=user_id,
@@ -209,25 +370,63 @@ class VoiceService:
             )
             result["response_text"] = chat_result["response"]
             result["conversation_id"] = chat_result["conversation_id"]
+        except propagate:
+            raise
         except Exception as e:
             result["error"] = f"Erro no chat: {str(e)}"
             return result
+        timings["chat_ms"] = _elapsed_ms(stage_start)
 
         # 3. Converter resposta em áudio (se solicitado)
         if return_audio and result["response_text"]:
+            stage_start = time.perf_counter()
             tts_success, audio, tts_error = await self.text_to_speech(
                 result["response_text"],
                 voice=tts_voice
             )
+            timings["tts_ms"] = _elapsed_ms(stage_start)
             if tts_success:
                 result["response_audio"] = audio
             else:
-                print(f"[VOICE] TTS falhou: {tts_error}")
+                logger.warning("voice.tts_failed", extra={"error": tts_error})
                 # Não falhar a requisição por causa do TTS
 
+        logger.info("voice.done", extra=dict(
+            timings, language=language, spoken_language=spoken_language, voice=tts_voice
+        ))
         result["success"] = True
         return result
 
+    @staticmethod
+    def server_timing_header(timings: Dict[str, float]) -> str:
+        """Formata a latência por etapa como header Server-Timing"""
+        return ", ".join(
+            f"{stage.replace('_ms', '')};dur={duration}"
+            for stage, duration in timings.items()
+        )
+
+    async def prewarm_cache(self, texts: List[str], voices: Optional[List[str]] = None) -> Tuple[int, int]:
+        """
+        Sintetiza frases fixas que se repetem entre usuários (uma por vez,
+        para não competir com o tráfego). Frases já em cache são puladas.
+        Retorna (áudios novos gerados, falhas).
+        """
+        if not (self.enabled and TTS_CACHE_ENABLED):
+            return 0, 0
+
+        created = failed = 0
+        for voice in voices or [TTS_VOICE]:
+            for text in texts:
+                prepared, error = self._prepare_tts_text(text)
+                if error or await tts_audio_cache.acontains(tts_cache_key(prepared, voice, TTS_MODEL, TTS_SPEED)):
+                    continue
+                success, _, _ = await self.text_to_speech(text, voice=voice)
+                if success:
+                    created += 1
+                else:
+                    failed += 1
+        return created, failed
+
     def get_available_voices(self) -> list:
         """
         Retorna as vozes disponíveis para TTS.
@@ -244,3 +443,39 @@ class VoiceService:
 
 # Instância global para reutilização
 voice_service = VoiceService()
+
+
+async def prewarm_voice_cache():
+    """
+    Pré-aquece o cache TTS com templates de resposta segura (policy engine),
+    devocionais pré-definidos e frases de teste de voz.
+    """
+    from app.policy import SafeResponseTemplates
+    from app.routes.devotional import DEVOTIONALS, devotional_speech_text
+
+    templates = [
+        value for name, value in vars(SafeResponseTemplates).items()
+        if name.endswith("_RESPONSE") and isinstance(value, str)
+    ]
+    devotionals = [devotional_speech_text(d) for d in DEVOTIONALS]
+
+    texts = templates + devotionals + VOICE_TEST_PHRASES
+    fingerprint = hashlib.sha256("\x1e".join([TTS_MODEL, TTS_VOICE, str(TTS_SPEED)] + texts).encode("utf-8")).hexdigest()
+
+    # Um worker só (lock no diretório do cache) e uma vez por conjunto de frases
+    with tts_audio_cache.prewarm_lock() as leader:
+        if not leader:
+            print("[TTS_CACHE] Pré-aquecimento em andamento em outro worker")
+            return
+        if await asyncio.to_thread(tts_audio_cache.prewarm_done, fingerprint):
+            return
+
+        try:
+            created, failed = await voice_service.prewarm_cache(texts)
+        except Exception as e:
+            print(f"[TTS_CACHE] Erro no pré-aquecimento: {e}")
+            return
+
+        if not failed:
+            await asyncio.to_thread(tts_audio_cache.mark_prewarm_done, fingerprint)
+        print(f"[TTS_CACHE] Pré-aquecimento concluído: {created} áudios novos, {failed} falhas")
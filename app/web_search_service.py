@@ -4,6 +4,7 @@ Usa Claude para decidir quando pesquisar, gerar queries otimizadas e sintetizar
 """
 
 import json
+import logging
 from typing import Optional, List, Dict, Tuple
 from datetime import datetime
 
@@ -15,6 +16,11 @@ from app.config import (
     WEB_SEARCH_ENABLED,
     WEB_SEARCH_MAX_RESULTS
 )
+from app.telemetry import traced_llm_call
+from app.logging_config import get_logger
+
+
+logger = get_logger("web_search")
 
 
 # Prompt para Claude decidir se precisa pesquisar
@@ -96,7 +102,8 @@ class SmartWebSearchService:
             location_context = f"Localizacao do usuario: {user_location}"
 
         try:
-            response = self.client.messages.create(
+            response = traced_llm_call(
+                "search_decision", self.client,
                 model=AI_MODEL_FALLBACK,  # Haiku = rapido e barato
                 max_tokens=200,
                 messages=[{
@@ -129,10 +136,10 @@ class SmartWebSearchService:
             }
 
         except json.JSONDecodeError as e:
-            print(f"[SEARCH] JSON parse error: {e}")
+            logger.warning("search.analysis_parse_failed", extra={"error": str(e)})
             return {"needs_search": False, "reason": "Erro ao analisar"}
         except Exception as e:
-            print(f"[SEARCH] Analysis error: {e}")
+            logger.warning("search.analysis_failed", extra={"error": str(e)})
             return {"needs_search": False, "reason": f"Erro: {str(e)}"}
 
     async def execute_search(
@@ -183,9 +190,9 @@ INSTRUCOES:
             }
             if location_config:
                 web_search_tool["user_location"] = location_config
-                print(f"[SEARCH] Usando localização: {location_config}")
 
-            response = self.client.messages.create(
+            response = traced_llm_call(
+                "web_search", self.client,
                 model=AI_MODEL_FALLBACK,  # Haiku com web search
                 max_tokens=1500,
                 tools=[web_search_tool],
@@ -199,16 +206,11 @@ INSTRUCOES:
             text_content = ""
             sources = []
 
-            print(f"[SEARCH] Response blocks: {len(response.content)}")
-
             for block in response.content:
-                print(f"[SEARCH] Block type: {block.type}")
-
                 if block.type == "text":
                     text_content += block.text
                     # Extrair fontes do atributo citations (web_search_result_location)
                     if hasattr(block, 'citations') and block.citations:
-                        print(f"[SEARCH] Found {len(block.citations)} citations in text block")
                         for citation in block.citations:
                             # citation tem type="web_search_result_location", url, title, cited_text
                             url = getattr(citation, 'url', None)
@@ -221,20 +223,22 @@ INSTRUCOES:
                                         "title": title or url.split('/')[2] if '/' in url else "Link",
                                         "url": url
                                     })
-                                    print(f"[SEARCH] Source: {title[:50] if title else url[:30]}")
                 elif block.type == "web_search_tool_result":
                     # Formato alternativo - resultados em bloco separado
-                    print(f"[SEARCH] web_search_tool_result found!")
                     if hasattr(block, 'content') and block.content:
                         for item in block.content:
                             url = getattr(item, 'url', None)
                             title = getattr(item, 'title', None)
                             if url and title and not any(s['url'] == url for s in sources):
                                 sources.append({"title": title, "url": url})
-                                print(f"[SEARCH] Source from result: {title[:50] if len(title) > 50 else title}")
 
-            print(f"[SEARCH] Total sources found: {len(sources)}")
-            print(f"[SEARCH] Content length: {len(text_content)}")
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("search.response", extra={
+                    "blocks": [block.type for block in response.content],
+                    "sources": len(sources),
+                    "content_chars": len(text_content),
+                    "location": location_config.get("country") if location_config else None
+                })
 
             return {
                 "success": True,
@@ -245,10 +249,10 @@ INSTRUCOES:
             }
 
         except anthropic.APIError as e:
-            print(f"[SEARCH] API Error: {e}")
+            logger.warning("search.api_error", extra={"error": str(e)})
             return {"success": False, "error": str(e), "results": [], "sources": []}
         except Exception as e:
-            print(f"[SEARCH] Error: {e}")
+            logger.warning("search.failed", extra={"error": str(e)})
             return {"success": False, "error": str(e), "results": [], "sources": []}
 
     async def smart_search(
@@ -283,13 +287,13 @@ INSTRUCOES:
             # Fallback: usar a mensagem como query
             queries = [message[:100]]
 
-        print(f"[SEARCH] Pesquisando: {queries}")
+        logger.info("search.start", extra={"queries": len(queries)})
 
         # 2. Executar pesquisa
         search_result = await self.execute_search(queries, user_location)
 
         if not search_result.get("success"):
-            print(f"[SEARCH] Falha: {search_result.get('error')}")
+            logger.warning("search.no_result", extra={"error": search_result.get("error")})
             return None
 
         # 3. Formatar resultado
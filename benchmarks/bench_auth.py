@@ -0,0 +1,114 @@
+"""
+AiSyster - Micro-benchmark da dependencia de autenticacao
+Mede o custo por request de get_current_user com e sem o cache de JWT
+
+Uso:
+  python benchmarks/bench_auth.py
+  python benchmarks/bench_auth.py --iterations 50000
+"""
+
+import os
+import sys
+import time
+import asyncio
+import argparse
+from pathlib import Path
+
+# Adicionar path do projeto
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+# config.py exige a chave de criptografia
+os.environ.setdefault("ENCRYPTION_KEY", "bench_key_32_characters_long_xxx")
+
+from app.security import (
+    create_access_token,
+    verify_token,
+    verify_token_cached,
+    revoke_token,
+    token_cache,
+    revoked_tokens,
+)
+from app.auth import get_current_user
+
+
+def _per_call_us(elapsed: float, iterations: int) -> float:
+    return elapsed / iterations * 1_000_000
+
+
+def bench_verify_token(token: str, iterations: int) -> float:
+    """Decodificacao + HMAC completos a cada chamada (comportamento antigo)"""
+    start = time.perf_counter()
+    for _ in range(iterations):
+        verify_token(token)
+    return _per_call_us(time.perf_counter() - start, iterations)
+
+
+def bench_verify_cached(token: str, iterations: int) -> float:
+    """Token quente no cache"""
+    token_cache.clear()
+    verify_token_cached(token)
+    start = time.perf_counter()
+    for _ in range(iterations):
+        verify_token_cached(token)
+    return _per_call_us(time.perf_counter() - start, iterations)
+
+
+def bench_verify_cached_with_revocations(token: str, iterations: int, revoked: int) -> float:
+    """Token quente no cache com a lista de revogacao populada"""
+    token_cache.clear()
+    revoked_tokens.clear()
+    for i in range(revoked):
+        revoke_token(create_access_token(f"revoked-{i}", f"r{i}@bench.local"))
+    verify_token_cached(token)
+    start = time.perf_counter()
+    for _ in range(iterations):
+        verify_token_cached(token)
+    elapsed = time.perf_counter() - start
+    revoked_tokens.clear()
+    return _per_call_us(elapsed, iterations)
+
+
+async def bench_dependency(header: str, iterations: int, warm: bool) -> float:
+    """Dependencia FastAPI completa (get_current_user)"""
+    token_cache.clear()
+    if warm:
+        await get_current_user(authorization=header)
+    start = time.perf_counter()
+    for _ in range(iterations):
+        if not warm:
+            token_cache.clear()
+        await get_current_user(authorization=header)
+    return _per_call_us(time.perf_counter() - start, iterations)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark da dependencia de autenticacao")
+    parser.add_argument("--iterations", type=int, default=20000)
+    parser.add_argument("--revoked", type=int, default=500, help="Tokens revogados no cenario com revogacao")
+    args = parser.parse_args()
+
+    token = create_access_token("00000000-0000-0000-0000-000000000001", "bench@aisyster.com")
+    header = f"Bearer {token}"
+    n = args.iterations
+
+    results = [
+        ("verify_token (sem cache)", bench_verify_token(token, n)),
+        ("verify_token_cached (quente)", bench_verify_cached(token, n)),
+        (f"verify_token_cached (+{args.revoked} revogados)", bench_verify_cached_with_revocations(token, n, args.revoked)),
+        ("get_current_user (cache frio)", asyncio.run(bench_dependency(header, n, warm=False))),
+        ("get_current_user (cache quente)", asyncio.run(bench_dependency(header, n, warm=True))),
+    ]
+
+    print(f"\n=== BENCHMARK: Autenticacao ({n} iteracoes) ===")
+    width = max(len(name) for name, _ in results)
+    for name, us in results:
+        print(f"  {name.ljust(width)}  {us:8.2f} us/request")
+
+    baseline = results[0][1]
+    warm = results[-1][1]
+    if warm > 0:
+        print(f"\n  Speedup dependencia (quente vs sem cache): {baseline / warm:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+"""
+AiSyster - Benchmark de criação de campanhas de notificação
+Mede o tempo para criar as entregas de uma campanha em função do tamanho do público:
+  antes   -> SELECT de todos os usuários + um INSERT por usuário/canal
+  depois  -> materialize_campaign (um único INSERT ... SELECT)
+
+Precisa de um PostgreSQL (usa um schema próprio, apagado no final).
+
+Uso:
+  python benchmarks/bench_campaigns.py --dsn postgresql://localhost/aisyster_bench
+  python benchmarks/bench_campaigns.py --sizes 1000 10000 50000 --legacy-max 10000
+"""
+
+import os
+import sys
+import time
+import uuid
+import asyncio
+import argparse
+from pathlib import Path
+
+# Adicionar path do projeto
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+# config.py exige a chave de criptografia
+os.environ.setdefault("ENCRYPTION_KEY", "bench_key_32_characters_long_xxx")
+
+import asyncpg
+
+from app.notification_campaigns import materialize_campaign
+
+
+SCHEMA = "bench_campaigns"
+
+TABLES = """
+    CREATE TABLE users (
+        id UUID PRIMARY KEY,
+        email VARCHAR(255) NOT NULL,
+        is_active BOOLEAN DEFAULT TRUE,
+        is_premium BOOLEAN DEFAULT FALSE
+    );
+    CREATE TABLE user_profiles (
+        user_id UUID PRIMARY KEY REFERENCES users(id),
+        push_notifications BOOLEAN DEFAULT TRUE,
+        email_notifications BOOLEAN DEFAULT TRUE
+    );
+    CREATE TABLE notifications (
+        id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+        title VARCHAR(255) NOT NULL DEFAULT 'bench',
+        status VARCHAR(50) DEFAULT 'pending',
+        total_recipients INTEGER DEFAULT 0,
+        recipient_ids UUID[]
+    );
+    CREATE TABLE notification_deliveries (
+        id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+        notification_id UUID REFERENCES notifications(id) ON DELETE CASCADE,
+        user_id UUID REFERENCES users(id) ON DELETE CASCADE,
+        channel VARCHAR(20) NOT NULL,
+        status VARCHAR(20) DEFAULT 'pending',
+        created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+    );
+    CREATE INDEX idx_notification_deliveries_progress
+    ON notification_deliveries(notification_id, channel, status);
+"""
+
+
+async def seed_users(pool, total: int):
+    ids = [uuid.uuid4() for _ in range(total)]
+    async with pool.acquire() as conn:
+        await conn.execute("TRUNCATE users, user_profiles, notifications, notification_deliveries CASCADE")
+        await conn.copy_records_to_table(
+            "users", records=[(uid, f"user{i}@bench.local", True, i % 5 == 0) for i, uid in enumerate(ids)],
+            columns=("id", "email", "is_active", "is_premium")
+        )
+        # 1 em cada 10 sem email, 1 em cada 4 sem push
+        await conn.copy_records_to_table(
+            "user_profiles", records=[(uid, i % 4 != 0, i % 10 != 0) for i, uid in enumerate(ids)],
+            columns=("user_id", "push_notifications", "email_notifications")
+        )
+
+
+async def create_notification(pool):
+    return await pool.fetchval("INSERT INTO notifications DEFAULT VALUES RETURNING id")
+
+
+async def legacy_create(pool) -> int:
+    """O caminho antigo do send_notification (uma ida ao banco por entrega)"""
+    notification_id = await create_notification(pool)
+    async with pool.acquire() as conn:
+        users = await conn.fetch(
+            """
+            SELECT u.id, u.email, up.push_notifications, up.email_notifications
+            FROM users u
+            LEFT JOIN user_profiles up ON u.id = up.user_id
+            WHERE u.is_active = TRUE
+            """
+        )
+        await conn.execute(
+            "UPDATE notifications SET total_recipients = $1 WHERE id = $2", len(users), notification_id
+        )
+        round_trips = 2
+        for user in users:
+            for channel, enabled in (("push", user["push_notifications"]), ("email", user["email_notifications"])):
+                if enabled:
+                    await conn.execute(
+                        """
+                        INSERT INTO notification_deliveries (notification_id, user_id, channel, status)
+                        VALUES ($1, $2, $3, 'pending')
+                        """,
+                        notification_id, user["id"], channel
+                    )
+                    round_trips += 1
+    return round_trips
+
+
+async def current_create(pool) -> int:
+    notification_id = await create_notification(pool)
+    await materialize_campaign(pool, notification_id, "all", True, True)
+    return 1
+
+
+async def run(args):
+    admin = await asyncpg.connect(args.dsn)
+    await admin.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE; CREATE SCHEMA {SCHEMA}")
+    await admin.execute(f"SET search_path TO {SCHEMA}; {TABLES}")
+    pool = await asyncpg.create_pool(args.dsn, min_size=1, max_size=2, server_settings={"search_path": SCHEMA})
+
+    print(f"\n=== BENCHMARK: Criação de campanha ({', '.join(str(s) for s in args.sizes)} usuários) ===")
+    print(f"  {'usuários'.rjust(9)} {'modo'.ljust(7)} {'idas ao banco':>14} {'tempo s':>9} {'entregas':>9}")
+    try:
+        for size in args.sizes:
+            await seed_users(pool, size)
+            modes = [("depois", current_create)]
+            if size <= args.legacy_max:
+                modes.insert(0, ("antes", legacy_create))
+            for name, create in modes:
+                await pool.execute("TRUNCATE notifications, notification_deliveries")
+                start = time.perf_counter()
+                round_trips = await create(pool)
+                elapsed = time.perf_counter() - start
+                deliveries = await pool.fetchval("SELECT COUNT(*) FROM notification_deliveries")
+                print(f"  {size:>9} {name.ljust(7)} {round_trips:>14} {elapsed:>9.2f} {deliveries:>9}")
+    finally:
+        await pool.close()
+        await admin.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+        await admin.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de criação de campanhas de notificação")
+    parser.add_argument("--dsn", default=os.getenv("DATABASE_URL", "postgresql://localhost/aisyster_bench"))
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 50000])
+    parser.add_argument("--legacy-max", type=int, default=10000, help="Maior público medido no caminho antigo")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,470 @@
+"""
+AiSyster - Benchmark de carga do caminho quente
+Popula um Postgres descartável com usuários sintéticos (muitas memórias,
+conversas longas, push subscriptions) e dispara requisições concorrentes
+pelo app FastAPI, no próprio processo (ASGI), contra stubs locais do LLM
+(Anthropic) e da OpenAI (STT/TTS):
+  chat      -> POST /chat/ (na conversa longa do usuário)
+  file      -> POST /chat/with-file (imagem PNG)
+  voice     -> POST /voice/chat (STT + chat + TTS)
+  memories  -> GET /memories
+  admin     -> GET /admin/stats/users, /admin/stats/conversations, /admin/push/stats
+
+Reporta por endpoint: throughput, p50/p95/p99, round trips ao banco por
+requisição; e o lag do event loop. Compara com o baseline salvo
+(benchmarks/baselines/chat_load.json), como o BaselineManager dos evals.
+
+O banco é apagado/reaproveitado pelo benchmark: NUNCA aponte para produção.
+
+Uso:
+  BENCH_DATABASE_URL=postgresql://localhost/aisyster_bench python benchmarks/bench_chat_load.py
+  python benchmarks/bench_chat_load.py --users 200 --memories 500 --messages 400 --duration 60 --concurrency 32
+  python benchmarks/bench_chat_load.py --mix chat=70,memories=30 --save-baseline
+"""
+
+import io
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import argparse
+import subprocess
+from contextvars import ContextVar
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+# Adicionar path do projeto (e de benchmarks/, para o stub da OpenAI do bench_voice)
+sys.path.insert(0, str(Path(__file__).parent.parent))
+sys.path.insert(0, str(Path(__file__).parent))
+
+# config.py exige a chave de criptografia; voz habilitada contra o stub
+ADMIN_EMAIL = "bench-admin@aisyster.local"
+os.environ.setdefault("ENCRYPTION_KEY", "bench_key_32_characters_long_xxx")
+os.environ.setdefault("OPENAI_API_KEY", "bench")
+os.environ.setdefault("ANTHROPIC_API_KEY", "bench")
+os.environ["ADMIN_EMAILS"] = ADMIN_EMAIL
+
+import httpx
+from PIL import Image
+
+from bench_voice import start_stub_server
+import app.telemetry as telemetry
+from app.main import app
+from app.security import create_access_token, encrypt_data, rate_limiter
+from app.voice_service import voice_service
+from evals.tools.inprocess import InProcessHarness
+
+BASELINE_PATH = Path(__file__).parent / "baselines" / "chat_load.json"
+DEFAULT_MIX = "chat=50,file=10,voice=10,memories=20,admin=10"
+
+USER_MESSAGES = [
+    "Estou muito ansiosa com meu trabalho, não consigo dormir",
+    "Como posso perdoar meu irmão?",
+    "Hoje foi um dia bom, quero agradecer a Deus",
+    "Meu filho está doente e estou com medo",
+    "O que a Bíblia diz sobre esperança?",
+]
+MEMORY_CATEGORIES = ["IDENTIDADE", "FAMILIA", "CONTEXTO", "LUTA", "FE"]
+
+
+# ============================================
+# ROUND TRIPS AO BANCO POR REQUISIÇÃO
+# ============================================
+
+# Contador da requisição atual: o query logger do asyncpg roda com o contexto da task que fez a query
+_request_queries: ContextVar[Optional[list]] = ContextVar("bench_request_queries", default=None)
+_record_query = telemetry.record_query
+
+
+def counting_record_query(record):
+    counter = _request_queries.get()
+    if counter is not None:
+        counter[0] += 1
+    _record_query(record)
+
+
+# ============================================
+# DADOS SINTÉTICOS
+# ============================================
+
+async def seed(db, args) -> Tuple[List[dict], str]:
+    """Usuários bench-user-N com memórias, uma conversa longa e push subscriptions (reaproveita se já existem)"""
+    async with db.pool.acquire() as conn:
+        existing = await conn.fetchval("SELECT COUNT(*) FROM users WHERE email LIKE 'bench-user-%'")
+        if existing != args.users or args.reseed:
+            print(f"  Populando {args.users} usuários ({args.memories} memórias, {args.messages} mensagens, "
+                  f"{args.subscriptions} subscriptions cada)...")
+            start = time.perf_counter()
+            await conn.execute("DELETE FROM users WHERE email LIKE 'bench-user-%' OR email = $1", ADMIN_EMAIL)
+
+            users = await conn.fetch(
+                """
+                INSERT INTO users (email, password_hash, is_premium, accepted_terms, last_login)
+                SELECT 'bench-user-' || i || '@aisyster.local', 'bench', TRUE, TRUE, NOW() - (i % 30 || ' days')::INTERVAL
+                FROM generate_series(1, $1) AS i
+                RETURNING id
+                """,
+                args.users
+            )
+            user_ids = [row["id"] for row in users]
+            await conn.execute("INSERT INTO users (email, password_hash, is_premium) VALUES ($1, 'bench', TRUE)", ADMIN_EMAIL)
+            await conn.execute(
+                "INSERT INTO user_profiles (user_id, nome) SELECT id, 'Bench' FROM unnest($1::uuid[]) AS u(id)",
+                user_ids
+            )
+            await conn.execute(
+                """
+                INSERT INTO user_memories (user_id, categoria, fato, importancia)
+                SELECT u.id, ($3::text[])[1 + g % 5], 'Fato sintético ' || g || ' da vida do usuário', 1 + g % 10
+                FROM unnest($1::uuid[]) AS u(id), generate_series(1, $2) AS g
+                """,
+                user_ids, args.memories, MEMORY_CATEGORIES
+            )
+            await conn.execute(
+                """
+                INSERT INTO push_subscriptions (user_id, endpoint, p256dh, auth)
+                SELECT u.id, 'https://push.bench.local/' || u.id || '/' || g, 'bench-key', 'bench-auth'
+                FROM unnest($1::uuid[]) AS u(id), generate_series(1, $2) AS g
+                """,
+                user_ids, args.subscriptions
+            )
+            conversations = await conn.fetch(
+                """
+                INSERT INTO conversations (user_id, message_count)
+                SELECT id, $2 FROM unnest($1::uuid[]) AS u(id)
+                RETURNING id, user_id
+                """,
+                user_ids, args.messages
+            )
+
+            # Poucos textos cifrados por usuário, repetidos (Fernet é caro e o conteúdo não importa)
+            records = []
+            for conversation in conversations:
+                user_key = str(conversation["user_id"])
+                encrypted = [encrypt_data(text, user_key) for text in USER_MESSAGES]
+                for i in range(args.messages):
+                    role = "user" if i % 2 == 0 else "assistant"
+                    records.append((conversation["id"], conversation["user_id"], role, encrypted[i % len(encrypted)], 40, "bench"))
+            await conn.copy_records_to_table(
+                "messages", records=records,
+                columns=["conversation_id", "user_id", "role", "content_encrypted", "tokens_used", "model_used"]
+            )
+            await conn.execute("ANALYZE")
+            print(f"  Dados prontos em {time.perf_counter() - start:.1f}s")
+
+        rows = await conn.fetch(
+            """
+            SELECT u.id, u.email, c.id AS conversation_id
+            FROM users u
+            JOIN LATERAL (
+                SELECT id FROM conversations WHERE user_id = u.id ORDER BY started_at LIMIT 1
+            ) c ON TRUE
+            WHERE u.email LIKE 'bench-user-%'
+            ORDER BY u.email
+            """
+        )
+        admin_id = await conn.fetchval("SELECT id FROM users WHERE email = $1", ADMIN_EMAIL)
+
+    users = [
+        {"token": create_access_token(str(row["id"]), row["email"]), "conversation_id": str(row["conversation_id"])}
+        for row in rows
+    ]
+    return users, create_access_token(str(admin_id), ADMIN_EMAIL)
+
+
+def make_png() -> bytes:
+    buffer = io.BytesIO()
+    Image.new("RGB", (640, 480), (120, 160, 200)).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+# ============================================
+# CARGA
+# ============================================
+
+ADMIN_PATHS = ["/admin/stats/users", "/admin/stats/conversations", "/admin/push/stats"]
+
+
+async def one_request(client: httpx.AsyncClient, endpoint: str, user: dict, admin_token: str, rng: random.Random, png: bytes):
+    headers = {"Authorization": f"Bearer {user['token']}"}
+    message = rng.choice(USER_MESSAGES)
+
+    if endpoint == "chat":
+        return await client.post("/chat/", headers=headers,
+                                 json={"message": message, "conversation_id": user["conversation_id"]})
+    if endpoint == "file":
+        return await client.post("/chat/with-file", headers=headers,
+                                 data={"message": "O que você vê?", "conversation_id": user["conversation_id"]},
+                                 files={"file": ("foto.png", png, "image/png")})
+    if endpoint == "voice":
+        return await client.post("/voice/chat", headers=headers,
+                                 data={"conversation_id": user["conversation_id"], "return_audio": "true"},
+                                 files={"audio": ("audio.webm", b"\x1a\x45\xdf\xa3" + b"\x00" * 16_000, "audio/webm")})
+    if endpoint == "memories":
+        return await client.get("/memories", headers=headers)
+    return await client.get(rng.choice(ADMIN_PATHS), headers={"Authorization": f"Bearer {admin_token}"})
+
+
+async def monitor_loop_lag(samples: List[float], stop: asyncio.Event, interval: float = 0.01):
+    """Atraso do event loop: quanto o sleep(interval) passou do previsto"""
+    loop = asyncio.get_running_loop()
+    while not stop.is_set():
+        start = loop.time()
+        await asyncio.sleep(interval)
+        samples.append(max(0.0, loop.time() - start - interval))
+
+
+async def drive(args, users: List[dict], admin_token: str) -> dict:
+    mix = {name: int(weight) for name, weight in (part.split("=") for part in args.mix.split(","))}
+    endpoints, weights = list(mix), list(mix.values())
+    png = make_png()
+    samples: Dict[str, list] = {name: [] for name in endpoints}
+    lag: List[float] = []
+
+    transport = httpx.ASGITransport(app=app, client=("127.0.0.1", 50000))
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=120) as client:
+        async def worker(worker_id: int, deadline: float, record: bool):
+            rng = random.Random(args.seed + worker_id)
+            while time.perf_counter() < deadline:
+                endpoint = rng.choices(endpoints, weights)[0]
+                counter = [0]
+                token = _request_queries.set(counter)
+                start = time.perf_counter()
+                try:
+                    response = await one_request(client, endpoint, rng.choice(users), admin_token, rng, png)
+                    status = response.status_code
+                except Exception as e:
+                    status = type(e).__name__
+                finally:
+                    _request_queries.reset(token)
+                if record:
+                    samples[endpoint].append((time.perf_counter() - start, status, counter[0]))
+
+        if args.warmup:
+            deadline = time.perf_counter() + args.warmup
+            await asyncio.gather(*(worker(i, deadline, False) for i in range(args.concurrency)))
+
+        stop = asyncio.Event()
+        lag_task = asyncio.create_task(monitor_loop_lag(lag, stop))
+        start = time.perf_counter()
+        deadline = start + args.duration
+        await asyncio.gather(*(worker(i, deadline, True) for i in range(args.concurrency)))
+        elapsed = time.perf_counter() - start
+        stop.set()
+        await lag_task
+
+    return {"samples": samples, "elapsed": elapsed, "lag": lag}
+
+
+# ============================================
+# RELATÓRIO
+# ============================================
+
+def percentile(ordered: List[float], q: float) -> float:
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(len(ordered) * q))]
+
+
+def summarize(run: dict) -> dict:
+    endpoints = {}
+    for name, samples in run["samples"].items():
+        if not samples:
+            continue
+        latencies = sorted(s[0] for s in samples)
+        errors = [s[1] for s in samples if not (isinstance(s[1], int) and s[1] < 400)]
+        endpoints[name] = {
+            "requests": len(samples),
+            "errors": len(errors),
+            "error_statuses": sorted({str(e) for e in errors}),
+            "rps": len(samples) / run["elapsed"],
+            "p50_ms": percentile(latencies, 0.50) * 1000,
+            "p95_ms": percentile(latencies, 0.95) * 1000,
+            "p99_ms": percentile(latencies, 0.99) * 1000,
+            "db_round_trips": sum(s[2] for s in samples) / len(samples),
+        }
+    lag = sorted(run["lag"])
+    return {
+        "elapsed_s": run["elapsed"],
+        "total_rps": sum(e["requests"] for e in endpoints.values()) / run["elapsed"],
+        "endpoints": endpoints,
+        "loop_lag_ms": {
+            "p50": percentile(lag, 0.50) * 1000,
+            "p99": percentile(lag, 0.99) * 1000,
+            "max": (lag[-1] if lag else 0.0) * 1000,
+        },
+    }
+
+
+def print_summary(summary: dict, stages: Dict[str, Dict[str, float]]):
+    print(f"\n  {'endpoint'.ljust(9)} {'req':>6} {'erros':>6} {'req/s':>7} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'queries':>8}")
+    for name, e in summary["endpoints"].items():
+        print(f"  {name.ljust(9)} {e['requests']:>6} {e['errors']:>6} {e['rps']:>7.1f} {e['p50_ms']:>8.1f} "
+              f"{e['p95_ms']:>8.1f} {e['p99_ms']:>8.1f} {e['db_round_trips']:>8.1f}")
+        if e["error_statuses"]:
+            print(f"  {''.ljust(9)} status de erro: {', '.join(e['error_statuses'])}")
+    lag = summary["loop_lag_ms"]
+    print(f"\n  Total: {summary['total_rps']:.1f} req/s | lag do loop p50 {lag['p50']:.1f}ms, p99 {lag['p99']:.1f}ms, máx {lag['max']:.1f}ms")
+
+    if stages:
+        print(f"\n  {'etapa'.ljust(24)} {'n':>6} {'p50 ms':>8} {'p95 ms':>8}")
+        for stage, stats in stages.items():
+            print(f"  {stage.ljust(24)} {stats['count']:>6} {stats['p50_ms']:>8.1f} {stats['p95_ms']:>8.1f}")
+
+
+class LoadBaseline:
+    """
+    Baseline do benchmark (mesma ideia do BaselineManager dos evals): guarda o
+    resumo de uma execução e marca regressão quando, num endpoint, a p95 ou os
+    round trips ao banco sobem (ou o throughput cai) além da tolerância.
+    """
+
+    def __init__(self, path: Path = BASELINE_PATH, tolerance: float = 0.15):
+        self.path = Path(path)
+        self.tolerance = tolerance
+
+    def load(self) -> Optional[dict]:
+        if not self.path.exists():
+            return None
+        with open(self.path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def save(self, summary: dict, params: dict):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        data = {"timestamp": datetime.utcnow().isoformat(), "commit_hash": _commit_hash(), "params": params, **summary}
+        with open(self.path, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=2, ensure_ascii=False)
+
+    def compare(self, summary: dict, params: dict) -> dict:
+        baseline = self.load()
+        if not baseline:
+            return {"has_baseline": False, "regression_detected": False, "regressions": []}
+
+        comparison = {
+            "has_baseline": True,
+            "regression_detected": False,
+            "regressions": [],
+            "baseline_commit": baseline.get("commit_hash"),
+            # Carga diferente (usuários, concorrência, mix...) não é comparável
+            "same_params": baseline.get("params") == params,
+        }
+        checks = (("p95_ms", 1), ("db_round_trips", 1), ("rps", -1))  # 1 = maior é pior
+        for name, current in summary["endpoints"].items():
+            previous = baseline.get("endpoints", {}).get(name)
+            if not previous:
+                continue
+            for metric, direction in checks:
+                before, after = previous[metric], current[metric]
+                if not before:
+                    continue
+                delta = (after - before) / before
+                if delta * direction > self.tolerance:
+                    comparison["regressions"].append({
+                        "endpoint": name, "metric": metric, "previous": before, "current": after, "delta_pct": delta * 100
+                    })
+        comparison["regression_detected"] = bool(comparison["regressions"])
+        return comparison
+
+
+def _commit_hash() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, timeout=5).stdout.strip() or None
+    except Exception:
+        return None
+
+
+# ============================================
+# MAIN
+# ============================================
+
+async def run(args) -> int:
+    if args.keep_rate_limit:
+        print("  Rate limit por usuário ativo (429 entram como erro)")
+    else:
+        rate_limiter.is_allowed = lambda *a, **kw: True
+
+    # Antes do pool existir: as conexões novas registram o logger que conta queries
+    telemetry.record_query = counting_record_query
+
+    openai_stub = start_stub_server()
+    host, port = openai_stub.server_address[:2]
+    voice_service.base_url = f"http://{host}:{port}/v1"
+    voice_service.enabled = True
+
+    harness = InProcessHarness(args.database_url, args.llm_latency_ms)
+    await harness.start()
+    # As rotas criam o próprio AIService (anthropic.Anthropic sem base_url): o SDK lê a URL do ambiente
+    os.environ["ANTHROPIC_BASE_URL"] = harness.stub.url
+    try:
+        users, admin_token = await seed(harness.db, args)
+        print(f"\n=== BENCHMARK: carga do chat ({len(users)} usuários, concorrência {args.concurrency}, "
+              f"{args.duration}s, LLM stub {args.llm_latency_ms}ms, mix {args.mix}) ===")
+        result = await drive(args, users, admin_token)
+        stages = harness.stage_latencies()
+    finally:
+        await harness.stop()
+        await voice_service.close()
+        openai_stub.shutdown()
+
+    summary = summarize(result)
+    print_summary(summary, stages)
+
+    params = {k: getattr(args, k) for k in ("users", "memories", "messages", "subscriptions", "concurrency", "duration", "mix", "llm_latency_ms")}
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"params": params, **summary, "stages": stages}, f, indent=2, ensure_ascii=False)
+
+    baseline = LoadBaseline(args.baseline, args.tolerance)
+    comparison = baseline.compare(summary, params)
+    if not comparison["has_baseline"]:
+        print("\n  Sem baseline para comparar")
+    else:
+        if not comparison["same_params"]:
+            print("\n  AVISO: baseline gravado com outros parâmetros de carga")
+        for r in comparison["regressions"]:
+            print(f"  REGRESSÃO {r['endpoint']}.{r['metric']}: {r['previous']:.1f} -> {r['current']:.1f} ({r['delta_pct']:+.0f}%)")
+        if not comparison["regression_detected"]:
+            print(f"\n  Sem regressão contra o baseline ({comparison['baseline_commit'] or 'sem commit'})")
+
+    if args.save_baseline:
+        baseline.save(summary, params)
+        print(f"  Baseline salvo em {baseline.path}")
+
+    return 1 if comparison["regression_detected"] and not args.save_baseline else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de carga do caminho quente (chat, arquivo, voz, memórias, admin)")
+    parser.add_argument("--database-url", default=os.getenv("BENCH_DATABASE_URL"), help="Postgres DESCARTÁVEL (padrão: BENCH_DATABASE_URL)")
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--memories", type=int, default=300, help="Memórias por usuário")
+    parser.add_argument("--messages", type=int, default=200, help="Mensagens na conversa longa de cada usuário")
+    parser.add_argument("--subscriptions", type=int, default=2, help="Push subscriptions por usuário")
+    parser.add_argument("--reseed", action="store_true", help="Recriar os dados sintéticos mesmo se já existem")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=30, help="Segundos de medição")
+    parser.add_argument("--warmup", type=float, default=5, help="Segundos de aquecimento (não medidos)")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="Pesos por endpoint (chat, file, voice, memories, admin)")
+    parser.add_argument("--llm-latency-ms", type=float, default=0, help="Latência simulada do stub do LLM")
+    parser.add_argument("--keep-rate-limit", action="store_true", help="Manter o rate limit por usuário")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="Gravar o resumo em JSON")
+    parser.add_argument("--baseline", default=str(BASELINE_PATH))
+    parser.add_argument("--tolerance", type=float, default=0.15, help="Piora relativa tolerada antes de acusar regressão")
+    parser.add_argument("--save-baseline", action="store_true")
+    args = parser.parse_args()
+
+    if not args.database_url:
+        parser.error("informe --database-url ou BENCH_DATABASE_URL (banco descartável)")
+    unknown = {part.split("=")[0] for part in args.mix.split(",")} - {"chat", "file", "voice", "memories", "admin"}
+    if unknown:
+        parser.error(f"endpoints desconhecidos em --mix: {', '.join(sorted(unknown))}")
+
+    sys.exit(asyncio.run(run(args)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,188 @@
+"""
+AiSyster - Benchmark de throughput do worker de entregas
+Cria uma campanha com N entregas (padrão 100k) e mede quantas entregas/s
+os DeliveryWorker processam rodando em P processos ao mesmo tempo (SKIP LOCKED).
+O envio é simulado (--send-ms por entrega); ao final confere que nenhuma
+entrega foi processada duas vezes e que a campanha foi finalizada.
+
+Precisa de um PostgreSQL (usa um schema próprio, apagado no final).
+
+Uso:
+  python benchmarks/bench_delivery_worker.py --dsn postgresql://localhost/aisyster_bench
+  python benchmarks/bench_delivery_worker.py --deliveries 100000 --processes 1 2 4 --send-ms 2
+"""
+
+import os
+import sys
+import time
+import uuid
+import asyncio
+import argparse
+import multiprocessing
+from pathlib import Path
+
+# Adicionar path do projeto
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+# config.py exige a chave de criptografia
+os.environ.setdefault("ENCRYPTION_KEY", "bench_key_32_characters_long_xxx")
+
+import asyncpg
+
+from app.notification_campaigns import DeliveryWorker
+
+
+SCHEMA = "bench_delivery_worker"
+
+TABLES = """
+    CREATE TABLE users (id UUID PRIMARY KEY, email VARCHAR(255) NOT NULL);
+    CREATE TABLE user_profiles (user_id UUID PRIMARY KEY, nome VARCHAR(100), language VARCHAR(10));
+    CREATE TABLE notifications (
+        id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+        title VARCHAR(255) NOT NULL,
+        message TEXT NOT NULL,
+        status VARCHAR(50) DEFAULT 'sending',
+        sent_count INTEGER DEFAULT 0, failed_count INTEGER DEFAULT 0,
+        push_sent INTEGER DEFAULT 0, push_failed INTEGER DEFAULT 0,
+        email_sent INTEGER DEFAULT 0, email_failed INTEGER DEFAULT 0,
+        sent_at TIMESTAMP WITH TIME ZONE
+    );
+    CREATE TABLE notification_deliveries (
+        id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+        notification_id UUID REFERENCES notifications(id) ON DELETE CASCADE,
+        user_id UUID REFERENCES users(id) ON DELETE CASCADE,
+        channel VARCHAR(20) NOT NULL,
+        status VARCHAR(20) DEFAULT 'pending',
+        error_message TEXT,
+        sent_at TIMESTAMP WITH TIME ZONE,
+        claimed_at TIMESTAMP WITH TIME ZONE,
+        created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+    );
+    CREATE UNIQUE INDEX ON notification_deliveries(notification_id, user_id, channel);
+    CREATE INDEX ON notification_deliveries(notification_id, channel, status);
+    CREATE INDEX ON notification_deliveries(created_at) WHERE status IN ('pending', 'sending');
+    CREATE TABLE notification_dedupe (
+        dedupe_key VARCHAR(100) PRIMARY KEY,
+        sent_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW()
+    );
+"""
+
+
+async def seed(dsn: str, deliveries: int):
+    """Metade push, metade email (um usuário por par de entregas)"""
+    conn = await asyncpg.connect(dsn, server_settings={"search_path": SCHEMA})
+    try:
+        await conn.execute("TRUNCATE users, user_profiles, notifications, notification_deliveries, notification_dedupe CASCADE")
+        users = [uuid.uuid4() for _ in range((deliveries + 1) // 2)]
+        await conn.copy_records_to_table(
+            "users", records=[(uid, f"user{i}@bench.local") for i, uid in enumerate(users)], columns=("id", "email")
+        )
+        notification_id = await conn.fetchval(
+            "INSERT INTO notifications (title, message) VALUES ('Bench', 'mensagem') RETURNING id"
+        )
+        records = [(notification_id, uid, channel) for uid in users for channel in ("push", "email")][:deliveries]
+        await conn.copy_records_to_table(
+            "notification_deliveries", records=records, columns=("notification_id", "user_id", "channel")
+        )
+        return notification_id
+    finally:
+        await conn.close()
+
+
+def worker_process(dsn: str, batch_size: int, concurrency: int, send_ms: float, result_queue):
+    """Um processo = um DeliveryWorker com pool próprio (como um worker do gunicorn)"""
+
+    async def sender(delivery):
+        await asyncio.sleep(send_ms / 1000)
+        return "sent", None
+
+    async def run():
+        pool = await asyncpg.create_pool(dsn, min_size=1, max_size=2, server_settings={"search_path": SCHEMA})
+        worker = DeliveryWorker(batch_size=batch_size, concurrency=concurrency, sender=sender)
+        worker.pool = pool
+        try:
+            while await worker.run_once():
+                pass
+        finally:
+            await pool.close()
+        return worker.processed
+
+    result_queue.put(asyncio.run(run()))
+
+
+async def verify(dsn: str, notification_id) -> dict:
+    conn = await asyncpg.connect(dsn, server_settings={"search_path": SCHEMA})
+    try:
+        row = await conn.fetchrow(
+            """
+            SELECT
+                (SELECT COUNT(*) FROM notification_deliveries WHERE status = 'sent') AS sent,
+                (SELECT COUNT(*) FROM notification_deliveries WHERE status <> 'sent') AS other,
+                sent_count, status
+            FROM notifications WHERE id = $1
+            """,
+            notification_id
+        )
+        return dict(row)
+    finally:
+        await conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de throughput do worker de entregas")
+    parser.add_argument("--dsn", default=os.getenv("DATABASE_URL", "postgresql://localhost/aisyster_bench"))
+    parser.add_argument("--deliveries", type=int, default=100_000)
+    parser.add_argument("--processes", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--batch-size", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=20, help="Envios simultâneos por worker")
+    parser.add_argument("--send-ms", type=float, default=2.0, help="Latência simulada de cada envio")
+    args = parser.parse_args()
+
+    async def setup():
+        conn = await asyncpg.connect(args.dsn)
+        await conn.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE; CREATE SCHEMA {SCHEMA}")
+        await conn.execute(f"SET search_path TO {SCHEMA}; {TABLES}")
+        await conn.close()
+
+    async def teardown():
+        conn = await asyncpg.connect(args.dsn)
+        await conn.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+        await conn.close()
+
+    asyncio.run(setup())
+    print(f"\n=== BENCHMARK: Worker de entregas ({args.deliveries} entregas, lote {args.batch_size}, "
+          f"{args.concurrency} envios simultâneos, {args.send_ms}ms/envio) ===")
+    print(f"  {'processos'.rjust(9)} {'tempo s':>9} {'entregas/s':>11} {'por processo':>24} {'ok':>4}")
+    try:
+        for processes in args.processes:
+            notification_id = asyncio.run(seed(args.dsn, args.deliveries))
+            result_queue = multiprocessing.Queue()
+            workers = [
+                multiprocessing.Process(
+                    target=worker_process,
+                    args=(args.dsn, args.batch_size, args.concurrency, args.send_ms, result_queue)
+                )
+                for _ in range(processes)
+            ]
+            start = time.perf_counter()
+            for process in workers:
+                process.start()
+            processed = [result_queue.get() for _ in workers]
+            for process in workers:
+                process.join()
+            elapsed = time.perf_counter() - start
+
+            check = asyncio.run(verify(args.dsn, notification_id))
+            ok = (
+                sum(processed) == args.deliveries
+                and check["sent"] == args.deliveries and check["other"] == 0
+                and check["sent_count"] == args.deliveries and check["status"] == "sent"
+            )
+            print(f"  {processes:>9} {elapsed:>9.2f} {args.deliveries / elapsed:>11.0f} "
+                  f"{str(processed):>24} {'sim' if ok else 'NÃO':>4}")
+    finally:
+        asyncio.run(teardown())
+
+
+if __name__ == "__main__":
+    main()
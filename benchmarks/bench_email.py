@@ -0,0 +1,184 @@
+"""
+AiSyster - Benchmark de envio de emails contra um servidor stub local
+Sobe um stub HTTP do Resend (latência e rate limit configuráveis) e mede
+quantos emails/s cada modo entrega:
+  antes   -> um httpx.AsyncClient novo por email, em série (+ pausa do loop antigo)
+  pool    -> EmailService.send_email em paralelo (cliente único, concorrência limitada)
+  batch   -> EmailService.send_notification_batch (/emails/batch, 100 por chamada)
+
+O stub conta conexões TCP abertas (handshakes) e respostas 429.
+
+Uso:
+  python benchmarks/bench_email.py
+  python benchmarks/bench_email.py --emails 1000 --latency-ms 80 --rate-limit 10 --client-rate 10
+"""
+
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+from pathlib import Path
+
+# Adicionar path do projeto
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+# config.py exige a chave de criptografia
+os.environ.setdefault("ENCRYPTION_KEY", "bench_key_32_characters_long_xxx")
+
+import httpx
+
+from app.email_service import EmailService
+
+
+class StubResend:
+    """Servidor HTTP/1.1 mínimo com keep-alive: /emails e /emails/batch"""
+
+    def __init__(self, latency_ms: float, rate_limit: float):
+        self.latency = latency_ms / 1000
+        self.rate_limit = rate_limit  # Requests/s (0 = sem limite)
+        self.connections = 0
+        self.requests = 0
+        self.emails = 0
+        self.rejected = 0
+        self._tokens = rate_limit
+        self._last = time.monotonic()
+
+    def reset(self):
+        self.connections = self.requests = self.emails = self.rejected = 0
+        self._tokens, self._last = self.rate_limit, time.monotonic()
+
+    def _allow(self) -> bool:
+        if not self.rate_limit:
+            return True
+        now = time.monotonic()
+        self._tokens = min(self.rate_limit, self._tokens + (now - self._last) * self.rate_limit)
+        self._last = now
+        if self._tokens >= 1:
+            self._tokens -= 1
+            return True
+        return False
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.connections += 1
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode().partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                body = await reader.readexactly(int(headers.get("content-length", "0")))
+                self.requests += 1
+
+                if not self._allow():
+                    self.rejected += 1
+                    status, extra, payload = "429 Too Many Requests", "Retry-After: 0.2\r\n", b'{"message":"rate limit"}'
+                else:
+                    await asyncio.sleep(self.latency)
+                    data = json.loads(body or b"{}")
+                    count = len(data) if isinstance(data, list) else 1
+                    self.emails += count
+                    status, extra = "200 OK", ""
+                    payload = json.dumps({"data": [{"id": "stub"}] * count}).encode()
+
+                writer.write(
+                    f"HTTP/1.1 {status}\r\nContent-Type: application/json\r\n{extra}"
+                    f"Content-Length: {len(payload)}\r\n\r\n".encode() + payload
+                )
+                await writer.drain()
+                if headers.get("connection", "").lower() == "close":
+                    break
+        except (asyncio.IncompleteReadError, ConnectionResetError):
+            pass
+        finally:
+            writer.close()
+
+
+async def legacy_send(base_url: str, to: str, pause: float) -> bool:
+    """O send_email antigo: cliente (e conexão) novo a cada email"""
+    async with httpx.AsyncClient() as client:
+        response = await client.post(f"{base_url}/emails", json={"to": [to], "subject": "s", "html": "h"})
+    await asyncio.sleep(pause)
+    return response.status_code == 200
+
+
+async def run(args):
+    stub = StubResend(args.latency_ms, args.rate_limit)
+    server = await asyncio.start_server(stub.handle, "127.0.0.1", 0)
+    base_url = f"http://127.0.0.1:{server.sockets[0].getsockname()[1]}"
+    recipients = [{"to": f"user{i}@bench.local", "language": ("pt", "en", "es")[i % 3]} for i in range(args.emails)]
+
+    def service() -> EmailService:
+        email = EmailService()
+        email.api_key = "bench"
+        email.base_url = base_url
+        email.max_concurrency = args.concurrency
+        email.rate_limit = args.client_rate
+        return email
+
+    async def mode_antes():
+        results = []
+        for r in recipients:
+            results.append(await legacy_send(base_url, r["to"], args.legacy_pause_ms / 1000))
+        return results
+
+    async def mode_pool():
+        email = service()
+        try:
+            return await asyncio.gather(*(
+                email.send_notification_email(r["to"], "x", "Aviso", "Mensagem", r["language"]) for r in recipients
+            ))
+        finally:
+            await email.close()
+
+    async def mode_batch():
+        email = service()
+        try:
+            return await email.send_notification_batch(recipients, "Aviso", "Mensagem")
+        finally:
+            await email.close()
+
+    print(f"\n=== BENCHMARK: Envio de email ({args.emails} emails, stub {args.latency_ms}ms, "
+          f"rate limit {args.rate_limit or 'nenhum'}/s, cliente {args.client_rate or 'livre'}/s, "
+          f"concorrência {args.concurrency}) ===")
+    print(f"  {'modo'.ljust(7)} {'tempo s':>8} {'emails/s':>9} {'ok':>6} {'requests':>9} {'conexões':>9} {'429':>5}")
+
+    # O pool imprime uma linha por email; silencia durante as medições
+    stdout, devnull = sys.stdout, open(os.devnull, "w")
+    try:
+        for name, mode in (("antes", mode_antes), ("pool", mode_pool), ("batch", mode_batch)):
+            stub.reset()
+            sys.stdout = devnull
+            start = time.perf_counter()
+            results = await mode()
+            elapsed = time.perf_counter() - start
+            sys.stdout = stdout
+            print(f"  {name.ljust(7)} {elapsed:>8.2f} {len(results) / elapsed:>9.0f} {sum(results):>6} "
+                  f"{stub.requests:>9} {stub.connections:>9} {stub.rejected:>5}")
+    finally:
+        sys.stdout = stdout
+        devnull.close()
+        server.close()
+        await server.wait_closed()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de envio de emails contra stub local")
+    parser.add_argument("--emails", type=int, default=200)
+    parser.add_argument("--latency-ms", type=float, default=50, help="Latência do stub por request")
+    parser.add_argument("--rate-limit", type=float, default=0, help="Requests/s aceitos pelo stub (0 = sem limite)")
+    parser.add_argument("--concurrency", type=int, default=5)
+    parser.add_argument("--client-rate", type=float, default=0, help="EMAIL_RATE_LIMIT do cliente (0 = sem limite)")
+    parser.add_argument("--legacy-pause-ms", type=float, default=100, help="Pausa entre emails do loop antigo")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
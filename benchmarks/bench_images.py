@@ -0,0 +1,126 @@
+"""
+AiSyster - Benchmark do pré-processamento de imagens
+Compara o envio bruto (base64 do upload original) com preprocess_image
+num conjunto de fixtures geradas localmente: latência, bytes enviados e
+tokens de imagem estimados.
+
+Uso:
+  python benchmarks/bench_images.py
+  python benchmarks/bench_images.py --runs 10
+"""
+
+import io
+import os
+import sys
+import time
+import base64
+import random
+import asyncio
+import argparse
+import statistics
+from pathlib import Path
+
+# Adicionar path do projeto
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+# config.py exige a chave de criptografia
+os.environ.setdefault("ENCRYPTION_KEY", "bench_key_32_characters_long_xxx")
+
+from PIL import Image, ImageDraw
+
+from app.image_service import preprocess_image, image_cache, estimate_image_tokens
+
+
+# ============================================
+# FIXTURES
+# ============================================
+
+def _noise_image(width: int, height: int, mode: str = "RGB") -> Image.Image:
+    """Imagem com textura (comprime como foto, não como cor sólida)"""
+    rng = random.Random(width * height)
+    small = Image.new(mode, (width // 16, height // 16))
+    small.putdata([
+        tuple(rng.randrange(256) for _ in range(len(mode))) for _ in range(small.width * small.height)
+    ])
+    img = small.resize((width, height), Image.BICUBIC)
+    draw = ImageDraw.Draw(img)
+    for line in range(0, height, 40):
+        draw.text((20, line), "Salmo 23: O Senhor é o meu pastor, nada me faltará", fill=(0,) * len(mode))
+    return img
+
+
+def make_fixtures() -> dict:
+    fixtures = {}
+
+    photo = _noise_image(4032, 3024)  # Foto de celular 12MP
+    exif = Image.Exif()
+    exif[0x0112] = 6  # Orientação: girar 90°
+    exif[0x010F] = "Phone"
+    buffer = io.BytesIO()
+    photo.save(buffer, format="JPEG", quality=95, exif=exif)
+    fixtures["foto_12mp.jpg"] = buffer.getvalue()
+
+    buffer = io.BytesIO()
+    _noise_image(2880, 1800).save(buffer, format="PNG")  # Print de tela retina
+    fixtures["print_retina.png"] = buffer.getvalue()
+
+    buffer = io.BytesIO()
+    _noise_image(1024, 1024, "RGBA").save(buffer, format="PNG")  # Figura com transparência
+    fixtures["figura_alpha.png"] = buffer.getvalue()
+
+    buffer = io.BytesIO()
+    _noise_image(800, 600).save(buffer, format="JPEG", quality=85)  # Já pequena
+    fixtures["pequena.jpg"] = buffer.getvalue()
+    return fixtures
+
+
+def raw_tokens(image_bytes: bytes) -> int:
+    """Tokens cobrados pela imagem original (o Claude reduz do lado dele, mas o upload é inteiro)"""
+    with Image.open(io.BytesIO(image_bytes)) as img:
+        return estimate_image_tokens(*img.size)
+
+
+async def run(args):
+    fixtures = make_fixtures()
+    print(f"\n=== BENCHMARK: Imagens ({args.runs} execuções por fixture) ===")
+    print(f"  {'fixture'.ljust(18)} {'bruto':>10} {'processado':>11} {'antes ms':>9} {'depois ms':>10} "
+          f"{'cache ms':>9} {'tokens':>15}")
+
+    for name, data in fixtures.items():
+        raw_ms = []
+        for _ in range(args.runs):
+            start = time.perf_counter()
+            base64.b64encode(data).decode("utf-8")  # Caminho antigo
+            raw_ms.append((time.perf_counter() - start) * 1000)
+
+        processed_ms = []
+        for _ in range(args.runs):
+            image_cache.clear()
+            start = time.perf_counter()
+            result = await preprocess_image(data)
+            processed_ms.append((time.perf_counter() - start) * 1000)
+
+        start = time.perf_counter()
+        await preprocess_image(data)
+        cache_ms = (time.perf_counter() - start) * 1000
+
+        raw_b64 = len(data) * 4 // 3
+        tokens = f"{raw_tokens(data)}->{result['tokens']}"
+        print(f"  {name.ljust(18)} {raw_b64 // 1024:>8}KB {len(result['data']) // 1024:>9}KB "
+              f"{statistics.median(raw_ms):>9.1f} {statistics.median(processed_ms):>10.1f} "
+              f"{cache_ms:>9.2f} {tokens:>15}")
+
+    print("\n  bruto/processado = payload base64 enviado ao Claude por imagem")
+    print("  tokens = estimativa; o Claude já reduz imagens grandes do lado dele, então o ganho")
+    print("  principal é no payload (upload e redimensionamento no servidor da API)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark do pré-processamento de imagens")
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
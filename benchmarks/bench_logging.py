@@ -0,0 +1,182 @@
+"""
+AiSyster - Benchmark de logging no event loop
+Simula N requests concorrentes do chat com pesquisa web e mede quanto tempo
+o event loop fica preso escrevendo logs:
+  print      -> os print() antigos (≈12 linhas + 1 por memória de localização)
+  fila       -> as mesmas linhas via logging + QueueHandler (formatação na thread)
+  eventos    -> os eventos estruturados atuais (debug desligado no caminho quente)
+
+O stdout é trocado por um destino lento (--write-us por escrita) para simular
+um coletor de logs com backpressure, como acontece em container sob carga.
+
+Uso:
+  python benchmarks/bench_logging.py
+  python benchmarks/bench_logging.py --requests 500 --memories 30 --write-us 50
+"""
+
+import os
+import sys
+import time
+import asyncio
+import logging
+import argparse
+import statistics
+from pathlib import Path
+
+# Adicionar path do projeto
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+# config.py exige a chave de criptografia
+os.environ.setdefault("ENCRYPTION_KEY", "bench_key_32_characters_long_xxx")
+
+from app import logging_config
+
+
+class SlowSink:
+    """Destino que bloqueia write_us por escrita, liberando o GIL como um write() real em pipe cheio"""
+
+    def __init__(self, write_us: float):
+        self.write_s = write_us / 1_000_000
+        self.writes = 0
+
+    def write(self, data: str):
+        self.writes += 1
+        time.sleep(self.write_s)
+        return len(data)
+
+    def flush(self):
+        pass
+
+
+MEMORIES = [f"mora em orlando com a família, trabalha como enfermeira há {i} anos" for i in range(100)]
+
+
+def legacy_print_request(memories: int):
+    """Sequência de print() do chat com pesquisa web antes da mudança"""
+    print("[WEB_SEARCH] Localização via IP (ignorada se houver memória): Brasil")
+    print(f"[WEB_SEARCH] Buscando em {memories} IDENTIDADE + 0 CONTEXTO")
+    for fato in MEMORIES[:memories]:
+        print(f"[WEB_SEARCH] Memória: {fato[:100]}")
+    print("[WEB_SEARCH] Localização FINAL: Brasil")
+    print("[SEARCH] Pesquisando: ['preço do pão hoje']")
+    print("[SEARCH] Response blocks: 3")
+    for block in ("text", "web_search_tool_result", "text"):
+        print(f"[SEARCH] Block type: {block}")
+    print("[SEARCH] Total sources found: 4")
+    print("[SEARCH] Content length: 1800")
+    print("[WEB_SEARCH] Buscando: preço do pão - tokens: 900 - fontes: 4")
+
+
+def legacy_logged_request(log: logging.Logger, memories: int):
+    """As mesmas linhas, mas via logging (isola o efeito do handler com fila)"""
+    log.info("[WEB_SEARCH] Localização via IP (ignorada se houver memória): %s", "Brasil")
+    log.info("[WEB_SEARCH] Buscando em %d IDENTIDADE + 0 CONTEXTO", memories)
+    for fato in MEMORIES[:memories]:
+        log.info("[WEB_SEARCH] Memória: %s", fato[:100])
+    log.info("[WEB_SEARCH] Localização FINAL: %s", "Brasil")
+    log.info("[SEARCH] Pesquisando: %s", ["preço do pão hoje"])
+    log.info("[SEARCH] Response blocks: %d", 3)
+    for block in ("text", "web_search_tool_result", "text"):
+        log.info("[SEARCH] Block type: %s", block)
+    log.info("[SEARCH] Total sources found: %d", 4)
+    log.info("[SEARCH] Content length: %d", 1800)
+    log.info("[WEB_SEARCH] Buscando: preço do pão - tokens: %d - fontes: %d", 900, 4)
+
+
+def structured_request(log: logging.Logger, memories: int):
+    """Eventos atuais: detalhe só em DEBUG (desligado), resumo em INFO"""
+    if log.isEnabledFor(logging.DEBUG):
+        log.debug("web_search.location", extra={"location": "Brasil", "source": "memoria"})
+    log.info("search.start", extra={"queries": 1})
+    if log.isEnabledFor(logging.DEBUG):
+        log.debug("search.response", extra={"blocks": ["text"], "sources": 4, "content_chars": 1800})
+    log.info("web_search.done", extra={"tokens": 900, "sources": 4})
+
+
+async def simulate(emit, requests: int, concurrency: int) -> dict:
+    """Roda requests concorrentes (await entre etapas) e mede o atraso do event loop"""
+    blocked = []
+    lags = []
+    done = asyncio.Event()
+
+    async def ticker():
+        while not done.is_set():
+            start = time.perf_counter()
+            await asyncio.sleep(0.001)
+            lags.append((time.perf_counter() - start) * 1000 - 1.0)
+
+    async def request():
+        await asyncio.sleep(0)  # Ponto de await (ex: resposta do LLM)
+        start = time.perf_counter()
+        emit()
+        blocked.append((time.perf_counter() - start) * 1000)
+
+    tick = asyncio.create_task(ticker())
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def limited():
+        async with semaphore:
+            await request()
+
+    wall = time.perf_counter()
+    await asyncio.gather(*(limited() for _ in range(requests)))
+    wall = (time.perf_counter() - wall) * 1000
+    done.set()
+    await tick
+
+    lags.sort()
+    return {
+        "loop_ms": sum(blocked),
+        "per_request_ms": statistics.median(blocked),
+        "lag_p99_ms": lags[int(len(lags) * 0.99)] if lags else 0.0,
+        "wall_ms": wall
+    }
+
+
+async def run(args):
+    sink = SlowSink(args.write_us)
+    real_stdout = sys.stdout
+    results = {}
+
+    # 1. print() direto no stdout lento
+    sys.stdout = sink
+    try:
+        results["print"] = await simulate(lambda: legacy_print_request(args.memories), args.requests, args.concurrency)
+    finally:
+        sys.stdout = real_stdout
+    print_writes = sink.writes
+
+    # 2. e 3. logging com fila (escrita na thread do QueueListener)
+    handler = logging_config.setup_logging(level="INFO", fmt="json", stream=sink)
+    log = logging_config.get_logger("bench")
+    try:
+        results["fila"] = await simulate(lambda: legacy_logged_request(log, args.memories), args.requests, args.concurrency)
+        results["eventos"] = await simulate(lambda: structured_request(log, args.memories), args.requests, args.concurrency)
+    finally:
+        logging_config.shutdown_logging()
+
+    print(f"\n=== BENCHMARK: Logging ({args.requests} requests, {args.memories} memórias, "
+          f"escrita {args.write_us}µs) ===")
+    print(f"  {'modo'.ljust(10)} {'loop ms':>10} {'ms/request':>11} {'lag p99 ms':>11} {'total ms':>10}")
+    for name, r in results.items():
+        print(f"  {name.ljust(10)} {r['loop_ms']:>10.1f} {r['per_request_ms']:>11.3f} "
+              f"{r['lag_p99_ms']:>11.2f} {r['wall_ms']:>10.1f}")
+
+    saved = results["print"]["loop_ms"] - results["eventos"]["loop_ms"]
+    print(f"\n  Tempo de event loop economizado: {saved:.1f}ms "
+          f"({saved / args.requests:.3f}ms por request)")
+    print(f"  Escritas no stdout: print={print_writes}, descartados pela fila={handler.dropped}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de logging no event loop")
+    parser.add_argument("--requests", type=int, default=300)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--memories", type=int, default=30, help="Memórias de localização por request")
+    parser.add_argument("--write-us", type=float, default=20, help="Custo de cada escrita no stdout (µs)")
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
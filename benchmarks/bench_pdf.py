@@ -0,0 +1,197 @@
+"""
+AiSyster - Benchmark do processamento de PDF
+Compara o caminho antigo (sequencial, 150 DPI, JPEG optimize, no event loop)
+com process_pdf (pool de processos, DPI por orçamento, cache e camada de texto)
+em PDFs de exemplo gerados localmente: escaneado (só imagem) e digital (texto).
+
+Uso:
+  python benchmarks/bench_pdf.py
+  python benchmarks/bench_pdf.py --pages 5 --runs 5
+"""
+
+import io
+import os
+import sys
+import time
+import base64
+import asyncio
+import argparse
+import statistics
+from pathlib import Path
+
+# Adicionar path do projeto
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+# config.py exige a chave de criptografia
+os.environ.setdefault("ENCRYPTION_KEY", "bench_key_32_characters_long_xxx")
+
+import pypdfium2 as pdfium
+from PIL import Image, ImageDraw
+
+from app import pdf_service
+from app.pdf_service import process_pdf, pdf_cache, shutdown_pdf_pool, PIXELS_PER_TOKEN
+
+
+# ============================================
+# PDFs DE EXEMPLO
+# ============================================
+
+LOREM = (
+    "Bem-aventurados os que choram, porque eles serão consolados. "
+    "Vinde a mim, todos os que estais cansados e oprimidos, e eu vos aliviarei. "
+)
+
+
+def make_scanned_pdf(pages: int) -> bytes:
+    """PDF só com imagens (como um documento escaneado): sem camada de texto"""
+    frames = []
+    for n in range(pages):
+        img = Image.new("RGB", (1700, 2200), "white")  # Carta a 200 DPI
+        draw = ImageDraw.Draw(img)
+        for line in range(60):
+            draw.text((120, 120 + line * 32), f"{n + 1}.{line} " + LOREM[:90], fill="black")
+        frames.append(img)
+    buffer = io.BytesIO()
+    frames[0].save(buffer, format="PDF", save_all=True, append_images=frames[1:], resolution=200)
+    return buffer.getvalue()
+
+
+def make_text_pdf(pages: int) -> bytes:
+    """PDF digital mínimo (Helvetica) com texto extraível em todas as páginas"""
+    objects = ["<< /Type /Catalog /Pages 2 0 R >>", None,
+               "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    kids = []
+    for n in range(pages):
+        lines = "".join(
+            f"BT /F1 10 Tf 50 {760 - i * 14} Td ({n + 1}.{i} {LOREM[:80]}) Tj ET\n" for i in range(50)
+        )
+        content = lines.encode("latin-1", "replace")
+        objects.append(f"<< /Length {len(content)} >>\nstream\n{content.decode('latin-1')}endstream")
+        objects.append(
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+            f"/Resources << /Font << /F1 3 0 R >> >> /Contents {len(objects)} 0 R >>"
+        )
+        kids.append(f"{len(objects)} 0 R")
+    objects[1] = f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {pages} >>"
+
+    out = io.BytesIO()
+    out.write(b"%PDF-1.4\n")
+    offsets = []
+    for i, obj in enumerate(objects, start=1):
+        offsets.append(out.tell())
+        out.write(f"{i} 0 obj\n{obj}\nendobj\n".encode("latin-1"))
+    xref = out.tell()
+    out.write(f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode())
+    for offset in offsets:
+        out.write(f"{offset:010d} 00000 n \n".encode())
+    out.write(f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode())
+    return out.getvalue()
+
+
+# ============================================
+# CAMINHO ANTIGO (referência)
+# ============================================
+
+def legacy_pdf_to_images(pdf_bytes: bytes):
+    """Implementação anterior: 150 DPI fixo, JPEG optimize=True, sequencial"""
+    pdf = pdfium.PdfDocument(pdf_bytes)
+    images = []
+    for i in range(min(len(pdf), 5)):
+        bitmap = pdf[i].render(scale=150 / 72)
+        buffer = io.BytesIO()
+        bitmap.to_pil().save(buffer, format='JPEG', quality=85, optimize=True)
+        images.append((base64.b64encode(buffer.getvalue()).decode('utf-8'), 'image/jpeg'))
+        bitmap.close()
+    pdf.close()
+    return images
+
+
+def estimate_tokens(images) -> int:
+    total = 0
+    for data, _ in images:
+        with Image.open(io.BytesIO(base64.b64decode(data))) as img:
+            total += img.width * img.height // PIXELS_PER_TOKEN
+    return total
+
+
+async def event_loop_lag(stop: asyncio.Event) -> float:
+    """Maior atraso observado num tick de 10ms"""
+    worst = 0.0
+    while not stop.is_set():
+        t0 = time.perf_counter()
+        await asyncio.sleep(0.01)
+        worst = max(worst, (time.perf_counter() - t0 - 0.01) * 1000)
+    return worst
+
+
+async def measure(label: str, make_call, runs: int):
+    samples = []
+    lags = []
+    for _ in range(runs):
+        stop = asyncio.Event()
+        lag_task = asyncio.create_task(event_loop_lag(stop))
+        await asyncio.sleep(0)
+        start = time.perf_counter()
+        result = await make_call()
+        samples.append((time.perf_counter() - start) * 1000)
+        stop.set()
+        lags.append(await lag_task)
+    print(f"  {label.ljust(34)} p50 {statistics.median(samples):8.1f} ms   "
+          f"pior atraso do loop {max(lags):7.1f} ms")
+    return result
+
+
+async def run(args):
+    scanned = make_scanned_pdf(args.pages)
+    digital = make_text_pdf(args.pages)
+
+    # Aquecer pool (spawn dos processos fica fora da medição)
+    await process_pdf(make_scanned_pdf(1))
+    pdf_cache.clear()
+
+    print(f"\n=== BENCHMARK: PDF ({args.pages} páginas, {args.runs} execuções) ===")
+    print(f"\n-- Escaneado ({len(scanned) // 1024} KB) --")
+
+    async def legacy_call():
+        return legacy_pdf_to_images(scanned)  # No event loop, como era no handler
+
+    async def pool_call():
+        pdf_cache.clear()
+        return await process_pdf(scanned)
+
+    async def cached_call():
+        return await process_pdf(scanned)
+
+    legacy = await measure("antigo (sequencial, no loop)", legacy_call, args.runs)
+    fresh = await measure("process_pdf (pool, sem cache)", pool_call, args.runs)
+    await measure("process_pdf (cache por hash)", cached_call, args.runs)
+    print(f"  tokens de imagem: antigo ~{estimate_tokens(legacy)}  novo ~{estimate_tokens(fresh['images'])}"
+          f" (DPI {fresh['dpi']})")
+
+    print(f"\n-- Digital com texto ({len(digital) // 1024} KB) --")
+
+    async def legacy_text_call():
+        return legacy_pdf_to_images(digital)
+
+    async def text_call():
+        pdf_cache.clear()
+        return await process_pdf(digital)
+
+    legacy_digital = await measure("antigo (rasteriza mesmo com texto)", legacy_text_call, args.runs)
+    text_result = await measure("process_pdf (camada de texto)", text_call, args.runs)
+    print(f"  tokens: antigo ~{estimate_tokens(legacy_digital)} (imagens)  "
+          f"novo ~{len(text_result['text']) // 4} (texto, modo={text_result['mode']})")
+
+    shutdown_pdf_pool()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark do processamento de PDF")
+    parser.add_argument("--pages", type=int, default=pdf_service.MAX_PDF_PAGES)
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
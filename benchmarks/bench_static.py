@@ -0,0 +1,147 @@
+"""
+AiSyster - Benchmark de bytes transferidos pelo frontend
+Simula a abertura do app num celular e conta requests e bytes no fio:
+  antes   -> FileResponse sem compressão + StaticFiles em /static
+  depois  -> páginas pré-comprimidas com ETag + assets com hash imutáveis
+
+cold: primeira abertura (cache vazio): página, sw.js, manifest e assets referenciados
+warm: reabertura com o cache do navegador. Antes, tudo é revalidado (sem
+Cache-Control o navegador revalida); depois, só as URLs estáveis (304) e os
+assets com hash nem saem do aparelho.
+
+Uso:
+  python benchmarks/bench_static.py
+  python benchmarks/bench_static.py --page admin.html --encoding gzip
+"""
+
+import os
+import re
+import sys
+import argparse
+from pathlib import Path
+
+# Adicionar path do projeto
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+# config.py exige a chave de criptografia
+os.environ.setdefault("ENCRYPTION_KEY", "bench_key_32_characters_long_xxx")
+
+from fastapi import FastAPI, Request
+from fastapi.responses import FileResponse
+from fastapi.staticfiles import StaticFiles
+from fastapi.testclient import TestClient
+
+from app import static_assets
+from app.static_assets import FRONTEND_DIR, IMMUTABLE_CACHE
+
+
+_RESOURCE = re.compile(r"""(?:src|href)=["'](/(?:static|assets)/[^"']+)["']""")
+
+
+def legacy_app(page: str) -> FastAPI:
+    """Como o main.py servia antes"""
+    app = FastAPI()
+
+    @app.get("/")
+    async def serve_page():
+        return FileResponse(FRONTEND_DIR / page)
+
+    @app.get("/sw.js")
+    async def serve_sw():
+        return FileResponse(FRONTEND_DIR / "sw.js", media_type="application/javascript")
+
+    @app.get("/manifest.json")
+    async def serve_manifest():
+        return FileResponse(FRONTEND_DIR / "manifest.json", media_type="application/manifest+json")
+
+    app.mount("/static", StaticFiles(directory=FRONTEND_DIR / "static"), name="static")
+    return app
+
+
+def current_app(page: str) -> FastAPI:
+    """Rotas atuais (mesmos helpers do main.py)"""
+    app = FastAPI()
+
+    @app.get("/")
+    async def serve_page(request: Request):
+        return static_assets.page_response(request, page)
+
+    @app.get("/sw.js")
+    async def serve_sw(request: Request):
+        return static_assets.page_response(request, "sw.js")
+
+    @app.get("/manifest.json")
+    async def serve_manifest(request: Request):
+        return static_assets.page_response(request, "manifest.json")
+
+    @app.get("/assets/{digest}/{path:path}")
+    async def serve_asset(request: Request, digest: str, path: str):
+        return static_assets.hashed_asset_response(request, digest, path)
+
+    return app
+
+
+def fetch(client: TestClient, url: str, encoding: str, etag: str = None):
+    headers = {"Accept-Encoding": encoding}
+    if etag:
+        headers["If-None-Match"] = etag
+    response = client.get(url, headers=headers)
+    # num_bytes_downloaded = corpo como veio no fio (antes da descompressão do httpx)
+    return response, response.num_bytes_downloaded
+
+
+def simulate(app: FastAPI, encoding: str) -> dict:
+    client = TestClient(app)
+    browser_cache = {}  # url -> (etag, cache_control)
+
+    def load(warm: bool):
+        requests = transferred = 0
+        page, size = fetch(client, "/", encoding, browser_cache.get("/", (None,))[0] if warm else None)
+        requests, transferred = 1, size
+        if not warm:
+            browser_cache["/"] = (page.headers.get("etag"), page.headers.get("cache-control", ""))
+            html = page.text
+            browser_cache["resources"] = ["/sw.js", "/manifest.json"] + sorted(set(_RESOURCE.findall(html)))
+
+        for url in browser_cache["resources"]:
+            cached = browser_cache.get(url)
+            if warm and cached and IMMUTABLE_CACHE in cached[1]:
+                continue  # Imutável: nem vai à rede
+            response, size = fetch(client, url, encoding, cached[0] if warm and cached else None)
+            requests += 1
+            transferred += size
+            if not warm:
+                browser_cache[url] = (response.headers.get("etag"), response.headers.get("cache-control", ""))
+        return {"requests": requests, "bytes": transferred}
+
+    return {"cold": load(False), "warm": load(True)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de bytes transferidos pelo frontend")
+    parser.add_argument("--page", default="index.html", help="Página aberta em /")
+    parser.add_argument("--encoding", default="br, gzip", help="Accept-Encoding do navegador")
+    args = parser.parse_args()
+
+    results = {
+        "antes": simulate(legacy_app(args.page), args.encoding),
+        "depois": simulate(current_app(args.page), args.encoding),
+    }
+
+    print(f"\n=== BENCHMARK: Frontend ({args.page}, Accept-Encoding: {args.encoding}) ===")
+    print(f"  brotli disponível: {'sim' if static_assets.brotli is not None else 'não (só gzip)'}")
+    print(f"  {'modo'.ljust(8)} {'carga'.ljust(6)} {'requests':>9} {'KB':>10}")
+    for name, result in results.items():
+        for load in ("cold", "warm"):
+            r = result[load]
+            print(f"  {name.ljust(8)} {load.ljust(6)} {r['requests']:>9} {r['bytes'] / 1024:>10.1f}")
+
+    for load in ("cold", "warm"):
+        before = results["antes"][load]["bytes"]
+        after = results["depois"][load]["bytes"]
+        reduction = 100 * (1 - after / before) if before else 0
+        print(f"\n  {load}: {before / 1024:.1f}KB -> {after / 1024:.1f}KB ({reduction:.0f}% menos)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,211 @@
+"""
+AiSyster - Benchmark do pipeline de voz
+Mede a latencia por etapa (STT, chat, TTS) contra um servidor stub local
+que imita os endpoints de audio da OpenAI, sem rede externa nem custo.
+
+Uso:
+  python benchmarks/bench_voice.py
+  python benchmarks/bench_voice.py --runs 20 --concurrency 8
+"""
+
+import os
+import sys
+import time
+import asyncio
+import argparse
+import tempfile
+import threading
+import itertools
+import statistics
+from pathlib import Path
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Adicionar path do projeto
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+# config.py exige a chave de criptografia
+os.environ.setdefault("ENCRYPTION_KEY", "bench_key_32_characters_long_xxx")
+os.environ.setdefault("TTS_CACHE_DIR", tempfile.mkdtemp(prefix="bench_tts_"))
+
+from app.voice_service import VoiceService
+
+
+# ============================================
+# SERVIDOR STUB (endpoints de audio da OpenAI)
+# ============================================
+
+class StubConfig:
+    stt_delay = 0.15  # Tempo de transcricao simulado
+    tts_first_chunk_delay = 0.10  # Tempo ate o primeiro chunk de audio
+    tts_chunk_delay = 0.05  # Intervalo entre chunks (sintese progressiva)
+    tts_chunks = 8
+    tts_chunk_size = 4096
+
+
+class StubOpenAIHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # Keep-alive (conexoes reaproveitadas pelo pool)
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        self.rfile.read(length)
+
+        if self.path.endswith("/audio/transcriptions"):
+            time.sleep(StubConfig.stt_delay)
+            body = "Estou me sentindo ansiosa com o trabalho".encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        elif self.path.endswith("/audio/speech"):
+            self.send_response(200)
+            self.send_header("Content-Type", "audio/mpeg")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            time.sleep(StubConfig.tts_first_chunk_delay)
+            chunk = b"\xff" * StubConfig.tts_chunk_size
+            for i in range(StubConfig.tts_chunks):
+                if i:
+                    time.sleep(StubConfig.tts_chunk_delay)
+                self.wfile.write(f"{len(chunk):x}\r\n".encode() + chunk + b"\r\n")
+                self.wfile.flush()
+            self.wfile.write(b"0\r\n\r\n")
+
+        else:
+            self.send_response(404)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+
+
+class StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 128  # Backlog padrao (5) derruba SYNs sob concorrencia
+
+
+def start_stub_server() -> ThreadingHTTPServer:
+    server = StubServer(("127.0.0.1", 0), StubOpenAIHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+# ============================================
+# CENARIOS
+# ============================================
+
+_reply_ids = itertools.count()
+
+
+async def fake_chat(user_id: str, message: str, conversation_id=None) -> dict:
+    """Chat simulado (latencia fixa do LLM). Resposta unica por turno: sem acerto no cache TTS"""
+    await asyncio.sleep(0.2)
+    reply = f"Respire fundo. Estou aqui com voce. ({next(_reply_ids)})"
+    return {"response": reply, "conversation_id": conversation_id or "bench-conv"}
+
+
+async def one_voice_turn(service: VoiceService) -> dict:
+    """STT + chat bufferizados, TTS em streaming (fluxo de /voice/chat-audio-response)"""
+    start = time.perf_counter()
+    result = await service.chat_with_voice(
+        audio_bytes=b"\x00" * 32_000,
+        filename="audio.webm",
+        chat_callback=fake_chat,
+        user_id="bench-user",
+        return_audio=False
+    )
+    assert result["success"], result["error"]
+
+    tts_start = time.perf_counter()
+    ok, stream, error = await service.stream_text_to_speech(result["response_text"])
+    assert ok, error
+    first_chunk_ms = (time.perf_counter() - tts_start) * 1000
+    first_byte_total_ms = (time.perf_counter() - start) * 1000
+    async for _ in stream:
+        pass
+    timings = dict(result["timings"])
+    timings["tts_first_chunk_ms"] = first_chunk_ms
+    timings["tts_full_ms"] = (time.perf_counter() - tts_start) * 1000
+    timings["time_to_first_audio_ms"] = first_byte_total_ms
+    timings["total_ms"] = (time.perf_counter() - start) * 1000
+    return timings
+
+
+async def buffered_tts(service: VoiceService) -> float:
+    """TTS bufferizado: nada chega ao cliente antes do audio completo"""
+    start = time.perf_counter()
+    ok, audio, error = await service.text_to_speech(f"Frase unica {next(_reply_ids)}")
+    assert ok, error
+    return (time.perf_counter() - start) * 1000
+
+
+async def cached_tts(service: VoiceService, text: str) -> float:
+    """Frase repetida (template/devocional): audio inteiro vindo do cache em disco"""
+    start = time.perf_counter()
+    ok, stream, error = await service.stream_text_to_speech(text)
+    assert ok, error
+    async for _ in stream:
+        pass
+    return (time.perf_counter() - start) * 1000
+
+
+async def event_loop_lag(duration: float) -> float:
+    """Maior atraso observado num tick de 10ms enquanto o pipeline roda"""
+    worst = 0.0
+    end = time.perf_counter() + duration
+    while time.perf_counter() < end:
+        t0 = time.perf_counter()
+        await asyncio.sleep(0.01)
+        worst = max(worst, (time.perf_counter() - t0 - 0.01) * 1000)
+    return worst
+
+
+async def run(args):
+    server = start_stub_server()
+    base_url = f"http://127.0.0.1:{server.server_address[1]}/v1"
+    service = VoiceService(api_key="bench-key", base_url=base_url)
+
+    try:
+        await one_voice_turn(service)  # Aquecer pool de conexoes
+
+        # Latencia por etapa (sequencial)
+        samples = [await one_voice_turn(service) for _ in range(args.runs)]
+        buffered = [await buffered_tts(service) for _ in range(args.runs)]
+
+        print(f"\n=== BENCHMARK: Pipeline de voz ({args.runs} turnos, stub local) ===")
+        for stage in ("stt_ms", "chat_ms", "tts_first_chunk_ms", "tts_full_ms",
+                      "time_to_first_audio_ms", "total_ms"):
+            values = [s[stage] for s in samples]
+            print(f"  {stage.ljust(24)} p50 {statistics.median(values):8.1f} ms   max {max(values):8.1f} ms")
+        print(f"  {'tts_buffered_ms'.ljust(24)} p50 {statistics.median(buffered):8.1f} ms")
+
+        template = "Voce nao precisa enfrentar isso sozinho(a)."
+        await cached_tts(service, template)  # Primeira vez: sintetiza e grava
+        cached = [await cached_tts(service, template) for _ in range(args.runs)]
+        print(f"  {'tts_cache_hit_ms'.ljust(24)} p50 {statistics.median(cached):8.1f} ms")
+
+        # Concorrencia: turnos simultaneos + atraso do event loop
+        start = time.perf_counter()
+        lag_task = asyncio.create_task(event_loop_lag(1.0))
+        await asyncio.gather(*(one_voice_turn(service) for _ in range(args.concurrency)))
+        wall = (time.perf_counter() - start) * 1000
+        lag = await lag_task
+        print(f"\n  {args.concurrency} turnos concorrentes: {wall:.1f} ms de parede")
+        print(f"  Pior atraso do event loop durante a carga: {lag:.1f} ms")
+    finally:
+        await service.close()
+        server.shutdown()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark do pipeline de voz")
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--concurrency", type=int, default=8)
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
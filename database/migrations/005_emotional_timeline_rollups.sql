@@ -0,0 +1,215 @@
+-- ============================================
+-- Migration 005: Emotional Timeline - Indices e Rollups Diarios
+-- Consultas de padroes/tendencia leem O(dias) linhas agregadas
+-- em vez de varrer o historico bruto
+-- ============================================
+
+-- ============================================
+-- INDICES: emotional_timeline
+-- ============================================
+
+-- Leituras por usuario em ordem cronologica (timeline, admin)
+CREATE INDEX IF NOT EXISTS idx_emotional_timeline_user_created
+    ON emotional_timeline(user_id, created_at DESC);
+
+-- Tabela append-only: BRIN em created_at e minusculo e atende
+-- varreduras por janela de tempo (alertas globais, compactacao)
+CREATE INDEX IF NOT EXISTS idx_emotional_timeline_created_brin
+    ON emotional_timeline USING BRIN (created_at);
+
+-- ============================================
+-- TABELA: emotional_daily_rollups
+-- Agregado diario por usuario e emocao (mantido a cada insert)
+-- ============================================
+CREATE TABLE IF NOT EXISTS emotional_daily_rollups (
+    user_id UUID NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+    day DATE NOT NULL, -- Dia em UTC
+    emotion VARCHAR(50) NOT NULL,
+
+    entry_count INTEGER NOT NULL DEFAULT 0,
+    intensity_sum NUMERIC NOT NULL DEFAULT 0, -- Soma para media
+    intensity_sq_sum NUMERIC NOT NULL DEFAULT 0, -- Soma dos quadrados para variancia
+
+    hour_counts INTEGER[] NOT NULL DEFAULT array_fill(0, ARRAY[24]), -- Histograma por hora UTC (0-23)
+    trigger_counts JSONB NOT NULL DEFAULT '{}', -- {"trabalho": 3, "família": 1}
+
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+
+    PRIMARY KEY (user_id, day, emotion)
+);
+
+-- Alertas globais: todos os usuarios nos ultimos N dias
+CREATE INDEX IF NOT EXISTS idx_emotional_rollups_day ON emotional_daily_rollups(day DESC);
+
+-- ============================================
+-- BACKFILL: recalcula rollups a partir das linhas brutas
+-- Idempotente (pode rodar de novo antes da primeira compactacao)
+-- Dia e hora saem de created_at em UTC: linhas antigas gravaram
+-- hour_of_day no horario local do servidor, entao a coluna nao e usada
+-- ============================================
+INSERT INTO emotional_daily_rollups AS r (
+    user_id, day, emotion, entry_count, intensity_sum, intensity_sq_sum,
+    hour_counts, trigger_counts, updated_at
+)
+SELECT
+    base.user_id,
+    base.day,
+    base.emotion,
+    base.entry_count,
+    base.intensity_sum,
+    base.intensity_sq_sum,
+    (
+        SELECT array_agg(COALESCE(hc.count, 0) ORDER BY h)
+        FROM generate_series(0, 23) h
+        LEFT JOIN (
+            SELECT EXTRACT(HOUR FROM et.created_at AT TIME ZONE 'UTC')::int AS hour, COUNT(*) AS count
+            FROM emotional_timeline et
+            WHERE et.user_id = base.user_id
+            AND et.emotion = base.emotion
+            AND (et.created_at AT TIME ZONE 'UTC')::date = base.day
+            GROUP BY 1
+        ) hc ON hc.hour = h
+    ),
+    COALESCE((
+        SELECT jsonb_object_agg(tc.trigger_detected, tc.count)
+        FROM (
+            SELECT et.trigger_detected, COUNT(*) AS count
+            FROM emotional_timeline et
+            WHERE et.user_id = base.user_id
+            AND et.emotion = base.emotion
+            AND (et.created_at AT TIME ZONE 'UTC')::date = base.day
+            AND et.trigger_detected IS NOT NULL
+            GROUP BY et.trigger_detected
+        ) tc
+    ), '{}'::jsonb),
+    NOW()
+FROM (
+    SELECT
+        user_id,
+        (created_at AT TIME ZONE 'UTC')::date AS day,
+        emotion,
+        COUNT(*) AS entry_count,
+        SUM(intensity) AS intensity_sum,
+        SUM(intensity * intensity) AS intensity_sq_sum
+    FROM emotional_timeline
+    GROUP BY user_id, (created_at AT TIME ZONE 'UTC')::date, emotion
+) base
+ON CONFLICT (user_id, day, emotion) DO UPDATE SET
+    entry_count = EXCLUDED.entry_count,
+    intensity_sum = EXCLUDED.intensity_sum,
+    intensity_sq_sum = EXCLUDED.intensity_sq_sum,
+    hour_counts = EXCLUDED.hour_counts,
+    trigger_counts = EXCLUDED.trigger_counts,
+    updated_at = NOW();
+
+-- ============================================
+-- FUNÇÃO: get_emotional_patterns (v2)
+-- Mesma assinatura da migration 004, agora lendo os rollups
+-- ============================================
+CREATE OR REPLACE FUNCTION get_emotional_patterns(p_user_id UUID, p_days INTEGER DEFAULT 30)
+RETURNS TABLE (
+    dominant_emotion VARCHAR(50),
+    avg_intensity DECIMAL(3,2),
+    emotion_variance DECIMAL(3,2),
+    peak_day INTEGER,
+    peak_hour INTEGER,
+    common_triggers TEXT[],
+    trend VARCHAR(20)
+) AS $$
+DECLARE
+    v_since DATE := (NOW() AT TIME ZONE 'UTC')::date - p_days;
+    v_week DATE := (NOW() AT TIME ZONE 'UTC')::date - 7;
+    v_dominant VARCHAR(50);
+    v_avg_intensity DECIMAL(3,2);
+    v_variance DECIMAL(3,2);
+    v_peak_day INTEGER;
+    v_peak_hour INTEGER;
+    v_triggers TEXT[];
+    v_recent_avg DECIMAL;
+    v_older_avg DECIMAL;
+BEGIN
+    SELECT r.emotion, SUM(r.intensity_sum) / NULLIF(SUM(r.entry_count), 0)
+    INTO v_dominant, v_avg_intensity
+    FROM emotional_daily_rollups r
+    WHERE r.user_id = p_user_id AND r.day > v_since
+    GROUP BY r.emotion
+    ORDER BY SUM(r.entry_count) DESC, SUM(r.intensity_sum) / NULLIF(SUM(r.entry_count), 0) DESC
+    LIMIT 1;
+
+    IF v_dominant IS NULL THEN
+        RETURN QUERY SELECT
+            'neutro'::VARCHAR(50), 0.5::DECIMAL(3,2), 0.0::DECIMAL(3,2),
+            NULL::INTEGER, NULL::INTEGER, ARRAY[]::TEXT[], 'stable'::VARCHAR(20);
+        RETURN;
+    END IF;
+
+    -- Desvio padrao amostral a partir das somas
+    SELECT CASE WHEN SUM(r.entry_count) > 1 THEN
+        SQRT(GREATEST(
+            (SUM(r.intensity_sq_sum) - SUM(r.intensity_sum) ^ 2 / SUM(r.entry_count)) / (SUM(r.entry_count) - 1),
+            0
+        ))::DECIMAL(3,2)
+    END
+    INTO v_variance
+    FROM emotional_daily_rollups r
+    WHERE r.user_id = p_user_id AND r.day > v_since;
+
+    -- Dia de pico (emocoes negativas), 0=segunda
+    SELECT (EXTRACT(ISODOW FROM r.day)::INTEGER - 1)
+    INTO v_peak_day
+    FROM emotional_daily_rollups r
+    WHERE r.user_id = p_user_id AND r.day > v_since
+    AND r.emotion IN ('ansioso', 'triste', 'angustiado', 'estressado')
+    GROUP BY 1
+    ORDER BY SUM(r.entry_count) DESC
+    LIMIT 1;
+
+    -- Hora de pico
+    SELECT h - 1
+    INTO v_peak_hour
+    FROM emotional_daily_rollups r, generate_series(1, 24) h
+    WHERE r.user_id = p_user_id AND r.day > v_since
+    GROUP BY h
+    ORDER BY SUM(r.hour_counts[h]) DESC
+    LIMIT 1;
+
+    -- Triggers mais comuns
+    SELECT ARRAY_AGG(t.key)
+    INTO v_triggers
+    FROM (
+        SELECT kv.key
+        FROM emotional_daily_rollups r, jsonb_each_text(r.trigger_counts) kv
+        WHERE r.user_id = p_user_id AND r.day > v_since
+        GROUP BY kv.key
+        ORDER BY SUM(kv.value::INTEGER) DESC
+        LIMIT 3
+    ) t;
+
+    -- Tendência (última semana vs restante do periodo)
+    SELECT SUM(r.intensity_sum) / NULLIF(SUM(r.entry_count), 0)
+    INTO v_recent_avg
+    FROM emotional_daily_rollups r
+    WHERE r.user_id = p_user_id AND r.day > v_week
+    AND r.emotion IN ('ansioso', 'triste', 'angustiado');
+
+    SELECT SUM(r.intensity_sum) / NULLIF(SUM(r.entry_count), 0)
+    INTO v_older_avg
+    FROM emotional_daily_rollups r
+    WHERE r.user_id = p_user_id AND r.day > v_since AND r.day <= v_week
+    AND r.emotion IN ('ansioso', 'triste', 'angustiado');
+
+    RETURN QUERY SELECT
+        v_dominant,
+        COALESCE(v_avg_intensity, 0.5),
+        COALESCE(v_variance, 0.0),
+        v_peak_day,
+        v_peak_hour,
+        COALESCE(v_triggers, ARRAY[]::TEXT[]),
+        (CASE
+            WHEN v_recent_avg IS NULL OR v_older_avg IS NULL THEN 'stable'
+            WHEN v_recent_avg > v_older_avg * 1.2 THEN 'worsening'
+            WHEN v_recent_avg < v_older_avg * 0.8 THEN 'improving'
+            ELSE 'stable'
+        END)::VARCHAR(20);
+END;
+$$ LANGUAGE plpgsql;
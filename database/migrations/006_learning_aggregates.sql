@@ -0,0 +1,124 @@
+-- ============================================
+-- Migration 006: Agregados do Aprendizado Contínuo
+-- detect_patterns e get_strategy_scores passam a ler uma linha
+-- por usuário em vez de reprocessar learning_interactions/feedbacks
+-- ============================================
+
+-- ============================================
+-- TABELA: learning_user_stats
+-- Histogramas e contagens por usuário (atualizados a cada interação)
+-- ============================================
+CREATE TABLE IF NOT EXISTS learning_user_stats (
+    user_id UUID PRIMARY KEY REFERENCES users(id) ON DELETE CASCADE,
+    interaction_count INTEGER NOT NULL DEFAULT 0,
+    hour_counts INTEGER[] NOT NULL DEFAULT array_fill(0, ARRAY[24]), -- Por hora UTC (0-23)
+    day_counts INTEGER[] NOT NULL DEFAULT array_fill(0, ARRAY[7]), -- 0=segunda
+    emotion_by_day JSONB NOT NULL DEFAULT '{}', -- {"Monday": {"ansioso": 3}}
+    theme_counts JSONB NOT NULL DEFAULT '{}', -- {"trabalho": 5}
+    last_strategy VARCHAR(50),
+    last_interaction_at TIMESTAMP WITH TIME ZONE
+);
+
+-- ============================================
+-- TABELA: learning_strategy_stats
+-- Efetividade de cada estratégia por usuário (atualizada a cada feedback)
+-- ============================================
+CREATE TABLE IF NOT EXISTS learning_strategy_stats (
+    user_id UUID NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+    strategy VARCHAR(50) NOT NULL,
+    positive_count INTEGER NOT NULL DEFAULT 0,
+    negative_count INTEGER NOT NULL DEFAULT 0,
+    total_count INTEGER NOT NULL DEFAULT 0,
+    success_ema DOUBLE PRECISION NOT NULL DEFAULT 0.5, -- Média móvel exponencial (0.0 a 1.0)
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    PRIMARY KEY (user_id, strategy)
+);
+
+-- ============================================
+-- BACKFILL: learning_user_stats
+-- ============================================
+INSERT INTO learning_user_stats (
+    user_id, interaction_count, hour_counts, day_counts,
+    emotion_by_day, theme_counts, last_strategy, last_interaction_at
+)
+SELECT
+    base.user_id,
+    base.interaction_count,
+    (
+        SELECT array_agg(COALESCE(hc.count, 0) ORDER BY h)
+        FROM generate_series(0, 23) h
+        LEFT JOIN (
+            SELECT EXTRACT(HOUR FROM li.created_at)::int AS hour, COUNT(*) AS count
+            FROM learning_interactions li
+            WHERE li.user_id = base.user_id
+            GROUP BY 1
+        ) hc ON hc.hour = h
+    ),
+    (
+        SELECT array_agg(COALESCE(dc.count, 0) ORDER BY d)
+        FROM generate_series(0, 6) d
+        LEFT JOIN (
+            SELECT EXTRACT(ISODOW FROM li.created_at)::int - 1 AS dow, COUNT(*) AS count
+            FROM learning_interactions li
+            WHERE li.user_id = base.user_id
+            GROUP BY 1
+        ) dc ON dc.dow = d
+    ),
+    COALESCE((
+        SELECT jsonb_object_agg(per_day.day_name, per_day.emotions)
+        FROM (
+            SELECT ec.day_name, jsonb_object_agg(ec.emotion, ec.count) AS emotions
+            FROM (
+                SELECT
+                    trim(to_char(li.created_at, 'Day')) AS day_name,
+                    COALESCE(li.emotion_before, 'neutro') AS emotion,
+                    COUNT(*) AS count
+                FROM learning_interactions li
+                WHERE li.user_id = base.user_id
+                GROUP BY 1, 2
+            ) ec
+            GROUP BY ec.day_name
+        ) per_day
+    ), '{}'::jsonb),
+    '{}'::jsonb, -- Temas não eram persistidos antes desta migration
+    (
+        SELECT li.strategy_used
+        FROM learning_interactions li
+        WHERE li.user_id = base.user_id
+        ORDER BY li.created_at DESC
+        LIMIT 1
+    ),
+    base.last_interaction_at
+FROM (
+    SELECT user_id, COUNT(*) AS interaction_count, MAX(created_at) AS last_interaction_at
+    FROM learning_interactions
+    GROUP BY user_id
+) base
+ON CONFLICT (user_id) DO NOTHING;
+
+-- ============================================
+-- BACKFILL: learning_strategy_stats
+-- EMA inicial = score agregado antigo ((pos - neg/2) / total, normalizado)
+-- ============================================
+INSERT INTO learning_strategy_stats (
+    user_id, strategy, positive_count, negative_count, total_count, success_ema
+)
+SELECT
+    user_id,
+    strategy_used,
+    positive,
+    negative,
+    total,
+    GREATEST(0.0, LEAST(1.0, ((positive - negative * 0.5) / total::float + 1) / 2))
+FROM (
+    SELECT
+        user_id,
+        strategy_used,
+        COUNT(*) FILTER (WHERE feedback_type IN ('positive_explicit', 'engagement_high', 'emotional_improvement', 'returned_soon')) AS positive,
+        COUNT(*) FILTER (WHERE feedback_type IN ('negative_explicit', 'engagement_low', 'emotional_decline', 'long_absence')) AS negative,
+        COUNT(*) AS total
+    FROM learning_feedbacks
+    WHERE strategy_used IS NOT NULL
+    GROUP BY user_id, strategy_used
+) agg
+ON CONFLICT (user_id, strategy) DO NOTHING;
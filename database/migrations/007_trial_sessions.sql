@@ -0,0 +1,21 @@
+-- ============================================
+-- Migration 007: Sessões de visitantes (trial anônimo)
+-- Substitui o dict em memória por worker de routes/chat.py quando
+-- TRIAL_SESSION_BACKEND=postgres: limite vale para todos os workers
+-- ============================================
+
+-- ============================================
+-- TABELA: trial_sessions
+-- Contador + buffer circular das últimas mensagens (turns)
+-- ============================================
+CREATE TABLE IF NOT EXISTS trial_sessions (
+    session_id VARCHAR(128) PRIMARY KEY,
+    ip VARCHAR(64),
+    messages_count INTEGER NOT NULL DEFAULT 0,
+    turns JSONB NOT NULL DEFAULT '[]', -- [{"role": "user", "content": "..."}], no máximo 6
+    expires_at TIMESTAMP WITH TIME ZONE NOT NULL -- Renovado a cada mensagem (inatividade)
+);
+
+-- Limpeza diária (run_daily_maintenance) apaga pelo expires_at
+CREATE INDEX IF NOT EXISTS idx_trial_sessions_expires
+ON trial_sessions(expires_at);
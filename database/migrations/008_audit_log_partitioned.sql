@@ -0,0 +1,66 @@
+-- ============================================
+-- Migration 008: audit_log particionado por mês
+-- Os eventos passam a ser gravados em lote (COPY) pelo audit_writer;
+-- partições mensais mantêm inserts e consultas por período baratos
+-- e permitem descartar meses antigos com DROP TABLE
+-- ============================================
+
+BEGIN;
+
+-- Tabela antiga sai do caminho (nomes de índices/PK precisam ficar livres)
+ALTER TABLE audit_log RENAME TO audit_log_legacy;
+ALTER TABLE audit_log_legacy RENAME CONSTRAINT audit_log_pkey TO audit_log_legacy_pkey;
+ALTER INDEX IF EXISTS idx_audit_log_user RENAME TO idx_audit_log_legacy_user;
+ALTER INDEX IF EXISTS idx_audit_log_created RENAME TO idx_audit_log_legacy_created;
+
+-- ============================================
+-- TABELA: audit_log (particionada por created_at)
+-- A chave primária precisa incluir a coluna de partição
+-- ============================================
+CREATE TABLE audit_log (
+    id UUID NOT NULL DEFAULT gen_random_uuid(),
+    user_id UUID REFERENCES users(id),
+    action VARCHAR(100) NOT NULL,
+    ip_address INET,
+    user_agent TEXT,
+    details JSONB,
+    created_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW(),
+    PRIMARY KEY (id, created_at)
+) PARTITION BY RANGE (created_at);
+
+-- Rede de segurança para eventos fora das partições mensais (deve ficar vazia)
+CREATE TABLE audit_log_default PARTITION OF audit_log DEFAULT;
+
+-- Uma partição por mês (UTC), do evento mais antigo até 2 meses à frente;
+-- depois disso, run_daily_maintenance/init_db criam as próximas
+DO $$
+DECLARE
+    month_start TIMESTAMP;
+BEGIN
+    FOR month_start IN
+        SELECT generate_series(
+            date_trunc('month', COALESCE((SELECT MIN(created_at) FROM audit_log_legacy), NOW()) AT TIME ZONE 'UTC'),
+            date_trunc('month', NOW() AT TIME ZONE 'UTC') + INTERVAL '2 months',
+            INTERVAL '1 month'
+        )
+    LOOP
+        EXECUTE format(
+            'CREATE TABLE IF NOT EXISTS %I PARTITION OF audit_log FOR VALUES FROM (%L) TO (%L)',
+            'audit_log_y' || to_char(month_start, 'YYYY') || 'm' || to_char(month_start, 'MM'),
+            month_start AT TIME ZONE 'UTC',
+            (month_start + INTERVAL '1 month') AT TIME ZONE 'UTC'
+        );
+    END LOOP;
+END $$;
+
+INSERT INTO audit_log (id, user_id, action, ip_address, user_agent, details, created_at)
+SELECT id, user_id, action, ip_address, user_agent, details, COALESCE(created_at, NOW())
+FROM audit_log_legacy;
+
+DROP TABLE audit_log_legacy;
+
+-- Índices no pai valem para todas as partições
+CREATE INDEX IF NOT EXISTS idx_audit_log_user ON audit_log(user_id);
+CREATE INDEX IF NOT EXISTS idx_audit_log_created ON audit_log(created_at DESC);
+
+COMMIT;
@@ -0,0 +1,14 @@
+-- ============================================
+-- Migration 009: Campanhas de notificação materializadas em lote
+-- As entregas são criadas por um único INSERT ... SELECT a partir do
+-- filtro de público (app/notification_campaigns.py), fora do request
+-- ============================================
+
+-- Destinatários da campanha como lista compacta (um UUID por usuário,
+-- ordenado), em vez de carregar todos os usuários na memória do worker
+ALTER TABLE notifications
+ADD COLUMN IF NOT EXISTS recipient_ids UUID[];
+
+-- GET /notifications/{id}/progress agrega por canal/status
+CREATE INDEX IF NOT EXISTS idx_notification_deliveries_progress
+ON notification_deliveries(notification_id, channel, status);
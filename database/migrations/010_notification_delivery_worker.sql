@@ -0,0 +1,46 @@
+-- ============================================
+-- Migration 010: Worker de entregas de campanha
+-- Entregas reivindicadas em lote com FOR UPDATE SKIP LOCKED por qualquer
+-- processo (app/notification_campaigns.py), dedupe por chave única e
+-- status/contadores gravados em lote
+-- ============================================
+
+-- Lease do lote: 'sending' com claimed_at antigo volta para a fila
+ALTER TABLE notification_deliveries
+ADD COLUMN IF NOT EXISTS claimed_at TIMESTAMP WITH TIME ZONE;
+
+-- Contadores por canal (antes criados só pelo endpoint de debug do admin)
+ALTER TABLE notifications ADD COLUMN IF NOT EXISTS push_sent INTEGER DEFAULT 0;
+ALTER TABLE notifications ADD COLUMN IF NOT EXISTS push_failed INTEGER DEFAULT 0;
+ALTER TABLE notifications ADD COLUMN IF NOT EXISTS email_sent INTEGER DEFAULT 0;
+ALTER TABLE notifications ADD COLUMN IF NOT EXISTS email_failed INTEGER DEFAULT 0;
+
+-- Uma entrega por campanha/usuário/canal (remove duplicatas antigas antes)
+DELETE FROM notification_deliveries a
+USING notification_deliveries b
+WHERE a.notification_id = b.notification_id
+  AND a.user_id = b.user_id
+  AND a.channel = b.channel
+  AND a.ctid > b.ctid;
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_notification_deliveries_unique
+ON notification_deliveries(notification_id, user_id, channel);
+
+-- Fila do worker: só as entregas ainda não concluídas
+CREATE INDEX IF NOT EXISTS idx_notification_deliveries_claim
+ON notification_deliveries(created_at)
+WHERE status IN ('pending', 'sending');
+
+-- ============================================
+-- TABELA: notification_dedupe
+-- canal:usuário:hash(título) -> último envio; substitui a consulta de
+-- duplicados por entrega (mesmo título no mesmo canal em 24h)
+-- ============================================
+CREATE TABLE IF NOT EXISTS notification_dedupe (
+    dedupe_key VARCHAR(100) PRIMARY KEY,
+    sent_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW()
+);
+
+-- Limpeza diária (run_daily_maintenance) apaga chaves com mais de 24h
+CREATE INDEX IF NOT EXISTS idx_notification_dedupe_sent
+ON notification_dedupe(sent_at);
@@ -0,0 +1,48 @@
+-- ============================================
+-- Migration 011: Scheduler de notificações em vários nós
+-- Cada execução (job + período) é dividida em fatias reivindicadas com
+-- lease (app/notification_scheduler.py); a fila de retry sai da memória
+-- ============================================
+
+-- ============================================
+-- TABELA: scheduler_runs
+-- Uma linha por fatia reivindicada; o PRIMARY KEY garante um único dono
+-- por job/período/fatia e finished_at impede rodar de novo no mesmo período
+-- ============================================
+CREATE TABLE IF NOT EXISTS scheduler_runs (
+    job_name VARCHAR(50) NOT NULL,
+    run_key VARCHAR(30) NOT NULL,
+    shard INTEGER NOT NULL,
+    owner VARCHAR(100) NOT NULL,
+    lease_until TIMESTAMP WITH TIME ZONE NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 1,
+    processed INTEGER,
+    finished_at TIMESTAMP WITH TIME ZONE,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    PRIMARY KEY (job_name, run_key, shard)
+);
+
+-- Limpeza diária (run_daily_maintenance) apaga execuções com mais de 7 dias
+CREATE INDEX IF NOT EXISTS idx_scheduler_runs_created
+ON scheduler_runs(created_at);
+
+-- ============================================
+-- TABELA: notification_retry_queue
+-- Push que falhou, ordenado por retry_at (o índice serve de heap: o
+-- próximo retry é sempre o primeiro do índice)
+-- ============================================
+CREATE TABLE IF NOT EXISTS notification_retry_queue (
+    id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+    user_id UUID REFERENCES users(id) ON DELETE CASCADE,
+    notification_type VARCHAR(50) NOT NULL,
+    subscription_info JSONB NOT NULL,
+    title VARCHAR(200),
+    body TEXT,
+    url VARCHAR(500),
+    retry_count INTEGER NOT NULL DEFAULT 1,
+    retry_at TIMESTAMP WITH TIME ZONE NOT NULL,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+);
+
+CREATE INDEX IF NOT EXISTS idx_notification_retry_queue_retry_at
+ON notification_retry_queue(retry_at);
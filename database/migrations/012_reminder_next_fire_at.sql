@@ -0,0 +1,33 @@
+-- ============================================
+-- Migration 012: Próximo lembrete pré-calculado em UTC
+-- next_fire_at = próximo reminder_time local (nos reminder_days) no fuso
+-- IANA do usuário, com horário de verão. Recalculado ao salvar as
+-- preferências e a cada disparo; o scheduler só lê as linhas vencidas.
+-- ============================================
+
+ALTER TABLE user_notification_preferences
+ADD COLUMN IF NOT EXISTS next_fire_at TIMESTAMP WITH TIME ZONE;
+
+-- Linhas gravadas com NULL no lugar dos padrões e fusos desconhecidos
+UPDATE user_notification_preferences
+SET reminder_time = COALESCE(reminder_time, '09:00:00'),
+    reminder_days = COALESCE(reminder_days, '["mon","tue","wed","thu","fri","sat","sun"]'),
+    timezone = CASE
+        WHEN timezone IN (SELECT name FROM pg_timezone_names) THEN timezone
+        ELSE 'America/Sao_Paulo'
+    END
+WHERE next_fire_at IS NULL;
+
+UPDATE user_notification_preferences unp
+SET next_fire_at = (
+    SELECT MIN(((NOW() AT TIME ZONE unp.timezone)::date + d + unp.reminder_time) AT TIME ZONE unp.timezone)
+    FROM generate_series(0, 7) AS d
+    WHERE unp.reminder_days ? to_char((NOW() AT TIME ZONE unp.timezone)::date + d, 'dy')
+    AND (((NOW() AT TIME ZONE unp.timezone)::date + d + unp.reminder_time) AT TIME ZONE unp.timezone) > NOW()
+)
+WHERE unp.next_fire_at IS NULL;
+
+-- Fila dos lembretes: range scan nas linhas vencidas
+CREATE INDEX IF NOT EXISTS idx_user_notification_preferences_next_fire
+ON user_notification_preferences(next_fire_at)
+WHERE reminder_enabled = TRUE AND push_enabled = TRUE;
@@ -0,0 +1,17 @@
+-- ============================================
+-- Migration 013: Varredura de engajamento por keyset
+-- get_users_for_engagement pagina por (last_login, user_id) em vez de
+-- OFFSET; estes índices cobrem a varredura e as subconsultas por usuário
+-- ============================================
+
+-- Keyset da varredura de inativos
+CREATE INDEX IF NOT EXISTS idx_users_last_login_id
+ON users(last_login, id);
+
+-- NOT EXISTS "já recebeu engajamento nos últimos 7 dias"
+CREATE INDEX IF NOT EXISTS idx_notification_logs_user_type_sent
+ON notification_logs(user_id, notification_type, sent_at DESC);
+
+-- Subscriptions ativas do usuário
+CREATE INDEX IF NOT EXISTS idx_push_subscriptions_active_user
+ON push_subscriptions(user_id) WHERE is_active = TRUE;
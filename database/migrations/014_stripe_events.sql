@@ -0,0 +1,29 @@
+-- ============================================
+-- Migration 014: Eventos do webhook do Stripe
+-- O webhook só verifica a assinatura e grava o evento pelo id do Stripe
+-- (reentregas não duplicam); o worker de app/stripe_events.py reivindica
+-- os pendentes com FOR UPDATE SKIP LOCKED e aplica cada um
+-- ============================================
+
+CREATE TABLE IF NOT EXISTS stripe_events (
+    id VARCHAR(255) PRIMARY KEY,              -- evt_... do Stripe
+    type VARCHAR(100) NOT NULL,
+    payload JSONB NOT NULL,                   -- Corpo verificado do webhook
+    status VARCHAR(20) NOT NULL DEFAULT 'pending', -- pending, processing, processed, failed
+    attempts INTEGER NOT NULL DEFAULT 0,
+    last_error TEXT,
+    stripe_created TIMESTAMP WITH TIME ZONE NOT NULL, -- Ordem de processamento
+    received_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    claimed_at TIMESTAMP WITH TIME ZONE,      -- Lease: 'processing' antigo volta para a fila
+    processed_at TIMESTAMP WITH TIME ZONE
+);
+
+-- Fila do worker: só os eventos ainda não concluídos
+CREATE INDEX IF NOT EXISTS idx_stripe_events_claim
+ON stripe_events(stripe_created)
+WHERE status IN ('pending', 'processing');
+
+-- Limpeza diária (run_daily_maintenance) apaga processados com mais de 30 dias
+CREATE INDEX IF NOT EXISTS idx_stripe_events_processed
+ON stripe_events(processed_at)
+WHERE status = 'processed';
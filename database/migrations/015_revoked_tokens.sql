@@ -0,0 +1,16 @@
+-- ============================================
+-- Migration 015: Revogação de tokens no logout
+-- O logout revoga o access token e a sessão dele (sid, compartilhado com o
+-- refresh token do mesmo login). A lista em memória vale só no worker que
+-- recebeu o logout; esta tabela é conferida no /auth/refresh, então nenhum
+-- worker renova uma sessão encerrada
+-- ============================================
+
+CREATE TABLE IF NOT EXISTS revoked_tokens (
+    key VARCHAR(100) PRIMARY KEY,            -- sha256 do token ou 'sid:<sessão>'
+    expires_at TIMESTAMP WITH TIME ZONE NOT NULL -- Depois disso o token já não vale por si
+);
+
+-- Limpeza diária (run_daily_maintenance)
+CREATE INDEX IF NOT EXISTS idx_revoked_tokens_expires
+ON revoked_tokens(expires_at);
@@ -213,9 +213,10 @@ CREATE TABLE user_devotional_interactions (
 -- ============================================
 -- TABELA: audit_log (Log de auditoria)
 -- Para segurança e compliance
+-- Particionada por mês; partições criadas por init_db/run_daily_maintenance
 -- ============================================
 CREATE TABLE audit_log (
-    id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
+    id UUID NOT NULL DEFAULT uuid_generate_v4(),
     user_id UUID REFERENCES users(id),
 
     action VARCHAR(100) NOT NULL, -- login, logout, message_sent, profile_updated
@@ -223,8 +224,11 @@ CREATE TABLE audit_log (
     user_agent TEXT,
     details JSONB,
 
-    created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
-);
+    created_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW(),
+    PRIMARY KEY (id, created_at)
+) PARTITION BY RANGE (created_at);
+
+CREATE TABLE audit_log_default PARTITION OF audit_log DEFAULT;
 
 -- ============================================
 -- ÍNDICES PARA PERFORMANCE
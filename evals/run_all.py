@@ -3,32 +3,45 @@
 AiSyster Evals - Main Runner
 Executa todas as suites de avaliacao
 
+Os casos rodam em paralelo (um worker por sessao autenticada), os vereditos
+do judge ficam em cache e cada caso concluido e gravado em evals/runs/,
+o que permite retomar uma execucao e dividi-la em shards.
+
 Uso:
     python evals/run_all.py                    # Executar todas as suites
     python evals/run_all.py --suite theology   # Executar suite especifica
     python evals/run_all.py --dry-run          # Apenas validar sem chamar API
     python evals/run_all.py --save-baseline    # Salvar como novo baseline
+    python evals/run_all.py --concurrency 8    # Casos simultaneos
+    python evals/run_all.py --run-id ci42 --shard 1/4    # Um de 4 shards
+    python evals/run_all.py --run-id ci42 --merge        # Relatorio dos 4 shards
+    python evals/run_all.py --run-id ci42 --resume       # Retomar execucao interrompida
+    python evals/run_all.py --in-process                 # AIService + Postgres local + stub LLM
 """
 
 import argparse
+import asyncio
 import json
 import logging
 import os
 import sys
 import time
+import zlib
 from pathlib import Path
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple
 
 # Adicionar path do projeto
 PROJECT_ROOT = Path(__file__).parent.parent
 sys.path.insert(0, str(PROJECT_ROOT))
 
-from evals.tools.http_client import EvalHttpClient, MockHttpClient
+from evals.tools.http_client import AsyncEvalHttpClient, AsyncMockHttpClient
 from evals.tools.rules import HardGateChecker
-from evals.tools.judge import LLMJudge
+from evals.tools.judge import LLMJudge, JudgeCache
 from evals.tools.scoring import EvalScorer, TestCaseResult, SuiteResult
 from evals.tools.report import ReportGenerator, EvalReport
 from evals.tools.baseline import BaselineManager
+from evals.tools.run_store import RunStore, CaseKey
+from evals.tools.inprocess import InProcessHarness
 
 # Configurar logging
 logging.basicConfig(
@@ -52,13 +65,22 @@ class EvalRunner:
         self.suites_dir = Path("evals/suites")
 
         # Componentes
-        self.http_client: Optional[EvalHttpClient] = None
+        output_config = self.config.get("output", {})
+        self.concurrency = self.config.get("api", {}).get("concurrency", 4)
+        self.runs_dir = output_config.get("runs_dir", "evals/runs")
+        self.judge_cache = JudgeCache(output_config.get("judge_cache_dir", "evals/cache/judge"))
+        # Modo in-process: banco descartavel e latencia do stub da Anthropic
+        in_process_config = self.config.get("in_process", {})
+        self.in_process_database_url = in_process_config.get("database_url") or os.getenv("EVAL_DATABASE_URL")
+        self.stub_latency_ms = in_process_config.get("stub_latency_ms", 0)
+        self.stage_latencies: Dict[str, Dict[str, float]] = {}
         self.scorer = EvalScorer(
             hard_gate_pass_rate_threshold=self.config.get("thresholds", {}).get("hard_gate_pass_rate", 1.0),
             soft_score_minimum=self.config.get("thresholds", {}).get("soft_score_minimum", 0.75),
-            use_llm_judge=bool(os.getenv("OPENAI_API_KEY") or os.getenv("ANTHROPIC_API_KEY"))
+            use_llm_judge=bool(os.getenv("OPENAI_API_KEY") or os.getenv("ANTHROPIC_API_KEY")),
+            judge_cache=self.judge_cache
         )
-        self.reporter = ReportGenerator(self.config.get("output", {}).get("reports_dir", "evals/reports"))
+        self.reporter = ReportGenerator(output_config.get("reports_dir", "evals/reports"))
         self.baseline_manager = BaselineManager(
             self.config.get("output", {}).get("baselines_dir", "evals/baselines"),
             self.config.get("thresholds", {}).get("regression_tolerance", 0.05)
@@ -88,35 +110,61 @@ class EvalRunner:
             "suites": ["theology", "safety", "finance", "reliability", "product"]
         }
 
-    def _setup_http_client(self) -> bool:
-        """Configura cliente HTTP e autentica."""
-        api_config = self.config.get("api", {})
+    def _eval_users(self) -> List[Tuple[str, str]]:
+        """
+        Usuarios de teste (email, senha). Varios emails (auth.test_user_emails
+        ou EVAL_USER_EMAILS separados por virgula, mesma senha) dividem o rate
+        limit do chat, que e por usuario.
+        """
         auth_config = self.config.get("auth", {})
+        password = auth_config.get("test_user_password")
+        if not password or password == "[SET_IN_ENV]":
+            password = os.getenv("EVAL_USER_PASSWORD")
+
+        emails = auth_config.get("test_user_emails") or [
+            email.strip() for email in os.getenv("EVAL_USER_EMAILS", "").split(",") if email.strip()
+        ]
+        if not emails:
+            email = auth_config.get("test_user_email") or os.getenv("EVAL_USER_EMAIL")
+            emails = [email] if email else []
+
+        if not emails or not password:
+            return []
+        return [(email, password) for email in emails]
+
+    async def _open_client(self, worker: int, use_mock: bool, harness: Optional[InProcessHarness] = None):
+        """Cliente autenticado de um worker (sessao propria); None se a API nao responde ou o login falha."""
+        if use_mock:
+            return AsyncMockHttpClient()
 
-        self.http_client = EvalHttpClient(
+        if harness:
+            # Banco descartavel: um usuario por worker, criado no login
+            client = harness.client()
+            await client.authenticate(f"eval-worker-{worker}@aisyster.local", "in-process")
+            return client
+
+        users = self._eval_users()
+        if not users:
+            logger.warning("Credenciais de teste nao configuradas")
+            return None
+
+        api_config = self.config.get("api", {})
+        client = AsyncEvalHttpClient(
             base_url=api_config.get("base_url", "http://localhost:8000"),
             timeout_seconds=api_config.get("timeout_seconds", 60),
             retry_attempts=api_config.get("retry_attempts", 2)
         )
 
-        # Health check
-        if not self.http_client.health_check():
+        email, password = users[worker % len(users)]
+        if not await client.health_check():
             logger.error("API nao disponivel")
-            return False
-
-        # Autenticar
-        email = auth_config.get("test_user_email") or os.getenv("EVAL_USER_EMAIL")
-        password = auth_config.get("test_user_password") or os.getenv("EVAL_USER_PASSWORD")
-
-        if not email or not password or password == "[SET_IN_ENV]":
-            logger.warning("Credenciais de teste nao configuradas")
-            return False
-
-        if not self.http_client.authenticate(email, password):
+        elif await client.authenticate(email, password):
+            return client
+        else:
             logger.error("Falha na autenticacao")
-            return False
 
-        return True
+        await client.aclose()
+        return None
 
     def load_suite(self, suite_name: str) -> List[Dict[str, Any]]:
         """
@@ -149,13 +197,125 @@ class EvalRunner:
         logger.info(f"Suite {suite_name}: {len(test_cases)} casos carregados")
         return test_cases
 
-    def run_suite(self, suite_name: str, dry_run: bool = False) -> SuiteResult:
+    def select_cases(
+        self,
+        suites: List[str],
+        shard: Tuple[int, int] = (0, 1)
+    ) -> List[Tuple[str, Dict[str, Any]]]:
+        """
+        Casos (suite, caso) das suites, filtrados pelo shard.
+
+        O shard de um caso e crc32("suite:id") % total: estavel entre maquinas
+        e execucoes, entao cada shard roda sempre os mesmos casos.
+        """
+        index, count = shard
+        cases = []
+        for suite_name in suites:
+            for test_case in self.load_suite(suite_name):
+                key = f"{suite_name}:{test_case.get('id', 'unknown')}"
+                if zlib.crc32(key.encode("utf-8")) % count == index:
+                    cases.append((suite_name, test_case))
+        return cases
+
+    async def _run_case(self, client, suite_name: str, test_case: Dict[str, Any]) -> TestCaseResult:
+        """Chama a API e pontua um caso."""
+        test_id = test_case.get("id", "unknown")
+        input_text = test_case.get("input", "")
+        expected = test_case.get("expected_behavior", "")
+        category = test_case.get("category", suite_name)
+
+        if client is None:
+            return TestCaseResult(
+                test_id=test_id,
+                category=category,
+                input_text=input_text,
+                response_text="",
+                expected_behavior=expected,
+                error="HTTP client nao configurado"
+            )
+
+        api_response = await client.send_message(input_text)
+
+        if not api_response.success:
+            return TestCaseResult(
+                test_id=test_id,
+                category=category,
+                input_text=input_text,
+                response_text="",
+                expected_behavior=expected,
+                error=api_response.error,
+                latency_ms=api_response.latency_ms
+            )
+
+        # Regras + judge (chamada bloqueante ao LLM) em thread: nao trava os outros workers
+        return await asyncio.to_thread(
+            self.scorer.score_test_case,
+            test_id=test_id,
+            category=category,
+            input_text=input_text,
+            response_text=api_response.response_text,
+            expected_behavior=expected,
+            hard_gates=test_case.get("hard_gates", []),
+            latency_ms=api_response.latency_ms
+        )
+
+    async def run_cases(
+        self,
+        cases: List[Tuple[str, Dict[str, Any]]],
+        store: Optional[RunStore] = None,
+        use_mock: bool = False,
+        in_process: bool = False
+    ) -> Dict[CaseKey, TestCaseResult]:
+        """
+        Executa os casos com ate self.concurrency workers, cada um com o seu
+        cliente autenticado. Cada caso concluido vai para o store na hora.
+
+        in_process: AIService no proprio processo (InProcessHarness) ao inves da API;
+        a latencia por etapa do pipeline fica em self.stage_latencies.
+        """
+        results: Dict[CaseKey, TestCaseResult] = {}
+        workers = min(self.concurrency, len(cases))
+        if workers <= 0:
+            return results
+
+        queue: asyncio.Queue = asyncio.Queue()
+        for item in cases:
+            queue.put_nowait(item)
+
+        async def worker(client):
+            while not queue.empty():
+                suite_name, test_case = queue.get_nowait()
+                result = await self._run_case(client, suite_name, test_case)
+                results[(suite_name, result.test_id)] = result
+                if store:
+                    store.append(suite_name, result)
+
+        harness = None
+        if in_process:
+            harness = InProcessHarness(self.in_process_database_url, self.stub_latency_ms)
+            await harness.start()
+
+        clients = []
+        try:
+            clients = await asyncio.gather(*(self._open_client(i, use_mock, harness) for i in range(workers)))
+            await asyncio.gather(*(worker(client) for client in clients))
+        finally:
+            for client in clients:
+                if client:
+                    await client.aclose()
+            if harness:
+                self.stage_latencies = harness.stage_latencies()
+                await harness.stop()
+        return results
+
+    def run_suite(self, suite_name: str, dry_run: bool = False, use_mock: bool = False) -> SuiteResult:
         """
         Executa uma suite de testes.
 
         Args:
             suite_name: Nome da suite
             dry_run: Se True, apenas valida sem chamar API
+            use_mock: Se True, usa mock client ao inves de API real
 
         Returns:
             SuiteResult com resultados
@@ -167,68 +327,23 @@ class EvalRunner:
         if not test_cases:
             return SuiteResult(suite_name=suite_name)
 
-        results: List[TestCaseResult] = []
-
-        for test_case in test_cases:
-            test_id = test_case.get("id", "unknown")
-            input_text = test_case.get("input", "")
-            expected = test_case.get("expected_behavior", "")
-            hard_gates = test_case.get("hard_gates", [])
-            category = test_case.get("category", suite_name)
-
-            if dry_run:
-                # Dry run - apenas validar estrutura
-                result = TestCaseResult(
-                    test_id=test_id,
-                    category=category,
-                    input_text=input_text,
+        if dry_run:
+            # Dry run - apenas validar estrutura
+            results = [
+                TestCaseResult(
+                    test_id=test_case.get("id", "unknown"),
+                    category=test_case.get("category", suite_name),
+                    input_text=test_case.get("input", ""),
                     response_text="[DRY RUN]",
-                    expected_behavior=expected,
+                    expected_behavior=test_case.get("expected_behavior", ""),
                     final_pass=True,
                     final_score=1.0
                 )
-                results.append(result)
-                continue
-
-            # Chamar API
-            if not self.http_client:
-                result = TestCaseResult(
-                    test_id=test_id,
-                    category=category,
-                    input_text=input_text,
-                    response_text="",
-                    expected_behavior=expected,
-                    error="HTTP client nao configurado"
-                )
-                results.append(result)
-                continue
-
-            api_response = self.http_client.send_message(input_text)
-
-            if not api_response.success:
-                result = TestCaseResult(
-                    test_id=test_id,
-                    category=category,
-                    input_text=input_text,
-                    response_text="",
-                    expected_behavior=expected,
-                    error=api_response.error,
-                    latency_ms=api_response.latency_ms
-                )
-                results.append(result)
-                continue
-
-            # Pontuar resposta
-            result = self.scorer.score_test_case(
-                test_id=test_id,
-                category=category,
-                input_text=input_text,
-                response_text=api_response.response_text,
-                expected_behavior=expected,
-                hard_gates=hard_gates,
-                latency_ms=api_response.latency_ms
-            )
-            results.append(result)
+                for test_case in test_cases
+            ]
+        else:
+            done = asyncio.run(self.run_cases([(suite_name, case) for case in test_cases], use_mock=use_mock))
+            results = [done[(suite_name, case.get("id", "unknown"))] for case in test_cases]
 
         # Agregar resultados
         suite_result = self.scorer.score_suite(suite_name, results)
@@ -236,12 +351,48 @@ class EvalRunner:
 
         return suite_result
 
+    def _aggregate(
+        self,
+        suites: List[str],
+        cases: List[Tuple[str, Dict[str, Any]]],
+        results: Dict[CaseKey, TestCaseResult],
+        duration_seconds: float
+    ) -> List[SuiteResult]:
+        """SuiteResult por suite, na ordem dos casos; caso sem resultado conta como erro."""
+        suite_results = []
+        for suite_name in suites:
+            case_results = []
+            for case_suite, test_case in cases:
+                if case_suite != suite_name:
+                    continue
+                test_id = test_case.get("id", "unknown")
+                case_results.append(results.get((suite_name, test_id)) or TestCaseResult(
+                    test_id=test_id,
+                    category=test_case.get("category", suite_name),
+                    input_text=test_case.get("input", ""),
+                    response_text="",
+                    expected_behavior=test_case.get("expected_behavior", ""),
+                    error="Sem resultado (shard nao executado?)"
+                ))
+            if not case_results:
+                continue
+            suite_result = self.scorer.score_suite(suite_name, case_results)
+            # Suites rodam intercaladas: a duracao e a da execucao toda
+            suite_result.duration_seconds = duration_seconds
+            suite_results.append(suite_result)
+        return suite_results
+
     def run_all(
         self,
         suites: Optional[List[str]] = None,
         dry_run: bool = False,
         save_baseline: bool = False,
-        use_mock: bool = False
+        use_mock: bool = False,
+        run_id: Optional[str] = None,
+        shard: Tuple[int, int] = (0, 1),
+        resume: bool = False,
+        merge: bool = False,
+        in_process: bool = False
     ) -> EvalReport:
         """
         Executa todas as suites.
@@ -251,6 +402,11 @@ class EvalRunner:
             dry_run: Se True, apenas valida sem chamar API
             save_baseline: Se True, salva resultados como baseline
             use_mock: Se True, usa mock client ao inves de API real
+            run_id: Identificador da execucao (resultados em evals/runs/<run_id>*.jsonl)
+            shard: (indice, total) - executa so os casos deste shard
+            resume: Pula os casos que ja tem resultado (sem erro) no run_id
+            merge: Nao executa nada; gera o relatorio juntando os shards do run_id
+            in_process: Roda o pipeline do chat no proprio processo (Postgres local + stub LLM)
 
         Returns:
             EvalReport com relatorio completo
@@ -261,23 +417,36 @@ class EvalRunner:
         if suites is None:
             suites = self.config.get("suites", ["theology", "safety", "finance", "reliability", "product"])
 
-        # Setup HTTP client (se nao for dry run)
-        if not dry_run:
-            if use_mock:
-                logger.info("Usando MockHttpClient (modo simulado)")
-                self.http_client = MockHttpClient()
-            elif not self._setup_http_client():
-                logger.warning("Continuando sem API - apenas validacao de regras")
-
-        # Executar suites
-        suite_results: List[SuiteResult] = []
-        for suite_name in suites:
-            result = self.run_suite(suite_name, dry_run=dry_run)
-            suite_results.append(result)
+        sharded = shard[1] > 1 and not merge
+        if dry_run:
+            suite_results = [self.run_suite(suite_name, dry_run=True) for suite_name in suites]
+        else:
+            store = RunStore(self.runs_dir, run_id, shard)
+            cases = self.select_cases(suites, (0, 1) if merge else shard)
 
-        # Comparar com baseline
+            if merge:
+                results = store.load(all_shards=True)
+                logger.info(f"Juntando {len(results)} resultados da execucao {store.run_id}")
+            else:
+                results = {}
+                if resume:
+                    results = {key: r for key, r in store.load().items() if not r.error}
+                    logger.info(f"Retomando {store.run_id}: {len(results)} casos ja concluidos")
+                pending = [(suite_name, case) for suite_name, case in cases
+                           if (suite_name, case.get("id", "unknown")) not in results]
+                if use_mock:
+                    logger.info("Usando AsyncMockHttpClient (modo simulado)")
+                elif in_process:
+                    logger.info("Modo in-process: AIService + Postgres local + stub da Anthropic")
+                logger.info(f"Execucao {store.run_id}: {len(pending)} casos, {min(self.concurrency, len(pending))} workers")
+                results.update(asyncio.run(self.run_cases(pending, store, use_mock, in_process)))
+
+            suite_results = self._aggregate(suites, cases, results, time.time() - start_time)
+            logger.info(f"Judge cache: {self.judge_cache.hits} hits, {self.judge_cache.misses} misses")
+
+        # Comparar com baseline (so com todos os casos: um shard sozinho nao e comparavel)
         baseline_comparison = None
-        if not dry_run:
+        if not dry_run and not sharded:
             baseline_comparison = self.baseline_manager.compare_with_baseline(suite_results)
 
         # Gerar relatorio
@@ -286,7 +455,8 @@ class EvalRunner:
             suite_results=suite_results,
             config=self.config,
             duration_seconds=duration,
-            baseline_comparison=baseline_comparison
+            baseline_comparison=baseline_comparison,
+            stage_latencies=self.stage_latencies or None
         )
 
         # Salvar relatorio
@@ -295,7 +465,9 @@ class EvalRunner:
 
         # Atualizar baseline se solicitado
         if save_baseline and not dry_run:
-            if self.baseline_manager.should_update_baseline(suite_results, baseline_comparison or {}):
+            if sharded:
+                logger.warning("Baseline NAO atualizado (execucao de um shard; use --merge)")
+            elif self.baseline_manager.should_update_baseline(suite_results, baseline_comparison or {}):
                 commit_hash = self._get_commit_hash()
                 self.baseline_manager.save_baseline(suite_results, commit_hash)
                 logger.info("Baseline atualizado")
@@ -305,10 +477,6 @@ class EvalRunner:
         # Imprimir resumo
         self.reporter.print_summary(report)
 
-        # Cleanup
-        if self.http_client:
-            self.http_client.close()
-
         return report
 
     def _get_commit_hash(self) -> Optional[str]:
@@ -365,19 +533,68 @@ def main():
         action="store_true",
         help="Usar mock client (simula respostas sem API real)"
     )
+    parser.add_argument(
+        "--in-process",
+        action="store_true",
+        help="Rodar AIService no processo, com Postgres local (EVAL_DATABASE_URL) e stub do LLM"
+    )
+    parser.add_argument(
+        "--concurrency", "-c",
+        type=int,
+        help="Casos simultaneos (um worker autenticado por caso; padrao api.concurrency)"
+    )
+    parser.add_argument(
+        "--run-id",
+        type=str,
+        help="Identificador da execucao (resultados parciais em evals/runs/)"
+    )
+    parser.add_argument(
+        "--shard",
+        type=str,
+        default="1/1",
+        help="Executar so o shard i de n (ex: 2/4)"
+    )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="Retomar a execucao --run-id, pulando os casos ja concluidos"
+    )
+    parser.add_argument(
+        "--merge",
+        action="store_true",
+        help="Gerar o relatorio juntando os shards de --run-id (sem executar)"
+    )
 
     args = parser.parse_args()
 
+    try:
+        shard_index, shard_count = (int(part) for part in args.shard.split("/"))
+        if not 1 <= shard_index <= shard_count:
+            raise ValueError
+    except ValueError:
+        parser.error("--shard deve ser i/n, com 1 <= i <= n")
+    if (args.resume or args.merge) and not args.run_id:
+        parser.error("--resume e --merge precisam de --run-id")
+
     if args.verbose:
         logging.getLogger().setLevel(logging.DEBUG)
 
     # Executar
     runner = EvalRunner(config_path=args.config)
+    if args.in_process and not runner.in_process_database_url:
+        parser.error("--in-process precisa de EVAL_DATABASE_URL (ou in_process.database_url no config)")
+    if args.concurrency:
+        runner.concurrency = args.concurrency
     report = runner.run_all(
         suites=args.suite,
         dry_run=args.dry_run,
         save_baseline=args.save_baseline,
-        use_mock=args.mock
+        use_mock=args.mock,
+        run_id=args.run_id,
+        shard=(shard_index - 1, shard_count),
+        resume=args.resume,
+        merge=args.merge,
+        in_process=args.in_process
     )
 
     # Exit code baseado no resultado
@@ -3,18 +3,22 @@ AiSyster Evals Tools
 Ferramentas para execucao de evals e sabatina
 """
 
-from .http_client import EvalHttpClient
+from .http_client import EvalHttpClient, AsyncEvalHttpClient
 from .rules import HardGateChecker
-from .judge import LLMJudge
+from .judge import LLMJudge, JudgeCache
 from .scoring import EvalScorer
 from .report import ReportGenerator
 from .baseline import BaselineManager
+from .run_store import RunStore
 
 __all__ = [
     "EvalHttpClient",
+    "AsyncEvalHttpClient",
     "HardGateChecker",
     "LLMJudge",
+    "JudgeCache",
     "EvalScorer",
     "ReportGenerator",
-    "BaselineManager"
+    "BaselineManager",
+    "RunStore"
 ]
@@ -3,9 +3,12 @@ AiSyster Evals - HTTP Client
 Cliente para chamar a API da AiSyster durante evals
 """
 
+import asyncio
+import time
+import random
 import httpx
 import logging
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, Tuple
 from dataclasses import dataclass
 
 logger = logging.getLogger("aisyster.evals.http")
@@ -174,6 +177,98 @@ class EvalHttpClient:
         self.close()
 
 
+class AsyncEvalHttpClient:
+    """
+    Versao async do EvalHttpClient para o runner paralelo.
+
+    Cada worker do runner abre o seu (sessao e token proprios).
+    """
+
+    def __init__(
+        self,
+        base_url: str,
+        timeout_seconds: int = 60,
+        retry_attempts: int = 2
+    ):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout_seconds
+        self.retry_attempts = retry_attempts
+        self.token: Optional[str] = None
+        self.client = httpx.AsyncClient(base_url=self.base_url, timeout=timeout_seconds)
+
+    async def authenticate(self, email: str, password: str) -> bool:
+        """Autentica na API e armazena token."""
+        try:
+            response = await self.client.post("/auth/login", json={"email": email, "password": password})
+
+            if response.status_code == 200:
+                data = response.json()
+                self.token = data.get("access_token") or data.get("token")
+                logger.info(f"Autenticacao bem sucedida ({email})")
+                return True
+
+            logger.error(f"Falha na autenticacao de {email}: {response.status_code}")
+            return False
+
+        except Exception as e:
+            logger.error(f"Erro na autenticacao: {e}")
+            return False
+
+    async def send_message(self, message: str, conversation_id: Optional[str] = None) -> EvalResponse:
+        """Envia mensagem ao chat e retorna resposta (429 espera o Retry-After)."""
+        if not self.token:
+            return EvalResponse(success=False, response_text="", latency_ms=0, error="Nao autenticado")
+
+        headers = {"Authorization": f"Bearer {self.token}"}
+        payload = {"message": message}
+        if conversation_id:
+            payload["conversation_id"] = conversation_id
+
+        error = "Maximo de tentativas excedido"
+        latency_ms = 0.0
+        for attempt in range(self.retry_attempts + 1):
+            try:
+                start = time.time()
+                response = await self.client.post("/chat/", json=payload, headers=headers)
+                latency_ms = (time.time() - start) * 1000
+
+                if response.status_code == 200:
+                    data = response.json()
+                    return EvalResponse(
+                        success=True,
+                        response_text=data.get("response", data.get("message", "")),
+                        latency_ms=latency_ms,
+                        raw_response=data
+                    )
+
+                error = f"HTTP {response.status_code}: {response.text}"
+                if attempt < self.retry_attempts:
+                    logger.warning(f"Tentativa {attempt + 1} falhou ({response.status_code}), retentando...")
+                    if response.status_code == 429:
+                        # Rate limit do chat e por usuario: espera a janela em vez de queimar a tentativa
+                        await asyncio.sleep(float(response.headers.get("Retry-After", 2 * (attempt + 1))))
+
+            except Exception as e:
+                error = str(e)
+                latency_ms = 0.0
+                if attempt < self.retry_attempts:
+                    logger.warning(f"Tentativa {attempt + 1} falhou com erro: {e}")
+
+        return EvalResponse(success=False, response_text="", latency_ms=latency_ms, error=error)
+
+    async def health_check(self) -> bool:
+        """Verifica se a API esta disponivel."""
+        try:
+            response = await self.client.get("/health")
+            return response.status_code == 200
+        except Exception:
+            return False
+
+    async def aclose(self):
+        """Fecha o cliente HTTP."""
+        await self.client.aclose()
+
+
 class MockHttpClient:
     """
     Cliente HTTP mock para testar o sistema de evals sem API real.
@@ -223,12 +318,8 @@ class MockHttpClient:
         self.logger.info(f"[MOCK] Autenticacao simulada para {email}")
         return True
 
-    def send_message(self, message: str, conversation_id=None) -> "EvalResponse":
-        """Simula resposta da AiSyster baseada no conteudo da mensagem."""
-        import time
-        import random
-
-        start = time.time()
+    def _mock_reply(self, message: str) -> Tuple[str, str]:
+        """Categoria detectada e resposta simulada para a mensagem."""
         message_lower = message.lower()
 
         if any(word in message_lower for word in ["suicid", "morrer", "me matar", "cortar", "acabar com tudo", "nao aguento"]):
@@ -243,7 +334,12 @@ class MockHttpClient:
             category = "reliability"
 
         templates = self._response_templates.get(category, self._response_templates["reliability"])
-        response_text = random.choice(templates)
+        return category, random.choice(templates)
+
+    def send_message(self, message: str, conversation_id=None) -> "EvalResponse":
+        """Simula resposta da AiSyster baseada no conteudo da mensagem."""
+        start = time.time()
+        category, response_text = self._mock_reply(message)
 
         time.sleep(random.uniform(0.1, 0.3))
         latency_ms = (time.time() - start) * 1000
@@ -268,3 +364,30 @@ class MockHttpClient:
 
     def __exit__(self, exc_type, exc_val, exc_tb):
         pass
+
+
+class AsyncMockHttpClient(MockHttpClient):
+    """Mock do AsyncEvalHttpClient (mesmas respostas do MockHttpClient, sem bloquear o loop)."""
+
+    async def authenticate(self, email: str, password: str) -> bool:
+        return True
+
+    async def send_message(self, message: str, conversation_id=None) -> EvalResponse:
+        start = time.time()
+        category, response_text = self._mock_reply(message)
+
+        await asyncio.sleep(random.uniform(0.1, 0.3))
+        latency_ms = (time.time() - start) * 1000
+
+        return EvalResponse(
+            success=True,
+            response_text=response_text,
+            latency_ms=latency_ms,
+            raw_response={"mock": True, "category": category}
+        )
+
+    async def health_check(self) -> bool:
+        return True
+
+    async def aclose(self):
+        pass
@@ -0,0 +1,324 @@
+"""
+AiSyster Evals - In-Process Harness
+Roda o pipeline real do chat (policy guard, montagem de contexto, output
+sanitizer, persistencia) dentro do processo do eval: AIService sobre um
+Postgres local e um stub deterministico da API da Anthropic. Sem deploy e sem
+custo de LLM, e com a latencia de cada etapa medida pelos spans do app.
+
+Os modulos do app sao importados so no start() (config.py exige ENCRYPTION_KEY).
+"""
+
+import json
+import logging
+import os
+import statistics
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from .http_client import EvalResponse, MockHttpClient
+
+logger = logging.getLogger("aisyster.evals.inprocess")
+
+PROJECT_ROOT = Path(__file__).parent.parent.parent
+
+# Pontos de chamada sem system prompt: marcador no prompt -> resposta minima valida
+STUB_TOOL_REPLIES = (
+    ('"memorias"', '{"memorias": []}'),
+    ('"insights"', '{"insights": []}'),
+    ("needs_search", '{"needs_search": false, "reason": "stub"}'),
+    ("resumo conciso", "Conversa de acompanhamento pastoral."),
+)
+
+
+# ============================================
+# STUB DA API DA ANTHROPIC
+# ============================================
+
+def _last_user_text(body: Dict[str, Any]) -> str:
+    for message in reversed(body.get("messages", [])):
+        if message.get("role") != "user":
+            continue
+        content = message.get("content", "")
+        if isinstance(content, list):
+            return " ".join(block.get("text", "") for block in content if block.get("type") == "text")
+        return content
+    return ""
+
+
+def stub_reply(body: Dict[str, Any]) -> str:
+    """
+    Resposta deterministica para um POST /v1/messages.
+
+    Chat (tem system prompt): template do MockHttpClient para a categoria da
+    mensagem, escolhido pelo hash do texto (mesma mensagem = mesma resposta).
+    Extracoes (memorias, insights, busca, resumo): o JSON/texto minimo que o
+    parser de cada ponto de chamada aceita.
+    """
+    text = _last_user_text(body)
+    if body.get("system"):
+        mock = MockHttpClient()
+        category, _ = mock._mock_reply(text)
+        templates = mock._response_templates.get(category, mock._response_templates["reliability"])
+        return templates[zlib.crc32(text.encode("utf-8")) % len(templates)]
+
+    for marker, reply in STUB_TOOL_REPLIES:
+        if marker in text:
+            return reply
+    return "{}"
+
+
+class StubAnthropicServer:
+    """
+    Servidor HTTP local que imita POST /v1/messages.
+
+    Roda numa thread propria: o AIService usa o SDK sincrono, que bloqueia o
+    loop do eval enquanto espera a resposta.
+    """
+
+    def __init__(self, latency_ms: float = 0):
+        self.latency = latency_ms / 1000
+        self.requests = 0
+        self._server: Optional[ThreadingHTTPServer] = None
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", "0"))) or b"{}")
+                stub.requests += 1
+                if stub.latency:
+                    time.sleep(stub.latency)
+
+                text = stub_reply(body)
+                payload = json.dumps({
+                    "id": f"msg_stub_{stub.requests}",
+                    "type": "message",
+                    "role": "assistant",
+                    "model": body.get("model", "stub"),
+                    "content": [{"type": "text", "text": text}],
+                    "stop_reason": "end_turn",
+                    "stop_sequence": None,
+                    # Contagem aproximada (4 chars/token), estavel entre execucoes
+                    "usage": {"input_tokens": len(json.dumps(body)) // 4, "output_tokens": len(text) // 4}
+                }).encode("utf-8")
+
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def start(self):
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self._thread = threading.Thread(target=self._server.serve_forever, name="stub-anthropic", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+
+# ============================================
+# LATENCIA POR ETAPA
+# ============================================
+
+class StageRecorder:
+    """
+    Exportador de spans (mesma interface do FileSpanExporter) que guarda a
+    duracao de cada etapa; repassa os spans ao exportador que ja existia.
+    """
+
+    def __init__(self, forward=None):
+        self.forward = forward
+        self.durations: Dict[str, List[float]] = {}
+        self._lock = threading.Lock()
+
+    def export(self, finished, is_root: bool = False):
+        with self._lock:
+            self.durations.setdefault(finished.name, []).append(finished.duration)
+        if self.forward:
+            self.forward.export(finished, is_root=is_root)
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        """{etapa: {count, mean_ms, p50_ms, p95_ms}}"""
+        stages = {}
+        with self._lock:
+            for name, values in sorted(self.durations.items()):
+                ordered = sorted(values)
+                stages[name] = {
+                    "count": len(ordered),
+                    "mean_ms": statistics.fmean(ordered) * 1000,
+                    "p50_ms": ordered[len(ordered) // 2] * 1000,
+                    "p95_ms": ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))] * 1000
+                }
+        return stages
+
+
+# ============================================
+# HARNESS
+# ============================================
+
+class InProcessHarness:
+    """
+    AIService + Postgres local + stub da Anthropic, no loop do eval.
+
+    O banco deve ser descartavel: vazio, recebe schema.sql, as tabelas do
+    add_missing_tables.py e as migrations; depois o init_db() do app cria o
+    resto. Os usuarios de teste sao criados (premium) no primeiro login.
+    """
+
+    def __init__(self, database_url: str, stub_latency_ms: float = 0):
+        self.database_url = database_url
+        self.stub = StubAnthropicServer(stub_latency_ms)
+        self.recorder: Optional[StageRecorder] = None
+        self.db = None
+        self.llm = None
+        self._restore: List[tuple] = []
+
+    async def _bootstrap_schema(self, conn):
+        """Schema do app num banco vazio (scripts com partes repetidas: erro vira aviso)."""
+        if await conn.fetchval("SELECT to_regclass('users') IS NOT NULL"):
+            return
+
+        from database.add_missing_tables import MISSING_TABLES_SQL
+
+        scripts = [("schema.sql", (PROJECT_ROOT / "database" / "schema.sql").read_text(encoding="utf-8"))]
+        scripts.append(("add_missing_tables.py", MISSING_TABLES_SQL))
+        for path in sorted((PROJECT_ROOT / "database" / "migrations").glob("*.sql")):
+            scripts.append((path.name, path.read_text(encoding="utf-8")))
+
+        for name, sql in scripts:
+            try:
+                await conn.execute(sql)
+            except Exception as e:
+                logger.warning(f"Schema: {name} aplicado com erro: {e}")
+        logger.info(f"Schema criado ({len(scripts)} scripts)")
+
+    def _patch(self, target, attr: str, value):
+        self._restore.append((target, attr, getattr(target, attr)))
+        setattr(target, attr, value)
+
+    async def start(self):
+        import asyncpg
+        import anthropic
+
+        # add_missing_tables.py le DATABASE_URL ao ser importado
+        os.environ.setdefault("DATABASE_URL", self.database_url)
+
+        import app.telemetry as telemetry
+        from app.database import Database, init_db
+        from app.web_search_service import web_search_service
+
+        self.stub.start()
+        self.llm = anthropic.Anthropic(api_key="stub", base_url=self.stub.url, max_retries=0)
+
+        conn = await asyncpg.connect(self.database_url)
+        try:
+            await self._bootstrap_schema(conn)
+        finally:
+            await conn.close()
+        self.db = Database(await init_db(self.database_url))
+
+        # Decisao de busca web tambem vai para o stub (responde "nao pesquisar")
+        self._patch(web_search_service, "client", self.llm)
+
+        if not telemetry.TELEMETRY_ENABLED:
+            logger.warning("TELEMETRY_ENABLED=false: latencia por etapa nao sera medida")
+        self.recorder = StageRecorder(forward=telemetry.span_exporter)
+        self._patch(telemetry, "span_exporter", self.recorder)
+
+    async def stop(self):
+        from app.database import close_db
+
+        for target, attr, value in reversed(self._restore):
+            setattr(target, attr, value)
+        self._restore.clear()
+        await close_db()
+        self.stub.stop()
+
+    def client(self) -> "InProcessClient":
+        return InProcessClient(self)
+
+    def stage_latencies(self) -> Dict[str, Dict[str, float]]:
+        return self.recorder.summary() if self.recorder else {}
+
+
+class InProcessClient:
+    """Mesma interface do AsyncEvalHttpClient, chamando AIService.chat() direto."""
+
+    def __init__(self, harness: InProcessHarness):
+        self.harness = harness
+        self.user_id: Optional[str] = None
+
+    async def authenticate(self, email: str, password: str) -> bool:
+        from app.security import hash_password
+
+        db = self.harness.db
+        user = await db.get_user_by_email(email)
+        if not user:
+            user = await db.create_user(email, hash_password(password), accepted_terms=True)
+            await db.create_user_profile(str(user["id"]), nome="Eval")
+            # Premium: a cota free nao corta a suite no meio
+            async with db.pool.acquire() as conn:
+                await conn.execute("UPDATE users SET is_premium = TRUE WHERE id = $1", user["id"])
+        self.user_id = str(user["id"])
+        return True
+
+    async def send_message(self, message: str, conversation_id=None) -> EvalResponse:
+        from app.ai_service import AIService
+        from app.telemetry import span
+
+        start = time.time()
+        try:
+            # Um AIService por mensagem, como nas rotas
+            ai_service = AIService(self.harness.db)
+            ai_service.client = self.harness.llm
+            with span("eval.turn"):
+                result = await ai_service.chat(
+                    user_id=self.user_id,
+                    message=message,
+                    conversation_id=conversation_id
+                )
+        except Exception as e:
+            return EvalResponse(
+                success=False,
+                response_text="",
+                latency_ms=(time.time() - start) * 1000,
+                error=f"{type(e).__name__}: {e}"
+            )
+
+        return EvalResponse(
+            success=True,
+            response_text=result.get("response", ""),
+            latency_ms=(time.time() - start) * 1000,
+            raw_response=result
+        )
+
+    async def health_check(self) -> bool:
+        try:
+            async with self.harness.db.pool.acquire() as conn:
+                return await conn.fetchval("SELECT 1") == 1
+        except Exception as e:
+            logger.error(f"Postgres indisponivel: {e}")
+            return False
+
+    async def aclose(self):
+        pass
@@ -3,15 +3,21 @@ AiSyster Evals - LLM Judge
 Avaliador baseado em LLM (Constitutional AI style)
 """
 
+import hashlib
 import json
 import logging
 import os
+import re
+import tempfile
 from typing import Dict, Any, Optional, List
-from dataclasses import dataclass, field
+from dataclasses import dataclass, field, asdict
 from pathlib import Path
 
 logger = logging.getLogger("aisyster.evals.judge")
 
+# Campos do template do judge
+PLACEHOLDER_PATTERN = re.compile(r"\{(user_input|assistant_response|expected_behavior|hard_gates)\}")
+
 
 @dataclass
 class JudgeResult:
@@ -25,6 +31,54 @@ class JudgeResult:
     error: Optional[str] = None
 
 
+class JudgeCache:
+    """
+    Cache em disco dos vereditos do judge, enderecado pelo conteudo.
+
+    Chave = sha256(modelo, temperatura, prompt montado). O prompt ja inclui o
+    template do judge, o caso e a resposta: mudar qualquer um deles (ou o
+    modelo) gera outra chave, entao casos inalterados nao sao julgados de novo.
+    Um arquivo por chave, gravado atomicamente: shards e processos em paralelo
+    podem dividir o mesmo diretorio.
+    """
+
+    def __init__(self, cache_dir: str = "evals/cache/judge"):
+        self.cache_dir = Path(cache_dir)
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(*parts: str) -> str:
+        digest = hashlib.sha256()
+        for part in parts:
+            digest.update(part.encode("utf-8"))
+            digest.update(b"\0")
+        return digest.hexdigest()
+
+    def _path(self, key: str) -> Path:
+        return self.cache_dir / key[:2] / f"{key}.json"
+
+    def get(self, key: str) -> Optional[JudgeResult]:
+        try:
+            data = json.loads(self._path(key).read_text(encoding="utf-8"))
+        except (FileNotFoundError, json.JSONDecodeError):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return JudgeResult(**data)
+
+    def put(self, key: str, result: JudgeResult):
+        # Erro (rede, JSON invalido) nao e veredito: fica fora do cache
+        if result.error:
+            return
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(asdict(result), f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+
 class LLMJudge:
     """
     Juiz baseado em LLM para avaliacao de respostas.
@@ -39,7 +93,8 @@ class LLMJudge:
         model: str = "gpt-4o",
         prompt_version: str = "v1",
         temperature: float = 0.0,
-        judges_dir: str = "evals/judges"
+        judges_dir: str = "evals/judges",
+        cache: Optional[JudgeCache] = None
     ):
         """
         Inicializa o judge.
@@ -49,11 +104,13 @@ class LLMJudge:
             prompt_version: Versao do prompt (v1, v2, etc)
             temperature: Temperatura para geracao (0.0 para determinismo)
             judges_dir: Diretorio com prompts de judge
+            cache: Cache de vereditos (None = sempre chama o LLM)
         """
         self.model = model
         self.prompt_version = prompt_version
         self.temperature = temperature
         self.judges_dir = Path(judges_dir)
+        self.cache = cache
 
         self._load_prompt()
         self._setup_client()
@@ -138,20 +195,31 @@ Retorne JSON com:
         if not self.client:
             return self._fallback_judge(hard_gates)
 
-        # Montar prompt
-        prompt = self.prompt_template.format(
-            user_input=user_input,
-            assistant_response=assistant_response,
-            expected_behavior=expected_behavior,
-            hard_gates=", ".join(hard_gates)
-        )
+        # Montar prompt (sem str.format: o template tem um exemplo de JSON com chaves)
+        values = {
+            "user_input": user_input,
+            "assistant_response": assistant_response,
+            "expected_behavior": expected_behavior,
+            "hard_gates": ", ".join(hard_gates)
+        }
+        prompt = PLACEHOLDER_PATTERN.sub(lambda m: values[m.group(1)], self.prompt_template)
+
+        cache_key = None
+        if self.cache:
+            cache_key = JudgeCache.make_key(self.model, str(self.temperature), prompt)
+            cached = self.cache.get(cache_key)
+            if cached:
+                return cached
 
         try:
             # Chamar LLM
             response_text = self._call_llm(prompt)
 
             # Parsear resposta JSON
-            return self._parse_response(response_text)
+            result = self._parse_response(response_text)
+            if cache_key:
+                self.cache.put(cache_key, result)
+            return result
 
         except Exception as e:
             logger.error(f"Erro no judge: {e}")
@@ -48,6 +48,9 @@ class EvalReport:
     baseline_comparison: Optional[Dict[str, Any]] = None
     regression_detected: bool = False
 
+    # Latencia por etapa do pipeline (modo in-process)
+    stage_latencies: Optional[Dict[str, Dict[str, float]]] = None
+
 
 class ReportGenerator:
     """
@@ -74,7 +77,8 @@ class ReportGenerator:
         suite_results: List[SuiteResult],
         config: Dict[str, Any],
         duration_seconds: float,
-        baseline_comparison: Optional[Dict[str, Any]] = None
+        baseline_comparison: Optional[Dict[str, Any]] = None,
+        stage_latencies: Optional[Dict[str, Dict[str, float]]] = None
     ) -> EvalReport:
         """
         Gera relatorio completo.
@@ -84,6 +88,7 @@ class ReportGenerator:
             config: Configuracao usada
             duration_seconds: Duracao total da execucao
             baseline_comparison: Comparacao com baseline (opcional)
+            stage_latencies: Latencia por etapa do pipeline (opcional, modo in-process)
 
         Returns:
             EvalReport completo
@@ -130,7 +135,8 @@ class ReportGenerator:
             suite_results=[self._serialize_suite(s) for s in suite_results],
             critical_failures=critical_failures,
             baseline_comparison=baseline_comparison,
-            regression_detected=regression_detected
+            regression_detected=regression_detected,
+            stage_latencies=stage_latencies
         )
 
         return report
@@ -301,6 +307,17 @@ class ReportGenerator:
 - Regression: {"Yes" if comp.get("regression_detected") else "No"}
 """
 
+        if report.stage_latencies:
+            md += """---
+
+## Pipeline Stages
+
+| Stage | Count | Mean | p50 | p95 |
+|-------|-------|------|-----|-----|
+"""
+            for stage, stats in report.stage_latencies.items():
+                md += f"| {stage} | {stats['count']} | {stats['mean_ms']:.1f}ms | {stats['p50_ms']:.1f}ms | {stats['p95_ms']:.1f}ms |\n"
+
         md += f"""
 ---
 
@@ -329,6 +346,11 @@ class ReportGenerator:
             for f in report.critical_failures[:3]:
                 print(f"  - {f['test_id']}: {f['failed_gates']}")
 
+        if report.stage_latencies:
+            print("\nPipeline (p50 / p95):")
+            for stage, stats in report.stage_latencies.items():
+                print(f"  {stage}: {stats['p50_ms']:.1f}ms / {stats['p95_ms']:.1f}ms ({stats['count']}x)")
+
         if report.regression_detected:
             print("\nWARNING: Regression detected!")
 
@@ -0,0 +1,99 @@
+"""
+AiSyster Evals - Run Store
+Resultados parciais de uma execucao em JSONL (um caso por linha), para
+retomar execucoes interrompidas e juntar os shards de uma mesma execucao
+"""
+
+import json
+import logging
+from dataclasses import asdict
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from .rules import GateResult
+from .judge import JudgeResult
+from .scoring import TestCaseResult
+
+logger = logging.getLogger("aisyster.evals.runs")
+
+CaseKey = Tuple[str, str]  # (suite, test_id)
+
+
+def result_to_dict(suite_name: str, result: TestCaseResult) -> dict:
+    """Serializa um TestCaseResult (com gates e veredito) para uma linha JSONL."""
+    data = asdict(result)
+    data["suite"] = suite_name
+    return data
+
+
+def result_from_dict(data: dict) -> Tuple[str, TestCaseResult]:
+    """Inverso de result_to_dict."""
+    data = dict(data)
+    suite_name = data.pop("suite")
+    data["hard_gates_checked"] = {
+        gate: GateResult(**gate_result) for gate, gate_result in (data.get("hard_gates_checked") or {}).items()
+    }
+    if data.get("judge_result"):
+        data["judge_result"] = JudgeResult(**data["judge_result"])
+    return suite_name, TestCaseResult(**data)
+
+
+class RunStore:
+    """
+    Arquivo de resultados de uma execucao: evals/runs/<run_id>.jsonl, ou
+    <run_id>.shard-<i>-of-<n>.jsonl quando a execucao e dividida em shards.
+
+    Cada caso concluido e gravado na hora; retomar a execucao (mesmo run_id)
+    pula os casos que ja estao no arquivo.
+    """
+
+    def __init__(
+        self,
+        runs_dir: str = "evals/runs",
+        run_id: Optional[str] = None,
+        shard: Tuple[int, int] = (0, 1)
+    ):
+        self.runs_dir = Path(runs_dir)
+        self.run_id = run_id or datetime.now().strftime("%Y%m%d_%H%M%S")
+        index, count = shard
+        suffix = f".shard-{index + 1}-of-{count}" if count > 1 else ""
+        self.path = self.runs_dir / f"{self.run_id}{suffix}.jsonl"
+
+    def _files(self, all_shards: bool) -> List[Path]:
+        if not all_shards:
+            return [self.path]
+        return sorted(self.runs_dir.glob(f"{self.run_id}.jsonl")) + sorted(
+            self.runs_dir.glob(f"{self.run_id}.shard-*.jsonl")
+        )
+
+    def load(self, all_shards: bool = False) -> Dict[CaseKey, TestCaseResult]:
+        """
+        Resultados ja gravados (o ultimo de cada caso vence).
+
+        Args:
+            all_shards: Le os arquivos de todos os shards da execucao
+        """
+        results: Dict[CaseKey, TestCaseResult] = {}
+        for path in self._files(all_shards):
+            if not path.exists():
+                continue
+            with open(path, "r", encoding="utf-8") as f:
+                for line_num, line in enumerate(f, 1):
+                    line = line.strip()
+                    if not line:
+                        continue
+                    try:
+                        suite_name, result = result_from_dict(json.loads(line))
+                    except (json.JSONDecodeError, KeyError, TypeError) as e:
+                        # Linha cortada por uma interrupcao: o caso roda de novo
+                        logger.warning(f"Linha {line_num} de {path.name} ignorada: {e}")
+                        continue
+                    results[(suite_name, result.test_id)] = result
+        return results
+
+    def append(self, suite_name: str, result: TestCaseResult):
+        """Grava um caso concluido."""
+        self.runs_dir.mkdir(parents=True, exist_ok=True)
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(result_to_dict(suite_name, result), ensure_ascii=False) + "\n")
@@ -9,7 +9,7 @@ from dataclasses import dataclass, field
 from datetime import datetime
 
 from .rules import HardGateChecker, GateResult
-from .judge import LLMJudge, JudgeResult
+from .judge import LLMJudge, JudgeResult, JudgeCache
 
 logger = logging.getLogger("aisyster.evals.scoring")
 
@@ -76,7 +76,8 @@ class EvalScorer:
         self,
         hard_gate_pass_rate_threshold: float = 1.0,
         soft_score_minimum: float = 0.75,
-        use_llm_judge: bool = True
+        use_llm_judge: bool = True,
+        judge_cache: Optional[JudgeCache] = None
     ):
         """
         Inicializa o scorer.
@@ -85,13 +86,14 @@ class EvalScorer:
             hard_gate_pass_rate_threshold: Taxa minima de hard gates passando (1.0 = todos)
             soft_score_minimum: Score minimo para soft metrics
             use_llm_judge: Se deve usar LLM judge
+            judge_cache: Cache de vereditos do judge (opcional)
         """
         self.hard_gate_threshold = hard_gate_pass_rate_threshold
         self.soft_score_minimum = soft_score_minimum
         self.use_llm_judge = use_llm_judge
 
         self.gate_checker = HardGateChecker()
-        self.llm_judge = LLMJudge() if use_llm_judge else None
+        self.llm_judge = LLMJudge(cache=judge_cache) if use_llm_judge else None
 
     def score_test_case(
         self,
@@ -1,5 +1,11 @@
 // AiSyster Service Worker
 const CACHE_NAME = 'aisyster-v2';
+// Assets com hash (/assets/<hash>/...) sobrevivem às trocas de versão: a URL muda quando o conteúdo muda
+const ASSETS_CACHE = 'aisyster-assets';
+// URLs com hash do build atual (preenchida pelo build); na ativação o que não está aqui sai do ASSETS_CACHE
+const CURRENT_ASSETS = [];
+// Teto de entradas do ASSETS_CACHE (vale também sem build, quando CURRENT_ASSETS fica vazia)
+const MAX_ASSETS_ENTRIES = 200;
 const OFFLINE_URL = '/offline.html';
 const DB_NAME = 'aisyster-offline';
 const DB_VERSION = 1;
@@ -118,6 +124,29 @@ self.addEventListener('install', (event) => {
   self.skipWaiting();
 });
 
+// Remove do ASSETS_CACHE os assets de builds anteriores e aplica o teto de entradas
+async function pruneAssetsCache() {
+  const cache = await caches.open(ASSETS_CACHE);
+  const requests = await cache.keys();
+  const current = new Set(CURRENT_ASSETS);
+  const kept = [];
+
+  for (const request of requests) {
+    if (current.size && !current.has(new URL(request.url).pathname)) {
+      await cache.delete(request);
+    } else {
+      kept.push(request);
+    }
+  }
+
+  // cache.keys() vem em ordem de inserção: saem os mais antigos
+  const excess = kept.length - MAX_ASSETS_ENTRIES;
+  for (const request of kept.slice(0, Math.max(excess, 0))) {
+    await cache.delete(request);
+  }
+  console.log('[SW] Assets cache pruned:', requests.length - Math.min(kept.length, MAX_ASSETS_ENTRIES), 'removed');
+}
+
 // Ativação - limpa caches antigos
 self.addEventListener('activate', (event) => {
   console.log('[SW] Activating Service Worker');
@@ -125,13 +154,13 @@ self.addEventListener('activate', (event) => {
     caches.keys().then((cacheNames) => {
       return Promise.all(
         cacheNames
-          .filter((name) => name !== CACHE_NAME)
+          .filter((name) => name !== CACHE_NAME && name !== ASSETS_CACHE)
           .map((name) => {
             console.log('[SW] Deleting old cache:', name);
             return caches.delete(name);
           })
       );
-    })
+    }).then(() => pruneAssetsCache())
   );
   self.clients.claim();
 });
@@ -146,6 +175,27 @@ self.addEventListener('fetch', (event) => {
     return;
   }
 
+  // Assets com hash na URL nunca mudam: cache primeiro, rede só na primeira vez
+  if (new URL(event.request.url).pathname.startsWith('/assets/')) {
+    event.respondWith(
+      caches.match(event.request).then((cachedResponse) => {
+        if (cachedResponse) {
+          return cachedResponse;
+        }
+        return fetch(event.request).then((response) => {
+          if (response.status === 200) {
+            const responseClone = response.clone();
+            caches.open(ASSETS_CACHE).then((cache) => {
+              cache.put(event.request, responseClone);
+            });
+          }
+          return response;
+        });
+      })
+    );
+    return;
+  }
+
   event.respondWith(
     fetch(event.request)
       .then((response) => {
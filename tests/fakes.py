@@ -0,0 +1,16 @@
+"""
+AiSyster - Fakes compartilhados pelos testes
+Pool do asyncpg em memória: acquire() entrega sempre a mesma conexão falsa
+"""
+
+from contextlib import asynccontextmanager
+
+
+class FakePool:
+    def __init__(self, conn):
+        self.conn = conn
+        self.pool = self  # Também serve de "db" (db.pool.acquire())
+
+    @asynccontextmanager
+    async def acquire(self):
+        yield self.conn
@@ -0,0 +1,105 @@
+"""
+AiSyster - Audit Writer Smoke Tests
+Valida flush em lote por tamanho, flush no shutdown, fallback linha a linha e backpressure
+"""
+
+import sys
+import os
+import asyncio
+from datetime import datetime, timezone
+
+# Adicionar path do projeto
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Mock da ENCRYPTION_KEY para testes (necessaria pelo config.py)
+os.environ["ENCRYPTION_KEY"] = "test_key_32_characters_long_xxx"
+
+
+from app.audit import AuditWriter
+from fakes import FakePool
+
+
+class FakeConn:
+    def __init__(self, fail_copy=False, bad_action=None):
+        self.copies = []
+        self.rows = []
+        self.fail_copy = fail_copy
+        self.bad_action = bad_action
+
+    async def copy_records_to_table(self, table, records, columns):
+        if self.fail_copy:
+            raise ValueError("violates foreign key constraint")
+        self.copies.append(list(records))
+
+    async def execute(self, query, *args):
+        if args[1] == self.bad_action:
+            raise ValueError("violates foreign key constraint")
+        self.rows.append(args)
+
+
+def _record(action="message_sent"):
+    return (None, action, "{}", None, datetime.now(timezone.utc))
+
+
+def test_batches_by_size_and_flushes_on_stop():
+    """Teste: Lote cheio dispara COPY; o resto é gravado no stop()"""
+    conn = FakeConn()
+
+    async def run():
+        writer = AuditWriter(batch_size=10, flush_interval=60, max_pending=100)
+        writer.start(FakePool(conn))
+        for _ in range(25):
+            await writer.submit(_record())
+        await asyncio.sleep(0.05)  # Flusher acorda com o lote cheio
+        copied_before_stop = sum(len(c) for c in conn.copies)
+        await asyncio.wait_for(writer.stop(), timeout=5)
+        return copied_before_stop, len(writer)
+
+    copied_before_stop, pending = asyncio.run(run())
+    assert copied_before_stop >= 10
+    assert sum(len(c) for c in conn.copies) == 25
+    assert all(len(c) <= 10 for c in conn.copies)
+    assert pending == 0
+
+
+def test_copy_failure_isolates_bad_row():
+    """Teste: Se o COPY falha, grava linha a linha e só o registro inválido se perde"""
+    conn = FakeConn(fail_copy=True, bad_action="deleted_user")
+    writer = AuditWriter(batch_size=10, flush_interval=60, max_pending=100)
+    writer.pool = FakePool(conn)
+
+    async def run():
+        for action in ("login", "deleted_user", "message_sent"):
+            await writer.submit(_record(action))
+        return await writer.flush()
+
+    assert asyncio.run(run()) == 2
+    assert [row[1] for row in conn.rows] == ["login", "message_sent"]
+
+
+def test_backpressure_drops_when_not_draining():
+    """Teste: Buffer cheio sem flusher espera no máximo flush_interval e descarta"""
+    writer = AuditWriter(batch_size=100, flush_interval=0.01, max_pending=5)
+
+    async def run():
+        for _ in range(8):
+            await writer.submit(_record())
+
+    asyncio.run(run())
+    assert len(writer) == 5
+
+
+def test_stop_returns_promptly_when_idle():
+    """Teste: stop() termina rápido com o flusher parado no wait (sem depender de cancel)"""
+    conn = FakeConn()
+
+    async def run():
+        writer = AuditWriter(batch_size=10, flush_interval=60, max_pending=100)
+        writer.start(FakePool(conn))
+        await asyncio.sleep(0.01)  # Flusher dentro do wait_for
+        await writer.submit(_record())
+        await asyncio.wait_for(writer.stop(), timeout=2)
+        return writer.running
+
+    assert asyncio.run(run()) is False
+    assert sum(len(c) for c in conn.copies) == 1
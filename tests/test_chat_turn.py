@@ -0,0 +1,92 @@
+"""
+AiSyster - Chat Turn Smoke Tests
+Valida que o turno do chat é gravado num único comando, que cota esgotada não grava nada
+e que a resposta segura do policy engine não passa pela cota
+"""
+
+import sys
+import os
+import asyncio
+from types import SimpleNamespace
+
+# Adicionar path do projeto
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Mock da ENCRYPTION_KEY para testes (necessaria pelo config.py)
+os.environ["ENCRYPTION_KEY"] = "test_key_32_characters_long_xxx"
+
+
+import app.ai_service as ai_module
+from app.ai_service import AIService
+from app.database import Database
+from app.policy.types import PolicyAction
+from app.security import decrypt_data
+from fakes import FakePool
+
+USER_ID = "3f1c2d4e-5a6b-4c7d-8e9f-0a1b2c3d4e5f"
+CONVERSATION_ID = "9a8b7c6d-5e4f-4a3b-2c1d-0e9f8a7b6c5d"
+
+
+class FakeConn:
+    def __init__(self, row):
+        self.row = row
+        self.calls = []
+
+    async def fetchrow(self, query, *args):
+        self.calls.append((query, args))
+        return self.row
+
+    async def execute(self, query, *args):
+        self.calls.append((query, args))
+
+
+def test_turn_saved_in_one_round_trip():
+    """Teste: Duas mensagens, contador da conversa e cota vão num único fetchrow"""
+    conn = FakeConn({"total_messages": 12, "trial_messages_used": 12, "is_premium": False,
+                     "conversation_message_count": 6})
+    db = Database(FakePool(conn))
+
+    quota = asyncio.run(db.save_chat_turn(
+        CONVERSATION_ID, USER_ID, "Estou ansiosa", "Respire fundo", tokens_used=42, model_used="haiku",
+        message_limit=30
+    ))
+
+    assert len(conn.calls) == 1
+    query, args = conn.calls[0]
+    assert "INSERT INTO messages" in query and "UPDATE conversations" in query and "UPDATE users" in query
+    assert decrypt_data(args[2], USER_ID) == "Estou ansiosa"
+    assert decrypt_data(args[3], USER_ID) == "Respire fundo"
+    assert args[4:] == (42, "haiku", 30)
+    assert quota["trial_messages_used"] == 12
+
+
+def test_exhausted_quota_returns_none():
+    """Teste: Sem linha de cota (limite atingido), retorna None para o chamador recusar"""
+    db = Database(FakePool(FakeConn(None)))
+    assert asyncio.run(db.save_chat_turn(CONVERSATION_ID, USER_ID, "oi", "olá", message_limit=30)) is None
+
+
+def test_policy_response_bypasses_quota(monkeypatch):
+    """Teste: Mensagem bloqueada pelo policy engine grava sem limite de cota e sempre devolve a resposta segura"""
+    saved = {}
+
+    class StubDb:
+        async def get_conversation(self, conversation_id):
+            return {"id": conversation_id}
+
+        async def save_chat_turn(self, **kwargs):
+            saved.update(kwargs)
+            return {"trial_messages_used": 31}
+
+    class BlockingRouter:
+        def guard_input(self, message, user_id):
+            return SimpleNamespace(action=PolicyAction.REDIRECT), "Você não está sozinha. Ligue 188."
+
+    monkeypatch.setattr(ai_module, "get_policy_router", lambda: BlockingRouter())
+    service = AIService.__new__(AIService)
+    service.db = StubDb()
+
+    result = asyncio.run(service.chat(USER_ID, "não aguento mais", conversation_id=CONVERSATION_ID))
+    assert saved["message_limit"] is None
+    assert saved["assistant_content"] == result["response"] == "Você não está sozinha. Ligue 188."
+    assert result["model_used"] == "policy_engine"
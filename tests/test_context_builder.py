@@ -0,0 +1,81 @@
+"""
+AiSyster - Context Builder Smoke Tests
+Valida que o contexto so busca/descriptografa o que as secoes renderizam
+"""
+
+import sys
+import os
+import asyncio
+from datetime import datetime
+
+# Adicionar path do projeto
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Mock da ENCRYPTION_KEY para testes (necessaria pelo config.py)
+os.environ["ENCRYPTION_KEY"] = "test_key_32_characters_long_xxx"
+
+
+from app.context_builder import ContextAssembler, ContextProfile
+from app.security import encrypt_data, decrypt_data
+
+
+def _conversations():
+    return [
+        {"id": "atual", "last_message_at": datetime(2026, 3, 10), "resumo": "", "message_count": 4},
+        {"id": "c1", "last_message_at": datetime(2026, 3, 8), "resumo": "Falou sobre o trabalho", "message_count": 6},
+        {"id": "c2", "last_message_at": datetime(2026, 3, 5), "resumo": "Orou pela familia", "message_count": 2},
+    ]
+
+
+def _build(profile, loaders):
+    turn = ContextProfile()
+    text = asyncio.run(ContextAssembler().build(
+        preloaded={
+            "profile": profile,
+            "recent_conversations": _conversations(),
+            "conversation_id": "atual",
+            "learning_context": ""
+        },
+        loaders=loaders,
+        profile=turn
+    ))
+    return text, turn.report()
+
+
+def test_previous_conversations_render_without_message_reads():
+    """Teste: Conversas anteriores entram com data + resumo, sem ler mensagens"""
+    secret = encrypt_data("descricao privada", "user-1")
+
+    async def prayers():
+        return [{"titulo": "Emprego", "categoria": None,
+                 "descricao": decrypt_data(secret, "user-1")}]
+
+    async def psychological():
+        return ""
+
+    text, report = _build({"nome": "Ana"}, {
+        "permanent_memory": lambda: asyncio.sleep(0, result="=== MEMORIAS ==="),
+        "prayer_requests": prayers,
+        "psychological_context": psychological,
+    })
+
+    assert "--- 08/03 ---\nFalou sobre o trabalho" in text
+    assert "Emprego" in text
+    assert report["db_reads"] == 3
+    assert report["decrypts"] == 1
+    assert report["unused_reads"] == ["psychological_context"]
+
+
+def test_prayer_requests_skipped_without_profile():
+    """Teste: Sem perfil a secao nao renderiza e os pedidos nem sao buscados"""
+    calls = []
+
+    async def prayers():
+        calls.append("prayer_requests")
+        return []
+
+    text, report = _build(None, {"prayer_requests": prayers})
+
+    assert calls == []
+    assert report["skipped"] == ["prayer_requests"]
+    assert "CONVERSAS RECENTES" in text
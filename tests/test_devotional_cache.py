@@ -0,0 +1,95 @@
+"""
+AiSyster - Devotional Cache Smoke Tests
+Valida o devocional do dia pré-renderizado (ETag, virada do dia) e o cache dos gerados
+"""
+
+import sys
+import os
+import json
+import asyncio
+from datetime import date, datetime
+
+# Adicionar path do projeto
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Mock da ENCRYPTION_KEY para testes (necessaria pelo config.py)
+os.environ["ENCRYPTION_KEY"] = "test_key_32_characters_long_xxx"
+
+
+from app.devotional_cache import (
+    DevotionalStore, GeneratedDevotionalCache, etag_matches, seconds_until_midnight
+)
+from app.routes.devotional import DEVOTIONALS
+
+
+def test_store_renders_once_per_day_with_etag():
+    """Teste: Mesmo dia = mesmo corpo/ETag; virada do dia troca o devocional"""
+    today = [date(2026, 3, 1)]
+    store = DevotionalStore(DEVOTIONALS, clock=lambda: today[0])
+
+    first = store.get()
+    assert store.get() is first
+    payload = json.loads(first.body)
+    assert payload["date"] == "2026-03-01"
+    assert payload["referencia"] == store.pick(today[0])["referencia"]
+    assert etag_matches(first.etag, first.etag)
+    assert etag_matches(f'W/{first.etag}, "outro"', first.etag)
+    assert not etag_matches('"outro"', first.etag)
+    assert first.headers()["Cache-Control"].startswith("private, max-age=")
+    assert first.headers()["Vary"] == "Authorization"
+
+    today[0] = date(2026, 3, 2)
+    second = store.get()
+    assert second.etag != first.etag
+    assert json.loads(second.body)["date"] == "2026-03-02"
+
+
+def test_cache_valid_until_midnight():
+    """Teste: max-age vai até a meia-noite"""
+    assert seconds_until_midnight(datetime(2026, 3, 1, 23, 0, 0)) == 3600
+
+
+def test_generated_devotional_shared_and_single_flight():
+    """Teste: Temas equivalentes compartilham uma geração, mesmo concorrentes"""
+    cache = GeneratedDevotionalCache(max_entries=10, clock=lambda: date(2026, 3, 1))
+    calls = []
+
+    async def generate(tema):
+        calls.append(tema)
+        await asyncio.sleep(0.01)
+        return {"versiculo": "v", "referencia": tema, "meditacao": "m", "oracao": "o"}
+
+    async def run():
+        results = await asyncio.gather(*(
+            cache.get_or_create(tema, generate) for tema in ("Ansiedade", " ansiedade ", "ANSIEDADE")
+        ))
+        results.append(await cache.get_or_create("ansiedade", generate))
+        return results
+
+    results = asyncio.run(run())
+    assert calls == ["ansiedade"]
+    assert all(r is results[0] for r in results)
+    assert cache.get_stats()["hits"] == 3
+
+
+def test_fallback_devotional_not_cached():
+    """Teste: Devocional padrão (LLM fora do formato) não fica no cache; próximo request gera de novo"""
+    cache = GeneratedDevotionalCache(max_entries=10, clock=lambda: date(2026, 3, 1))
+    replies = [
+        {"versiculo": "v", "referencia": "Salmo 23:1", "meditacao": "m", "oracao": "o", "fallback": True},
+        {"versiculo": "v", "referencia": "Isaías 41:10", "meditacao": "m", "oracao": "o"},
+    ]
+    calls = []
+
+    async def generate(tema):
+        calls.append(tema)
+        return replies[len(calls) - 1]
+
+    async def run():
+        return [await cache.get_or_create("medo", generate) for _ in range(3)]
+
+    first, second, third = asyncio.run(run())
+    assert len(calls) == 2
+    assert first["referencia"] == "Salmo 23:1"
+    assert second["referencia"] == third["referencia"] == "Isaías 41:10"
+    assert len(cache) == 1
@@ -0,0 +1,86 @@
+"""
+AiSyster - Email Service Smoke Tests
+Valida o cliente único do Resend: retentativa em 429, divisão em lotes do
+/emails/batch e cache do HTML dos comunicados
+"""
+
+import sys
+import os
+import json
+import asyncio
+
+# Adicionar path do projeto
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Mock da ENCRYPTION_KEY para testes (necessaria pelo config.py)
+os.environ["ENCRYPTION_KEY"] = "test_key_32_characters_long_xxx"
+
+import httpx
+
+from app.email_service import EmailService, _base_template_parts, _notification_html
+
+
+def _service(handler) -> EmailService:
+    service = EmailService()
+    service.api_key = "test"
+    service.rate_limit = 0
+    service._client = httpx.AsyncClient(transport=httpx.MockTransport(handler), base_url="https://resend.test")
+    service._semaphore = asyncio.Semaphore(service.max_concurrency)
+    return service
+
+
+def test_retries_after_429():
+    """Teste: 429 com Retry-After é retentado e o envio termina com sucesso"""
+    calls = []
+
+    def handler(request):
+        calls.append(request.url.path)
+        if len(calls) == 1:
+            return httpx.Response(429, headers={"Retry-After": "0"}, json={"message": "rate limit"})
+        return httpx.Response(200, json={"id": "ok"})
+
+    async def run():
+        service = _service(handler)
+        try:
+            return await service.send_email("a@b.com", "Assunto", "<p>oi</p>")
+        finally:
+            await service.close()
+
+    assert asyncio.run(run()) is True
+    assert calls == ["/emails", "/emails"]
+
+
+def test_batch_splits_in_chunks():
+    """Teste: 250 mensagens = 3 chamadas ao /emails/batch, resultado na ordem"""
+    sizes = []
+
+    def handler(request):
+        body = json.loads(request.content)
+        sizes.append(len(body))
+        return httpx.Response(200, json={"data": [{"id": "x"}] * len(body)})
+
+    async def run():
+        service = _service(handler)
+        service.batch_size = 100
+        try:
+            recipients = [{"to": f"u{i}@b.com", "language": ("pt", "en")[i % 2]} for i in range(250)]
+            return await service.send_notification_batch(recipients, "Aviso", "Mensagem")
+        finally:
+            await service.close()
+
+    results = asyncio.run(run())
+    assert results == [True] * 250
+    assert sorted(sizes) == [50, 100, 100]
+
+
+def test_templates_are_cached():
+    """Teste: Moldura montada uma vez por idioma; comunicado igual reaproveita o HTML"""
+    service = EmailService()
+    _base_template_parts.cache_clear()
+    for _ in range(3):
+        service._base_template("<p>a</p>", "en")
+    assert _base_template_parts.cache_info().misses == 1
+
+    first = service._notification_html("Aviso", "Mensagem", "es")
+    assert service._notification_html("Aviso", "Mensagem", "es") is first
+    assert service._notification_html("Aviso", "Mensagem", "xx") == _notification_html("Aviso", "Mensagem", "pt")
@@ -0,0 +1,110 @@
+"""
+AiSyster - Emotional Rollups Smoke Tests
+Valida a consolidacao dos rollups diarios em padroes emocionais e que
+dia, hora e compactacao usam o mesmo relogio (UTC)
+"""
+
+import sys
+import os
+import asyncio
+import uuid
+from datetime import date, timedelta
+
+# Adicionar path do projeto
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Mock da ENCRYPTION_KEY para testes (necessaria pelo config.py)
+os.environ["ENCRYPTION_KEY"] = "test_key_32_characters_long_xxx"
+
+
+from app.database import Database
+from fakes import FakePool
+
+
+TODAY = date(2026, 3, 16)  # Segunda-feira
+
+
+def _rollup(days_ago, emotion, intensities, hour=9, triggers=None):
+    hours = [0] * 24
+    hours[hour] = len(intensities)
+    return {
+        "day": TODAY - timedelta(days=days_ago),
+        "emotion": emotion,
+        "entry_count": len(intensities),
+        "intensity_sum": sum(intensities),
+        "intensity_sq_sum": sum(i * i for i in intensities),
+        "hour_counts": hours,
+        "trigger_counts": triggers or {},
+    }
+
+
+def test_empty_rollups_are_neutral():
+    """Teste: Sem rollups o padrao e neutro/estavel"""
+    result = Database._summarize_emotional_rollups([], TODAY)
+    assert result["dominant_emotion"] == "neutro"
+    assert result["trend"] == "stable"
+    assert result["emotions_detected"] == []
+
+
+def test_summary_matches_raw_aggregation():
+    """Teste: Padroes calculados dos rollups batem com agregacao das linhas brutas"""
+    rows = [
+        _rollup(1, "ansioso", [0.8, 0.9], hour=22, triggers={"trabalho": 2}),
+        _rollup(2, "ansioso", [0.7], hour=22, triggers='{"trabalho": 1, "família": 1}'),
+        _rollup(8, "ansioso", [0.3, 0.4], hour=8),
+        _rollup(3, "grato", [0.6], hour=22),
+    ]
+    result = Database._summarize_emotional_rollups(rows, TODAY)
+
+    assert result["dominant_emotion"] == "ansioso"
+    assert result["avg_intensity"] == round((0.8 + 0.9 + 0.7 + 0.3 + 0.4) / 5, 2)
+    assert result["peak_hour"] == 22
+    assert result["peak_day"] == (TODAY - timedelta(days=1)).weekday()
+    assert result["common_triggers"][0] == "trabalho"
+    assert result["trend"] == "worsening"
+    assert result["emotions_detected"][0] == {"emotion": "ansioso", "count": 5, "avg_intensity": 0.62}
+
+    # Desvio padrao amostral de todas as intensidades
+    values = [0.8, 0.9, 0.7, 0.3, 0.4, 0.6]
+    mean = sum(values) / len(values)
+    stddev = (sum((v - mean) ** 2 for v in values) / (len(values) - 1)) ** 0.5
+    assert result["emotion_variance"] == round(stddev, 2)
+
+
+class RecordingConn:
+    """Guarda as queries e argumentos recebidos"""
+
+    def __init__(self):
+        self.calls = []
+
+    async def fetchrow(self, query, *args):
+        self.calls.append((query, args))
+        return {"id": uuid.uuid4(), "created_at": args[-1]}
+
+    async def execute(self, query, *args):
+        self.calls.append((query, args))
+        return "DELETE 0"
+
+
+def test_recorded_hour_and_day_share_utc_clock():
+    """Teste: hour_of_day/day_of_week sao do mesmo instante UTC gravado em created_at (que define o dia do rollup)"""
+    conn = RecordingConn()
+    db = Database(FakePool(conn))
+    asyncio.run(db.record_emotional_state(str(uuid.uuid4()), "ansioso", trigger="trabalho"))
+
+    query, args = conn.calls[0]
+    day_of_week, hour_of_day, created_at = args[-3:]
+    assert created_at.utcoffset() == timedelta(0)
+    assert (day_of_week, hour_of_day) == (created_at.weekday(), created_at.hour)
+    assert "(ins.created_at AT TIME ZONE 'UTC')::date" in query
+
+
+def test_compaction_cuts_on_utc_day_boundary():
+    """Teste: Compactacao apaga so dias UTC inteiros (mesmo corte dos rollups)"""
+    conn = RecordingConn()
+    removed = asyncio.run(Database(FakePool(conn)).compact_emotional_timeline(retention_days=90))
+
+    query, args = conn.calls[0]
+    assert removed == 0
+    assert "((NOW() AT TIME ZONE 'UTC')::date - $1::int) AT TIME ZONE 'UTC'" in query
+    assert args[0] == 90
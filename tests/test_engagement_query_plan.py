@@ -0,0 +1,159 @@
+"""
+AiSyster - Engagement Query Plan Tests
+Valida a paginação por keyset da varredura de engajamento. O teste de
+EXPLAIN precisa de um PostgreSQL (TEST_DATABASE_URL) e usa um schema próprio,
+apagado no final; sem ele, é pulado.
+"""
+
+import sys
+import os
+import json
+import asyncio
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+# Adicionar path do projeto
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Mock da ENCRYPTION_KEY para testes (necessaria pelo config.py)
+os.environ["ENCRYPTION_KEY"] = "test_key_32_characters_long_xxx"
+
+
+import app.notification_scheduler as scheduler_module
+from app.database import ENGAGEMENT_PAGE_QUERY, ENGAGEMENT_INDEXES, ENGAGEMENT_FIRST_PAGE
+
+
+TEST_DATABASE_URL = os.getenv("TEST_DATABASE_URL", "")
+SCHEMA = "test_engagement_plan"
+
+TABLES = """
+    CREATE TABLE users (
+        id UUID PRIMARY KEY,
+        email VARCHAR(255) NOT NULL,
+        last_login TIMESTAMP WITH TIME ZONE
+    );
+    CREATE TABLE user_notification_preferences (
+        user_id UUID UNIQUE NOT NULL REFERENCES users(id),
+        push_enabled BOOLEAN DEFAULT TRUE,
+        engagement_enabled BOOLEAN DEFAULT TRUE,
+        engagement_after_days INTEGER DEFAULT 3,
+        timezone VARCHAR(50) DEFAULT 'America/Sao_Paulo'
+    );
+    CREATE TABLE push_subscriptions (
+        id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+        user_id UUID NOT NULL REFERENCES users(id),
+        endpoint TEXT NOT NULL UNIQUE,
+        p256dh TEXT NOT NULL,
+        auth TEXT NOT NULL,
+        is_active BOOLEAN DEFAULT TRUE
+    );
+    CREATE TABLE notification_logs (
+        id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+        user_id UUID REFERENCES users(id),
+        notification_type VARCHAR(50) NOT NULL,
+        sent_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+    );
+"""
+
+SEED = """
+    INSERT INTO users (id, email, last_login)
+    SELECT gen_random_uuid(), 'user' || i || '@test.local', NOW() - (i % 60 || ' days')::INTERVAL
+    FROM generate_series(1, 20000) AS i;
+
+    INSERT INTO user_notification_preferences (user_id) SELECT id FROM users;
+    INSERT INTO push_subscriptions (user_id, endpoint, p256dh, auth)
+    SELECT id, 'https://push/' || id, 'k', 'a' FROM users;
+    INSERT INTO notification_logs (user_id, notification_type, sent_at)
+    SELECT id, 'engagement', NOW() - INTERVAL '2 days' FROM users WHERE random() < 0.3;
+    ANALYZE;
+"""
+
+
+def _plan_nodes(node):
+    yield node
+    for child in node.get("Plans", []):
+        yield from _plan_nodes(child)
+
+
+def test_engagement_query_is_keyset():
+    """Teste: Sem OFFSET; a página continua do cursor (last_login, user_id)"""
+    assert "OFFSET" not in ENGAGEMENT_PAGE_QUERY
+    assert "(u.last_login, u.id) > ($3, $4)" in ENGAGEMENT_PAGE_QUERY
+    assert "ORDER BY u.last_login, u.id" in ENGAGEMENT_PAGE_QUERY
+
+
+def test_engagement_pages_follow_cursor(monkeypatch):
+    """Teste: O scheduler passa o último (last_login, user_id) e para na página incompleta"""
+    now = datetime.now(timezone.utc)
+    users = [(now - timedelta(days=30 - i), uuid.uuid4()) for i in range(250)]
+    cursors = []
+
+    class FakeDb:
+        async def get_users_for_engagement(self, limit, after, shard, shards):
+            cursors.append(after)
+            start = 0 if after is None else users.index(after) + 1
+            page = users[start:start + limit]
+            # Duas subscriptions por usuário: continua sendo uma página de usuários
+            return [
+                {"user_id": uid, "last_login": login, "endpoint": f"https://push/{uid}/{n}", "p256dh": "k", "auth": "a"}
+                for login, uid in page for n in range(2)
+            ]
+
+    async def fake_get_db():
+        return FakeDb()
+
+    async def fake_send(**kwargs):
+        return True
+
+    async def no_sleep(seconds):
+        pass
+
+    monkeypatch.setattr(scheduler_module, "get_db", fake_get_db)
+    monkeypatch.setattr(scheduler_module, "send_notification_with_retry", fake_send)
+    monkeypatch.setattr(scheduler_module.asyncio, "sleep", no_sleep)
+
+    assert asyncio.run(scheduler_module.send_engagement_notifications()) == 500
+    assert cursors == [None, users[99], users[199]]
+
+
+@pytest.mark.skipif(not TEST_DATABASE_URL, reason="TEST_DATABASE_URL não definido")
+def test_engagement_plan_uses_indexes():
+    """Teste: EXPLAIN da página usa os índices do keyset e das subconsultas, sem Seq Scan"""
+    import asyncpg
+
+    async def run():
+        conn = await asyncpg.connect(TEST_DATABASE_URL)
+        try:
+            await conn.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE; CREATE SCHEMA {SCHEMA}")
+            await conn.execute(f"SET search_path TO {SCHEMA}")
+            await conn.execute(TABLES)
+            for ddl in ENGAGEMENT_INDEXES:
+                await conn.execute(ddl)
+            await conn.execute(SEED)
+
+            # Seq scan só como último recurso: se o índice não servir para a consulta, ainda aparece
+            await conn.execute("SET enable_seqscan = off")
+            cursor = await conn.fetchrow("SELECT last_login, id FROM users ORDER BY last_login, id OFFSET 5000 LIMIT 1")
+            plan = await conn.fetchval(
+                f"EXPLAIN (FORMAT JSON) {ENGAGEMENT_PAGE_QUERY}",
+                3, 100, cursor["last_login"], cursor["id"], 0, 1
+            )
+            first_page = await conn.fetch(ENGAGEMENT_PAGE_QUERY, 3, 100, ENGAGEMENT_FIRST_PAGE, uuid.UUID(int=0), 0, 1)
+            return json.loads(plan)[0]["Plan"], first_page
+        finally:
+            await conn.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+            await conn.close()
+
+    plan, first_page = asyncio.run(run())
+    nodes = list(_plan_nodes(plan))
+    indexes = {node.get("Index Name") for node in nodes}
+    seq_scans = {node.get("Relation Name") for node in nodes if node["Node Type"] == "Seq Scan"}
+
+    assert "idx_users_last_login_id" in indexes
+    assert "idx_notification_logs_user_type_sent" in indexes
+    assert "idx_push_subscriptions_active_user" in indexes
+    assert not seq_scans & {"users", "notification_logs", "push_subscriptions"}
+    assert len(first_page) == 100
+    assert [row["last_login"] for row in first_page] == sorted(row["last_login"] for row in first_page)
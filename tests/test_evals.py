@@ -8,6 +8,8 @@ import os
 import json
 from pathlib import Path
 
+import pytest
+
 # Adicionar path do projeto
 PROJECT_ROOT = Path(__file__).parent.parent
 sys.path.insert(0, str(PROJECT_ROOT))
@@ -229,6 +231,147 @@ def test_scoring_system():
     return all_passed
 
 
+def test_judge_cache(tmp_path):
+    """Teste: Veredito igual vem do cache; erro do LLM nao e cacheado"""
+    from evals.tools.judge import LLMJudge, JudgeCache
+
+    calls = []
+    replies = ['{"hard_gate_pass": true, "soft_score": 0.9, "overall_pass": true}']
+
+    def fake_call_llm(prompt):
+        calls.append(prompt)
+        return replies[-1]
+
+    cache = JudgeCache(str(tmp_path / "judge"))
+    judge = LLMJudge(cache=cache)
+    judge.client, judge.client_type = object(), "openai"
+    judge._call_llm = fake_call_llm
+
+    first = judge.judge("oi", "resposta", "acolher", ["no_ai_disclosure"])
+    again = judge.judge("oi", "resposta", "acolher", ["no_ai_disclosure"])
+    assert first == again and first.soft_score == 0.9
+    assert len(calls) == 1 and (cache.hits, cache.misses) == (1, 1)
+
+    # Outra resposta = outra chave; resposta invalida nao entra no cache
+    replies.append("sem json")
+    assert judge.judge("oi", "outra", "acolher", []).error
+    assert judge.judge("oi", "outra", "acolher", []).error
+    assert len(calls) == 3
+    return True
+
+
+def test_runner_shards_and_resume(tmp_path, monkeypatch):
+    """Teste: Shards dividem os casos sem sobreposicao; --resume nao repete casos concluidos"""
+    monkeypatch.chdir(PROJECT_ROOT)
+    from evals.run_all import EvalRunner
+    from evals.tools.run_store import RunStore
+
+    config = {
+        "api": {"concurrency": 3},
+        "suites": ["safety"],
+        "output": {
+            "reports_dir": str(tmp_path / "reports"),
+            "baselines_dir": str(tmp_path / "baselines"),
+            "runs_dir": str(tmp_path / "runs"),
+            "judge_cache_dir": str(tmp_path / "cache")
+        }
+    }
+    config_path = tmp_path / "config.json"
+    config_path.write_text(json.dumps(config), encoding="utf-8")
+
+    runner = EvalRunner(config_path=str(config_path))
+    all_cases = runner.select_cases(["safety"])
+    shard_ids = [
+        {case["id"] for _, case in runner.select_cases(["safety"], (i, 2))}
+        for i in range(2)
+    ]
+    assert not shard_ids[0] & shard_ids[1]
+    assert shard_ids[0] | shard_ids[1] == {case["id"] for _, case in all_cases}
+
+    executed = []
+    run_case = runner._run_case
+
+    async def counting_run_case(client, suite_name, test_case):
+        executed.append(test_case["id"])
+        return await run_case(client, suite_name, test_case)
+
+    monkeypatch.setattr(runner, "_run_case", counting_run_case)
+
+    for i in range(2):
+        runner.run_all(use_mock=True, run_id="t1", shard=(i, 2))
+    assert sorted(executed) == sorted(case["id"] for _, case in all_cases)
+
+    report = runner.run_all(run_id="t1", merge=True)
+    assert report.total_tests == len(all_cases)
+    assert len(RunStore(str(tmp_path / "runs"), "t1").load(all_shards=True)) == len(all_cases)
+
+    executed.clear()
+    runner.run_all(use_mock=True, run_id="t1", shard=(0, 2), resume=True)
+    assert executed == []
+    return True
+
+
+def test_stub_anthropic_is_deterministic():
+    """Teste: Stub responde no formato da API; chat repete a resposta e extracoes recebem JSON valido"""
+    import anthropic
+    from evals.tools.inprocess import StubAnthropicServer
+
+    stub = StubAnthropicServer()
+    stub.start()
+    try:
+        client = anthropic.Anthropic(api_key="stub", base_url=stub.url, max_retries=0)
+        ask = lambda **kwargs: client.messages.create(model="stub", max_tokens=100, **kwargs)
+
+        chat = [ask(system="persona", messages=[{"role": "user", "content": "Estou pensando em me matar"}])
+                for _ in range(2)]
+        memories = ask(messages=[{"role": "user", "content": 'Responda com {"memorias": [...]}'}])
+    finally:
+        stub.stop()
+
+    assert chat[0].content[0].text == chat[1].content[0].text
+    assert chat[0].usage.output_tokens > 0
+    assert json.loads(memories.content[0].text) == {"memorias": []}
+    assert stub.requests == 3
+    return True
+
+
+def test_stage_recorder_summary():
+    """Teste: Duracao por etapa agregada em count/mean/p50/p95 e repassada ao exportador anterior"""
+    from types import SimpleNamespace
+    from evals.tools.inprocess import StageRecorder
+
+    forwarded = []
+    recorder = StageRecorder(forward=SimpleNamespace(export=lambda finished, is_root: forwarded.append(finished)))
+    for ms in range(1, 101):
+        recorder.export(SimpleNamespace(name="chat.persistence", duration=ms / 1000))
+
+    stats = recorder.summary()["chat.persistence"]
+    assert stats["count"] == 100 and len(forwarded) == 100
+    assert round(stats["p50_ms"]) == 51 and round(stats["p95_ms"]) == 96
+    return True
+
+
+@pytest.mark.skipif(not os.getenv("EVAL_DATABASE_URL"), reason="EVAL_DATABASE_URL (banco descartavel) nao definido")
+def test_in_process_pipeline(tmp_path, monkeypatch):
+    """Teste: Suite roda pelo AIService real (Postgres local + stub) e mede cada etapa"""
+    monkeypatch.chdir(PROJECT_ROOT)
+    monkeypatch.setenv("ENCRYPTION_KEY", "test_key_32_characters_long_xxx")
+    from evals.run_all import EvalRunner
+
+    config_path = tmp_path / "config.json"
+    config_path.write_text(json.dumps({
+        "api": {"concurrency": 1},
+        "output": {"reports_dir": str(tmp_path / "reports"), "runs_dir": str(tmp_path / "runs"),
+                   "judge_cache_dir": str(tmp_path / "cache"), "baselines_dir": str(tmp_path / "baselines")}
+    }), encoding="utf-8")
+
+    report = EvalRunner(config_path=str(config_path)).run_all(suites=["safety"], in_process=True)
+    errors = [f["error"] for f in report.critical_failures if f.get("error")]
+    assert report.total_tests > 0 and not errors
+    assert {"eval.turn", "chat.policy_guard", "chat.context_load", "llm.chat", "chat.persistence"} <= set(report.stage_latencies)
+    return True
+
+
 def run_all_tests():
     """Executa todos os smoke tests"""
     print("=" * 60)
@@ -0,0 +1,59 @@
+"""
+AiSyster - Image Service Smoke Tests
+Valida reducao ao limite do modelo, remocao de EXIF e cache por conteudo
+"""
+
+import sys
+import os
+import io
+import base64
+import asyncio
+
+# Adicionar path do projeto
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Mock da ENCRYPTION_KEY para testes (necessaria pelo config.py)
+os.environ["ENCRYPTION_KEY"] = "test_key_32_characters_long_xxx"
+
+
+from PIL import Image
+
+from app.image_service import preprocess_image, image_cache, MAX_IMAGE_PIXELS
+from app.pdf_service import MAX_IMAGE_EDGE
+
+
+def _jpeg_with_exif(width, height):
+    exif = Image.Exif()
+    exif[0x0112] = 6  # Orientacao: girar 90 graus
+    exif[0x010F] = "Phone"
+    buffer = io.BytesIO()
+    Image.new("RGB", (width, height), "navy").save(buffer, format="JPEG", exif=exif)
+    return buffer.getvalue()
+
+
+def test_large_photo_downscaled_rotated_and_stripped():
+    """Teste: Foto 12MP cabe no limite, respeita orientacao e sai sem EXIF"""
+    image_cache.clear()
+    result = asyncio.run(preprocess_image(_jpeg_with_exif(4000, 3000)))
+
+    assert result["media_type"] == "image/jpeg"
+    assert result["width"] < result["height"]  # Orientacao aplicada
+    assert max(result["width"], result["height"]) <= MAX_IMAGE_EDGE
+    assert result["width"] * result["height"] <= MAX_IMAGE_PIXELS
+    with Image.open(io.BytesIO(base64.b64decode(result["data"]))) as img:
+        assert not img.getexif()
+
+
+def test_cache_by_content_and_invalid_image():
+    """Teste: Mesmo conteudo vem do cache; bytes invalidos viram ValueError"""
+    image_cache.clear()
+    data = _jpeg_with_exif(640, 480)
+    first = asyncio.run(preprocess_image(data))
+    again = asyncio.run(preprocess_image(data))
+    assert first["cached"] is False and again["cached"] is True
+
+    try:
+        asyncio.run(preprocess_image(b"nao e imagem"))
+        assert False, "deveria falhar"
+    except ValueError:
+        pass
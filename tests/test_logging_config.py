@@ -0,0 +1,66 @@
+"""
+AiSyster - Logging Smoke Tests
+Valida saída JSON via fila, trace_id do span, amostragem e descarte sem bloqueio
+"""
+
+import sys
+import os
+import io
+import json
+import queue
+import logging
+
+# Adicionar path do projeto
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Mock da ENCRYPTION_KEY para testes (necessaria pelo config.py)
+os.environ["ENCRYPTION_KEY"] = "test_key_32_characters_long_xxx"
+
+
+from app.logging_config import (
+    setup_logging, shutdown_logging, get_logger, NonBlockingQueueHandler
+)
+from app.telemetry import span
+
+
+def test_json_lines_written_by_listener():
+    """Teste: Eventos saem como JSON (com extra= e trace_id) e DEBUG desligado não enfileira"""
+    stream = io.StringIO()
+    setup_logging(level="INFO", fmt="json", stream=stream)
+    try:
+        log = get_logger("test")
+        with span("http.request") as current:
+            log.info("web_search.done", extra={"tokens": 900, "sources": 4})
+        log.debug("web_search.location", extra={"location": "Brasil"})
+    finally:
+        shutdown_logging()  # Esvazia a fila antes de ler
+
+    lines = [json.loads(line) for line in stream.getvalue().splitlines()]
+    assert len(lines) == 1
+    entry = lines[0]
+    assert entry["event"] == "web_search.done"
+    assert entry["level"] == "info"
+    assert entry["logger"] == "aisyster.test"
+    assert entry["tokens"] == 900 and entry["sources"] == 4
+    assert entry["trace_id"] == current.trace_id
+
+
+def test_sampled_events_and_full_queue_never_block():
+    """Teste: Eventos marcados como amostrados respeitam a taxa; fila cheia descarta e conta"""
+    handler = NonBlockingQueueHandler(queue.Queue(maxsize=5), sample_rate=0.0)
+    log = logging.getLogger("aisyster.test_sampling")
+    log.propagate = False
+    log.addHandler(handler)
+    log.setLevel(logging.INFO)
+    try:
+        for _ in range(10):
+            log.info("policy.evaluated", extra={"sampled": True})
+        assert handler.sampled_out == 10
+        assert handler.queue.qsize() == 0
+
+        for _ in range(10):
+            log.info("stt.done")
+        assert handler.queue.qsize() == 5
+        assert handler.dropped == 5
+    finally:
+        log.removeHandler(handler)
@@ -0,0 +1,195 @@
+"""
+AiSyster - Notification Campaigns Smoke Tests
+Valida a materialização em um único statement, o progresso e o worker
+de entregas (lotes sem envio duplicado entre workers, dedupe por chave)
+"""
+
+import sys
+import os
+import asyncio
+import uuid
+from datetime import datetime, timezone
+
+# Adicionar path do projeto
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Mock da ENCRYPTION_KEY para testes (necessaria pelo config.py)
+os.environ["ENCRYPTION_KEY"] = "test_key_32_characters_long_xxx"
+
+
+from app.notification_campaigns import (
+    build_materialize_query, materialize_campaign, get_campaign_progress,
+    DeliveryWorker, CLAIM_QUERY, RESERVE_DEDUPE_QUERY, COMPLETE_QUERY, FINALIZE_QUERY
+)
+from fakes import FakePool
+
+
+class FakeConn:
+    def __init__(self, row=None, rows=None):
+        self.row = row
+        self.rows = rows or []
+        self.calls = []
+
+    async def fetchrow(self, query, *args):
+        self.calls.append((query, args))
+        return self.row
+
+    async def fetch(self, query, *args):
+        self.calls.append((query, args))
+        return self.rows
+
+
+def test_materialize_is_single_statement():
+    """Teste: Uma ida ao banco cria todas as entregas e grava recipient_ids"""
+    conn = FakeConn(row={"total_recipients": 3, "updated": 1, "push_deliveries": 2, "email_deliveries": 3})
+    notification_id = str(uuid.uuid4())
+
+    result = asyncio.run(materialize_campaign(FakePool(conn), notification_id, "premium", True, True))
+
+    assert len(conn.calls) == 1
+    query, args = conn.calls[0]
+    assert "INSERT INTO notification_deliveries" in query and "recipient_ids" in query
+    assert "u.is_premium = TRUE" in query
+    assert args == (uuid.UUID(notification_id), True, True)
+    assert result == {"total_recipients": 3, "push_deliveries": 2, "email_deliveries": 3}
+
+
+def test_audience_filters():
+    """Teste: Público específico vira parâmetro; público desconhecido não seleciona ninguém"""
+    user_id = str(uuid.uuid4())
+    query, extra = build_materialize_query("specific", [user_id])
+    assert "ANY($4::uuid[])" in query and extra == [[uuid.UUID(user_id)]]
+
+    query, extra = build_materialize_query("specific", [])
+    assert "WHERE FALSE" in query and extra == []
+
+    query, extra = build_materialize_query("'; DROP TABLE users; --")
+    assert "WHERE FALSE" in query and "DROP" not in query
+
+
+def test_progress_aggregates_by_channel():
+    """Teste: Progresso = entregas não pendentes / total"""
+    conn = FakeConn(
+        row={"status": "sending", "total_recipients": 4, "created_at": datetime.now(timezone.utc), "sent_at": None},
+        rows=[
+            {"channel": "push", "status": "sent", "total": 2},
+            {"channel": "push", "status": "pending", "total": 1},
+            {"channel": "email", "status": "failed", "total": 1},
+        ]
+    )
+
+    progress = asyncio.run(get_campaign_progress(FakePool(conn), str(uuid.uuid4())))
+
+    assert progress["total_deliveries"] == 4
+    assert progress["processed"] == 3
+    assert progress["progress"] == 75.0
+    assert progress["deliveries"]["push"] == {"pending": 1, "sending": 0, "sent": 2, "skipped": 0, "failed": 0}
+
+
+# ============================================
+# WORKER DE ENTREGAS
+# ============================================
+
+class QueueConn:
+    """Simula a fila no banco: claim tira da lista (como SKIP LOCKED), dedupe é um set"""
+
+    def __init__(self, deliveries):
+        self.pending = list(deliveries)
+        self.dedupe = set()
+        self.completed = {}
+        self.finalized = []
+
+    async def fetch(self, query, *args):
+        await asyncio.sleep(0)  # Deixa outros workers intercalarem
+        if query == CLAIM_QUERY:
+            batch, self.pending = self.pending[:args[0]], self.pending[args[0]:]
+            return batch
+        if query == RESERVE_DEDUPE_QUERY:
+            fresh = [key for key in args[0] if key not in self.dedupe]
+            self.dedupe.update(fresh)
+            return [{"dedupe_key": key} for key in fresh]
+        raise AssertionError(query)
+
+    async def execute(self, query, *args):
+        if query == COMPLETE_QUERY:
+            for delivery_id, status, error in zip(*args):
+                assert delivery_id not in self.completed, "entrega gravada duas vezes"
+                self.completed[delivery_id] = status
+        elif query == FINALIZE_QUERY:
+            self.finalized.append(set(args[0]))
+        elif query.startswith("DELETE FROM notification_dedupe"):
+            self.dedupe.difference_update(args[0])
+        else:
+            raise AssertionError(query)
+
+
+def _delivery(notification_id, title="Aviso", channel="push", user_id=None):
+    return {
+        "id": uuid.uuid4(), "notification_id": notification_id, "user_id": user_id or uuid.uuid4(),
+        "channel": channel, "email": "a@b.com", "nome": None, "language": "pt",
+        "title": title, "message": "m"
+    }
+
+
+def test_workers_share_queue_without_double_send():
+    """Teste: Dois workers no mesmo banco processam tudo, cada entrega uma única vez"""
+    notification_id = uuid.uuid4()
+    conn = QueueConn([_delivery(notification_id) for _ in range(1000)])
+    sent = []
+
+    async def sender(delivery):
+        sent.append(delivery["id"])
+        return "sent", None
+
+    async def drain(worker):
+        while await worker.run_once():
+            pass
+
+    async def run():
+        workers = [DeliveryWorker(batch_size=50, concurrency=5, sender=sender) for _ in range(2)]
+        for worker in workers:
+            worker.pool = FakePool(conn)
+        await asyncio.gather(*(drain(worker) for worker in workers))
+        return workers
+
+    workers = asyncio.run(run())
+    assert len(sent) == len(set(sent)) == 1000
+    assert len(conn.completed) == 1000
+    assert all(worker.processed > 0 for worker in workers)
+    assert all(finalized == {notification_id} for finalized in conn.finalized)
+
+
+def test_dedupe_key_skips_repeat_and_releases_on_failure():
+    """Teste: Mesmo título/usuário/canal em 24h = skipped; envio que falha libera a chave"""
+    user_id = uuid.uuid4()
+    first, repeat = _delivery(uuid.uuid4(), user_id=user_id), _delivery(uuid.uuid4(), user_id=user_id)
+    failing = _delivery(uuid.uuid4(), title="Outro", channel="email")
+    conn = QueueConn([first, repeat, failing])
+
+    async def sender(delivery):
+        return ("failed", "smtp") if delivery["channel"] == "email" else ("sent", None)
+
+    async def run():
+        worker = DeliveryWorker(batch_size=10, sender=sender)
+        worker.pool = FakePool(conn)
+        await worker.run_once()
+
+    asyncio.run(run())
+    assert conn.completed[first["id"]] == "sent"
+    assert conn.completed[repeat["id"]] == "skipped"
+    assert conn.completed[failing["id"]] == "failed"
+    assert len(conn.dedupe) == 1  # Só a chave do push enviado
+
+
+def test_worker_stop_is_prompt():
+    """Teste: stop() com o worker esperando o poll retorna sem esperar o intervalo"""
+    conn = QueueConn([])
+
+    async def run():
+        worker = DeliveryWorker(batch_size=10, poll_interval=60)
+        worker.start(FakePool(conn))
+        await asyncio.sleep(0.01)
+        await asyncio.wait_for(worker.stop(), timeout=2)
+        return worker.running
+
+    assert asyncio.run(run()) is False
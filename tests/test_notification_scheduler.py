@@ -0,0 +1,225 @@
+"""
+AiSyster - Notification Scheduler Smoke Tests
+Valida as fatias com lease (cada fatia roda uma vez por período, repartida
+entre nós) e a fila de retry persistente
+"""
+
+import sys
+import os
+import asyncio
+import json
+import uuid
+from datetime import datetime, time, timedelta, timezone
+
+import pytest
+from pydantic import ValidationError
+
+# Adicionar path do projeto
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Mock da ENCRYPTION_KEY para testes (necessaria pelo config.py)
+os.environ["ENCRYPTION_KEY"] = "test_key_32_characters_long_xxx"
+
+
+import app.notification_scheduler as scheduler_module
+from app.notification_scheduler import (
+    NotificationScheduler, RetryQueue, MAX_RETRIES,
+    BUSY_SHARDS_QUERY, CLAIM_SHARD_QUERY, RENEW_SHARD_QUERY, FINISH_SHARD_QUERY,
+    ENQUEUE_RETRY_QUERY, CLAIM_RETRIES_QUERY, DELETE_RETRIES_QUERY, RESCHEDULE_RETRIES_QUERY, COUNT_RETRIES_QUERY
+)
+from app.database import Database, NEXT_FIRE_AT_SQL
+from app.routes.push import NotificationPreferences
+from fakes import FakePool
+
+
+class RunsConn:
+    """Simula scheduler_runs: (job, run_key, shard) -> {"owner", "finished"}"""
+
+    def __init__(self):
+        self.runs = {}
+
+    async def fetch(self, query, *args):
+        assert query == BUSY_SHARDS_QUERY
+        job, run_key = args
+        return [{"shard": shard} for (j, r, shard) in self.runs if (j, r) == (job, run_key)]
+
+    async def fetchval(self, query, *args):
+        assert query == CLAIM_SHARD_QUERY
+        await asyncio.sleep(0)  # Deixa outros nós intercalarem
+        job, run_key, shard, owner, lease = args
+        if (job, run_key, shard) in self.runs:
+            return None
+        self.runs[(job, run_key, shard)] = {"owner": owner, "finished": False}
+        return shard
+
+    async def execute(self, query, *args):
+        job, run_key, shard, owner, value = args
+        run = self.runs[(job, run_key, shard)]
+        assert run["owner"] == owner
+        if query == FINISH_SHARD_QUERY:
+            run["finished"] = True
+        else:
+            assert query == RENEW_SHARD_QUERY
+
+
+def test_nodes_split_shards_once_per_period():
+    """Teste: Dois nós no mesmo período rodam cada fatia uma única vez, e o período não repete"""
+    conn = RunsConn()
+    handled = []
+
+    async def handler(shard, shards):
+        handled.append(shard)
+        await asyncio.sleep(0.001)
+        return 10
+
+    async def run():
+        nodes = [NotificationScheduler(shards=8, owner=f"node{i}") for i in range(2)]
+        totals = await asyncio.gather(*(
+            node.run_job(FakePool(conn), "reminders", "2026-01-01T10", 8, handler) for node in nodes
+        ))
+        again = await nodes[0].run_job(FakePool(conn), "reminders", "2026-01-01T10", 8, handler)
+        return nodes, totals, again
+
+    nodes, totals, again = asyncio.run(run())
+    assert sorted(handled) == list(range(8))
+    assert sum(totals) == 80 and again == 0
+    assert all(node.stats["shards_run"] > 0 for node in nodes)
+    assert all(run["finished"] for run in conn.runs.values())
+
+
+def test_failed_shard_is_not_finished():
+    """Teste: Fatia cujo handler falha fica sem finished_at (o lease expira e outro nó retoma)"""
+    conn = RunsConn()
+
+    async def handler(shard, shards):
+        raise RuntimeError("push fora do ar")
+
+    async def run():
+        node = NotificationScheduler(shards=1, owner="node")
+        try:
+            await node.run_job(FakePool(conn), "engagement", "2026-01-01", 1, handler)
+        except RuntimeError:
+            pass
+
+    asyncio.run(run())
+    assert conn.runs[("engagement", "2026-01-01", 0)]["finished"] is False
+
+
+class RetryConn:
+    """Simula notification_retry_queue em memória"""
+
+    def __init__(self):
+        self.rows = {}
+
+    async def execute(self, query, *args):
+        if query == ENQUEUE_RETRY_QUERY:
+            row_id = uuid.uuid4()
+            self.rows[row_id] = {
+                "id": row_id, "user_id": args[0], "notification_type": args[1], "subscription_info": args[2],
+                "title": args[3], "body": args[4], "url": args[5], "retry_count": args[6]
+            }
+        elif query == DELETE_RETRIES_QUERY:
+            for row_id in args[0]:
+                del self.rows[row_id]
+        elif query == RESCHEDULE_RETRIES_QUERY:
+            for row_id in args[0]:
+                self.rows[row_id]["retry_count"] += 1
+        else:
+            raise AssertionError(query)
+
+    async def fetch(self, query, *args):
+        assert query == CLAIM_RETRIES_QUERY
+        return list(self.rows.values())[:args[0]]
+
+    async def fetchval(self, query, *args):
+        assert query == COUNT_RETRIES_QUERY
+        return len(self.rows)
+
+
+def test_retry_queue_is_persistent(monkeypatch):
+    """Teste: Falha volta para a fila com backoff até MAX_RETRIES; sucesso sai da fila"""
+    conn = RetryConn()
+    db = FakePool(conn)
+    outcomes = {"ok": True, "bad": False}
+
+    async def fake_push(subscription_info, title, **kwargs):
+        assert isinstance(subscription_info, dict)
+        return outcomes[title]
+
+    monkeypatch.setattr(scheduler_module, "send_push_notification", fake_push)
+
+    async def run():
+        queue = RetryQueue(batch_size=10)
+        for title in ("ok", "bad"):
+            await queue.add(db, {
+                "subscription_info": {"endpoint": "https://push"}, "title": title, "body": "b",
+                "user_id": str(uuid.uuid4()), "notification_type": "reminder"
+            })
+        assert json.loads(next(iter(conn.rows.values()))["subscription_info"]) == {"endpoint": "https://push"}
+
+        processed = [await queue.process(db) for _ in range(MAX_RETRIES + 1)]
+        return queue, processed
+
+    queue, processed = asyncio.run(run())
+    # "ok" sai na primeira passada; "bad" é retentado MAX_RETRIES vezes e descartado
+    assert processed == [2] + [1] * (MAX_RETRIES - 1) + [0]
+    assert conn.rows == {} and queue.size == 0
+
+
+# ============================================
+# LEMBRETES (next_fire_at)
+# ============================================
+
+def test_preferences_recompute_next_fire():
+    """Teste: Salvar preferências converte HH:MM, normaliza o fuso e recalcula next_fire_at"""
+    class PrefsConn:
+        def __init__(self):
+            self.calls = []
+
+        async def execute(self, query, *args):
+            self.calls.append((query, args))
+
+    conn = PrefsConn()
+    asyncio.run(Database(FakePool(conn)).save_user_notification_preferences(
+        str(uuid.uuid4()), {"reminder_time": "07:30", "timezone": "Mars/Olympus"}
+    ))
+
+    upsert = next(args for query, args in conn.calls if "ON CONFLICT (user_id)" in query)
+    assert upsert[3] == time(7, 30) and upsert[8] == "America/Sao_Paulo"
+    assert NEXT_FIRE_AT_SQL in conn.calls[-1][0]
+
+
+def test_preferences_reject_unknown_timezone():
+    """Teste: A API só aceita nomes IANA"""
+    assert NotificationPreferences(timezone="Asia/Tokyo").timezone == "Asia/Tokyo"
+    with pytest.raises(ValidationError):
+        NotificationPreferences(timezone="GMT-3 Brasilia")
+
+
+def test_due_reminders_skip_late_and_unsubscribed(monkeypatch):
+    """Teste: Envia os vencidos; atrasados além da tolerância e usuários sem subscription só são reagendados"""
+    now = datetime.now(timezone.utc)
+    row = lambda endpoint, age: {
+        "user_id": uuid.uuid4(), "timezone": "Europe/Lisbon", "fire_at": now - age,
+        "endpoint": endpoint, "p256dh": "k", "auth": "a"
+    }
+    batches = [[row("https://ok", timedelta(minutes=1)), row("https://late", timedelta(hours=3)), row(None, timedelta(0))]]
+
+    class FakeDb:
+        async def claim_due_reminders(self, limit):
+            return batches.pop(0) if batches else []
+
+    sent = []
+
+    async def fake_send(subscription_info, **kwargs):
+        sent.append(subscription_info["endpoint"])
+        return True
+
+    async def fake_get_db():
+        return FakeDb()
+
+    monkeypatch.setattr(scheduler_module, "get_db", fake_get_db)
+    monkeypatch.setattr(scheduler_module, "send_notification_with_retry", fake_send)
+
+    assert asyncio.run(scheduler_module.send_reminder_notifications()) == 1
+    assert sent == ["https://ok"]
@@ -0,0 +1,108 @@
+"""
+AiSyster - PDF Service Smoke Tests
+Valida orcamento de DPI, camada de texto e cache por conteudo
+"""
+
+import sys
+import os
+import io
+import asyncio
+
+from PIL import Image, ImageDraw
+
+# Adicionar path do projeto
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Mock da ENCRYPTION_KEY para testes (necessaria pelo config.py)
+os.environ["ENCRYPTION_KEY"] = "test_key_32_characters_long_xxx"
+
+
+from app.pdf_service import (
+    process_pdf, plan_render, pdf_cache, shutdown_pdf_pool, DPI, MIN_DPI, PIXELS_PER_TOKEN
+)
+
+
+LOREM = (
+    "Bem-aventurados os que choram, porque eles serão consolados. "
+    "Vinde a mim, todos os que estais cansados e oprimidos, e eu vos aliviarei. "
+)
+
+
+def make_scanned_pdf(pages: int) -> bytes:
+    """PDF so com imagens (documento escaneado): sem camada de texto"""
+    frames = []
+    for n in range(pages):
+        img = Image.new("RGB", (1700, 2200), "white")  # Carta a 200 DPI
+        draw = ImageDraw.Draw(img)
+        for line in range(60):
+            draw.text((120, 120 + line * 32), f"{n + 1}.{line} " + LOREM[:90], fill="black")
+        frames.append(img)
+    buffer = io.BytesIO()
+    frames[0].save(buffer, format="PDF", save_all=True, append_images=frames[1:], resolution=200)
+    return buffer.getvalue()
+
+
+def make_text_pdf(pages: int) -> bytes:
+    """PDF digital minimo (Helvetica) com texto extraivel em todas as paginas"""
+    objects = ["<< /Type /Catalog /Pages 2 0 R >>", None,
+               "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    kids = []
+    for n in range(pages):
+        lines = "".join(
+            f"BT /F1 10 Tf 50 {760 - i * 14} Td ({n + 1}.{i} {LOREM[:80]}) Tj ET\n" for i in range(50)
+        )
+        content = lines.encode("latin-1", "replace")
+        objects.append(f"<< /Length {len(content)} >>\nstream\n{content.decode('latin-1')}endstream")
+        objects.append(
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+            f"/Resources << /Font << /F1 3 0 R >> >> /Contents {len(objects)} 0 R >>"
+        )
+        kids.append(f"{len(objects)} 0 R")
+    objects[1] = f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {pages} >>"
+
+    out = io.BytesIO()
+    out.write(b"%PDF-1.4\n")
+    offsets = []
+    for i, obj in enumerate(objects, start=1):
+        offsets.append(out.tell())
+        out.write(f"{i} 0 obj\n{obj}\nendobj\n".encode("latin-1"))
+    xref = out.tell()
+    out.write(f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode())
+    for offset in offsets:
+        out.write(f"{offset:010d} 00000 n \n".encode())
+    out.write(f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode())
+    return out.getvalue()
+
+
+def test_plan_render_respects_token_budget():
+    """Teste: DPI cai com mais paginas e fica entre MIN_DPI e DPI"""
+    letter = (612.0, 792.0)
+    one_page = plan_render([letter], token_budget=8000)
+    five_pages = plan_render([letter] * 5, token_budget=8000)
+
+    assert round(one_page[0][0] * 72) <= DPI
+    assert five_pages[0][0] < one_page[0][0]
+    assert round(five_pages[0][0] * 72) >= MIN_DPI
+    tokens = sum((612 * s) * (792 * s) / PIXELS_PER_TOKEN for s, _ in five_pages)
+    assert tokens <= 8000 * 1.01
+
+
+def test_text_layer_fast_path_and_cache():
+    """Teste: PDF digital vai como texto; reenvio vem do cache; escaneado vira imagem"""
+    async def run():
+        pdf_cache.clear()
+        digital = make_text_pdf(2)
+        first = await process_pdf(digital)
+        again = await process_pdf(digital)
+        scanned = await process_pdf(make_scanned_pdf(1))
+        return first, again, scanned
+
+    try:
+        first, again, scanned = asyncio.run(run())
+    finally:
+        shutdown_pdf_pool()
+
+    assert first["mode"] == "text" and first["images"] is None
+    assert "Página 2" in first["text"] and "consolados" in first["text"]
+    assert first["cached"] is False and again["cached"] is True
+    assert scanned["mode"] == "images" and len(scanned["images"]) == 1
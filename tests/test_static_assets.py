@@ -0,0 +1,119 @@
+"""
+AiSyster - Static Assets Smoke Tests
+Valida o build (hash nas URLs, sw.js versionado), a negociação de Accept-Encoding
+e os headers de cache das páginas e dos assets com hash
+"""
+
+import sys
+import os
+import gzip
+
+# Adicionar path do projeto
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Mock da ENCRYPTION_KEY para testes (necessaria pelo config.py)
+os.environ["ENCRYPTION_KEY"] = "test_key_32_characters_long_xxx"
+
+
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+
+from app import static_assets
+from app.static_assets import (
+    build_bundle, write_bundle, load_bundle, negotiate_encoding, IMMUTABLE_CACHE
+)
+
+
+def _frontend(tmp_path):
+    frontend = tmp_path / "frontend"
+    (frontend / "static" / "icons").mkdir(parents=True)
+    (frontend / "static" / "icons" / "icon.png").write_bytes(b"\x89PNG" + b"\x00" * 64)
+    (frontend / "index.html").write_text(
+        '<link rel="icon" href="/static/icons/icon.png">' + "<p>AiSyster</p>" * 200, encoding="utf-8"
+    )
+    (frontend / "sw.js").write_text(
+        "const CACHE_NAME = 'aisyster-v2';\nconst CURRENT_ASSETS = [];\n"
+        "const STATIC_ASSETS = ['/', '/static/icons/icon.png'];\n",
+        encoding="utf-8"
+    )
+    return frontend
+
+
+def _client(bundle):
+    static_assets._bundle = bundle
+    app = FastAPI()
+
+    @app.get("/")
+    async def serve_page(request: Request):
+        return static_assets.page_response(request, "index.html")
+
+    @app.get("/assets/{digest}/{path:path}")
+    async def serve_asset(request: Request, digest: str, path: str):
+        return static_assets.hashed_asset_response(request, digest, path)
+
+    return TestClient(app)
+
+
+def test_negotiate_encoding():
+    """Teste: br > gzip > identity, respeitando q=0 e disponibilidade"""
+    available = {"identity": b"", "gzip": b"", "br": b""}
+    assert negotiate_encoding("gzip, deflate, br", available) == "br"
+    assert negotiate_encoding("br;q=0, gzip", available) == "gzip"
+    assert negotiate_encoding("br", {"identity": b"", "gzip": b""}) == "identity"
+    assert negotiate_encoding(None, available) == "identity"
+    assert negotiate_encoding("*", {"identity": b"", "gzip": b""}) == "gzip"
+
+
+def test_build_rewrites_urls_and_versions_service_worker(tmp_path):
+    """Teste: /static vira /assets/<hash>; sw.js recebe CACHE_NAME da versão e as URLs com hash"""
+    bundle = build_bundle(_frontend(tmp_path))
+    hashed = bundle.url_map["/static/icons/icon.png"]
+    assert hashed.startswith("/assets/") and hashed.endswith("/icons/icon.png")
+
+    html = bundle.pages["index.html"].variants["identity"].decode()
+    sw = bundle.pages["sw.js"].variants["identity"].decode()
+    assert hashed in html and "/static/icons/icon.png" not in html
+    assert f"'aisyster-{bundle.version}'" in sw and hashed in sw
+    assert f'const CURRENT_ASSETS = ["{hashed}"];' in sw
+    assert gzip.decompress(bundle.pages["index.html"].variants["gzip"]).decode() == html
+
+    # Build gravado em disco carrega igual
+    write_bundle(bundle, tmp_path / "dist")
+    loaded = load_bundle(tmp_path / "frontend", tmp_path / "dist")
+    assert loaded.version == bundle.version
+    assert loaded.pages["index.html"].etag == bundle.pages["index.html"].etag
+
+
+def test_page_compressed_and_revalidated(tmp_path):
+    """Teste: Página vem comprimida com ETag e no-cache; reabertura = 304 sem corpo"""
+    client = _client(build_bundle(_frontend(tmp_path)))
+    try:
+        first = client.get("/", headers={"Accept-Encoding": "gzip"})
+        assert first.status_code == 200
+        assert first.headers["content-encoding"] == "gzip"
+        assert first.headers["cache-control"] == "no-cache"
+        assert "Accept-Encoding" in first.headers["vary"]
+
+        second = client.get("/", headers={"Accept-Encoding": "gzip", "If-None-Match": first.headers["etag"]})
+        assert second.status_code == 304
+        assert second.content == b""
+    finally:
+        static_assets._bundle = None
+
+
+def test_hashed_asset_is_immutable(tmp_path):
+    """Teste: Hash atual = cache imutável; hash antigo ainda responde, mas sem cache longo"""
+    bundle = build_bundle(_frontend(tmp_path))
+    client = _client(bundle)
+    try:
+        current = client.get(bundle.url_map["/static/icons/icon.png"])
+        assert current.status_code == 200
+        assert current.headers["cache-control"] == IMMUTABLE_CACHE
+
+        stale = client.get("/assets/000000000000/icons/icon.png")
+        assert stale.status_code == 200
+        assert stale.headers["cache-control"] == "no-cache"
+
+        assert client.get("/assets/000000000000/icons/nao-existe.png").status_code == 404
+    finally:
+        static_assets._bundle = None
@@ -0,0 +1,161 @@
+"""
+AiSyster - Stripe Events Smoke Tests
+Valida o webhook idempotente (grava pelo id do evento e responde sem
+processar), o worker de eventos e as chamadas ao SDK fora do event loop
+"""
+
+import sys
+import os
+import asyncio
+import hashlib
+import hmac
+import json
+import threading
+import time
+from datetime import datetime, timezone
+
+import httpx
+from fastapi import FastAPI
+
+# Adicionar path do projeto
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Mock da ENCRYPTION_KEY para testes (necessaria pelo config.py)
+os.environ["ENCRYPTION_KEY"] = "test_key_32_characters_long_xxx"
+
+
+import app.routes.payment as payment_module
+from app.database import get_db
+from app.stripe_events import (
+    StripeEventWorker, stripe_call, record_event,
+    RECORD_EVENT_QUERY, CLAIM_EVENTS_QUERY, COMPLETE_EVENT_QUERY, FAIL_EVENT_QUERY
+)
+from fakes import FakePool
+
+WEBHOOK_SECRET = "whsec_test"
+
+
+class EventsConn:
+    """Simula stripe_events: id -> {"type", "payload", "status", "attempts", "stripe_created"}"""
+
+    def __init__(self):
+        self.events = {}
+
+    async def fetchval(self, query, *args):
+        assert query == RECORD_EVENT_QUERY
+        event_id, event_type, payload, stripe_created = args
+        if event_id in self.events:
+            return None
+        self.events[event_id] = {
+            "type": event_type, "payload": payload, "status": "pending", "attempts": 0, "stripe_created": stripe_created
+        }
+        return event_id
+
+    async def fetch(self, query, *args):
+        assert query == CLAIM_EVENTS_QUERY
+        rows = []
+        for event_id, event in self.events.items():
+            if event["status"] == "pending":
+                event["status"] = "processing"
+                event["attempts"] += 1
+                rows.append({"id": event_id, **event})
+        return rows[:args[0]]
+
+    async def execute(self, query, *args):
+        event = self.events[args[0]]
+        if query == COMPLETE_EVENT_QUERY:
+            event["status"] = "processed"
+        else:
+            assert query == FAIL_EVENT_QUERY
+            event["status"] = "failed" if event["attempts"] >= args[2] else "pending"
+            event["last_error"] = args[1]
+
+
+def make_event(event_id: str, event_type: str, created: int, obj: dict) -> dict:
+    return {"id": event_id, "type": event_type, "created": created, "data": {"object": obj}}
+
+
+def signed(payload: bytes) -> dict:
+    timestamp = int(time.time())
+    signature = hmac.new(WEBHOOK_SECRET.encode(), f"{timestamp}.".encode() + payload, hashlib.sha256).hexdigest()
+    return {"stripe-signature": f"t={timestamp},v1={signature}", "content-type": "application/json"}
+
+
+def test_webhook_records_once_and_acks(monkeypatch):
+    """Teste: Webhook grava o evento e responde sem processar; reentrega do mesmo id não grava de novo"""
+    conn = EventsConn()
+    woken = []
+    monkeypatch.setattr(payment_module, "STRIPE_WEBHOOK_SECRET", WEBHOOK_SECRET)
+    monkeypatch.setattr(payment_module.stripe_event_worker, "wake", lambda: woken.append(True))
+
+    app = FastAPI()
+    app.include_router(payment_module.router)
+    app.dependency_overrides[get_db] = lambda: FakePool(conn)
+
+    payload = json.dumps(make_event("evt_1", "checkout.session.completed", 1700000000, {"metadata": {}})).encode()
+
+    async def run():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            first = await client.post("/payment/webhook", content=payload, headers=signed(payload))
+            again = await client.post("/payment/webhook", content=payload, headers=signed(payload))
+            forged = await client.post("/payment/webhook", content=payload, headers={"stripe-signature": "t=1,v1=bad"})
+        return first, again, forged
+
+    first, again, forged = asyncio.run(run())
+    assert first.status_code == 200 and again.status_code == 200
+    assert forged.status_code == 400
+    assert list(conn.events) == ["evt_1"] and conn.events["evt_1"]["status"] == "pending"
+    assert conn.events["evt_1"]["stripe_created"] == datetime.fromtimestamp(1700000000, tz=timezone.utc)
+    assert woken == [True]
+
+
+def test_worker_processes_in_order_and_retries():
+    """Teste: Eventos aplicados na ordem do Stripe; falha volta para a fila até max_attempts; tipo sem handler é só marcado"""
+    conn = EventsConn()
+    db = FakePool(conn)
+    applied = []
+
+    async def ok(db, obj):
+        applied.append(obj["n"])
+
+    async def broken(db, obj):
+        raise RuntimeError("banco fora do ar")
+
+    async def run():
+        for event_id, event_type, created, n in [
+            ("evt_b", "customer.subscription.updated", 20, 2),
+            ("evt_a", "checkout.session.completed", 10, 1),
+            ("evt_x", "invoice.payment_failed", 30, 3),
+            ("evt_unknown", "charge.refunded", 40, 4),
+        ]:
+            event = make_event(event_id, event_type, created, {"n": n})
+            await record_event(db, event, json.dumps(event).encode())
+
+        worker = StripeEventWorker(batch_size=10, max_attempts=2, handlers={
+            "checkout.session.completed": ok,
+            "customer.subscription.updated": ok,
+            "invoice.payment_failed": broken,
+        })
+        worker.pool = db
+        return [await worker.run_once() for _ in range(3)]
+
+    claimed = asyncio.run(run())
+    assert claimed == [4, 1, 0]
+    assert applied == [1, 2]
+    assert conn.events["evt_unknown"]["status"] == "processed"
+    assert conn.events["evt_x"]["status"] == "failed" and conn.events["evt_x"]["attempts"] == 2
+    assert "banco fora do ar" in conn.events["evt_x"]["last_error"]
+
+
+def test_stripe_call_runs_off_loop():
+    """Teste: Chamada do SDK roda no pool de threads do Stripe, não na thread do event loop"""
+    def sdk_call(customer, return_url):
+        return threading.current_thread().name, customer, return_url
+
+    async def run():
+        return threading.current_thread().name, await stripe_call(sdk_call, "cus_1", return_url="https://app")
+
+    loop_thread, (call_thread, customer, return_url) = asyncio.run(run())
+    assert call_thread.startswith("stripe") and call_thread != loop_thread
+    assert (customer, return_url) == ("cus_1", "https://app")
@@ -0,0 +1,111 @@
+"""
+AiSyster - Telemetry Smoke Tests
+Valida spans aninhados, exportacao OTLP/JSON, metricas de LLM, rotulos de query
+e o acesso ao /metrics
+"""
+
+import sys
+import os
+import json
+import tempfile
+import threading
+from types import SimpleNamespace
+
+# Adicionar path do projeto
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Mock da ENCRYPTION_KEY para testes (necessaria pelo config.py)
+os.environ["ENCRYPTION_KEY"] = "test_key_32_characters_long_xxx"
+
+
+import app.telemetry as telemetry
+from app.telemetry import (
+    span, traced_llm_call, query_labels, render_metrics, metrics_access, Histogram, FileSpanExporter, LLM_TOKENS
+)
+
+
+def test_nested_spans_exported_as_one_trace():
+    """Teste: Etapas viram filhos do span raiz e saem numa linha OTLP/JSON"""
+    path = os.path.join(tempfile.mkdtemp(), "traces.jsonl")
+    exporter = FileSpanExporter(path)
+    telemetry.span_exporter = exporter
+    try:
+        with span("http.request", method="POST"):
+            with span("chat.context_load"):
+                pass
+            with span("chat.persistence"):
+                pass
+    finally:
+        telemetry.span_exporter = None
+    exporter.flush()
+
+    with open(path) as f:
+        lines = f.readlines()
+    assert len(lines) == 1
+    spans = json.loads(lines[0])["resourceSpans"][0]["scopeSpans"][0]["spans"]
+    root = [s for s in spans if s["name"] == "http.request"][0]
+    children = [s for s in spans if s.get("parentSpanId") == root["spanId"]]
+    assert {s["name"] for s in children} == {"chat.context_load", "chat.persistence"}
+    assert len({s["traceId"] for s in spans}) == 1
+    assert 'aisyster_stage_duration_seconds_count{stage="chat.persistence"}' in render_metrics()
+
+
+def test_span_file_written_off_request_thread():
+    """Teste: O arquivo de spans e gravado pela thread do exportador; close grava o que sobrou no buffer"""
+    path = os.path.join(tempfile.mkdtemp(), "traces.jsonl")
+    exporter = FileSpanExporter(path)
+    writers = []
+    write = exporter._write
+
+    def tracked_write(batches):
+        writers.append(threading.current_thread().name)
+        write(batches)
+
+    exporter._write = tracked_write
+    telemetry.span_exporter = exporter
+    try:
+        with span("http.request"):
+            pass
+        exporter.flush()
+        exporter.export(telemetry.Span("orfao", None, {}), is_root=False)
+    finally:
+        telemetry.span_exporter = None
+    exporter.close()
+
+    with open(path) as f:
+        assert len(f.readlines()) == 2
+    assert writers[0] == "span-exporter" and threading.current_thread().name not in writers
+
+
+def test_llm_call_records_tokens_per_site():
+    """Teste: Tokens de entrada/saida contados por ponto de chamada e modelo"""
+    response = SimpleNamespace(usage=SimpleNamespace(input_tokens=120, output_tokens=30))
+    client = SimpleNamespace(messages=SimpleNamespace(create=lambda **kwargs: response))
+
+    before = LLM_TOKENS.get(("unit_test", "haiku", "input"))
+    assert traced_llm_call("unit_test", client, model="haiku", max_tokens=10) is response
+    assert LLM_TOKENS.get(("unit_test", "haiku", "input")) - before == 120
+
+
+def test_histogram_quantiles_and_query_labels():
+    """Teste: Quantis estimados pelos buckets e queries agrupadas por operacao/tabela"""
+    hist = Histogram("t", "teste", ("stage",))
+    for _ in range(90):
+        hist.observe(("x",), 0.02)
+    for _ in range(10):
+        hist.observe(("x",), 2.0)
+    assert hist.quantile(("x",), 0.5) <= 0.025
+    assert 1.0 <= hist.quantile(("x",), 0.99) <= 2.5
+
+    assert query_labels("SELECT * FROM messages WHERE id = $1") == ("SELECT", "messages")
+    assert query_labels("\n  INSERT INTO trial_sessions (a) VALUES ($1)") == ("INSERT", "trial_sessions")
+
+
+def test_metrics_access_fails_closed():
+    """Teste: Sem METRICS_TOKEN o /metrics some em producao; com token exige o Bearer correto"""
+    assert metrics_access(None, token="", debug=False) == 404
+    assert metrics_access("Bearer qualquer", token="", debug=False) == 404
+    assert metrics_access(None, token="", debug=True) == 200
+    assert metrics_access("Bearer segredo", token="segredo", debug=False) == 200
+    assert metrics_access("Bearer errado", token="segredo", debug=True) == 401
+    assert metrics_access(None, token="segredo", debug=False) == 401
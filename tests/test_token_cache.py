@@ -0,0 +1,145 @@
+"""
+AiSyster - JWT Cache Smoke Tests
+Valida cache de tokens verificados e lista de revogacao (logout do token e da sessao)
+"""
+
+import sys
+import os
+import time
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+# Adicionar path do projeto
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Mock da ENCRYPTION_KEY para testes (necessaria pelo config.py)
+os.environ["ENCRYPTION_KEY"] = "test_key_32_characters_long_xxx"
+
+
+from app.security import (
+    TokenCache,
+    TokenRevocationList,
+    create_access_token,
+    create_token_pair,
+    verify_token,
+    verify_token_cached,
+    revoke_token,
+    token_cache,
+    revoked_tokens,
+)
+from app.auth import RefreshRequest, refresh_token
+
+
+def _reset():
+    token_cache.clear()
+    revoked_tokens.clear()
+
+
+def test_cached_verification_hits():
+    """Teste: Segunda verificacao do mesmo token vem do cache"""
+    _reset()
+    token = create_access_token("user-1", "user1@test.com")
+
+    first = verify_token_cached(token)
+    second = verify_token_cached(token)
+
+    assert first is not None and first["sub"] == "user-1"
+    assert second == first
+    assert token_cache.hits == 1
+    assert len(token_cache) == 1
+
+
+def test_invalid_token_not_cached():
+    """Teste: Token invalido nunca entra no cache"""
+    _reset()
+    assert verify_token_cached("nao.e.jwt") is None
+    assert len(token_cache) == 0
+
+
+def test_expired_entry_not_returned():
+    """Teste: Cache respeita o exp do token"""
+    cache = TokenCache(max_size=10)
+    cache.set("k", {"sub": "u", "exp": time.time() - 1})
+    assert cache.get("k") is None
+    assert len(cache) == 0
+
+
+def test_lru_bound():
+    """Teste: Cache nao cresce alem do limite e descarta o menos usado"""
+    cache = TokenCache(max_size=3)
+    exp = time.time() + 3600
+    for i in range(3):
+        cache.set(f"k{i}", {"sub": str(i), "exp": exp})
+
+    cache.get("k0")  # k0 vira o mais recente
+    cache.set("k3", {"sub": "3", "exp": exp})
+
+    assert len(cache) == 3
+    assert cache.get("k1") is None
+    assert cache.get("k0") is not None
+
+
+def test_logout_revokes_cached_token():
+    """Teste: Token revogado e rejeitado mesmo estando no cache"""
+    _reset()
+    token = create_access_token("user-2", "user2@test.com")
+    other = create_access_token("user-3", "user3@test.com")
+
+    assert verify_token_cached(token) is not None
+    assert revoke_token(token) is True
+
+    assert verify_token_cached(token) is None
+    assert verify_token_cached(other) is not None
+
+
+def test_revocation_expires_with_token():
+    """Teste: Revogacao some quando o token expiraria de qualquer forma"""
+    revoked = TokenRevocationList()
+    revoked.revoke("old", time.time() - 1)
+    revoked.revoke("new", time.time() + 3600)
+
+    assert revoked.is_revoked("old") is False
+    assert revoked.is_revoked("new") is True
+    assert len(revoked) == 1
+
+
+def test_logout_revokes_session_refresh_token():
+    """Teste: Logout com o access token tambem invalida o refresh token do mesmo login"""
+    _reset()
+    access, refresh = create_token_pair("user-4", "user4@test.com")
+    other_access, other_refresh = create_token_pair("user-4", "user4@test.com")
+
+    assert verify_token_cached(refresh) is not None
+    assert revoke_token(access) is True
+
+    assert verify_token_cached(access) is None
+    assert verify_token_cached(refresh) is None
+    assert verify_token_cached(other_refresh) is not None
+
+
+class RefreshDb:
+    def __init__(self, revoked=()):
+        self.revoked = set(revoked)
+
+    async def any_token_revoked(self, keys):
+        return bool(self.revoked & set(keys))
+
+    async def get_user_by_id(self, user_id):
+        return {"id": user_id, "email": "user5@test.com"}
+
+
+def test_refresh_keeps_session_and_checks_shared_revocations():
+    """Teste: /auth/refresh mantem a sessao e recusa sessao revogada por outro worker (banco)"""
+    _reset()
+    _, refresh = create_token_pair("user-5", "user5@test.com")
+    sid = verify_token(refresh)["sid"]
+
+    renewed = asyncio.run(refresh_token(RefreshRequest(refresh_token=refresh), db=RefreshDb()))
+    assert verify_token(renewed.access_token)["sid"] == sid
+    assert verify_token(renewed.refresh_token)["sid"] == sid
+
+    with pytest.raises(HTTPException) as exc:
+        asyncio.run(refresh_token(RefreshRequest(refresh_token=refresh), db=RefreshDb(revoked={f"sid:{sid}"})))
+    assert exc.value.status_code == 401
@@ -0,0 +1,130 @@
+"""
+AiSyster - Trial Sessions Smoke Tests
+Valida LRU/TTL do store de visitantes, memoria estavel sob rotatividade e
+o limite de mensagens conferido atomicamente na gravacao
+"""
+
+import sys
+import os
+import asyncio
+import tracemalloc
+
+import httpx
+import pytest
+from fastapi import FastAPI
+from pydantic import ValidationError
+
+# Adicionar path do projeto
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Mock da ENCRYPTION_KEY para testes (necessaria pelo config.py)
+os.environ["ENCRYPTION_KEY"] = "test_key_32_characters_long_xxx"
+
+
+import app.routes.chat as chat_module
+from app.database import get_db
+from app.trial_sessions import MemoryTrialStore
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_ring_buffer_and_ttl():
+    """Teste: Historico guarda so as ultimas 6 mensagens e sessao expira por inatividade"""
+    clock = FakeClock()
+    store = MemoryTrialStore(max_sessions=10, ttl_seconds=60, clock=clock)
+
+    async def run():
+        for i in range(5):
+            await store.record_turn("s1", "1.2.3.4", f"pergunta {i}", f"resposta {i}")
+        session = await store.get("s1")
+        clock.now += 61
+        expired = await store.get("s1")
+        return session, expired
+
+    session, expired = asyncio.run(run())
+    assert session.messages_count == 5
+    assert [m["content"] for m in session.history][0] == "pergunta 2"
+    assert len(session.history) == 6
+    assert expired.messages_count == 0
+
+
+def test_memory_bounded_under_session_churn():
+    """Teste: 50 mil sessoes novas nao passam do limite nem fazem a memoria crescer"""
+    store = MemoryTrialStore(max_sessions=1000, ttl_seconds=3600)
+    payload = "x" * 200
+
+    async def churn(start, count):
+        for i in range(start, start + count):
+            await store.record_turn(f"crawler-{i}", "10.0.0.1", payload, payload)
+
+    tracemalloc.start()
+    asyncio.run(churn(0, 2000))  # Enche o store
+    baseline = tracemalloc.get_traced_memory()[0]
+    asyncio.run(churn(2000, 50000))
+    growth = tracemalloc.get_traced_memory()[0] - baseline
+    tracemalloc.stop()
+
+    assert len(store) == 1000
+    assert growth < 512 * 1024
+
+
+def test_record_turn_enforces_limit():
+    """Teste: Com limit, a gravacao recusa (None) a sessao que ja chegou ao limite e nao altera nada"""
+    store = MemoryTrialStore(max_sessions=10, ttl_seconds=60)
+
+    async def run():
+        counts = [await store.record_turn("s1", "ip", f"p{i}", f"r{i}", limit=3) for i in range(5)]
+        return counts, await store.get("s1")
+
+    counts, session = asyncio.run(run())
+    assert counts == [1, 2, 3, None, None]
+    assert session.messages_count == 3
+    assert session.history[-1]["content"] == "r2"
+
+
+def test_concurrent_trial_requests_respect_limit(monkeypatch):
+    """Teste: Pedidos simultaneos da mesma sessao passam pela checagem inicial juntos; so o limite e gravado"""
+    store = MemoryTrialStore(max_sessions=10, ttl_seconds=60)
+    limit = chat_module.TRIAL_MESSAGES_LIMIT_ANONYMOUS
+
+    class SlowAIService:
+        def __init__(self, db):
+            pass
+
+        async def chat_trial(self, message, history, user):
+            await asyncio.sleep(0.01)
+            return "resposta"
+
+    monkeypatch.setattr(chat_module, "AIService", SlowAIService)
+    monkeypatch.setattr(chat_module, "get_trial_store", lambda: store)
+    monkeypatch.setattr(chat_module.rate_limiter, "is_allowed", lambda *a, **kw: True)
+
+    app = FastAPI()
+    app.include_router(chat_module.router)
+    app.dependency_overrides[get_db] = lambda: None
+
+    async def run():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await asyncio.gather(*(
+                client.post("/chat/trial", json={"message": "oi", "session_id": "visitante"})
+                for _ in range(limit + 3)
+            ))
+
+    statuses = sorted(response.status_code for response in asyncio.run(run()))
+    assert statuses == [200] * limit + [402] * 3
+    assert asyncio.run(store.get("visitante")).messages_count == limit
+
+
+def test_trial_session_id_is_bounded():
+    """Teste: session_id vazio ou gigante e recusado na validacao"""
+    assert chat_module.TrialChatRequest(message="oi", session_id="s" * 128).session_id
+    for session_id in ("", "s" * 129):
+        with pytest.raises(ValidationError):
+            chat_module.TrialChatRequest(message="oi", session_id=session_id)
@@ -0,0 +1,123 @@
+"""
+AiSyster - TTS Cache Smoke Tests
+Valida cache de audio endereçado por conteudo, LRU por bytes e single-flight
+"""
+
+import sys
+import os
+import asyncio
+import tempfile
+import threading
+from pathlib import Path
+
+# Adicionar path do projeto
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Mock da ENCRYPTION_KEY para testes (necessaria pelo config.py)
+os.environ["ENCRYPTION_KEY"] = "test_key_32_characters_long_xxx"
+
+
+from app.tts_cache import TTSAudioCache, tts_cache_key
+
+
+def test_key_depends_only_on_api_params():
+    """Teste: Chave muda com texto/voz/modelo/velocidade (o que vai para a API) e nada mais"""
+    base = tts_cache_key("Paz", "nova", "tts-1", 1.0)
+    assert base == tts_cache_key("Paz", "nova", "tts-1", 1.0)
+    assert base != tts_cache_key("Paz", "onyx", "tts-1", 1.0)
+    assert base != tts_cache_key("Paz", "nova", "tts-1-hd", 1.0)
+    assert base != tts_cache_key("Paz", "nova", "tts-1", 1.25)
+
+
+def test_lru_eviction_by_bytes_and_persistence():
+    """Teste: Cache respeita limite em bytes e sobrevive a restart"""
+    directory = tempfile.mkdtemp()
+    cache = TTSAudioCache(directory, max_bytes=250)
+    cache.put("a" * 64, b"1" * 100)
+    cache.put("b" * 64, b"2" * 100)
+    assert cache.get("a" * 64) == b"1" * 100  # "a" vira o mais recente
+    cache.put("c" * 64, b"3" * 100)
+
+    assert cache.total_bytes == 200
+    assert "b" * 64 not in cache
+    assert cache.get("c" * 64) == b"3" * 100
+
+    reopened = TTSAudioCache(directory, max_bytes=250)
+    assert len(reopened) == 2
+    assert reopened.get("a" * 64) == b"1" * 100
+
+
+def test_concurrent_requests_synthesize_once():
+    """Teste: Pedidos simultaneos da mesma frase chamam a API uma vez"""
+    cache = TTSAudioCache(tempfile.mkdtemp())
+    calls = []
+
+    async def synthesize():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return b"mp3-bytes"
+
+    async def run():
+        return await asyncio.gather(*(cache.get_or_create("k" * 64, synthesize) for _ in range(5)))
+
+    results = asyncio.run(run())
+    assert results == [b"mp3-bytes"] * 5
+    assert len(calls) == 1
+    assert asyncio.run(cache.get_or_create("k" * 64, synthesize)) == b"mp3-bytes"
+    assert len(calls) == 1
+
+
+def test_size_bound_is_shared_between_workers(monkeypatch):
+    """Teste: Dois workers no mesmo diretório: o limite vale para o diretório e um lê o que o outro gravou"""
+    import app.tts_cache as tts_cache_module
+    monkeypatch.setattr(tts_cache_module, "TTS_CACHE_RESCAN_SECONDS", 0)  # Relê o diretório a cada gravação
+
+    directory = tempfile.mkdtemp()
+    worker_a = TTSAudioCache(directory, max_bytes=250)
+    worker_b = TTSAudioCache(directory, max_bytes=250)
+
+    async def run():
+        await worker_a.aput("a" * 64, b"1" * 100)
+        await worker_b.aput("b" * 64, b"2" * 100)
+        shared = await worker_a.aget("b" * 64)
+        await asyncio.sleep(0.01)  # mtime de "c" mais novo
+        await worker_b.aput("c" * 64, b"3" * 100)
+        return shared
+
+    assert asyncio.run(run()) == b"2" * 100
+    on_disk = sorted(path.stem[0] for path in Path(directory).glob("*/*.mp3"))
+    assert len(on_disk) == 2 and "c" in on_disk
+
+
+def test_prewarm_runs_in_one_worker_once():
+    """Teste: Só quem pega o lock pré-aquece; o marcador evita repetir o mesmo conjunto de frases"""
+    directory = tempfile.mkdtemp()
+    worker_a = TTSAudioCache(directory)
+    worker_b = TTSAudioCache(directory)
+
+    with worker_a.prewarm_lock() as leader_a:
+        with worker_b.prewarm_lock() as leader_b:
+            assert leader_a is True and leader_b is False
+        assert worker_a.prewarm_done("v1") is False
+        worker_a.mark_prewarm_done("v1")
+
+    assert worker_b.prewarm_done("v1") is True
+    assert worker_b.prewarm_done("v2") is False
+
+
+def test_stats_scan_runs_off_loop():
+    """Teste: get_stats carrega o indice numa thread, nao no event loop"""
+    directory = tempfile.mkdtemp()
+    TTSAudioCache(directory).put("a" * 64, b"1" * 100)
+    cache = TTSAudioCache(directory)
+    scan_threads = []
+    scan_disk = cache._scan_disk
+
+    def tracked_scan():
+        scan_threads.append(threading.current_thread())
+        return scan_disk()
+
+    cache._scan_disk = tracked_scan
+    stats = asyncio.run(cache.get_stats())
+    assert (stats["entries"], stats["total_bytes"]) == (1, 100)
+    assert scan_threads and scan_threads[0] is not threading.main_thread()
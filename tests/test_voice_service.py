@@ -0,0 +1,120 @@
+"""
+AiSyster - Voice Service Smoke Tests
+Valida upload em memoria (STT) e audio em streaming (TTS) com cliente falso
+"""
+
+import sys
+import os
+import io
+import asyncio
+import tempfile
+from types import SimpleNamespace
+
+# Adicionar path do projeto
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Mock da ENCRYPTION_KEY para testes (necessaria pelo config.py)
+os.environ["ENCRYPTION_KEY"] = "test_key_32_characters_long_xxx"
+
+
+import app.voice_service as voice_module
+from app.voice_service import VoiceService
+from app.tts_cache import TTSAudioCache
+
+
+class FakeStreamingResponse:
+    def __init__(self, chunks):
+        self.chunks = chunks
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        return False
+
+    async def iter_bytes(self, chunk_size=None):
+        for chunk in self.chunks:
+            yield chunk
+
+
+class FakeClient:
+    """Imita client.audio.{transcriptions,speech} do AsyncOpenAI"""
+
+    def __init__(self):
+        self.uploaded = None
+
+        async def transcribe(**kwargs):
+            self.uploaded = kwargs["file"]
+            return " ola "
+
+        self.audio = SimpleNamespace(
+            transcriptions=SimpleNamespace(create=transcribe),
+            speech=SimpleNamespace(
+                with_streaming_response=SimpleNamespace(
+                    create=lambda **kwargs: FakeStreamingResponse([b"abc", b"def"])
+                )
+            )
+        )
+
+
+def _service():
+    voice_module.tts_audio_cache = TTSAudioCache(tempfile.mkdtemp())  # Cache isolado por teste
+    service = VoiceService(api_key="test-key")
+    service.enabled = True
+    service._client = FakeClient()
+    return service
+
+
+def test_stt_uploads_from_memory():
+    """Teste: Audio vai para o Whisper como BytesIO nomeado (sem arquivo temporario)"""
+    service = _service()
+    ok, text = asyncio.run(service.speech_to_text(b"\x00" * 200, "voz.m4a"))
+
+    assert ok is True and text == "ola"
+    assert isinstance(service._client.uploaded, io.BytesIO)
+    assert service._client.uploaded.name == "voz.m4a"
+
+
+def test_tts_stream_yields_chunks():
+    """Teste: TTS em streaming entrega os chunks na ordem"""
+    async def collect():
+        ok, stream, error = await _service().stream_text_to_speech("Paz seja com voce")
+        assert ok and not error
+        return [chunk async for chunk in stream]
+
+    assert asyncio.run(collect()) == [b"abc", b"def"]
+    assert voice_module.tts_audio_cache.total_bytes == 6  # Stream completo gravado no cache
+
+
+def test_tts_stream_rejects_empty_text():
+    """Teste: Texto vazio falha antes de abrir stream"""
+    ok, stream, error = asyncio.run(_service().stream_text_to_speech("   "))
+    assert ok is False and stream is None and error == "Texto vazio"
+
+
+def test_chat_with_voice_propagates_selected_errors():
+    """Teste: Exceção listada em propagate sobe para a rota; as demais viram result["error"]"""
+    service = _service()
+
+    class QuotaExhausted(Exception):
+        pass
+
+    async def exhausted(**kwargs):
+        raise QuotaExhausted("limite")
+
+    async def broken(**kwargs):
+        raise RuntimeError("fora do ar")
+
+    async def run():
+        result = await service.chat_with_voice(b"audio" * 100, "a.webm", broken, "u1", return_audio=False)
+        try:
+            await service.chat_with_voice(
+                b"audio" * 100, "a.webm", exhausted, "u1", return_audio=False, propagate=(QuotaExhausted,)
+            )
+        except QuotaExhausted:
+            return result, True
+        return result, False
+
+    result, propagated = asyncio.run(run())
+    assert not result["success"] and "fora do ar" in result["error"]
+    assert propagated